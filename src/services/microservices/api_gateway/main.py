@@ -1,17 +1,26 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.background import BackgroundTask
 import uvicorn
 import httpx
+import json
+import math
+import os
+import random
 import time
 import asyncio
+import yaml
+from enum import Enum
 from functools import wraps
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_VERIFICATION_REQUESTS, QUEUE_PAYOUT_REQUESTS
+from ..common.message_queue import QUEUE_VERIFICATION_REQUESTS, QUEUE_PAYOUT_REQUESTS
+from ..common.async_message_queue import async_mq_client
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -41,12 +50,283 @@ SERVICES = {
 
 # HTTP客户端配置
 HTTP_CLIENT_TIMEOUT = 30.0  # 30秒超时
+HTTP_CLIENT_CONNECT_TIMEOUT = 5.0  # 建立连接的超时
 HTTP_CLIENT_MAX_RETRIES = 3  # 最多重试3次
 
-# 创建HTTP客户端（带连接池）
+# 各服务路由的默认读超时（秒），可由 services.<name>.timeout 覆盖；报告下载耗时较长
+DEFAULT_ROUTE_TIMEOUTS = {
+    'report_generation': 120.0,
+}
+
+def _route_timeout(service_name: str) -> httpx.Timeout:
+    """服务路由的超时配置（services.<name>.timeout / services.<name>.connect_timeout）"""
+    timeout = config_manager.get(f'services.{service_name}.timeout',
+                                 DEFAULT_ROUTE_TIMEOUTS.get(service_name, HTTP_CLIENT_TIMEOUT))
+    connect = config_manager.get(f'services.{service_name}.connect_timeout', HTTP_CLIENT_CONNECT_TIMEOUT)
+    return httpx.Timeout(timeout, connect=connect)
+
+ROUTE_TIMEOUTS = {service_name: _route_timeout(service_name) for service_name in SERVICES}
+
+# 创建HTTP客户端（带连接池）；代理不跟随重定向，由调用方自行处理
 http_client = httpx.AsyncClient(
-    timeout=HTTP_CLIENT_TIMEOUT,
-    follow_redirects=True
+    timeout=httpx.Timeout(HTTP_CLIENT_TIMEOUT, connect=HTTP_CLIENT_CONNECT_TIMEOUT),
+    limits=httpx.Limits(
+        max_connections=config_manager.get('api_gateway.max_connections', 200),
+        max_keepalive_connections=config_manager.get('api_gateway.max_keepalive_connections', 100),
+        keepalive_expiry=config_manager.get('api_gateway.keepalive_expiry', 30.0)
+    ),
+    follow_redirects=False
+)
+
+# 逐跳头（RFC 7230 6.1），只对单个连接有效，代理时不转发
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'proxy-connection',
+    'te',
+    'trailer',
+    'transfer-encoding',
+    'upgrade',
+})
+
+class LoadBalancingPolicy(str, Enum):
+    """上游副本选择策略"""
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"  # 随机两个副本中在途请求较少者
+    EWMA = "ewma"  # 随机两个副本中 延迟EWMA × (在途请求数 + 1) 较小者
+
+class Upstream:
+    """服务的一个副本"""
+    
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True  # 主动健康检查结果
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0  # 被动剔除截止时间（monotonic）
+        self.ejections = 0
+        self.requests = 0
+        self.failures = 0
+        self._ewma = 0.0
+        self._ewma_at = 0.0
+    
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+    
+    def available(self, now: float) -> bool:
+        return self.healthy and not self.ejected(now)
+    
+    def observe(self, latency: float, now: float, decay: float) -> None:
+        """按时间衰减更新延迟EWMA（秒）"""
+        if self._ewma_at == 0.0:
+            self._ewma = latency
+        else:
+            weight = math.exp(-(now - self._ewma_at) / decay)
+            self._ewma = self._ewma * weight + latency * (1 - weight)
+        self._ewma_at = now
+    
+    def cost(self, now: float, decay: float) -> float:
+        """EWMA策略的负载代价；空闲副本的延迟随时间衰减，慢副本恢复后会重新得到流量"""
+        ewma = self._ewma * math.exp(-(now - self._ewma_at) / decay) if self._ewma_at else 0.0
+        return ewma * (self.outstanding + 1)
+    
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self._ewma * 1000, 2),
+            "ejected": self.ejected(now),
+            "ejected_for_s": round(max(0.0, self.ejected_until - now), 1),
+            "ejections": self.ejections,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+class UpstreamPool:
+    """
+    服务的副本池
+    
+    按策略选择副本，并根据代理结果做被动异常剔除：连续 failure_threshold 次连接错误、超时或
+    502/503/504 的副本被剔除 ejection_time × 剔除次数 秒（不超过 max_ejection_time），同时被剔除的副本
+    不超过 max_ejection_percent。所有副本都被剔除时仍在健康检查通过的副本中选择，避免整个服务不可用。
+    """
+    
+    def __init__(
+        self,
+        service_name: str,
+        urls: List[str],
+        policy: LoadBalancingPolicy = LoadBalancingPolicy.LEAST_OUTSTANDING,
+        failure_threshold: int = 5,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        max_ejection_percent: int = 50,
+        ewma_decay: float = 10.0
+    ):
+        self.service_name = service_name
+        self.policy = LoadBalancingPolicy(policy)
+        self.failure_threshold = max(1, failure_threshold)
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_ejection_percent = max_ejection_percent
+        self.ewma_decay = ewma_decay
+        self.upstreams: List[Upstream] = []
+        self._next = 0
+        self.update(urls)
+    
+    def update(self, urls: List[str]) -> None:
+        """更新副本列表，仍在列表中的副本保留统计和状态；空列表被忽略"""
+        current = {upstream.url: upstream for upstream in self.upstreams}
+        upstreams = [current.get(url) or Upstream(url) for url in dict.fromkeys(url.rstrip('/') for url in urls)]
+        if not upstreams:
+            logger.warning(f"Ignoring empty replica list for {self.service_name}")
+            return
+        added = [upstream.url for upstream in upstreams if upstream.url not in current]
+        removed = set(current) - {upstream.url for upstream in upstreams}
+        if current and (added or removed):
+            logger.info(f"Replicas of {self.service_name} updated: added {added}, removed {sorted(removed)}")
+        self.upstreams = upstreams
+    
+    def select(self, exclude: Optional[Upstream] = None) -> Optional[Upstream]:
+        """选择副本，没有可用副本时返回None"""
+        now = time.monotonic()
+        candidates = [u for u in self.upstreams if u is not exclude and u.available(now)]
+        if not candidates:
+            candidates = [u for u in self.upstreams if u is not exclude and u.healthy]
+            if not candidates:
+                return None
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.policy == LoadBalancingPolicy.ROUND_ROBIN:
+            self._next += 1
+            return candidates[self._next % len(candidates)]
+        # 两个随机选择（power of two choices）：避免所有请求同时涌向同一个“最优”副本
+        first, second = random.sample(candidates, 2)
+        if self.policy == LoadBalancingPolicy.LEAST_OUTSTANDING:
+            return first if first.outstanding <= second.outstanding else second
+        return first if first.cost(now, self.ewma_decay) <= second.cost(now, self.ewma_decay) else second
+    
+    def acquire(self, upstream: Upstream) -> None:
+        upstream.outstanding += 1
+        upstream.requests += 1
+    
+    def release(self, upstream: Upstream) -> None:
+        upstream.outstanding = max(0, upstream.outstanding - 1)
+    
+    def record_success(self, upstream: Upstream, latency: float) -> None:
+        upstream.consecutive_failures = 0
+        upstream.observe(latency, time.monotonic(), self.ewma_decay)
+    
+    def record_failure(self, upstream: Upstream) -> None:
+        upstream.failures += 1
+        upstream.consecutive_failures += 1
+        now = time.monotonic()
+        if upstream.consecutive_failures < self.failure_threshold or upstream.ejected(now):
+            return
+        ejected = sum(1 for u in self.upstreams if u.ejected(now))
+        if (ejected + 1) * 100 > self.max_ejection_percent * len(self.upstreams):
+            return
+        upstream.ejections += 1
+        duration = min(self.max_ejection_time, self.ejection_time * upstream.ejections)
+        upstream.ejected_until = now + duration
+        upstream.consecutive_failures = 0
+        logger.warning(f"Ejected {self.service_name} replica {upstream.url} for {duration:.0f}s "
+                       f"after {self.failure_threshold} consecutive failures")
+
+def _pool_options(service_name: str) -> Dict[str, Any]:
+    """副本池配置：services.<name>.lb_policy 以及 api_gateway.outlier_detection"""
+    outlier = config_manager.get('api_gateway.outlier_detection', {}) or {}
+    return {
+        'policy': config_manager.get(f'services.{service_name}.lb_policy',
+                                     config_manager.get('api_gateway.lb_policy', LoadBalancingPolicy.LEAST_OUTSTANDING.value)),
+        'failure_threshold': outlier.get('failure_threshold', 5),
+        'ejection_time': outlier.get('ejection_time', 30.0),
+        'max_ejection_time': outlier.get('max_ejection_time', 300.0),
+        'max_ejection_percent': outlier.get('max_ejection_percent', 50),
+        'ewma_decay': config_manager.get('api_gateway.ewma_decay', 10.0)
+    }
+
+def _load_upstreams_file(path: str) -> Dict[str, List[str]]:
+    """读取副本文件（JSON或YAML）：{服务名: [地址, ...]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() in ('.yml', '.yaml'):
+            data = yaml.safe_load(f) or {}
+        else:
+            data = json.load(f)
+    return {service_name: [urls] if isinstance(urls, str) else list(urls) for service_name, urls in data.items()}
+
+def _configured_upstreams(file_upstreams: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """各服务的副本地址：副本文件优先，其次 services.<name>.urls，最后 services.<name>.url"""
+    upstreams = {}
+    for service_name, default_url in SERVICES.items():
+        urls = (file_upstreams or {}).get(service_name) or config_manager.get(f'services.{service_name}.urls')
+        upstreams[service_name] = urls or [default_url]
+    return upstreams
+
+UPSTREAMS: Dict[str, UpstreamPool] = {
+    service_name: UpstreamPool(service_name, urls, **_pool_options(service_name))
+    for service_name, urls in _configured_upstreams().items()
+}
+
+class UpstreamWatcher:
+    """
+    副本列表刷新
+    
+    每隔 interval 秒重新读取配置（services.<name>.urls）和副本文件（api_gateway.upstreams_file，
+    按修改时间判断是否变化），增减副本不需要重启网关；文件读取失败时保留当前列表。
+    """
+    
+    def __init__(self, pools: Dict[str, UpstreamPool], path: Optional[str] = None, interval: float = 5.0):
+        self.pools = pools
+        self.path = path
+        self.interval = interval
+        self._mtime: Optional[float] = None
+        self._file_upstreams: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def refresh(self) -> None:
+        """重新读取副本列表并更新副本池"""
+        if self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime != self._mtime:
+                    self._file_upstreams = _load_upstreams_file(self.path)
+                    self._mtime = mtime
+            except FileNotFoundError:
+                self._file_upstreams, self._mtime = {}, None
+            except Exception as e:
+                logger.error(f"Failed to load upstreams file {self.path}: {str(e)}")
+        for service_name, urls in _configured_upstreams(self._file_upstreams).items():
+            self.pools[service_name].update(urls)
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Upstream refresh failed: {str(e)}")
+    
+    def start(self) -> None:
+        """启动后台刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止后台刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+upstream_watcher = UpstreamWatcher(
+    UPSTREAMS,
+    path=config_manager.get('api_gateway.upstreams_file'),
+    interval=config_manager.get('api_gateway.upstream_refresh_interval', 5.0)
 )
 
 # 安全认证
@@ -120,83 +400,280 @@ async def log_request_middleware(request: Request, call_next):
             content={"detail": "Internal server error"}
         )
 
-# 服务健康检查
-@app.get("/health", tags=["Health"])
-async def health_check():
-    """检查API网关健康状态"""
-    # 检查各服务连接状态
-    services_status = {}
-    for service_name, service_url in SERVICES.items():
+class ServiceHealthMonitor:
+    """
+    后台服务健康监控
+    
+    每隔 interval 秒通过共享连接池并发探测所有服务副本的 /health，保存最新状态和时间戳，
+    并把结果写入副本（Upstream.healthy）供负载均衡使用；/health 接口直接返回内存中的结果。
+    消息队列只检查连接状态，断开时在后台重连，不阻塞请求。
+    """
+    
+    def __init__(self, pools: Dict[str, UpstreamPool], interval: float = 5.0, timeout: float = 2.0):
+        self.pools = pools
+        self.interval = interval
+        self.timeout = httpx.Timeout(timeout)
+        # 服务名 -> 副本地址 -> 最近一次探测结果
+        self._status: Dict[str, Dict[str, Dict[str, Any]]] = {service_name: {} for service_name in pools}
+        self._mq_status: Dict[str, Any] = {"status": "unknown", "checked_at": None}
+        self._task: Optional[asyncio.Task] = None
+    
+    def _update(self, service_name: str, upstream: Upstream, result: Dict[str, Any]) -> None:
+        replicas = self._status.setdefault(service_name, {})
+        previous = replicas.get(upstream.url, {})
+        now = time.time()
+        result["checked_at"] = now
+        result["changed_at"] = now if previous.get("status") != result["status"] else previous.get("changed_at")
+        if previous.get("status") not in (None, result["status"]):
+            logger.warning(f"Service {service_name} replica {upstream.url} is now {result['status']}")
+        replicas[upstream.url] = result
+        upstream.healthy = result["status"] == "up"
+    
+    async def _probe(self, service_name: str, upstream: Upstream) -> None:
+        start = time.perf_counter()
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{service_url}/health")
-                services_status[service_name] = {
-                    "status": "up" if response.status_code == 200 else "down",
-                    "status_code": response.status_code
-                }
+            response = await http_client.get(f"{upstream.url}/health", timeout=self.timeout)
+            result = {
+                "status": "up" if response.status_code == 200 else "down",
+                "status_code": response.status_code
+            }
         except Exception as e:
-            services_status[service_name] = {
-                "status": "down",
-                "error": str(e)
+            result = {"status": "down", "error": str(e) or type(e).__name__}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self._update(service_name, upstream, result)
+    
+    async def _check_message_queue(self) -> None:
+        connected = async_mq_client.connected
+        if not connected:
+            try:
+                connected = await asyncio.wait_for(async_mq_client.connect(), self.timeout.connect)
+            except Exception as e:
+                logger.warning(f"Message queue reconnect failed: {str(e)}")
+                connected = False
+        self._mq_status = {"status": "up" if connected else "down", "checked_at": time.time()}
+    
+    async def check_all(self) -> None:
+        """并发探测所有服务副本和消息队列"""
+        await asyncio.gather(
+            *(self._probe(service_name, upstream)
+              for service_name, pool in self.pools.items() for upstream in pool.upstreams),
+            self._check_message_queue()
+        )
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Health check round failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """启动后台探测任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止后台探测任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def _service_snapshot(self, service_name: str, pool: UpstreamPool) -> Dict[str, Any]:
+        probes = self._status.get(service_name, {})
+        replicas = {}
+        for upstream in pool.upstreams:
+            replicas[upstream.url] = {
+                "status": "unknown",
+                "checked_at": None,
+                **probes.get(upstream.url, {}),
+                **upstream.stats()
             }
+        statuses = [replica["status"] for replica in replicas.values()]
+        if statuses and all(status == "up" for status in statuses):
+            status = "up"
+        elif "up" in statuses:
+            status = "degraded"
+        elif statuses and all(status == "unknown" for status in statuses):
+            status = "unknown"
+        else:
+            status = "down"
+        return {"status": status, "policy": pool.policy.value, "replicas": replicas}
     
-    # 检查消息队列连接
-    mq_status = "up" if mq_client.connected or mq_client.connect() else "down"
+    def snapshot(self) -> Dict[str, Any]:
+        """最新的健康状态"""
+        services_status = {
+            service_name: self._service_snapshot(service_name, pool) for service_name, pool in self.pools.items()
+        }
+        statuses = [s["status"] for s in services_status.values()]
+        mq_status = self._mq_status["status"]
+        if all(status == "up" for status in statuses) and mq_status == "up":
+            overall_status = "up"
+        elif "down" in statuses or mq_status == "down":
+            overall_status = "down"
+        else:
+            overall_status = "degraded"
+        return {
+            "status": overall_status,
+            "timestamp": time.time(),
+            "services": services_status,
+            "message_queue": mq_status,
+            "message_queue_checked_at": self._mq_status["checked_at"]
+        }
+
+health_monitor = ServiceHealthMonitor(
+    UPSTREAMS,
+    interval=config_manager.get('api_gateway.health_check_interval', 5.0),
+    timeout=config_manager.get('api_gateway.health_check_timeout', 2.0)
+)
+
+# 服务健康检查
+@app.get("/health", tags=["Health"])
+async def health_check():
+    """检查API网关健康状态（返回后台监控的最新结果）"""
+    return health_monitor.snapshot()
+
+def _strip_hop_by_hop(items: Iterable[Tuple[str, str]], *extra: str) -> List[Tuple[str, str]]:
+    """去掉逐跳头以及 Connection 头中列出的字段，保留重复的头（如 set-cookie）"""
+    items = list(items)
+    drop = set(HOP_BY_HOP_HEADERS).union(extra)
+    for name, value in items:
+        if name.lower() == 'connection':
+            drop.update(token.strip().lower() for token in value.split(',') if token.strip())
+    return [(name, value) for name, value in items if name.lower() not in drop]
+
+def _forward_headers(request: Request) -> List[Tuple[str, str]]:
+    """转发给上游的请求头：去掉逐跳头和host（由httpx按目标地址设置），追加X-Forwarded-*"""
+    headers = _strip_hop_by_hop(request.headers.items(), 'host')
+    client_ip = request.client.host if request.client else None
+    if client_ip:
+        forwarded_for = request.headers.get('x-forwarded-for')
+        headers = [(name, value) for name, value in headers if name.lower() != 'x-forwarded-for']
+        headers.append(('x-forwarded-for', f"{forwarded_for}, {client_ip}" if forwarded_for else client_ip))
+    if 'x-forwarded-proto' not in request.headers:
+        headers.append(('x-forwarded-proto', request.url.scheme))
+    if 'x-forwarded-host' not in request.headers and 'host' in request.headers:
+        headers.append(('x-forwarded-host', request.headers['host']))
+    if 'accept-encoding' not in request.headers:
+        # 覆盖httpx默认的 gzip, deflate：响应体原样转发，不能让上游压缩客户端未要求压缩的内容
+        headers.append(('accept-encoding', 'identity'))
+    return headers
+
+class _UpstreamLease:
+    """一次代理请求占用的副本，响应体转发结束或中断时释放（只释放一次）"""
     
-    # 总体健康状态
-    overall_status = "up" if all(s["status"] == "up" for s in services_status.values()) and mq_status == "up" else "down"
+    def __init__(self, pool: UpstreamPool, upstream: Upstream, response: httpx.Response):
+        self.pool = pool
+        self.upstream = upstream
+        self.response = response
+        self._closed = False
     
-    return {
-        "status": overall_status,
-        "timestamp": time.time(),
-        "services": services_status,
-        "message_queue": mq_status
-    }
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.pool.release(self.upstream)
+        await self.response.aclose()
+
+async def _relay_body(service_name: str, lease: _UpstreamLease) -> AsyncIterator[bytes]:
+    """原样转发上游响应体（不解压、不解析）"""
+    try:
+        async for chunk in lease.response.aiter_raw():
+            yield chunk
+    except httpx.HTTPError as e:
+        # 响应头已发出，只能中断连接让客户端感知响应不完整
+        logger.error(f"Upstream {service_name} failed while streaming response: {str(e)}")
+        lease.pool.record_failure(lease.upstream)
+        raise
+    finally:
+        await lease.close()
 
 # 通用的服务代理函数
 async def proxy_request(service_name: str, path: str, method: str, request: Request):
-    """代理请求到指定的微服务"""
-    if service_name not in SERVICES:
+    """
+    以流式方式代理请求到指定的微服务
+    
+    请求体和响应体按原始字节转发，不解析也不重新编码（压缩的响应保持压缩，content-length 仍然有效），
+    网关的CPU和内存开销与负载大小无关；逐跳头不转发，超时按服务路由配置（ROUTE_TIMEOUTS）。
+    副本由服务的 UpstreamPool 选择；不带请求体的请求在连接失败时换一个副本重试一次。
+    """
+    pool = UPSTREAMS.get(service_name)
+    if pool is None:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
+    upstream = pool.select()
+    if upstream is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service '{service_name}' is unavailable",
+            headers={"Retry-After": str(int(health_monitor.interval) or 1)}
+        )
     
-    service_url = SERVICES[service_name]
-    target_url = f"{service_url}{path}"
+    # 使用原始查询串，保留重复参数和编码
+    path_and_query = f"{path}?{request.url.query}" if request.url.query else path
+    headers = _forward_headers(request)
     
-    # 获取请求头和请求体
-    headers = dict(request.headers)
-    # 移除host头，让httpx自动设置
-    headers.pop("host", None)
+    # 只有带请求体的请求才流式转发请求体，避免为GET等请求发送分块编码；
+    # 请求体只能读取一次，因此这类请求不换副本重试
+    has_body = 'content-length' in request.headers or 'transfer-encoding' in request.headers
+    attempts = 1 if has_body else 2
     
-    try:
-        # 读取请求体
-        body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            body = await request.body()
-            
-        # 转发请求到目标服务
-        response = await http_client.request(
-            method=method,
-            url=target_url,
-            headers=headers,
-            content=body,
-            params=request.query_params
-        )
-        
-        # 返回目标服务的响应
-        return JSONResponse(
-            content=response.json(),
-            status_code=response.status_code,
-            headers=dict(response.headers)
-        )
-    except httpx.TimeoutException:
-        logger.error(f"Request to {service_name} timed out: {target_url}")
-        raise HTTPException(status_code=504, detail=f"Service '{service_name}' timeout")
-    except httpx.HTTPError as e:
-        logger.error(f"HTTP error when calling {service_name}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error calling service '{service_name}'")
-    except Exception as e:
-        logger.error(f"Unexpected error when proxying to {service_name}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    while True:
+        attempts -= 1
+        target_url = f"{upstream.url}{path_and_query}"
+        pool.acquire(upstream)
+        start = time.perf_counter()
+        try:
+            upstream_request = http_client.build_request(
+                method,
+                target_url,
+                headers=headers,
+                content=request.stream() if has_body else None,
+                timeout=ROUTE_TIMEOUTS.get(service_name, http_client.timeout)
+            )
+            upstream_response = await http_client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            pool.release(upstream)
+            pool.record_failure(upstream)
+            if attempts > 0 and isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                alternative = pool.select(exclude=upstream)
+                if alternative is not None:
+                    logger.warning(f"Connect to {service_name} replica {upstream.url} failed, "
+                                   f"retrying on {alternative.url}: {str(e)}")
+                    upstream = alternative
+                    continue
+            if isinstance(e, httpx.TimeoutException):
+                logger.error(f"Request to {service_name} timed out: {target_url}")
+                raise HTTPException(status_code=504, detail=f"Service '{service_name}' timeout")
+            logger.error(f"HTTP error when calling {service_name}: {str(e)}")
+            raise HTTPException(status_code=502, detail=f"Error calling service '{service_name}'")
+        except Exception as e:
+            pool.release(upstream)
+            logger.error(f"Unexpected error when proxying to {service_name}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        break
+    
+    # 网关类错误计入被动异常剔除，其余响应按首字节延迟更新EWMA
+    if upstream_response.status_code in (502, 503, 504):
+        pool.record_failure(upstream)
+    else:
+        pool.record_success(upstream, time.perf_counter() - start)
+    
+    lease = _UpstreamLease(pool, upstream, upstream_response)
+    response = StreamingResponse(
+        _relay_body(service_name, lease),
+        status_code=upstream_response.status_code,
+        background=BackgroundTask(lease.close)
+    )
+    # 直接设置原始响应头，保留重复的头
+    response.raw_headers = [
+        (name.encode('latin-1'), value.encode('latin-1'))
+        for name, value in _strip_hop_by_hop(upstream_response.headers.multi_items())
+    ]
+    return response
 
 # 订单验证服务代理路由
 @app.api_route("/api/verify/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"], tags=["Order Verification"])
@@ -227,7 +704,7 @@ async def proxy_report_generation(request: Request, path: str):
 async def publish_message(queue_name: str, message: dict, request: Request):
     """发布消息到指定的消息队列（需要认证）"""
     try:
-        success = mq_client.publish_message(queue_name, message)
+        success = await async_mq_client.publish_message(queue_name, message)
         if success:
             logger.info(f"Message published to queue '{queue_name}' via API Gateway")
             return {"status": "success", "message": f"Message published to queue '{queue_name}'"}
@@ -244,17 +721,20 @@ async def startup_event():
     logger.info("API Gateway starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.warning("Failed to connect to message queue during startup")
     
-    # 预热HTTP客户端连接池
-    for service_name, service_url in SERVICES.items():
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.get(f"{service_url}/health")
-                logger.info(f"Connected to {service_name} service at {service_url}")
-        except Exception as e:
-            logger.warning(f"Failed to connect to {service_name} service at startup: {str(e)}")
+    # 读取副本列表；首次健康检查同时预热共享连接池，之后在后台定期检查和刷新
+    upstream_watcher.refresh()
+    await health_monitor.check_all()
+    for service_name, status in health_monitor.snapshot()["services"].items():
+        replicas = ", ".join(f"{url} ({replica['status']})" for url, replica in status["replicas"].items())
+        if status["status"] == "up":
+            logger.info(f"Connected to {service_name} service at {replicas}")
+        else:
+            logger.warning(f"Service {service_name} is {status['status']} at startup: {replicas}")
+    health_monitor.start()
+    upstream_watcher.start()
     
     logger.info("API Gateway started successfully")
 
@@ -263,11 +743,15 @@ async def shutdown_event():
     """应用关闭时执行"""
     logger.info("API Gateway shutting down...")
     
+    # 停止健康检查和副本刷新
+    await health_monitor.stop()
+    await upstream_watcher.stop()
+    
     # 关闭HTTP客户端
     await http_client.aclose()
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("API Gateway shut down successfully")
 
@@ -0,0 +1,93 @@
+"""
+InMemoryCache 并发微基准
+
+对比旧实现（所有操作共享一把全局asyncio.Lock）与当前实现（读无锁、写分段加锁）
+在大量并发任务下的吞吐量。
+
+运行方式（在 src 目录下）:
+    python -m services.microservices.benchmarks.cache_benchmark --tasks 10000
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Optional
+
+from ..common.cache import InMemoryCache
+
+
+class GlobalLockCache(InMemoryCache):
+    """基线实现：与旧版一致，get/set/delete/exists/size 均获取同一把全局锁"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._global_lock = asyncio.Lock()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        async with self._global_lock:
+            return self.get_sync(key)
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        async with self._global_lock:
+            self.set_sync(key, value, ttl)
+    
+    async def delete(self, key: str) -> bool:
+        async with self._global_lock:
+            return self.delete_sync(key)
+    
+    async def exists(self, key: str) -> bool:
+        return await self.get(key) is not None
+    
+    async def size(self) -> int:
+        async with self._global_lock:
+            self._purge_expired()
+            return len(list(self._cache.keys()))
+
+
+async def _worker(cache: InMemoryCache, ops: int, key_space: int, write_ratio: float, seed: int) -> None:
+    """单个并发任务：按比例混合读写，每次操作后让出事件循环"""
+    rnd = random.Random(seed)
+    for _ in range(ops):
+        key = f"key:{rnd.randrange(key_space)}"
+        roll = rnd.random()
+        if roll < write_ratio:
+            await cache.set(key, {"value": roll}, ttl=60)
+        elif roll < write_ratio + 0.05:
+            await cache.size()
+        else:
+            await cache.get(key)
+        await asyncio.sleep(0)
+
+
+async def run_benchmark(cache: InMemoryCache, tasks: int, ops_per_task: int,
+                        key_space: int, write_ratio: float) -> float:
+    """运行基准并返回每秒操作数"""
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(cache, ops_per_task, key_space, write_ratio, seed)
+        for seed in range(tasks)
+    ))
+    elapsed = time.perf_counter() - start
+    return tasks * ops_per_task / elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = {}
+    for name, cache_cls in (("global_lock", GlobalLockCache), ("lock_free_reads", InMemoryCache)):
+        cache = cache_cls(max_entries=args.key_space)
+        results[name] = await run_benchmark(
+            cache, args.tasks, args.ops, args.key_space, args.write_ratio
+        )
+        print(f"{name:>16}: {results[name]:>12,.0f} ops/s  stats={cache.stats()}")
+    
+    speedup = results["lock_free_reads"] / results["global_lock"]
+    print(f"{'speedup':>16}: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="InMemoryCache concurrency micro-benchmark")
+    parser.add_argument("--tasks", type=int, default=10000, help="并发任务数")
+    parser.add_argument("--ops", type=int, default=20, help="每个任务的操作数")
+    parser.add_argument("--key-space", type=int, default=5000, help="键空间大小")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="写操作比例")
+    asyncio.run(main(parser.parse_args()))
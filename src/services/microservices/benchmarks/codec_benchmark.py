@@ -0,0 +1,116 @@
+"""
+缓存编解码器基准
+
+对典型缓存对象（风险评估结果、含大量成交记录的验证结果、市场行情序列）
+测量各编解码器的序列化/反序列化CPU耗时和负载大小。未安装的可选依赖会被跳过。
+
+运行方式（在 src 目录下）:
+    python -m services.microservices.benchmarks.codec_benchmark --rounds 2000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..common.codec import CodecError, get_codec
+
+
+def _risk_assessment_result() -> Dict[str, Any]:
+    """风险评估结果（小对象）"""
+    return {
+        "assessment_id": "ra-20250101-000001",
+        "user_id": "user-123",
+        "order_id": "2938812509925187584",
+        "risk_level": "medium",
+        "risk_score": 0.4375,
+        "factors": {"leverage": 0.6, "volatility": 0.31, "history": 0.12, "exposure": 0.44},
+        "recommendations": ["reduce_leverage", "increase_margin"],
+        "created_at": datetime(2025, 1, 1, 12, 30, 0),
+        "premium": Decimal("12.345600"),
+    }
+
+
+def _verification_result(fills: int) -> Dict[str, Any]:
+    """订单验证结果（包含大量成交记录）"""
+    rnd = random.Random(42)
+    start = datetime(2025, 1, 1)
+    return {
+        "order_id": "2940071038556348417",
+        "verified": True,
+        "merkle_root": "0x" + "ab" * 32,
+        "fills": [
+            {
+                "trade_id": str(1000000 + i),
+                "px": Decimal(f"{60000 + rnd.random() * 100:.2f}"),
+                "sz": Decimal(f"{rnd.random():.6f}"),
+                "side": "sell" if i % 2 else "buy",
+                "fee": Decimal(f"-{rnd.random() / 100:.8f}"),
+                "ts": start + timedelta(milliseconds=i * 37),
+            }
+            for i in range(fills)
+        ],
+    }
+
+
+def _market_data(points: int) -> List[Dict[str, Any]]:
+    """市场行情序列（浮点数为主）"""
+    rnd = random.Random(7)
+    return [
+        {"ts": 1735689600 + i * 60, "open": 60000 + rnd.random(), "high": 60100 + rnd.random(),
+         "low": 59900 + rnd.random(), "close": 60000 + rnd.random(), "volume": rnd.random() * 1000}
+        for i in range(points)
+    ]
+
+
+def _measure(dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any],
+             value: Any, rounds: int) -> Tuple[float, float, int]:
+    """返回 (编码微秒/次, 解码微秒/次, 负载字节数)"""
+    payload = dumps(value)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        dumps(value)
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        loads(payload)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+    return encode_us, decode_us, len(payload)
+
+
+def main(args: argparse.Namespace) -> None:
+    samples = {
+        "risk_result": _risk_assessment_result(),
+        "verification_200_fills": _verification_result(200),
+        "market_data_500": _market_data(500),
+    }
+    
+    codecs: Dict[str, Tuple[Callable, Callable]] = {
+        # 旧实现：json.dumps，日期与Decimal只能退化为字符串，无法还原类型
+        "legacy_json": (lambda v: json.dumps(v, default=str).encode("utf-8"), json.loads),
+    }
+    for name in ("json", "orjson", "msgpack"):
+        for threshold in (None, args.compress_threshold):
+            label = name if threshold is None else f"{name}+zstd"
+            try:
+                codec = get_codec(name, compress_threshold=threshold)
+            except CodecError as e:
+                print(f"skip {label}: {e.message}")
+                continue
+            codecs[label] = (codec.dumps, codec.loads)
+    
+    print(f"{'sample':<24}{'codec':<16}{'encode us':>12}{'decode us':>12}{'bytes':>10}")
+    for sample_name, value in samples.items():
+        for codec_name, (dumps, loads) in codecs.items():
+            encode_us, decode_us, size = _measure(dumps, loads, value, args.rounds)
+            print(f"{sample_name:<24}{codec_name:<16}{encode_us:>12.1f}{decode_us:>12.1f}{size:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache codec benchmark")
+    parser.add_argument("--rounds", type=int, default=2000, help="每个样本的编解码次数")
+    parser.add_argument("--compress-threshold", type=int, default=1024, help="zstd压缩阈值（字节）")
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""
+消息信封编解码基准
+
+对典型的队列消息（风险评估结果、含大量成交记录的验证结果）测量一次
+"发布编码 + 消费解码为模型" 的CPU耗时和消息大小：
+旧实现为 json.dumps -> json.loads -> Model(**dict)，信封为 EnvelopeCodec.encode -> decode_envelope(body, Model)。
+未安装的可选依赖会被跳过。
+
+运行方式（在 src 目录下）:
+    python -m services.microservices.benchmarks.envelope_benchmark --rounds 2000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from pydantic import BaseModel
+
+from ..common.codec import CodecError
+from ..common.envelope import EnvelopeCodec, decode_envelope, register_schema
+
+
+@register_schema("benchmark.risk_assessment_result")
+class RiskAssessmentResult(BaseModel):
+    assessment_id: str
+    user_id: str
+    order_id: str
+    risk_level: str
+    risk_score: float
+    factors: Dict[str, float]
+    recommendations: List[str]
+    created_at: datetime
+    premium: Decimal
+
+
+class Fill(BaseModel):
+    trade_id: str
+    px: Decimal
+    sz: Decimal
+    side: str
+    fee: Decimal
+    ts: datetime
+
+
+@register_schema("benchmark.verification_result")
+class VerificationResult(BaseModel):
+    order_id: str
+    verified: bool
+    merkle_root: str
+    fills: List[Fill]
+
+
+def _risk_assessment_result() -> RiskAssessmentResult:
+    """风险评估结果（小消息）"""
+    return RiskAssessmentResult(
+        assessment_id="ra-20250101-000001",
+        user_id="user-123",
+        order_id="2938812509925187584",
+        risk_level="medium",
+        risk_score=0.4375,
+        factors={"leverage": 0.6, "volatility": 0.31, "history": 0.12, "exposure": 0.44},
+        recommendations=["reduce_leverage", "increase_margin"],
+        created_at=datetime(2025, 1, 1, 12, 30, 0),
+        premium=Decimal("12.345600"),
+    )
+
+
+def _verification_result(fills: int) -> VerificationResult:
+    """订单验证结果（包含大量成交记录）"""
+    rnd = random.Random(42)
+    start = datetime(2025, 1, 1)
+    return VerificationResult(
+        order_id="2940071038556348417",
+        verified=True,
+        merkle_root="0x" + "ab" * 32,
+        fills=[
+            Fill(
+                trade_id=str(1000000 + i),
+                px=Decimal(f"{60000 + rnd.random() * 100:.2f}"),
+                sz=Decimal(f"{rnd.random():.6f}"),
+                side="sell" if i % 2 else "buy",
+                fee=Decimal(f"-{rnd.random() / 100:.8f}"),
+                ts=start + timedelta(milliseconds=i * 37),
+            )
+            for i in range(fills)
+        ],
+    )
+
+
+def _legacy(model_cls: Type[BaseModel]) -> Tuple[Callable[[BaseModel], bytes], Callable[[bytes], Any]]:
+    """旧实现：发布端 json.dumps(dict)，消费端 json.loads 后由服务再构造模型"""
+    def dumps(value: BaseModel) -> bytes:
+        return json.dumps(value.dict(), ensure_ascii=False, default=str).encode("utf-8")
+    
+    def loads(body: bytes) -> Any:
+        return model_cls(**json.loads(body.decode("utf-8")))
+    return dumps, loads
+
+
+def _envelope(codec: EnvelopeCodec,
+              model_cls: Type[BaseModel]) -> Tuple[Callable[[BaseModel], bytes], Callable[[bytes], Any]]:
+    """信封：编码一次，消费端直接解码为模型"""
+    return codec.encode, lambda body: decode_envelope(body, model_cls).payload
+
+
+def _measure(dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any],
+             value: Any, rounds: int) -> Tuple[float, float, int]:
+    """返回 (编码微秒/次, 解码微秒/次, 消息字节数)"""
+    body = dumps(value)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        dumps(value)
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        loads(body)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+    return encode_us, decode_us, len(body)
+
+
+def main(args: argparse.Namespace) -> None:
+    samples = {
+        "risk_result": _risk_assessment_result(),
+        f"verification_{args.fills}_fills": _verification_result(args.fills),
+    }
+    
+    codecs: Dict[str, EnvelopeCodec] = {}
+    for name in ("json", "orjson", "msgpack"):
+        for threshold in (None, args.compress_threshold):
+            label = f"envelope/{name}" if threshold is None else f"envelope/{name}+zstd"
+            try:
+                codec = EnvelopeCodec(name, compress_threshold=threshold)
+            except CodecError as e:
+                print(f"skip {label}: {e.message}")
+                continue
+            if codec.codec_name != name:
+                print(f"skip {label}: {name} is not installed")
+                continue
+            codecs[label] = codec
+    
+    print(f"{'sample':<28}{'format':<24}{'encode us':>12}{'decode us':>12}{'bytes':>10}")
+    for sample_name, value in samples.items():
+        model_cls = type(value)
+        formats = {"legacy_json": _legacy(model_cls)}
+        for label, codec in codecs.items():
+            formats[label] = _envelope(codec, model_cls)
+        for label, (dumps, loads) in formats.items():
+            encode_us, decode_us, size = _measure(dumps, loads, value, args.rounds)
+            print(f"{sample_name:<28}{label:<24}{encode_us:>12.1f}{decode_us:>12.1f}{size:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Message envelope benchmark")
+    parser.add_argument("--rounds", type=int, default=2000, help="每个样本的编解码次数")
+    parser.add_argument("--fills", type=int, default=200, help="验证结果中的成交记录数")
+    parser.add_argument("--compress-threshold", type=int, default=1024, help="zstd压缩阈值（字节）")
+    main(parser.parse_args())
@@ -0,0 +1,241 @@
+"""
+队列流水线端到端基准
+
+用进程内broker（--transport memory）或本地broker服务（--transport socket）代替RabbitMQ，
+让合成订单依次经过 验证 -> 风险评估 -> 赔付 三个消费者（各自使用独立的客户端，与服务部署方式一致），
+报告吞吐量、端到端延迟分位数以及每个队列的排队等待时间和最大深度。风险评分超过阈值的请求被拒绝，
+经死信交换机进入死信队列。
+
+运行方式（在 src 目录下）:
+    python -m services.microservices.benchmarks.pipeline_benchmark --orders 100000 --transport memory
+    python -m services.microservices.benchmarks.pipeline_benchmark --orders 100000 --transport socket --batch
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+from ..common.async_message_queue import AsyncMessageQueueClient
+from ..common.envelope import register_schema
+from ..common.message_queue import ConsumeResult
+from ..common.mq_transport import LocalBrokerServer
+
+QUEUE_ORDERS = "bench.verification_requests"
+QUEUE_RISK = "bench.risk_assessment"
+QUEUE_PAYOUT = "bench.payout_requests"
+
+
+@register_schema("benchmark.order")
+class Order(BaseModel):
+    order_id: str
+    user_id: str
+    leverage: float
+    collateral: float
+    order_size: float
+    created_at: float
+
+
+@register_schema("benchmark.risk_request")
+class RiskRequest(BaseModel):
+    order_id: str
+    user_id: str
+    leverage: float
+    collateral_ratio: float
+    created_at: float
+
+
+@register_schema("benchmark.payout_request")
+class PayoutRequest(BaseModel):
+    order_id: str
+    user_id: str
+    risk_score: float
+    amount: float
+    created_at: float
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Pipeline:
+    """三个阶段的消费者和完成计数"""
+    
+    def __init__(self, args: argparse.Namespace, config: Dict[str, Any]):
+        self.args = args
+        self.producer = AsyncMessageQueueClient(config)
+        self.verification = AsyncMessageQueueClient(config)
+        self.risk = AsyncMessageQueueClient(config)
+        self.payout = AsyncMessageQueueClient(config)
+        self.latencies: List[float] = []
+        self.finished = 0
+        self.rejected = 0
+        self.done = asyncio.Event()
+    
+    def _finish(self, count: int = 1) -> None:
+        self.finished += count
+        if self.finished >= self.args.orders:
+            self.done.set()
+    
+    # 验证阶段
+    @staticmethod
+    def _verify(order: Order) -> RiskRequest:
+        return RiskRequest(
+            order_id=order.order_id,
+            user_id=order.user_id,
+            leverage=order.leverage,
+            collateral_ratio=order.collateral / (order.order_size * order.leverage),
+            created_at=order.created_at,
+        )
+    
+    async def on_order(self, order: Order) -> None:
+        await self.verification.publish(QUEUE_RISK, self._verify(order))
+    
+    async def on_orders(self, orders: List[Order]) -> None:
+        await self.verification.publish_batch(QUEUE_RISK, [self._verify(order) for order in orders])
+    
+    # 风险评估阶段：评分过高的请求被拒绝（进入死信队列）
+    def _assess(self, request: RiskRequest) -> float:
+        return min(1.0, request.leverage / 20.0 * 0.7 + (1.0 - min(1.0, request.collateral_ratio * 10)) * 0.3)
+    
+    def _payout_request(self, request: RiskRequest, score: float) -> PayoutRequest:
+        return PayoutRequest(order_id=request.order_id, user_id=request.user_id, risk_score=score,
+                             amount=100.0 * (1 - score), created_at=request.created_at)
+    
+    async def on_risk(self, request: RiskRequest) -> ConsumeResult:
+        score = self._assess(request)
+        if score > self.args.reject_score:
+            self.rejected += 1
+            self._finish()
+            return ConsumeResult.REJECT
+        await self.risk.publish(QUEUE_PAYOUT, self._payout_request(request, score))
+        return ConsumeResult.ACK
+    
+    async def on_risks(self, requests: List[RiskRequest]) -> List[ConsumeResult]:
+        results = []
+        payouts = []
+        for request in requests:
+            score = self._assess(request)
+            if score > self.args.reject_score:
+                results.append(ConsumeResult.REJECT)
+            else:
+                results.append(ConsumeResult.ACK)
+                payouts.append(self._payout_request(request, score))
+        rejected = len(requests) - len(payouts)
+        self.rejected += rejected
+        await self.risk.publish_batch(QUEUE_PAYOUT, payouts)
+        self._finish(rejected)
+        return results
+    
+    # 赔付阶段：记录端到端延迟
+    async def on_payout(self, request: PayoutRequest) -> None:
+        self.latencies.append(time.time() - request.created_at)
+        self._finish()
+    
+    async def on_payouts(self, requests: List[PayoutRequest]) -> None:
+        now = time.time()
+        self.latencies.extend(now - request.created_at for request in requests)
+        self._finish(len(requests))
+    
+    async def start(self) -> None:
+        for client in (self.producer, self.verification, self.risk, self.payout):
+            if not await client.connect():
+                raise RuntimeError("Failed to connect to broker")
+        args = self.args
+        if args.batch:
+            await self.verification.consume_batch(QUEUE_ORDERS, self.on_orders, batch_size=args.batch_size,
+                                                  batch_timeout_ms=args.batch_timeout_ms, model=Order)
+            await self.risk.consume_batch(QUEUE_RISK, self.on_risks, batch_size=args.batch_size,
+                                          batch_timeout_ms=args.batch_timeout_ms, model=RiskRequest)
+            await self.payout.consume_batch(QUEUE_PAYOUT, self.on_payouts, batch_size=args.batch_size,
+                                            batch_timeout_ms=args.batch_timeout_ms, model=PayoutRequest)
+        else:
+            await self.verification.consume(QUEUE_ORDERS, self.on_order, prefetch_count=args.prefetch, model=Order)
+            await self.risk.consume(QUEUE_RISK, self.on_risk, prefetch_count=args.prefetch, model=RiskRequest)
+            await self.payout.consume(QUEUE_PAYOUT, self.on_payout, prefetch_count=args.prefetch,
+                                      model=PayoutRequest)
+    
+    async def produce(self) -> float:
+        """按批发布全部订单，返回发布耗时"""
+        rnd = random.Random(7)
+        start = time.perf_counter()
+        for offset in range(0, self.args.orders, self.args.publish_batch):
+            now = time.time()
+            orders = [
+                Order(
+                    order_id=f"order-{i}",
+                    user_id=f"user-{i % 5000}",
+                    leverage=rnd.uniform(1, 20),
+                    collateral=rnd.uniform(50, 5000),
+                    order_size=rnd.uniform(100, 10000),
+                    created_at=now,
+                )
+                for i in range(offset, min(offset + self.args.publish_batch, self.args.orders))
+            ]
+            await self.producer.publish_batch(QUEUE_ORDERS, orders)
+        return time.perf_counter() - start
+    
+    async def close(self) -> None:
+        for client in (self.producer, self.verification, self.risk, self.payout):
+            await client.close()
+
+
+async def run(args: argparse.Namespace) -> None:
+    config = {"transport": args.transport}
+    server = None
+    if args.transport == "socket":
+        if args.broker_port:
+            config["local_broker_port"] = args.broker_port
+        else:
+            # 在本进程中启动本地broker服务，客户端仍通过socket访问
+            server = LocalBrokerServer(port=0)
+            await server.start()
+            config["local_broker_port"] = server.port
+    
+    pipeline = Pipeline(args, config)
+    await pipeline.start()
+    start = time.perf_counter()
+    publish_elapsed = await pipeline.produce()
+    await asyncio.wait_for(pipeline.done.wait(), timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    stats = await pipeline.producer.queue_stats()
+    await pipeline.close()
+    if server is not None:
+        await server.stop()
+    
+    mode = f"batch (batch_size={args.batch_size})" if args.batch else f"per-message (prefetch={args.prefetch})"
+    print(f"transport={args.transport} mode={mode} orders={args.orders}")
+    print(f"{'published':>16}: {args.orders / publish_elapsed:>12,.0f} orders/s")
+    print(f"{'end-to-end':>16}: {args.orders / elapsed:>12,.0f} orders/s ({elapsed:.2f}s)")
+    print(f"{'paid out':>16}: {len(pipeline.latencies):>12,} (rejected to DLX: {pipeline.rejected:,})")
+    print(f"{'latency p50':>16}: {_percentile(pipeline.latencies, 0.50) * 1000:>12.1f} ms")
+    print(f"{'latency p95':>16}: {_percentile(pipeline.latencies, 0.95) * 1000:>12.1f} ms")
+    print(f"{'latency p99':>16}: {_percentile(pipeline.latencies, 0.99) * 1000:>12.1f} ms")
+    print()
+    print(f"{'queue':<32}{'published':>10}{'acked':>10}{'dead':>8}{'max depth':>11}{'avg wait ms':>13}{'max wait ms':>13}")
+    for name in (QUEUE_ORDERS, QUEUE_RISK, QUEUE_PAYOUT, "dlx_queue"):
+        queue = stats.get(name)
+        if queue is None:
+            continue
+        print(f"{name:<32}{queue['published']:>10}{queue['acked']:>10}{queue['dead_lettered']:>8}"
+              f"{queue['max_depth']:>11}{queue['wait_avg'] * 1000:>13.1f}{queue['wait_max'] * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue pipeline benchmark (verification -> risk -> payout)")
+    parser.add_argument("--orders", type=int, default=100000, help="合成订单数")
+    parser.add_argument("--transport", choices=["memory", "socket"], default="memory", help="传输层")
+    parser.add_argument("--broker-port", type=int, default=0, help="已运行的本地broker端口（socket传输，默认在本进程启动）")
+    parser.add_argument("--batch", action="store_true", help="使用批量消费")
+    parser.add_argument("--batch-size", type=int, default=100, help="批量消费的每批消息数")
+    parser.add_argument("--batch-timeout-ms", type=float, default=20, help="批量消费的凑批等待毫秒数")
+    parser.add_argument("--prefetch", type=int, default=256, help="逐条消费的预取数量")
+    parser.add_argument("--publish-batch", type=int, default=1000, help="生产者每批发布的订单数")
+    parser.add_argument("--reject-score", type=float, default=0.95, help="超过该风险评分的请求被拒绝")
+    parser.add_argument("--timeout", type=float, default=600, help="等待流水线完成的最长秒数")
+    asyncio.run(run(parser.parse_args()))
@@ -1,33 +1,260 @@
 import asyncio
+import base64
+import json
+import logging
+import random
 import time
-from typing import Any, Dict, Optional, Union, List, Callable, TypeVar, Generic
+from collections import deque
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Optional, Union, List, Callable, Tuple, TypeVar, Generic
 import aiohttp
 from pydantic import BaseModel
 from urllib.parse import urljoin
+from .config_manager import get_config
 from .errors import BaseError, ServiceUnavailableError, ValidationError, AuthenticationError
 from .logging_system import logger, log_with_context
 
+# 可选依赖：安装orjson时用于解码JSON响应
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 T = TypeVar('T')
 
+# 幂等方法：超时和网关错误（502/503/504）时可以安全重试
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+# 错误响应写入日志和异常详情的最大字符数
+ERROR_BODY_LIMIT = 1024
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+def _decode_body(body: bytes, content_type: str) -> Any:
+    """解码响应体：JSON内容类型解码为对象，其余（或JSON无效时）返回文本，空响应返回None"""
+    if not body or not body.strip():
+        return None
+    if 'json' in content_type:
+        try:
+            return _json_loads(body)
+        except ValueError:
+            pass
+    return body.decode('utf-8', errors='replace')
+
+def _error_text(body: bytes) -> str:
+    """截断后的错误响应文本"""
+    text = body[:ERROR_BODY_LIMIT + 1].decode('utf-8', errors='replace')
+    if len(body) > ERROR_BODY_LIMIT:
+        text = text[:ERROR_BODY_LIMIT] + f"...({len(body)} bytes)"
+    return text
+
 class ApiClientError(BaseError):
     """API客户端异常基类"""
     pass
 
+class CircuitOpenError(ServiceUnavailableError):
+    """熔断器打开，请求未发出"""
+    pass
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"  # 正常放行
+    OPEN = "open"  # 快速失败
+    HALF_OPEN = "half_open"  # 放行少量试探请求
+
+class CircuitBreaker:
+    """
+    熔断器
+    
+    连续失败（连接错误、超时、5xx响应）达到 failure_threshold 次后打开，期间请求直接失败；
+    recovery_timeout 秒后进入半开状态，放行至多 half_open_max_calls 个试探请求，
+    试探成功则关闭，失败则重新打开。只在事件循环中使用，不需要加锁。
+    """
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+    
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（打开超过 recovery_timeout 后视为半开）"""
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+    
+    @property
+    def retry_after(self) -> float:
+        """距离进入半开状态的秒数"""
+        if self._state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+    
+    def allow_request(self) -> bool:
+        """是否放行请求；放行的请求必须以 record_success/record_failure/release 之一结束"""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+    
+    def record_success(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            logger.info("Circuit breaker closed after successful trial request")
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != CircuitState.OPEN:
+                logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+    
+    def release(self) -> None:
+        """请求被取消，未得出结果：归还半开状态的试探名额"""
+        if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+class RetryBudget:
+    """
+    重试预算
+    
+    最近 window 秒内的重试（包括对冲请求）数不超过同期请求数的 ratio 倍，另有每秒
+    min_retries_per_second 次的保底。下游整体故障时重试不会成倍放大流量。
+    """
+    
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 5.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = max(1.0, window)
+        # 每秒一个桶：[秒, 请求数, 重试数]
+        self._buckets: deque = deque()
+    
+    def _bucket(self) -> List[int]:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+    
+    def record_request(self) -> None:
+        self._bucket()[1] += 1
+    
+    def try_retry(self) -> bool:
+        """预算内时记一次重试并返回True"""
+        bucket = self._bucket()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        if retries >= requests * self.ratio + self.min_retries_per_second * self.window:
+            return False
+        bucket[2] += 1
+        return True
+
+class LatencyTracker:
+    """最近请求耗时的滑动窗口，用于计算对冲请求的等待时间"""
+    
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self._samples: deque = deque(maxlen=size)
+        self._min_samples = min_samples
+        self._sorted: Optional[List[float]] = None
+        self._pending = 0
+    
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._pending += 1
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """耗时分位数（秒），样本不足时返回None；每新增16个样本重新排序一次"""
+        if len(self._samples) < self._min_samples:
+            return None
+        if self._sorted is None or self._pending >= 16:
+            self._sorted = sorted(self._samples)
+            self._pending = 0
+        return self._sorted[min(len(self._sorted) - 1, int(len(self._sorted) * q))]
+
+class _HostState:
+    """同一基础URL的所有客户端共享的熔断器、重试预算和耗时统计"""
+    
+    def __init__(self, breaker: CircuitBreaker, budget: RetryBudget):
+        self.breaker = breaker
+        self.budget = budget
+        self.latency = LatencyTracker()
+
+# 基础URL -> 共享状态
+_host_states: Dict[str, _HostState] = {}
+
+def _token_expiry(headers: Dict[str, str]) -> Optional[float]:
+    """读取 Authorization 头中 Bearer JWT 的过期时间（exp，不校验签名），无法解析时返回None"""
+    value = headers.get('Authorization') or headers.get('authorization') or ''
+    scheme, _, token = value.partition(' ')
+    if scheme.lower() != 'bearer' or token.count('.') != 2:
+        return None
+    try:
+        segment = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+        return float(claims['exp'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _get_host_state(base_url: str, failure_threshold: int, recovery_timeout: float,
+                    retry_budget_ratio: float) -> _HostState:
+    """获取基础URL的共享状态（参数以首次创建时为准）"""
+    state = _host_states.get(base_url)
+    if state is None:
+        state = _host_states[base_url] = _HostState(
+            CircuitBreaker(failure_threshold, recovery_timeout),
+            RetryBudget(retry_budget_ratio)
+        )
+    return state
+
 class ApiResponse(Generic[T]):
-    """API响应模型"""
+    """API响应模型（给出原始响应体时，data 在首次访问时才解码）"""
     
     def __init__(
         self,
         status_code: int,
         data: Optional[T] = None,
         headers: Optional[Dict[str, str]] = None,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        body: Optional[bytes] = None,
+        content_type: str = ''
     ):
         self.status_code = status_code
-        self.data = data
+        self._data = data
+        self._decoded = body is None or data is not None
+        self.body = body
+        self.content_type = content_type
         self.headers = headers or {}
         self.error = error
     
+    @property
+    def data(self) -> Optional[T]:
+        """响应数据"""
+        if not self._decoded:
+            self._data = _decode_body(self.body, self.content_type)
+            self._decoded = True
+        return self._data
+    
+    @data.setter
+    def data(self, value: Optional[T]) -> None:
+        self._data = value
+        self._decoded = True
+    
+    def text(self) -> str:
+        """响应体文本"""
+        return self.body.decode('utf-8', errors='replace') if self.body else ''
+    
     @property
     def is_success(self) -> bool:
         """检查响应是否成功"""
@@ -37,7 +264,13 @@ class ApiResponse(Generic[T]):
         return f"ApiResponse(status_code={self.status_code}, data={self.data}, error={self.error})"
 
 class APIClient:
-    """异步API客户端，用于微服务间通信"""
+    """
+    异步API客户端，用于微服务间通信
+    
+    同一基础URL的客户端共享熔断器、重试预算和耗时统计：熔断器打开时请求立即以 CircuitOpenError 失败；
+    重试使用带随机抖动的指数退避，并受重试预算限制。启用对冲（hedge）时，GET请求在超过该服务
+    p95耗时后仍未返回则再发一个相同请求，采用先返回的结果。
+    """
     
     def __init__(
         self,
@@ -48,7 +281,21 @@ class APIClient:
         retry_backoff: float = 2.0,
         default_headers: Optional[Dict[str, str]] = None,
         auth_provider: Optional[Callable[[], Dict[str, str]]] = None,
-        service_name: str = "api_client"
+        service_name: str = "api_client",
+        connect_timeout: float = 5.0,
+        retry_max_delay: float = 10.0,
+        retry_budget_ratio: float = 0.2,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.01,
+        auth_ttl: float = 300.0,
+        auth_refresh_margin: float = 30.0,
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 50,
+        dns_cache_ttl: Optional[int] = 300,
+        keepalive_timeout: float = 30.0
     ):
         """
         初始化API客户端
@@ -62,53 +309,153 @@ class APIClient:
             default_headers: 默认请求头
             auth_provider: 认证提供者函数，返回认证头
             service_name: 服务名称，用于日志记录
+            connect_timeout: 建立TCP连接的超时时间（秒）
+            retry_max_delay: 单次重试延迟上限（秒），实际延迟在 [0, 上限] 内随机
+            retry_budget_ratio: 重试预算占请求数的比例（按基础URL共享）
+            failure_threshold: 熔断器打开前的连续失败次数（按基础URL共享）
+            recovery_timeout: 熔断器打开后进入半开状态的秒数
+            hedge: GET请求是否默认启用对冲
+            hedge_percentile: 对冲等待时间使用的耗时分位数
+            hedge_min_delay: 对冲等待时间下限（秒）
+            auth_ttl: 认证头缓存秒数；Bearer JWT 以其过期时间为准（取较早者）
+            auth_refresh_margin: 令牌过期前提前刷新的秒数
+            connection_limit: 连接池总连接数上限
+            connection_limit_per_host: 每个主机的连接数上限（0表示不限制）
+            dns_cache_ttl: DNS缓存秒数，None表示不缓存
+            keepalive_timeout: 空闲连接保持秒数
         """
         self.base_url = base_url.rstrip('/')
         self.timeout = timeout
         self.retries = retries
         self.retry_delay = retry_delay
         self.retry_backoff = retry_backoff
+        self.connect_timeout = connect_timeout
+        self.retry_max_delay = retry_max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._host = _get_host_state(self.base_url, failure_threshold, recovery_timeout, retry_budget_ratio)
         self.default_headers = default_headers or {
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
         self.auth_provider = auth_provider
+        self.auth_ttl = auth_ttl
+        self.auth_refresh_margin = auth_refresh_margin
         self.service_name = service_name
         self._session: Optional[aiohttp.ClientSession] = None
         self._lock = asyncio.Lock()
+        self._auth_lock = asyncio.Lock()
+        self._auth_headers: Optional[Dict[str, str]] = None
+        self._auth_expires_at = 0.0
+        # 由 ServiceClientRegistry 管理的共享客户端，退出 async with 时不关闭会话
+        self._shared = False
+        self._batchers: Dict[Tuple[str, str], 'RequestBatcher'] = {}
     
     async def __aenter__(self):
         await self._ensure_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.close()
+        if not self._shared:
+            await self.close()
     
     async def _ensure_session(self):
         """确保aiohttp会话已创建"""
         if self._session is None or self._session.closed:
             async with self._lock:
                 if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=self.connection_limit,
+                        limit_per_host=self.connection_limit_per_host,
+                        use_dns_cache=self.dns_cache_ttl is not None,
+                        ttl_dns_cache=self.dns_cache_ttl,
+                        keepalive_timeout=self.keepalive_timeout
+                    )
                     self._session = aiohttp.ClientSession(
-                        timeout=aiohttp.ClientTimeout(total=self.timeout),
-                        headers=self.default_headers
+                        timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                        headers=self.default_headers,
+                        connector=connector
                     )
     
     async def close(self):
-        """关闭aiohttp会话"""
+        """发送合并器中待发送的请求并关闭aiohttp会话"""
+        for batcher in list(self._batchers.values()):
+            await batcher.flush()
         if self._session and not self._session.closed:
             await self._session.close()
             self._session = None
     
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """该基础URL共享的熔断器"""
+        return self._host.breaker
+    
+    def stats(self) -> Dict[str, Any]:
+        """熔断器状态和耗时统计"""
+        p95 = self._host.latency.percentile(0.95)
+        return {
+            'service': self.service_name,
+            'base_url': self.base_url,
+            'circuit_state': self._host.breaker.state.value,
+            'retry_after': self._host.breaker.retry_after,
+            'latency_p95_ms': p95 * 1000 if p95 is not None else None
+        }
+    
     async def _get_auth_headers(self) -> Dict[str, str]:
-        """获取认证头"""
-        if self.auth_provider:
+        """获取认证头（缓存到过期前 auth_refresh_margin 秒，并发请求只刷新一次）"""
+        if not self.auth_provider:
+            return {}
+        if self._auth_headers is not None and time.time() < self._auth_expires_at:
+            return self._auth_headers
+        
+        async with self._auth_lock:
+            if self._auth_headers is not None and time.time() < self._auth_expires_at:
+                return self._auth_headers
             try:
                 auth_headers = await self.auth_provider() if asyncio.iscoroutinefunction(self.auth_provider) else self.auth_provider()
-                return auth_headers
             except Exception as e:
                 logger.error(f"Failed to get auth headers: {str(e)}")
-        return {}
+                return {}
+            auth_headers = dict(auth_headers or {})
+            now = time.time()
+            expires_at = now + self.auth_ttl
+            token_expiry = _token_expiry(auth_headers)
+            if token_expiry is not None:
+                expires_at = min(expires_at, token_expiry - self.auth_refresh_margin)
+            self._auth_headers = auth_headers
+            self._auth_expires_at = expires_at
+            return auth_headers
+    
+    def invalidate_auth(self) -> None:
+        """丢弃缓存的认证头，下次请求时重新获取"""
+        self._auth_headers = None
+        self._auth_expires_at = 0.0
+    
+    async def warm_up(self, connections: int = 1, path: str = '/health') -> int:
+        """
+        预热连接：创建会话、获取认证头，并发访问 path 建立 connections 个保活连接
+        
+        失败只记录日志，不影响服务启动；返回成功的请求数。
+        """
+        await self._ensure_session()
+        await self._get_auth_headers()
+        url = self._prepare_url(path)
+        
+        async def _touch() -> bool:
+            try:
+                await self._make_request('GET', url, headers=self._prepare_headers())
+                return True
+            except Exception as e:
+                logger.warning(f"Warm-up request to {self.service_name} failed: {str(e)}")
+                return False
+        
+        results = await asyncio.gather(*(_touch() for _ in range(max(1, connections))))
+        return sum(results)
     
     def _prepare_headers(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """准备请求头"""
@@ -123,56 +470,143 @@ class APIClient:
             return endpoint
         return urljoin(self.base_url, endpoint.lstrip('/'))
     
+    @staticmethod
+    def _is_failure(error: Exception) -> bool:
+        """是否计为下游故障（连接错误、超时、5xx响应），4xx等调用方错误不影响熔断器"""
+        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+            return True
+        return isinstance(error, ApiClientError) and error.status_code >= 500
+    
+    @staticmethod
+    def _is_retryable(error: Exception, idempotent: bool) -> bool:
+        """
+        未建立连接（请求未发出）的错误总是重试；断连、响应读取失败、超时和网关错误时服务端可能已处理请求，
+        只对幂等方法重试
+        """
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return True
+        if not idempotent:
+            return False
+        if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+            return True
+        return isinstance(error, ApiClientError) and error.status_code in RETRYABLE_STATUS_CODES
+    
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次重试的等待时间：指数退避上限内的随机值（full jitter）"""
+        cap = min(self.retry_max_delay, self.retry_delay * self.retry_backoff ** (attempt - 1))
+        return random.uniform(0, cap)
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """对冲请求的等待时间，样本不足时返回None（不对冲）"""
+        delay = self._host.latency.percentile(self.hedge_percentile)
+        return None if delay is None else max(self.hedge_min_delay, delay)
+    
+    async def _hedged_request(self, method: str, url: str, **kwargs) -> ApiResponse:
+        """
+        对冲请求：首个请求超过p95耗时仍未返回时再发一个，采用先成功的结果
+        
+        对冲请求计入重试预算，熔断器非关闭状态时不对冲；两个请求都失败时抛出首个请求的异常。
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._make_request(method, url, **kwargs)
+        first = asyncio.ensure_future(self._make_request(method, url, **kwargs))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or self._host.breaker.state != CircuitState.CLOSED or not self._host.budget.try_retry():
+                return await first
+            
+            logger.debug(f"Hedging {method} {url} after {delay * 1000:.1f}ms")
+            pending.add(asyncio.ensure_future(self._make_request(method, url, **kwargs)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _circuit_open_error(self, url: str) -> CircuitOpenError:
+        return CircuitOpenError(
+            message=f"Circuit breaker is open for {self.service_name}",
+            error_code="SERVICE_CIRCUIT_OPEN",
+            details={"service": self.service_name, "url": url, "retry_after": self._host.breaker.retry_after}
+        )
+    
     async def _request_with_retry(
         self,
         method: str,
         url: str,
+        hedge: Optional[bool] = None,
         **kwargs
     ) -> ApiResponse:
-        """带重试机制的请求方法"""
+        """带熔断、重试预算和可选对冲的请求方法"""
+        host = self._host
+        idempotent = method in IDEMPOTENT_METHODS
+        hedge = (self.hedge if hedge is None else hedge) and method == 'GET'
+        host.budget.record_request()
         retry_count = 0
-        current_delay = self.retry_delay
+        auth_refreshed = False
         
-        while retry_count <= self.retries:
+        while True:
+            if not host.breaker.allow_request():
+                raise self._circuit_open_error(url)
             try:
-                return await self._make_request(method, url, **kwargs)
-            except aiohttp.ClientError as e:
-                retry_count += 1
+                if hedge:
+                    response = await self._hedged_request(method, url, **kwargs)
+                else:
+                    response = await self._make_request(method, url, **kwargs)
+            except asyncio.CancelledError:
+                host.breaker.release()
+                raise
+            except AuthenticationError:
+                # 缓存的令牌可能已被吊销：刷新认证头后立即重试一次
+                host.breaker.record_success()
+                if not self.auth_provider or auth_refreshed:
+                    raise
+                auth_refreshed = True
+                self.invalidate_auth()
+                continue
+            except Exception as e:
+                if self._is_failure(e):
+                    host.breaker.record_failure()
+                else:
+                    host.breaker.record_success()
+                if not self._is_retryable(e, idempotent):
+                    raise
                 
-                # 判断是否应该重试
-                if retry_count > self.retries:
-                    logger.error(f"Request failed after {self.retries} retries: {str(e)}")
+                retry_count += 1
+                if retry_count > self.retries or not host.budget.try_retry():
+                    logger.error(f"Request failed after {retry_count - 1} retries: {str(e)}")
+                    if isinstance(e, ApiClientError):
+                        raise
                     raise ServiceUnavailableError(
                         message=f"Failed to connect to {self.service_name}",
                         error_code="SERVICE_CONNECTION_ERROR",
-                        details={"service": self.service_name, "url": url, "error": str(e)}
+                        details={"service": self.service_name, "url": url, "error": str(e) or type(e).__name__}
                     )
                 
                 # 记录重试信息
+                delay = self._backoff(retry_count)
                 logger.warning(
-                    f"Request failed (attempt {retry_count}/{self.retries}), retrying in {current_delay:.2f}s: {str(e)}"
+                    f"Request failed (attempt {retry_count}/{self.retries}), retrying in {delay:.2f}s: {str(e)}"
                 )
-                
-                # 等待重试
-                await asyncio.sleep(current_delay)
-                current_delay *= self.retry_backoff
-            except Exception as e:
-                # 非连接错误，不重试
-                logger.error(f"Unexpected error during request: {str(e)}")
-                raise
+                await asyncio.sleep(delay)
+                continue
+            
+            host.breaker.record_success()
+            return response
     
-    async def _make_request(
-        self,
-        method: str,
-        url: str,
-        **kwargs
-    ) -> ApiResponse:
-        """执行HTTP请求"""
+    async def _prepare_request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """合并认证头并转换请求体中的模型"""
         await self._ensure_session()
         
-        # 获取认证头
+        # 获取认证头（每次请求使用独立的请求头，重试和对冲请求可以并发）
         auth_headers = await self._get_auth_headers()
-        headers = kwargs.get('headers', {})
+        headers = dict(kwargs.get('headers') or {})
         headers.update(auth_headers)
         kwargs['headers'] = headers
         
@@ -183,6 +617,45 @@ class APIClient:
             request_json = request_data['json']
             if isinstance(request_json, BaseModel):
                 request_data['json'] = request_json.dict()
+        return request_data
+    
+    def _raise_for_status(self, status: int, error_message: str, url: str) -> None:
+        """把错误状态码转换为异常"""
+        if status == 401:
+            raise AuthenticationError(
+                message="Authentication failed",
+                error_code="API_AUTH_FAILED",
+                details={"service": self.service_name, "url": url, "error": error_message}
+            )
+        elif status == 400:
+            raise ValidationError(
+                message="Invalid request data",
+                error_code="API_VALIDATION_ERROR",
+                details={"service": self.service_name, "url": url, "error": error_message}
+            )
+        elif status == 404:
+            raise ApiClientError(
+                message="Resource not found",
+                error_code="API_RESOURCE_NOT_FOUND",
+                status_code=404,
+                details={"service": self.service_name, "url": url}
+            )
+        else:
+            raise ApiClientError(
+                message=f"API request failed with status {status}",
+                error_code=f"API_ERROR_{status}",
+                status_code=status,
+                details={"service": self.service_name, "url": url, "error": error_message}
+            )
+    
+    async def _make_request(
+        self,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> ApiResponse:
+        """执行HTTP请求（响应体按原始字节读取，首次访问 data 时才解码）"""
+        request_data = await self._prepare_request(kwargs)
         
         # 记录请求开始时间
         start_time = time.time()
@@ -192,6 +665,8 @@ class APIClient:
             async with self._session.request(method, url, **request_data) as response:
                 # 计算请求耗时
                 duration = (time.time() - start_time) * 1000
+                if method == 'GET' and response.status < 500:
+                    self._host.latency.record(duration / 1000)
                 
                 # 构建日志上下文
                 context = {
@@ -202,73 +677,43 @@ class APIClient:
                     'duration_ms': duration
                 }
                 
-                # 尝试解析响应数据
-                try:
-                    data = await response.json()
-                except (aiohttp.ContentTypeError, ValueError):
-                    data = await response.text()
-                    if not data.strip():
-                        data = None
+                # 读取响应体，解码推迟到首次访问 data
+                body = await response.read()
                 
-                # 记录请求日志
+                # 记录请求日志（错误响应体截断后记录）
                 if response.status >= 400:
+                    error_message = _error_text(body) if body.strip() else f"HTTP {response.status}"
                     log_with_context(
                         logger,
-                        logger.error,
+                        logging.ERROR,
                         f"API Request failed",
-                        context={**context, 'error': data}
+                        context={**context, 'error': error_message}
                     )
                 else:
                     log_with_context(
                         logger,
-                        logger.info,
+                        logging.INFO,
                         f"API Request completed",
                         context=context
                     )
                 
                 # 处理错误响应
                 if response.status >= 400:
-                    error_message = str(data) if data else f"HTTP {response.status}"
-                    
-                    if response.status == 401:
-                        raise AuthenticationError(
-                            message="Authentication failed",
-                            error_code="API_AUTH_FAILED",
-                            details={"service": self.service_name, "url": url, "error": error_message}
-                        )
-                    elif response.status == 400:
-                        raise ValidationError(
-                            message="Invalid request data",
-                            error_code="API_VALIDATION_ERROR",
-                            details={"service": self.service_name, "url": url, "error": error_message}
-                        )
-                    elif response.status == 404:
-                        raise ApiClientError(
-                            message="Resource not found",
-                            error_code="API_RESOURCE_NOT_FOUND",
-                            status_code=404,
-                            details={"service": self.service_name, "url": url}
-                        )
-                    else:
-                        raise ApiClientError(
-                            message=f"API request failed with status {response.status}",
-                            error_code=f"API_ERROR_{response.status}",
-                            status_code=response.status,
-                            details={"service": self.service_name, "url": url, "error": error_message}
-                        )
+                    self._raise_for_status(response.status, error_message, url)
                 
                 # 返回成功响应
                 return ApiResponse(
                     status_code=response.status,
-                    data=data,
-                    headers=dict(response.headers)
+                    headers=dict(response.headers),
+                    body=body,
+                    content_type=response.content_type or ''
                 )
         except Exception as e:
             # 记录请求失败日志
             duration = (time.time() - start_time) * 1000
             log_with_context(
                 logger,
-                logger.error,
+                logging.ERROR,
                 f"API Request failed with exception",
                 context={
                     'service': self.service_name,
@@ -285,12 +730,14 @@ class APIClient:
         endpoint: str,
         params: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
+        hedge: Optional[bool] = None,
         **kwargs
     ) -> ApiResponse:
-        """发送GET请求"""
+        """发送GET请求（hedge 覆盖客户端的对冲设置）"""
         url = self._prepare_url(endpoint)
         request_headers = self._prepare_headers(headers)
-        return await self._request_with_retry('GET', url, params=params, headers=request_headers, **kwargs)
+        return await self._request_with_retry('GET', url, hedge=hedge, params=params, headers=request_headers,
+                                              **kwargs)
     
     async def post(
         self,
@@ -366,26 +813,189 @@ class APIClient:
             request_data['json'] = json
         
         return await self._request_with_retry('PATCH', url, headers=request_headers, **request_data, **kwargs)
+    
+    async def stream_get(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        ndjson: bool = False,
+        chunk_size: int = 64 * 1024,
+        read_timeout: Optional[float] = None
+    ) -> AsyncIterator[Any]:
+        """
+        流式GET请求：逐块产出响应体，ndjson=True 时逐行产出解码后的记录
+        
+        响应体不在内存中缓冲，也不受会话总超时限制（read_timeout 为两次读取之间的最长间隔，默认 timeout）。
+        流式请求不重试；收到响应头之前的失败和5xx响应计入熔断器。
+        """
+        url = self._prepare_url(endpoint)
+        request_data = await self._prepare_request({'params': params, 'headers': self._prepare_headers(headers)})
+        request_data['timeout'] = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=self.connect_timeout,
+            sock_read=read_timeout or self.timeout
+        )
+        breaker = self._host.breaker
+        if not breaker.allow_request():
+            raise self._circuit_open_error(url)
+        
+        settled = False
+        start_time = time.time()
+        try:
+            async with self._session.request('GET', url, **request_data) as response:
+                settled = True
+                context = {
+                    'service': self.service_name,
+                    'method': 'GET',
+                    'url': url,
+                    'status_code': response.status,
+                    'duration_ms': (time.time() - start_time) * 1000
+                }
+                if response.status >= 400:
+                    if response.status >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    body = await response.content.read(ERROR_BODY_LIMIT + 1)
+                    error_message = _error_text(body) if body.strip() else f"HTTP {response.status}"
+                    log_with_context(logger, logging.ERROR, "API Stream failed", context={**context, 'error': error_message})
+                    self._raise_for_status(response.status, error_message, url)
+                
+                breaker.record_success()
+                log_with_context(logger, logging.INFO, "API Stream opened", context=context)
+                if ndjson:
+                    async for record in self._iter_ndjson(response, chunk_size):
+                        yield record
+                else:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        yield chunk
+        except asyncio.CancelledError:
+            if not settled:
+                breaker.release()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not settled:
+                breaker.record_failure()
+            raise ServiceUnavailableError(
+                message=f"Stream from {self.service_name} failed",
+                error_code="SERVICE_STREAM_ERROR",
+                details={"service": self.service_name, "url": url, "error": str(e) or type(e).__name__}
+            ) from e
+    
+    @staticmethod
+    async def _iter_ndjson(response: Any, chunk_size: int) -> AsyncIterator[Any]:
+        """按行解码NDJSON响应体"""
+        buffer = b''
+        async for chunk in response.content.iter_chunked(chunk_size):
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield _json_loads(line)
+        if buffer.strip():
+            yield _json_loads(buffer)
+    
+    def batcher(self, endpoint: str, method: str = 'POST', **kwargs) -> 'RequestBatcher':
+        """获取批量接口的请求合并器（按方法和接口缓存，kwargs 只在首次创建时生效）"""
+        key = (method, endpoint)
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            batcher = self._batchers[key] = RequestBatcher(self, endpoint, method=method, **kwargs)
+        return batcher
+
+class RequestBatcher:
+    """
+    客户端请求合并器
+    
+    在 max_delay_ms 内把对同一批量接口的多次调用合并为一次请求，攒满 max_batch_size 条时立即发送。
+    默认请求体为条目的JSON数组，响应须为等长的结果数组，按顺序分发给各调用方；
+    build_request / split_response 可以适配其他格式。整批失败时所有调用方收到同一异常。
+    """
+    
+    def __init__(
+        self,
+        client: APIClient,
+        endpoint: str,
+        method: str = 'POST',
+        max_batch_size: int = 100,
+        max_delay_ms: float = 5.0,
+        build_request: Optional[Callable[[List[Any]], Any]] = None,
+        split_response: Optional[Callable[[Any], List[Any]]] = None
+    ):
+        self.client = client
+        self.endpoint = endpoint
+        self.method = method
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay_ms / 1000
+        self._build_request = build_request or (lambda items: items)
+        self._split_response = split_response or (lambda data: data)
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set = set()
+    
+    async def submit(self, item: Any) -> Any:
+        """提交一个条目，返回批量响应中对应的结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_now)
+        return await future
+    
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+    
+    async def flush(self) -> None:
+        """立即发送待合并的条目并等待所有批量请求完成"""
+        self._flush_now()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+    
+    async def _send(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        client = self.client
+        url = client._prepare_url(self.endpoint)
+        try:
+            response = await client._request_with_retry(
+                self.method,
+                url,
+                json=self._build_request([item for item, _ in batch]),
+                headers=client._prepare_headers()
+            )
+            results = self._split_response(response.data)
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise ApiClientError(
+                    message="Batch response does not match the request",
+                    error_code="API_BATCH_MISMATCH",
+                    status_code=502,
+                    details={"service": client.service_name, "url": url, "items": len(batch)}
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 # 服务客户端工厂函数
-def create_service_client(
+def _new_service_client(
     service_name: str,
     base_url: Optional[str] = None,
     config_manager: Optional[Any] = None,
     **kwargs
 ) -> APIClient:
-    """
-    创建服务客户端实例
-    
-    Args:
-        service_name: 服务名称
-        base_url: 基础URL，如果为None则从配置中获取
-        config_manager: 配置管理器实例
-        **kwargs: 传递给APIClient的其他参数
-    
-    Returns:
-        APIClient实例
-    """
+    """创建新的服务客户端实例（参数同 create_service_client）"""
     # 从配置中获取服务URL
     if base_url is None and config_manager:
         # 尝试从配置中获取服务URL
@@ -401,10 +1011,142 @@ def create_service_client(
     # 创建并返回客户端实例
     return APIClient(base_url=base_url, service_name=service_name, **kwargs)
 
+class ServiceClientRegistry:
+    """
+    进程内共享的服务客户端注册表
+    
+    按服务名缓存 APIClient，同一服务的调用复用同一个会话和保活连接；
+    共享客户端在 async with 退出时不关闭，由 close_all 在服务关闭时统一关闭。
+    """
+    
+    def __init__(self):
+        self._clients: Dict[str, APIClient] = {}
+    
+    def get_client(
+        self,
+        service_name: str,
+        base_url: Optional[str] = None,
+        config_manager: Optional[Any] = None,
+        **kwargs
+    ) -> APIClient:
+        """获取服务的共享客户端，首次调用时创建（之后的参数被忽略）"""
+        client = self._clients.get(service_name)
+        if client is None:
+            client = _new_service_client(service_name, base_url, config_manager, **kwargs)
+            client._shared = True
+            self._clients[service_name] = client
+        return client
+    
+    def register_client(self, client: APIClient) -> None:
+        """注册已创建的客户端（替换同名服务的客户端）"""
+        client._shared = True
+        self._clients[client.service_name] = client
+    
+    def has_client(self, service_name: str) -> bool:
+        """检查服务客户端是否已注册"""
+        return service_name in self._clients
+    
+    async def warm_up(self, connections: int = 1, path: str = '/health') -> Dict[str, int]:
+        """并发预热所有已注册的客户端，返回每个服务成功的预热请求数"""
+        names = list(self._clients)
+        results = await asyncio.gather(*(self._clients[name].warm_up(connections, path) for name in names))
+        return dict(zip(names, results))
+    
+    async def close_all(self) -> None:
+        """关闭并移除所有客户端"""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close client for {client.service_name}: {str(e)}")
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """所有客户端的熔断器状态和耗时统计"""
+        return {name: client.stats() for name, client in self._clients.items()}
+
+# 全局服务客户端注册表实例
+service_clients = ServiceClientRegistry()
+
+def create_service_client(
+    service_name: str,
+    base_url: Optional[str] = None,
+    config_manager: Optional[Any] = None,
+    shared: bool = True,
+    **kwargs
+) -> APIClient:
+    """
+    获取服务客户端实例
+    
+    Args:
+        service_name: 服务名称
+        base_url: 基础URL，如果为None则从配置中获取
+        config_manager: 配置管理器实例
+        shared: 是否返回注册表中的共享客户端（首次调用时创建，之后的参数被忽略）；
+            False 时创建独立客户端，退出 async with 时关闭会话
+        **kwargs: 传递给APIClient的其他参数
+    
+    Returns:
+        APIClient实例
+    """
+    if shared:
+        return service_clients.get_client(service_name, base_url, config_manager, **kwargs)
+    return _new_service_client(service_name, base_url, config_manager, **kwargs)
+
+async def init_service_clients(
+    service_names: Optional[List[str]] = None,
+    warm_up: Optional[bool] = None
+) -> None:
+    """
+    服务启动时调用：为依赖的服务创建共享客户端并预热连接
+    
+    Args:
+        service_names: 依赖的服务名，默认读取配置 service_clients.services
+        warm_up: 是否预热连接，默认读取配置 service_clients.warm_up（默认True）
+    """
+    client_config = get_config("service_clients", {}) or {}
+    if service_names is None:
+        service_names = client_config.get("services", [])
+    for name in service_names:
+        service_clients.get_client(name, **client_config.get("options", {}))
+    
+    if warm_up is None:
+        warm_up = client_config.get("warm_up", True)
+    if warm_up and service_names:
+        results = await service_clients.warm_up(
+            connections=client_config.get("warm_up_connections", 1),
+            path=client_config.get("warm_up_path", "/health")
+        )
+        logger.info(f"Service clients warmed up: {results}")
+
+async def close_service_clients() -> None:
+    """服务关闭时调用：关闭所有共享客户端"""
+    await service_clients.close_all()
+
+def install_client_lifecycle(app: Any, service_names: Optional[List[str]] = None,
+                             warm_up: Optional[bool] = None) -> None:
+    """为FastAPI应用注册启动/关闭事件，管理共享客户端的生命周期"""
+    async def _startup() -> None:
+        await init_service_clients(service_names, warm_up)
+    
+    app.add_event_handler("startup", _startup)
+    app.add_event_handler("shutdown", close_service_clients)
+
 # 导出所有类和函数
 __all__ = [
     'ApiClientError',
+    'CircuitOpenError',
+    'CircuitState',
+    'CircuitBreaker',
+    'RetryBudget',
+    'LatencyTracker',
     'ApiResponse',
     'APIClient',
-    'create_service_client'
+    'RequestBatcher',
+    'ServiceClientRegistry',
+    'service_clients',
+    'create_service_client',
+    'init_service_clients',
+    'close_service_clients',
+    'install_client_lifecycle'
 ]
\ No newline at end of file
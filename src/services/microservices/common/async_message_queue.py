@@ -0,0 +1,527 @@
+import asyncio
+import contextvars
+import inspect
+from typing import Any, Callable, Dict, List, Optional, Type
+from pydantic import BaseModel
+from .config_manager import get_config
+from .logging_system import get_logger
+from .envelope import decode_envelope, trace_context
+from .mq_transport import Transport, create_transport
+from .message_queue import (
+    DEFAULT_MQ_CONFIG,
+    ConsumeResult,
+    MessageQueueError,
+    ConnectionError,
+    PublishError,
+    ConsumeError,
+    QueueSettings,
+    mq_client,
+    _create_envelope,
+    _serialize_message,
+    _normalize_result
+)
+
+class AsyncMessageQueueClient:
+    """
+    asyncio消息队列客户端
+    
+    通过传输层访问broker（见 mq_transport）：默认使用aio-pika连接RabbitMQ，连接和发布通道来自
+    连接池/通道池，消费者各自使用独立通道；transport=memory/socket 时使用进程内或本地broker，
+    语义相同（确认、拒绝进入死信队列、预取），用于压测和CI。消费者由 prefetch_count 控制并发。回调结果与同步客户端一致（ConsumeResult，None/True确认），
+    抛出异常则拒绝消息（进入死信队列，队列启用延迟重试时先重试）。同步回调在线程池中执行，避免阻塞事件循环。
+    consume_batch 按批交付消息，适合可以批量计算和批量写入的队列。
+    消息按配置编码为信封（见 envelope 模块），消费时指定 model 可直接得到模型实例。
+    队列级配置（见 QueueSettings）决定队列的最大优先级、消息默认优先级和延迟重试：处理失败的消息
+    依次进入各延迟队列，TTL到期后回到原队列，重试次数用尽后进入死信队列。紧急通道的消息
+    （优先级不低于 urgent_priority）使用预留的发布通道，不会排在批量消息之后等待通道。
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None, transport: Optional[Transport] = None):
+        """
+        初始化客户端
+        
+        Args:
+            config: 消息队列配置，默认读取 message_queue 配置节
+            transport: 传输层实例，默认按 transport 配置在连接时创建
+        """
+        self._logger = get_logger('message_queue')
+        self._config = DEFAULT_MQ_CONFIG.copy()
+        try:
+            self._config.update(config if config is not None else get_config('message_queue', {}))
+        except Exception as e:
+            self._logger.error(f"Failed to load message queue config: {str(e)}")
+        self._envelope = _create_envelope(self._config)
+        self._content_type = self._envelope.content_type if self._envelope is not None else 'application/json'
+        self._queues = QueueSettings(self._config)
+        # 非紧急消息同时占用的发布通道数上限，其余通道留给紧急消息
+        self._bulk_slots: Optional[asyncio.Semaphore] = None
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._transport = transport
+        self._connected = False
+        # 已声明的队列/交换机/绑定（拓扑保存在broker上，只需声明一次）
+        self._declared = set()
+        # consumer_tag -> 队列名称
+        self._consumers: Dict[str, str] = {}
+        # 后台发布和批处理任务，保留引用避免被回收
+        self._background = set()
+        # 从其他线程（如线程池中的批处理函数）提交的后台协程，close() 同样需要等待
+        self._background_futures = set()
+    
+    @property
+    def connected(self) -> bool:
+        """是否已连接"""
+        return self._connected
+    
+    @property
+    def transport(self) -> Optional[Transport]:
+        """当前使用的传输层"""
+        return self._transport
+    
+    async def connect(self) -> bool:
+        """建立连接并声明死信队列，成功返回True"""
+        try:
+            if self._transport is None:
+                self._transport = create_transport(self._config)
+            self._loop = asyncio.get_running_loop()
+            self._bulk_slots = asyncio.Semaphore(
+                max(1, self._config['channel_pool_size'] - self._config['urgent_reserved_channels'])
+            )
+            await self._transport.connect()
+            if self._config['dead_letter_enabled']:
+                await self._declare_dead_letter()
+            self._connected = True
+            self._logger.info(f"Connected to message queue (asyncio, transport={self._transport.name})")
+        except Exception as e:
+            self._connected = False
+            self._logger.error(f"Failed to connect to message queue: {str(e)}")
+        return self._connected
+    
+    async def _ensure_connected(self) -> None:
+        if not self._connected and not await self.connect():
+            raise ConnectionError("Message queue is not connected")
+    
+    async def _declare_exchange(self, exchange_name: str, exchange_type: Optional[str] = None) -> None:
+        """声明交换机"""
+        key = ('exchange', exchange_name)
+        if key in self._declared:
+            return
+        await self._transport.declare_exchange(
+            exchange_name,
+            exchange_type or self._config['exchange_type'],
+            durable=self._config['durable'],
+            auto_delete=self._config['auto_delete']
+        )
+        self._declared.add(key)
+    
+    async def _declare_queue(self, queue_name: str, durable: bool = True, dead_letter_enabled: Optional[bool] = None) -> None:
+        """声明队列"""
+        key = ('queue', queue_name, durable)
+        if key in self._declared:
+            return
+        await self._transport.declare_queue(
+            queue_name,
+            durable=durable,
+            auto_delete=self._config['auto_delete'],
+            arguments=self._queues.arguments(queue_name, dead_letter_enabled)
+        )
+        self._declared.add(key)
+    
+    async def _declare_retry_queues(self, queue_name: str, durable: bool = True) -> None:
+        """声明队列的延迟重试队列（未启用重试时不声明）"""
+        for retry_queue, arguments in self._queues.retry_queues(queue_name):
+            key = ('queue', retry_queue, durable)
+            if key in self._declared:
+                continue
+            await self._transport.declare_queue(
+                retry_queue,
+                durable=durable,
+                auto_delete=self._config['auto_delete'],
+                arguments=arguments
+            )
+            self._declared.add(key)
+    
+    async def _bind_queue(self, queue_name: str, exchange_name: str, routing_key: str, durable: bool = True) -> None:
+        """绑定队列到交换机"""
+        key = ('bind', queue_name, exchange_name, routing_key)
+        if key in self._declared:
+            return
+        await self._declare_queue(queue_name, durable)
+        await self._declare_exchange(exchange_name)
+        await self._transport.bind_queue(queue_name, exchange_name, routing_key)
+        self._declared.add(key)
+    
+    async def _declare_dead_letter(self) -> None:
+        """声明死信交换机和队列"""
+        exchange_name = self._config['dead_letter_exchange']
+        queue_name = self._config['dead_letter_queue']
+        await self._declare_queue(queue_name, self._config['durable'], dead_letter_enabled=False)
+        await self._bind_queue(queue_name, exchange_name, '#', self._config['durable'])
+    
+    async def setup_dead_letter(self) -> None:
+        """声明死信交换机和队列（connect时自动调用）"""
+        await self._ensure_connected()
+        await self._declare_dead_letter()
+    
+    async def publish(self, queue_name: str, message: Any, exchange: str = '',
+                      routing_key: Optional[str] = None, durable: bool = True,
+                      headers: Optional[Dict[str, Any]] = None, priority: Optional[int] = None) -> None:
+        """
+        发布消息，启用发布确认时等待broker确认
+        
+        Args:
+            queue_name: 队列名称（首次使用时声明）
+            message: 消息内容（bytes原样发送，其他类型按配置编码为信封或JSON）
+            exchange: 交换机名称，为空时直接发送到队列
+            routing_key: 路由键，默认与队列名称相同
+            durable: 队列与消息是否持久化
+            headers: 消息头
+            priority: 消息优先级，默认使用队列配置的 priority
+        """
+        await self.publish_batch(queue_name, [message], exchange, routing_key, durable, headers, priority)
+    
+    async def publish_batch(self, queue_name: str, messages: List[Any], exchange: str = '',
+                            routing_key: Optional[str] = None, durable: bool = True,
+                            headers: Optional[Dict[str, Any]] = None, priority: Optional[int] = None,
+                            trace_ids: Optional[List[Optional[str]]] = None) -> None:
+        """
+        在同一通道上连续发布一批消息，统一等待broker确认（参数同 publish）
+        
+        trace_ids 与 messages 一一对应时每条消息使用各自的跟踪ID，默认沿用当前上下文。
+        """
+        if not messages:
+            return
+        await self._ensure_connected()
+        routing_key = routing_key or queue_name
+        priority = self._queues.priority(queue_name, priority)
+        try:
+            await self._declare_queue(queue_name, durable)
+            if exchange:
+                await self._bind_queue(queue_name, exchange, routing_key, durable)
+            bodies = [
+                _serialize_message(message, self._envelope, trace_id)
+                for message, trace_id in zip(messages, trace_ids or [None] * len(messages))
+            ]
+            if self._queues.is_urgent(priority):
+                await self._transport.publish(exchange, routing_key, bodies, self._content_type,
+                                              persistent=durable, headers=headers, priority=priority)
+            else:
+                async with self._bulk_slots:
+                    await self._transport.publish(exchange, routing_key, bodies, self._content_type,
+                                                  persistent=durable, headers=headers, priority=priority)
+        except MessageQueueError:
+            raise
+        except Exception as e:
+            raise PublishError(f"Failed to publish {len(messages)} messages to '{routing_key}': {str(e)}")
+    
+    async def publish_message(self, queue_name: str, message: Any, exchange: str = '',
+                              routing_key: Optional[str] = None, durable: bool = True,
+                              priority: Optional[int] = None) -> bool:
+        """发布消息，失败时记录日志并返回False（与同步客户端接口一致）"""
+        try:
+            await self.publish(queue_name, message, exchange, routing_key, durable, priority=priority)
+            return True
+        except Exception as e:
+            self._logger.error(f"Failed to publish message to queue '{queue_name}': {str(e)}")
+            return False
+    
+    def _spawn(self, coro) -> bool:
+        """在客户端的事件循环中运行后台协程（可从其他线程调用），没有可用事件循环时返回False"""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is not None and (self._loop is None or running_loop is self._loop):
+            task = running_loop.create_task(coro)
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return True
+        if self._loop is not None and self._loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+            self._background_futures.add(future)
+            future.add_done_callback(self._background_futures.discard)
+            return True
+        coro.close()
+        return False
+    
+    def publish_nowait(self, queue_name: str, message: Any, exchange: str = '',
+                       routing_key: Optional[str] = None, durable: bool = True,
+                       priority: Optional[int] = None) -> None:
+        """
+        在后台发布消息，不等待broker往返，可在事件循环、线程池和调度器线程中调用
+        
+        没有可用事件循环时退回同步客户端的批量发布器。
+        """
+        # 在调用方编码，保留调用方上下文中的跟踪ID，同时避免占用事件循环
+        message = _serialize_message(message, self._envelope)
+        if not self._spawn(self.publish_message(queue_name, message, exchange, routing_key, durable, priority)):
+            mq_client.publish_message_nowait(queue_name, message, exchange, routing_key, durable, priority=priority)
+    
+    async def _publish_batch_logged(self, queue_name: str, messages: List[Any], exchange: str,
+                                    routing_key: Optional[str], durable: bool, priority: Optional[int]) -> None:
+        try:
+            await self.publish_batch(queue_name, messages, exchange, routing_key, durable, priority=priority)
+        except Exception as e:
+            self._logger.error(f"Failed to publish {len(messages)} messages to queue '{queue_name}': {str(e)}")
+    
+    def publish_batch_nowait(self, queue_name: str, messages: List[Any], exchange: str = '',
+                             routing_key: Optional[str] = None, durable: bool = True,
+                             priority: Optional[int] = None,
+                             trace_ids: Optional[List[Optional[str]]] = None) -> None:
+        """在后台发布一批消息（调用约束同 publish_nowait，trace_ids 同 publish_batch）"""
+        if not messages:
+            return
+        messages = [
+            _serialize_message(message, self._envelope, trace_id)
+            for message, trace_id in zip(messages, trace_ids or [None] * len(messages))
+        ]
+        if not self._spawn(self._publish_batch_logged(queue_name, messages, exchange, routing_key, durable, priority)):
+            for message in messages:
+                mq_client.publish_message_nowait(queue_name, message, exchange, routing_key, durable, priority=priority)
+    
+    def _wrap_callback(self, queue_name: str, callback: Callable, requeue_on_error: bool,
+                       model: Optional[Type[BaseModel]]) -> Callable:
+        """包装用户回调：解码消息、执行回调、根据结果确认或拒绝"""
+        is_coroutine = inspect.iscoroutinefunction(callback)
+        loop = asyncio.get_running_loop()
+        error_result = self._error_result(queue_name, requeue_on_error)
+        
+        async def on_message(message) -> None:
+            try:
+                envelope = decode_envelope(message.body, model)
+                # 回调中发布的消息沿用当前消息的跟踪ID（线程池中执行时复制上下文）
+                with trace_context(envelope.trace_id):
+                    if is_coroutine:
+                        result = await callback(envelope.payload)
+                    else:
+                        result = await loop.run_in_executor(
+                            None, contextvars.copy_context().run, callback, envelope.payload
+                        )
+                result = _normalize_result(result)
+            except Exception as e:
+                self._logger.error(f"Error processing message from queue {queue_name}: {str(e)}")
+                result = error_result
+            await self._settle(queue_name, message, result)
+        
+        return on_message
+    
+    def _error_result(self, queue_name: str, requeue_on_error: bool) -> ConsumeResult:
+        """回调异常时的处理结果：重新入队、延迟重试（队列启用时）或进入死信队列"""
+        if requeue_on_error:
+            return ConsumeResult.REQUEUE
+        return ConsumeResult.RETRY if self._queues.retries_enabled(queue_name) else ConsumeResult.REJECT
+    
+    async def _settle(self, queue_name: str, message, result: ConsumeResult) -> None:
+        if result == ConsumeResult.RETRY and await self._retry(queue_name, message):
+            return
+        if result == ConsumeResult.ACK:
+            await message.ack()
+        else:
+            await message.nack(requeue=result == ConsumeResult.REQUEUE)
+    
+    async def _retry(self, queue_name: str, message) -> bool:
+        """把消息转入延迟重试队列后确认原消息；未启用重试、次数用尽或转发失败时返回False（消息进入死信队列）"""
+        target = self._queues.retry_target(queue_name, message.headers)
+        if target is None:
+            return False
+        retry_queue, headers = target
+        try:
+            await self._transport.publish('', retry_queue, [message.body], message.content_type or self._content_type,
+                                          persistent=True, headers=headers, priority=message.priority)
+        except Exception as e:
+            self._logger.error(f"Failed to schedule retry for message from queue {queue_name}: {str(e)}")
+            return False
+        await message.ack()
+        return True
+    
+    async def _start_consumer(self, queue_name: str, on_message: Callable, prefetch_count: int,
+                              exchange_name: Optional[str], routing_key: Optional[str], durable: bool) -> str:
+        """声明队列和绑定后开始消费，返回消费者标签"""
+        try:
+            await self._declare_queue(queue_name, durable)
+            await self._declare_retry_queues(queue_name, durable)
+            if exchange_name and routing_key:
+                await self._bind_queue(queue_name, exchange_name, routing_key, durable)
+            consumer_tag = await self._transport.consume(queue_name, on_message, prefetch_count)
+        except MessageQueueError:
+            raise
+        except Exception as e:
+            raise ConsumeError(f"Failed to consume queue '{queue_name}': {str(e)}")
+        self._consumers[consumer_tag] = queue_name
+        return consumer_tag
+    
+    async def consume(self, queue_name: str, callback: Callable,
+                      prefetch_count: Optional[int] = None,
+                      exchange_name: Optional[str] = None,
+                      routing_key: Optional[str] = None,
+                      durable: bool = True,
+                      requeue_on_error: bool = False,
+                      model: Optional[Type[BaseModel]] = None) -> str:
+        """
+        开始消费队列
+        
+        Args:
+            queue_name: 队列名称
+            callback: 回调函数 callback(message)，可以是协程函数；message为解码后的消息体，
+                返回值含义同 ConsumeResult（None/True确认，False拒绝）
+            prefetch_count: 预取数量（即最大并发处理数），默认使用队列配置或全局配置的值
+            exchange_name: 绑定的交换机名称（可选）
+            routing_key: 绑定的路由键（可选）
+            durable: 队列是否持久化
+            requeue_on_error: 回调异常时是否立即重新入队（默认按队列配置延迟重试或进入死信队列）
+            model: 消息模型类，指定时回调直接收到模型实例（解码失败的消息被拒绝）
+        
+        Returns:
+            消费者标签，用于 cancel
+        """
+        await self._ensure_connected()
+        consumer_tag = await self._start_consumer(
+            queue_name, self._wrap_callback(queue_name, callback, requeue_on_error, model),
+            prefetch_count or self._queues.get(queue_name)['prefetch_count'] or self._config['prefetch_count'],
+            exchange_name, routing_key, durable
+        )
+        self._logger.info(f"Started consuming messages from queue: {queue_name}")
+        return consumer_tag
+    
+    async def consume_batch(self, queue_name: str, handle_batch: Callable,
+                            batch_size: Optional[int] = None,
+                            batch_timeout_ms: Optional[float] = None,
+                            exchange_name: Optional[str] = None,
+                            routing_key: Optional[str] = None,
+                            durable: bool = True,
+                            requeue_on_error: bool = False,
+                            model: Optional[Type[BaseModel]] = None,
+                            with_trace_ids: bool = False) -> str:
+        """
+        批量消费队列：收集到 batch_size 条消息或首条消息等待 batch_timeout_ms 后调用 handle_batch
+        
+        Args:
+            queue_name: 队列名称
+            handle_batch: 回调函数 handle_batch(messages) -> 每条消息的处理结果列表（与messages等长），
+                可以是协程函数；返回None表示全部确认，抛出异常时整批按 requeue_on_error 拒绝
+            batch_size: 每批最多消息数，默认 batch_size 配置
+            batch_timeout_ms: 最长等待毫秒数，默认 batch_timeout_ms 配置
+            exchange_name: 绑定的交换机名称（可选）
+            routing_key: 绑定的路由键（可选）
+            durable: 队列是否持久化
+            requeue_on_error: handle_batch 异常时是否立即重新入队（默认按队列配置延迟重试或进入死信队列）
+            model: 消息模型类，指定时 handle_batch 收到模型实例；解码失败的消息单独拒绝，不交给 handle_batch
+            with_trace_ids: 为True时以 handle_batch(messages, trace_ids) 调用，trace_ids 为每条消息的跟踪ID，
+                供处理结果沿用（如传给 publish_batch 或 trace_context）；整批只有一个跟踪ID时回调总在该上下文中执行
+            
+        Returns:
+            消费者标签，用于 cancel
+        """
+        await self._ensure_connected()
+        batch_size = max(1, int(batch_size or self._config['batch_size']))
+        timeout = (self._config['batch_timeout_ms'] if batch_timeout_ms is None else batch_timeout_ms) / 1000.0
+        loop = asyncio.get_running_loop()
+        is_coroutine = inspect.iscoroutinefunction(handle_batch)
+        error_result = self._error_result(queue_name, requeue_on_error)
+        buffer: List[Any] = []
+        timer: List[Optional[asyncio.TimerHandle]] = [None]
+        # 批次按投递顺序逐个处理，处理期间下一批继续积累
+        lock = asyncio.Lock()
+        
+        async def run_batch(batch: List[Any]) -> None:
+            async with lock:
+                rejected = []
+                bodies = []
+                trace_ids = []
+                decoded = []
+                for message in batch:
+                    try:
+                        envelope = decode_envelope(message.body, model)
+                        bodies.append(envelope.payload)
+                        trace_ids.append(envelope.trace_id)
+                        decoded.append(message)
+                    except Exception as e:
+                        self._logger.error(f"Failed to decode message from queue {queue_name}: {str(e)}")
+                        rejected.append(message)
+                batch = decoded
+                args = (bodies, trace_ids) if with_trace_ids else (bodies,)
+                shared_trace_id = trace_ids[0] if len(set(trace_ids)) == 1 else None
+                try:
+                    if not batch:
+                        results = []
+                    else:
+                        with trace_context(shared_trace_id):
+                            if is_coroutine:
+                                results = await handle_batch(*args)
+                            else:
+                                results = await loop.run_in_executor(
+                                    None, contextvars.copy_context().run, handle_batch, *args
+                                )
+                    if results is None:
+                        results = [ConsumeResult.ACK] * len(batch)
+                    elif len(results) != len(batch):
+                        raise ConsumeError(f"handle_batch returned {len(results)} results for {len(batch)} messages")
+                    results = [_normalize_result(result) for result in results]
+                except Exception as e:
+                    self._logger.error(f"Error processing batch of {len(batch)} messages from queue {queue_name}: {str(e)}")
+                    results = [error_result] * len(batch)
+                await asyncio.gather(
+                    *(self._settle(queue_name, message, result) for message, result in zip(batch, results)),
+                    *(self._settle(queue_name, message, ConsumeResult.REJECT) for message in rejected)
+                )
+        
+        def flush() -> None:
+            if timer[0] is not None:
+                timer[0].cancel()
+                timer[0] = None
+            if buffer:
+                batch = buffer[:]
+                buffer.clear()
+                self._spawn(run_batch(batch))
+        
+        async def on_message(message) -> None:
+            buffer.append(message)
+            if len(buffer) >= batch_size:
+                flush()
+            elif timer[0] is None:
+                timer[0] = loop.call_later(timeout, flush)
+        
+        # 预取两批：处理当前批次时下一批可以继续投递
+        consumer_tag = await self._start_consumer(
+            queue_name, on_message, batch_size * 2, exchange_name, routing_key, durable
+        )
+        self._logger.info(f"Started batch consuming from queue: {queue_name} (batch_size={batch_size})")
+        return consumer_tag
+    
+    async def cancel(self, consumer_tag: str) -> bool:
+        """停止消费者，未确认的消息由broker重新投递"""
+        if self._consumers.pop(consumer_tag, None) is None:
+            return False
+        try:
+            await self._transport.cancel(consumer_tag)
+        except Exception as e:
+            self._logger.error(f"Failed to cancel consumer {consumer_tag}: {str(e)}")
+        return True
+    
+    async def queue_stats(self) -> Dict[str, Any]:
+        """各队列的深度、确认计数和排队等待时间（内存/本地broker传输支持，AMQP传输返回空字典）"""
+        await self._ensure_connected()
+        return await self._transport.stats()
+    
+    async def close(self, timeout: float = 5.0) -> None:
+        """等待后台发布完成，停止所有消费者并关闭连接"""
+        pending = list(self._background) + [asyncio.wrap_future(f) for f in list(self._background_futures)]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        for consumer_tag in list(self._consumers):
+            await self.cancel(consumer_tag)
+        if self._transport is not None:
+            await self._transport.close()
+        self._connected = False
+        self._declared.clear()
+        self._loop = None
+
+# 全局asyncio消息队列客户端实例
+async_mq_client = AsyncMessageQueueClient()
+
+# 导出所有类和函数
+__all__ = [
+    'AsyncMessageQueueClient',
+    'async_mq_client'
+]
@@ -1,11 +1,28 @@
+import sys
+import math
+import hashlib
+import inspect
+import dataclasses
 import time
+import random
+import threading
+import heapq
 import asyncio
 import json
-from typing import Any, Dict, Optional, Callable, Union, List, Tuple, TypeVar, Generic
+import uuid
+from collections import OrderedDict, defaultdict
+from enum import Enum
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Callable, Union, List, Tuple, TypeVar, Generic, Iterator, AsyncIterator, Awaitable
 from functools import wraps
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import redis
 import aioredis
+from pydantic import BaseModel
 from .errors import BaseError
+from .codec import Codec, JSONCodec, get_codec
 from .config_manager import get_config
 from .logging_system import logger
 
@@ -49,7 +66,11 @@ class CacheConfig:
         retry_attempts: int = 3,
         retry_delay: float = 0.5,
         pool_size: int = 10,
-        decode_responses: bool = True
+        decode_responses: bool = True,
+        batch_size: int = 500,
+        scan_count: int = 1000,
+        codec: Optional[str] = None,
+        compress_threshold: Optional[int] = None
     ):
         self.host = host
         self.port = port
@@ -60,47 +81,341 @@ class CacheConfig:
         self.retry_delay = retry_delay
         self.pool_size = pool_size
         self.decode_responses = decode_responses
+        self.batch_size = batch_size
+        self.scan_count = scan_count
+        self.codec = codec
+        self.compress_threshold = compress_threshold
+
+class EvictionPolicy(str, Enum):
+    """缓存淘汰策略枚举"""
+    LRU = "lru"            # 最近最少使用
+    LFU = "lfu"            # 最不经常使用
+    TINY_LFU = "tinylfu"   # LRU + TinyLFU准入过滤
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """估算缓存值占用的内存字节数（对容器递归估算，限制深度）"""
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += _estimate_size(v, _depth + 1)
+    return size
 
 class CacheItem:
     """缓存项类"""
     
+    __slots__ = ('value', 'ttl', 'created_at', 'expires_at', 'size')
+    
     def __init__(self,
                  value: Any,
                  ttl: Optional[int] = None,
-                 created_at: Optional[float] = None):
+                 created_at: Optional[float] = None,
+                 size: int = 0):
         self.value = value
         self.ttl = ttl
         self.created_at = created_at or time.time()
-        
-    def is_expired(self) -> bool:
+        self.expires_at = None if ttl is None else self.created_at + ttl
+        self.size = size
+    
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """检查缓存项是否已过期"""
-        if self.ttl is None:
+        if self.expires_at is None:
             return False
-        return time.time() > (self.created_at + self.ttl)
+        return (now or time.time()) > self.expires_at
+
+class CacheStats:
+    """缓存命中/未命中/淘汰计数器"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """重置计数器"""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+    
+    @property
+    def hit_rate(self) -> float:
+        """缓存命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'rejections': self.rejections,
+            'hit_rate': self.hit_rate
+        }
+
+class _FrequencySketch:
+    """Count-Min Sketch访问频率估计器，用于TinyLFU准入判断"""
+    
+    _DEPTH = 4
+    _MAX_COUNT = 15
+    
+    def __init__(self, capacity: int):
+        width = 1
+        while width < max(capacity, 16):
+            width <<= 1
+        self._mask = width - 1
+        self._table = [[0] * width for _ in range(self._DEPTH)]
+        self._sample_size = 10 * width
+        self._additions = 0
+    
+    def _indexes(self, key: str):
+        h = hash(key)
+        for i in range(self._DEPTH):
+            yield i, (h ^ (h >> (8 * (i + 1))) ^ (0x9E3779B1 * (i + 1))) & self._mask
+    
+    def increment(self, key: str) -> None:
+        """记录一次访问"""
+        for row, idx in self._indexes(key):
+            if self._table[row][idx] < self._MAX_COUNT:
+                self._table[row][idx] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+    
+    def estimate(self, key: str) -> int:
+        """估算访问频率"""
+        return min(self._table[row][idx] for row, idx in self._indexes(key))
+    
+    def _age(self) -> None:
+        """计数器减半，使旧的热度逐渐衰减"""
+        for row in self._table:
+            for i in range(len(row)):
+                row[i] >>= 1
+        self._additions //= 2
 
 T = TypeVar('T')
 
 class InMemoryCache(Generic[T]):
-    """内存缓存实现"""
+    """
+    内存缓存实现，支持容量限制、LRU/LFU/TinyLFU淘汰和后台过期清理
     
-    def __init__(self):
-        self._cache: Dict[str, CacheItem] = {}
-        self._lock = asyncio.Lock()
+    同一实例可能同时被事件循环和线程池中的同步调用（如同步函数上的cache_result）访问，
+    每个操作在实例的可重入锁内完成；操作中不存在await，持锁时间很短。
+    """
     
-    async def get(self, key: str) -> Optional[T]:
-        """获取缓存项"""
-        async with self._lock:
-            if key not in self._cache:
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        eviction_policy: Union[EvictionPolicy, str] = EvictionPolicy.LRU,
+        sweep_interval: float = 1.0,
+        size_estimator: Optional[Callable[[Any], int]] = None
+    ):
+        """
+        初始化内存缓存
+        
+        Args:
+            max_entries: 最大缓存项数，None表示不限制
+            max_bytes: 最大估算内存字节数，None表示不限制
+            eviction_policy: 超出容量时的淘汰策略
+            sweep_interval: 后台过期清理的最长间隔（秒）
+            size_estimator: 缓存值大小估算函数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_policy = EvictionPolicy(eviction_policy)
+        self.sweep_interval = sweep_interval
+        self._size_estimator = size_estimator or _estimate_size
+        self._cache: "OrderedDict[str, CacheItem]" = OrderedDict()
+        self._current_bytes = 0
+        self._stats = CacheStats()
+        
+        # LFU频率桶：频率 -> 按插入顺序排列的键
+        self._freq: Dict[str, int] = {}
+        self._freq_buckets: Dict[int, "OrderedDict[str, None]"] = defaultdict(OrderedDict)
+        self._min_freq = 0
+        
+        # TinyLFU准入过滤器
+        self._sketch: Optional[_FrequencySketch] = None
+        if self.eviction_policy == EvictionPolicy.TINY_LFU:
+            self._sketch = _FrequencySketch(max_entries or 10000)
+        
+        # 过期时间小顶堆：(过期时间, 键)，过期项由后台清理任务按堆顶时间回收
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._lock = threading.RLock()
+    
+    def _record_access(self, key: str) -> None:
+        """记录键被访问（更新LRU顺序或LFU频率）"""
+        if self.eviction_policy == EvictionPolicy.LFU:
+            freq = self._freq[key]
+            bucket = self._freq_buckets[freq]
+            del bucket[key]
+            if not bucket:
+                del self._freq_buckets[freq]
+                if self._min_freq == freq:
+                    self._min_freq = freq + 1
+            self._freq[key] = freq + 1
+            self._freq_buckets[freq + 1][key] = None
+        else:
+            self._cache.move_to_end(key)
+    
+    def _remove(self, key: str) -> Optional[CacheItem]:
+        """从所有内部结构中移除键"""
+        item = self._cache.pop(key, None)
+        if item is None:
+            return None
+        self._current_bytes -= item.size
+        if self.eviction_policy == EvictionPolicy.LFU:
+            freq = self._freq.pop(key)
+            bucket = self._freq_buckets[freq]
+            del bucket[key]
+            if not bucket:
+                del self._freq_buckets[freq]
+        return item
+    
+    def _select_victim(self) -> str:
+        """根据淘汰策略选择被淘汰的键"""
+        if self.eviction_policy == EvictionPolicy.LFU:
+            while self._min_freq not in self._freq_buckets:
+                self._min_freq = min(self._freq_buckets)
+            return next(iter(self._freq_buckets[self._min_freq]))
+        return next(iter(self._cache))
+    
+    def _over_capacity(self, incoming_size: int) -> bool:
+        """检查插入新项后是否超出容量"""
+        if self.max_entries is not None and len(self._cache) + 1 > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._current_bytes + incoming_size > self.max_bytes:
+            return True
+        return False
+    
+    def _insert(self, key: str, item: CacheItem) -> bool:
+        """插入缓存项，必要时淘汰旧项；返回是否被接纳"""
+        self._remove(key)
+        
+        if self.max_bytes is not None and item.size > self.max_bytes:
+            self._stats.rejections += 1
+            return False
+        
+        if self._over_capacity(item.size):
+            # 优先回收已过期的项
+            self._purge_expired()
+        
+        while self._cache and self._over_capacity(item.size):
+            victim = self._select_victim()
+            if self._sketch is not None and self._sketch.estimate(key) <= self._sketch.estimate(victim):
+                # TinyLFU：新键的历史频率不高于被淘汰者时拒绝接纳
+                self._stats.rejections += 1
+                return False
+            self._remove(victim)
+            self._stats.evictions += 1
+        
+        self._cache[key] = item
+        self._current_bytes += item.size
+        if self.eviction_policy == EvictionPolicy.LFU:
+            self._freq[key] = 1
+            self._freq_buckets[1][key] = None
+            self._min_freq = 1
+        if item.expires_at is not None:
+            heapq.heappush(self._expiry_heap, (item.expires_at, key))
+        return True
+    
+    def _purge_expired(self, now: Optional[float] = None) -> int:
+        """回收堆顶所有已到期的缓存项"""
+        now = now or time.time()
+        heap = self._expiry_heap
+        purged = 0
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            item = self._cache.get(key)
+            # 堆中可能残留已被覆盖或删除的旧记录
+            if item is not None and item.expires_at == expires_at:
+                self._remove(key)
+                self._stats.expirations += 1
+                purged += 1
+        
+        # 残留记录过多时重建堆
+        if len(heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [
+                (item.expires_at, k) for k, item in self._cache.items() if item.expires_at is not None
+            ]
+            heapq.heapify(self._expiry_heap)
+        return purged
+    
+    async def _sweep_loop(self) -> None:
+        """后台过期清理循环，休眠到堆顶项到期或清理间隔结束"""
+        while True:
+            delay = self.sweep_interval
+            if self._expiry_heap:
+                delay = min(delay, max(0.0, self._expiry_heap[0][0] - time.time()))
+            await asyncio.sleep(delay)
+            with self._lock:
+                self._purge_expired()
+    
+    def start_sweeper(self) -> None:
+        """启动后台过期清理任务（需在事件循环中调用）"""
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+    
+    async def stop_sweeper(self) -> None:
+        """停止后台过期清理任务"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+    
+    def get_sync(self, key: str) -> Optional[T]:
+        """同步获取缓存项"""
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(key)
+            
+            item = self._cache.get(key)
+            if item is None:
+                self._stats.misses += 1
                 return None
             
-            item = self._cache[key]
             if item.is_expired():
                 # 惰性删除过期项
-                del self._cache[key]
+                self._remove(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
                 return None
             
+            self._record_access(key)
+            self._stats.hits += 1
             return item.value
     
+    def set_sync(
+        self,
+        key: str,
+        value: T,
+        ttl: Optional[int] = None
+    ) -> None:
+        """同步设置缓存项"""
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(key)
+            self._insert(key, CacheItem(value, ttl, size=self._size_estimator(value)))
+    
+    def delete_sync(self, key: str) -> bool:
+        """同步删除缓存项"""
+        with self._lock:
+            return self._remove(key) is not None
+    
+    async def get(self, key: str) -> Optional[T]:
+        """获取缓存项"""
+        return self.get_sync(key)
+    
     async def set(
         self,
         key: str,
@@ -108,69 +423,155 @@ class InMemoryCache(Generic[T]):
         ttl: Optional[int] = None
     ) -> None:
         """设置缓存项"""
-        async with self._lock:
-            self._cache[key] = CacheItem(value, ttl)
+        self.set_sync(key, value, ttl)
     
     async def delete(self, key: str) -> bool:
         """删除缓存项"""
-        async with self._lock:
-            if key not in self._cache:
-                return False
-            
-            del self._cache[key]
-            return True
+        return self.delete_sync(key)
     
     async def exists(self, key: str) -> bool:
         """检查缓存项是否存在"""
-        return await self.get(key) is not None
+        with self._lock:
+            item = self._cache.get(key)
+            return item is not None and not item.is_expired()
+    
+    def clear_sync(self) -> None:
+        """同步清空缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._freq.clear()
+            self._freq_buckets.clear()
+            self._min_freq = 0
+            self._expiry_heap.clear()
+            self._current_bytes = 0
     
     async def clear(self) -> None:
         """清空缓存"""
-        async with self._lock:
-            self._cache.clear()
+        self.clear_sync()
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """删除所有以 prefix 开头的缓存项，返回删除数量"""
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
     
     async def keys(self) -> List[str]:
         """获取所有缓存键"""
-        async with self._lock:
+        with self._lock:
             # 先清理过期项
-            for key in list(self._cache.keys()):
-                if self._cache[key].is_expired():
-                    del self._cache[key]
-            
+            self._purge_expired()
             return list(self._cache.keys())
     
     async def size(self) -> int:
-        """获取缓存大小"""
-        return len(await self.keys())
+        """获取缓存大小（O(1)，可能包含尚未被清理的过期项）"""
+        return len(self._cache)
     
     async def get_with_ttl(self, key: str) -> Tuple[Optional[T], Optional[int]]:
         """获取缓存项及其剩余生存时间"""
-        async with self._lock:
-            if key not in self._cache:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                self._stats.misses += 1
                 return None, None
             
-            item = self._cache[key]
-            if item.is_expired():
-                del self._cache[key]
+            now = time.time()
+            if item.is_expired(now):
+                self._remove(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
                 return None, None
             
-            if item.ttl is None:
+            self._record_access(key)
+            self._stats.hits += 1
+            
+            if item.expires_at is None:
                 ttl = None
             else:
-                ttl = int(item.created_at + item.ttl - time.time())
+                ttl = int(item.expires_at - now)
                 if ttl < 0:
                     ttl = 0
             
             return item.value, ttl
+    
+    async def mget(self, keys: List[str]) -> Dict[str, T]:
+        """批量获取缓存项，只返回命中的键"""
+        result: Dict[str, T] = {}
+        for key in keys:
+            value = self.get_sync(key)
+            if value is not None:
+                result[key] = value
+        return result
+    
+    async def mset(self, mapping: Dict[str, T], ttl: Optional[int] = None) -> None:
+        """批量设置缓存项"""
+        for key, value in mapping.items():
+            self.set_sync(key, value, ttl)
+    
+    async def mdelete(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        return sum(1 for key in keys if self.delete_sync(key))
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                **self._stats.to_dict(),
+                'entries': len(self._cache),
+                'bytes': self._current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'eviction_policy': self.eviction_policy.value
+            }
+    
+    def reset_stats(self) -> None:
+        """重置统计计数器"""
+        self._stats.reset()
 
 class RedisCache:
     """Redis缓存实现"""
     
-    def __init__(self, config: Optional[CacheConfig] = None):
+    def __init__(self, config: Optional[CacheConfig] = None, codec: Optional[Codec] = None):
         self.config = config or CacheConfig()
         self._client = None
         self._async_client = None
         self._lock = asyncio.Lock()
+        
+        # 配置编解码器后值以带类型标签的二进制负载存储，get直接返回原始对象
+        if codec is None and self.config.codec:
+            codec = get_codec(self.config.codec, compress_threshold=self.config.compress_threshold)
+        self.codec = codec
+    
+    @property
+    def _decode_responses(self) -> bool:
+        """使用编解码器时负载可能是二进制，客户端不能自动解码"""
+        return self.config.decode_responses and self.codec is None
+    
+    def _serialize(self, value: Any) -> Any:
+        """序列化缓存值"""
+        if self.codec is not None:
+            return self.codec.dumps(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+    
+    def _deserialize(self, value: Any) -> Any:
+        """反序列化缓存值"""
+        if value is None or self.codec is None:
+            return value
+        return self.codec.loads(value)
+    
+    @staticmethod
+    def _decode_key(key: Union[str, bytes]) -> str:
+        """二进制客户端返回的键转为str"""
+        return key.decode("utf-8") if isinstance(key, bytes) else key
+    
+    def _chunks(self, items: List[Any]):
+        """按批大小切分，避免单个管道过大"""
+        size = self.config.batch_size
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
     
     def _get_sync_client(self) -> redis.Redis:
         """获取同步Redis客户端"""
@@ -182,7 +583,7 @@ class RedisCache:
                     db=self.config.db,
                     password=self.config.password,
                     socket_timeout=self.config.socket_timeout,
-                    decode_responses=self.config.decode_responses,
+                    decode_responses=self._decode_responses,
                     health_check_interval=30
                 )
                 # 测试连接
@@ -209,7 +610,7 @@ class RedisCache:
                         self._async_client = await aioredis.from_url(
                             url,
                             socket_timeout=self.config.socket_timeout,
-                            decode_responses=self.config.decode_responses
+                            decode_responses=self._decode_responses
                         )
                         # 测试连接
                         await self._async_client.ping()
@@ -224,8 +625,7 @@ class RedisCache:
         """同步获取缓存项"""
         try:
             client = self._get_sync_client()
-            value = client.get(key)
-            return value
+            return self._deserialize(client.get(key))
         except Exception as e:
             logger.error(f"Failed to get cache item: {str(e)}")
             raise CacheOperationError(details={"operation": "get", "error": str(e)})
@@ -239,9 +639,7 @@ class RedisCache:
         """同步设置缓存项"""
         try:
             client = self._get_sync_client()
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            client.set(key, value, ex=ttl)
+            client.set(key, self._serialize(value), ex=ttl)
         except Exception as e:
             logger.error(f"Failed to set cache item: {str(e)}")
             raise CacheOperationError(details={"operation": "set", "error": str(e)})
@@ -259,8 +657,7 @@ class RedisCache:
         """异步获取缓存项"""
         try:
             client = await self._get_async_client()
-            value = await client.get(key)
-            return value
+            return self._deserialize(await client.get(key))
         except Exception as e:
             logger.error(f"Failed to get cache item (async): {str(e)}")
             raise CacheOperationError(details={"operation": "get", "error": str(e)})
@@ -274,9 +671,7 @@ class RedisCache:
         """异步设置缓存项"""
         try:
             client = await self._get_async_client()
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            await client.set(key, value, ex=ttl)
+            await client.set(key, self._serialize(value), ex=ttl)
         except Exception as e:
             logger.error(f"Failed to set cache item (async): {str(e)}")
             raise CacheOperationError(details={"operation": "set", "error": str(e)})
@@ -299,23 +694,61 @@ class RedisCache:
             logger.error(f"Failed to check cache item existence (async): {str(e)}")
             raise CacheOperationError(details={"operation": "exists", "error": str(e)})
     
-    async def clear(self) -> None:
-        """异步清空缓存"""
+    async def clear(self, namespace: Optional[str] = None) -> None:
+        """异步清空缓存；指定命名空间时只删除该命名空间下的键"""
         try:
-            client = await self._get_async_client()
-            await client.flushdb()
+            if namespace is None:
+                client = await self._get_async_client()
+                await client.flushdb()
+            else:
+                await self.delete_pattern(f"{namespace}:*")
+        except CacheOperationError:
+            raise
         except Exception as e:
             logger.error(f"Failed to clear cache (async): {str(e)}")
             raise CacheOperationError(details={"operation": "clear", "error": str(e)})
     
-    async def keys(self, pattern: str = "*") -> List[str]:
-        """异步获取所有匹配的缓存键"""
+    async def scan_iter(self, pattern: str = "*", count: Optional[int] = None) -> AsyncIterator[str]:
+        """使用SCAN增量迭代匹配的键，不会像KEYS一样阻塞Redis"""
         try:
             client = await self._get_async_client()
-            return await client.keys(pattern)
+            cursor = 0
+            while True:
+                cursor, batch = await client.scan(cursor=cursor, match=pattern, count=count or self.config.scan_count)
+                for key in batch:
+                    yield self._decode_key(key)
+                if cursor == 0:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to scan cache keys (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "scan", "error": str(e)})
+    
+    def scan_iter_sync(self, pattern: str = "*", count: Optional[int] = None) -> Iterator[str]:
+        """同步使用SCAN增量迭代匹配的键"""
+        try:
+            client = self._get_sync_client()
+            for key in client.scan_iter(match=pattern, count=count or self.config.scan_count):
+                yield self._decode_key(key)
         except Exception as e:
-            logger.error(f"Failed to get cache keys (async): {str(e)}")
-            raise CacheOperationError(details={"operation": "keys", "error": str(e)})
+            logger.error(f"Failed to scan cache keys: {str(e)}")
+            raise CacheOperationError(details={"operation": "scan", "error": str(e)})
+    
+    async def keys(self, pattern: str = "*") -> List[str]:
+        """异步获取所有匹配的缓存键（基于SCAN）"""
+        return [key async for key in self.scan_iter(pattern)]
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """异步删除所有匹配的键，按批UNLINK"""
+        deleted = 0
+        batch: List[str] = []
+        async for key in self.scan_iter(pattern):
+            batch.append(key)
+            if len(batch) >= self.config.batch_size:
+                deleted += await self.mdelete(batch)
+                batch = []
+        if batch:
+            deleted += await self.mdelete(batch)
+        return deleted
     
     async def size(self) -> int:
         """异步获取缓存大小"""
@@ -327,31 +760,157 @@ class RedisCache:
             raise CacheOperationError(details={"operation": "size", "error": str(e)})
     
     async def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[int]]:
-        """异步获取缓存项及其剩余生存时间"""
+        """异步获取缓存项及其剩余生存时间（GET与TTL在同一次往返中完成）"""
         try:
             client = await self._get_async_client()
-            value = await client.get(key)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.ttl(key)
+                value, ttl = await pipe.execute()
             if value is None:
                 return None, None
             
-            ttl = await client.ttl(key)
             # ttl 为 -1 表示永不过期，-2 表示键不存在
             if ttl == -1:
                 ttl = None
             elif ttl == -2:
                 return None, None
             
-            return value, ttl
+            return self._deserialize(value), ttl
         except Exception as e:
             logger.error(f"Failed to get cache item with ttl (async): {str(e)}")
             raise CacheOperationError(details={"operation": "get_with_ttl", "error": str(e)})
     
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False):
+        """异步管道上下文管理器，退出时一次性执行所有命令"""
+        client = await self._get_async_client()
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            try:
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to execute cache pipeline (async): {str(e)}")
+                raise CacheOperationError(details={"operation": "pipeline", "error": str(e)})
+    
+    @contextmanager
+    def pipeline_sync(self, transaction: bool = False):
+        """同步管道上下文管理器，退出时一次性执行所有命令"""
+        client = self._get_sync_client()
+        with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            try:
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to execute cache pipeline: {str(e)}")
+                raise CacheOperationError(details={"operation": "pipeline", "error": str(e)})
+    
+    async def mget_with_ttl(self, keys: List[str]) -> Dict[str, Tuple[Any, Optional[int]]]:
+        """异步批量获取缓存项及其剩余生存时间，只返回命中的键（每批一次往返）"""
+        try:
+            client = await self._get_async_client()
+            result: Dict[str, Tuple[Any, Optional[int]]] = {}
+            for chunk in self._chunks(list(keys)):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in chunk:
+                        pipe.get(key)
+                        pipe.ttl(key)
+                    replies = await pipe.execute()
+                for index, key in enumerate(chunk):
+                    value, ttl = replies[2 * index], replies[2 * index + 1]
+                    # ttl 为 -2 表示键在GET与TTL之间过期
+                    if value is None or ttl == -2:
+                        continue
+                    result[key] = (self._deserialize(value), None if ttl == -1 else ttl)
+            return result
+        except Exception as e:
+            logger.error(f"Failed to mget cache items with ttl (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "mget_with_ttl", "error": str(e)})
+    
+    async def mget(self, keys: List[str]) -> Dict[str, Any]:
+        """异步批量获取缓存项，只返回命中的键"""
+        try:
+            client = await self._get_async_client()
+            result: Dict[str, Any] = {}
+            for chunk in self._chunks(list(keys)):
+                values = await client.mget(chunk)
+                for key, value in zip(chunk, values):
+                    if value is not None:
+                        result[key] = self._deserialize(value)
+            return result
+        except Exception as e:
+            logger.error(f"Failed to mget cache items (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "mget", "error": str(e)})
+    
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """异步批量设置缓存项（管道化，每批一次往返）"""
+        try:
+            client = await self._get_async_client()
+            for chunk in self._chunks(list(mapping.items())):
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, value in chunk:
+                        pipe.set(key, self._serialize(value), ex=ttl)
+                    await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to mset cache items (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "mset", "error": str(e)})
+    
+    async def mdelete(self, keys: List[str]) -> int:
+        """异步批量删除缓存项，返回删除数量"""
+        try:
+            client = await self._get_async_client()
+            deleted = 0
+            for chunk in self._chunks(list(keys)):
+                deleted += await client.unlink(*chunk)
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to mdelete cache items (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "mdelete", "error": str(e)})
+    
+    def mget_sync(self, keys: List[str]) -> Dict[str, Any]:
+        """同步批量获取缓存项，只返回命中的键"""
+        try:
+            client = self._get_sync_client()
+            result: Dict[str, Any] = {}
+            for chunk in self._chunks(list(keys)):
+                for key, value in zip(chunk, client.mget(chunk)):
+                    if value is not None:
+                        result[key] = self._deserialize(value)
+            return result
+        except Exception as e:
+            logger.error(f"Failed to mget cache items: {str(e)}")
+            raise CacheOperationError(details={"operation": "mget", "error": str(e)})
+    
+    def mset_sync(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """同步批量设置缓存项"""
+        try:
+            client = self._get_sync_client()
+            for chunk in self._chunks(list(mapping.items())):
+                with client.pipeline(transaction=False) as pipe:
+                    for key, value in chunk:
+                        pipe.set(key, self._serialize(value), ex=ttl)
+                    pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to mset cache items: {str(e)}")
+            raise CacheOperationError(details={"operation": "mset", "error": str(e)})
+    
+    def mdelete_sync(self, keys: List[str]) -> int:
+        """同步批量删除缓存项，返回删除数量"""
+        try:
+            client = self._get_sync_client()
+            deleted = 0
+            for chunk in self._chunks(list(keys)):
+                deleted += client.unlink(*chunk)
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to mdelete cache items: {str(e)}")
+            raise CacheOperationError(details={"operation": "mdelete", "error": str(e)})
+    
     async def hget(self, key: str, field: str) -> Optional[Any]:
         """异步获取哈希表中的字段值"""
         try:
             client = await self._get_async_client()
-            value = await client.hget(key, field)
-            return value
+            return self._deserialize(await client.hget(key, field))
         except Exception as e:
             logger.error(f"Failed to get hash field (async): {str(e)}")
             raise CacheOperationError(details={"operation": "hget", "error": str(e)})
@@ -366,9 +925,7 @@ class RedisCache:
         """异步设置哈希表中的字段值"""
         try:
             client = await self._get_async_client()
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            await client.hset(key, field, value)
+            await client.hset(key, field, self._serialize(value))
             
             # 设置TTL
             if ttl is not None:
@@ -385,18 +942,371 @@ class RedisCache:
         except Exception as e:
             logger.error(f"Failed to delete hash field (async): {str(e)}")
             raise CacheOperationError(details={"operation": "hdel", "error": str(e)})
+    
+    def publish_sync(self, channel: str, message: str) -> int:
+        """同步发布消息到频道"""
+        try:
+            client = self._get_sync_client()
+            return client.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Failed to publish cache message: {str(e)}")
+            raise CacheOperationError(details={"operation": "publish", "error": str(e)})
+    
+    async def publish(self, channel: str, message: str) -> int:
+        """异步发布消息到频道"""
+        try:
+            client = await self._get_async_client()
+            return await client.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Failed to publish cache message (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "publish", "error": str(e)})
+    
+    async def subscribe(self, *channels: str):
+        """异步订阅频道，返回PubSub对象"""
+        try:
+            client = await self._get_async_client()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(*channels)
+            return pubsub
+        except Exception as e:
+            logger.error(f"Failed to subscribe cache channel (async): {str(e)}")
+            raise CacheOperationError(details={"operation": "subscribe", "error": str(e)})
+
+class TieredCache:
+    """
+    两级近端缓存：进程内有界L1 + Redis L2
+    
+    写入和删除会通过Redis发布/订阅广播失效消息，其他副本收到后丢弃本地L1中的
+    对应键。L1的TTL按命名空间（键中第一个分隔符之前的部分）单独配置，TTL为0的
+    命名空间不进入L1。
+    
+    L2必须配置编解码器，保证L1命中和L2回源返回的对象类型一致。L1不是线程安全的，
+    只在事件循环线程中访问；同步接口直接读写L2，本地L1失效交给事件循环执行。
+    """
+    
+    def __init__(
+        self,
+        l2: RedisCache,
+        l1: Optional[InMemoryCache] = None,
+        namespace_ttls: Optional[Dict[str, int]] = None,
+        default_l1_ttl: int = 30,
+        channel: str = "leverageguard:cache:invalidate",
+        namespace_separator: str = ":"
+    ):
+        """
+        初始化两级缓存
+        
+        Args:
+            l2: Redis缓存实例
+            l1: 进程内缓存实例，默认创建容量为10000的LRU缓存
+            namespace_ttls: 命名空间 -> L1 TTL（秒）
+            default_l1_ttl: 未配置命名空间的L1 TTL（秒）
+            channel: 失效消息频道
+            namespace_separator: 命名空间分隔符
+        """
+        if getattr(l2, "codec", None) is None:
+            # 无编解码器时L2返回JSON字符串，与L1中的原始对象类型不一致
+            raise CacheError(message="TieredCache requires an L2 cache configured with a codec")
+        self.l2 = l2
+        self.l1 = l1 or InMemoryCache(max_entries=10000)
+        self.namespace_ttls = namespace_ttls or {}
+        self.default_l1_ttl = default_l1_ttl
+        self.channel = channel
+        self.namespace_separator = namespace_separator
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task: Optional[asyncio.Task] = None
+        # L1所属的事件循环，同步接口通过它投递本地失效
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 每收到一次失效消息递增，用于避免将失效前读到的旧值回填到L1
+        self._invalidation_seq = 0
+        self._l1_hits = 0
+        self._l2_hits = 0
+        self._misses = 0
+        self._invalidations_received = 0
+    
+    def _l1_ttl(self, key: str, ttl: Optional[int] = None) -> Optional[int]:
+        """计算键在L1中的TTL，返回None表示不进入L1"""
+        namespace = key.split(self.namespace_separator, 1)[0] if self.namespace_separator in key else key
+        l1_ttl = self.namespace_ttls.get(namespace, self.default_l1_ttl)
+        if not l1_ttl or l1_ttl <= 0:
+            return None
+        if ttl is not None:
+            l1_ttl = min(l1_ttl, ttl)
+        return l1_ttl
+    
+    def _fill_l1(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """回填L1（只在事件循环线程中调用）"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        l1_ttl = self._l1_ttl(key, ttl)
+        if l1_ttl is not None:
+            self.l1.set_sync(key, value, l1_ttl)
+    
+    async def _publish_invalidation(self, keys: List[str]) -> None:
+        """广播失效消息"""
+        try:
+            await self.l2.publish(self.channel, json.dumps({"origin": self._instance_id, "keys": keys}))
+        except CacheOperationError:
+            # 广播失败时其他副本依靠L1 TTL兜底
+            logger.warning(f"Failed to broadcast cache invalidation for {len(keys)} key(s)")
+    
+    def _publish_invalidation_sync(self, keys: List[str]) -> None:
+        """同步广播失效消息"""
+        try:
+            self.l2.publish_sync(self.channel, json.dumps({"origin": self._instance_id, "keys": keys}))
+        except CacheOperationError:
+            logger.warning(f"Failed to broadcast cache invalidation for {len(keys)} key(s)")
+    
+    def _invalidate_local(self, keys: List[str]) -> None:
+        """从同步接口丢弃本地L1中的键，在事件循环线程中执行"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            # L1尚未被事件循环使用，不存在并发访问
+            self._apply_invalidation(keys, received=False)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._apply_invalidation(keys, received=False)
+        else:
+            loop.call_soon_threadsafe(self._apply_invalidation, keys, False)
+    
+    def _apply_invalidation(self, keys: List[str], received: bool = True) -> None:
+        """处理失效消息"""
+        self._invalidation_seq += 1
+        if received:
+            self._invalidations_received += 1
+        for key in keys:
+            if key == "*":
+                self.l1.clear_sync()
+                return
+            if key.endswith("*"):
+                # 命名空间失效
+                self.l1.delete_prefix(key[:-1])
+                continue
+            self.l1.delete_sync(key)
+    
+    async def _listen(self) -> None:
+        """订阅失效频道；连接中断时清空L1并重连"""
+        retry_delay = 0.5
+        while True:
+            pubsub = None
+            try:
+                pubsub = await self.l2.subscribe(self.channel)
+                retry_delay = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message.get("data")
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    try:
+                        payload = json.loads(data)
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+                    if payload.get("origin") == self._instance_id:
+                        continue
+                    self._apply_invalidation(payload.get("keys", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error, clearing L1: {str(e)}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+            # 失效消息可能已丢失，L1不再可信
+            self._invalidation_seq += 1
+            self.l1.clear_sync()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+    
+    async def start(self) -> None:
+        """启动失效消息监听和L1过期清理"""
+        self._loop = asyncio.get_running_loop()
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen())
+        self.l1.start_sweeper()
+    
+    async def stop(self) -> None:
+        """停止失效消息监听和L1过期清理"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        await self.l1.stop_sweeper()
+    
+    def get_sync(self, key: str) -> Optional[Any]:
+        """同步获取缓存项，可能在工作线程中调用，直接读Redis"""
+        value = self.l2.get_sync(key)
+        if value is None:
+            self._misses += 1
+            return None
+        self._l2_hits += 1
+        return value
+    
+    def set_sync(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """同步设置缓存项，写穿到Redis，丢弃本地L1并广播失效"""
+        self.l2.set_sync(key, value, ttl)
+        self._invalidate_local([key])
+        self._publish_invalidation_sync([key])
+    
+    def delete_sync(self, key: str) -> bool:
+        """同步删除缓存项，丢弃本地L1并广播失效"""
+        deleted = self.l2.delete_sync(key)
+        self._invalidate_local([key])
+        self._publish_invalidation_sync([key])
+        return deleted
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存项，先查L1再查Redis"""
+        value = self.l1.get_sync(key)
+        if value is not None:
+            self._l1_hits += 1
+            return value
+        
+        seq = self._invalidation_seq
+        value, ttl = await self.l2.get_with_ttl(key)
+        if value is None:
+            self._misses += 1
+            return None
+        
+        self._l2_hits += 1
+        if seq == self._invalidation_seq:
+            self._fill_l1(key, value, ttl)
+        return value
+    
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None
+    ) -> None:
+        """设置缓存项，写穿到Redis并广播失效"""
+        await self.l2.set(key, value, ttl)
+        # 写入期间发起的读取可能读到旧值，递增序号使其放弃回填
+        self._invalidation_seq += 1
+        self._fill_l1(key, value, ttl)
+        await self._publish_invalidation([key])
+    
+    async def delete(self, key: str) -> bool:
+        """删除缓存项并广播失效"""
+        self.l1.delete_sync(key)
+        deleted = await self.l2.delete(key)
+        self._invalidation_seq += 1
+        self.l1.delete_sync(key)
+        await self._publish_invalidation([key])
+        return deleted
+    
+    async def mget(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存项，L1未命中的键通过一次Redis批量请求获取"""
+        result: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self.l1.get_sync(key)
+            if value is not None:
+                result[key] = value
+                self._l1_hits += 1
+            else:
+                missing.append(key)
+        
+        if missing:
+            seq = self._invalidation_seq
+            fetched = await self.l2.mget_with_ttl(missing)
+            self._l2_hits += len(fetched)
+            self._misses += len(missing) - len(fetched)
+            fill = seq == self._invalidation_seq
+            for key, (value, ttl) in fetched.items():
+                if fill:
+                    self._fill_l1(key, value, ttl)
+                result[key] = value
+        return result
+    
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """批量设置缓存项，只广播一次失效消息"""
+        await self.l2.mset(mapping, ttl)
+        self._invalidation_seq += 1
+        for key, value in mapping.items():
+            self._fill_l1(key, value, ttl)
+        await self._publish_invalidation(list(mapping.keys()))
+    
+    async def mdelete(self, keys: List[str]) -> int:
+        """批量删除缓存项，只广播一次失效消息"""
+        for key in keys:
+            self.l1.delete_sync(key)
+        deleted = await self.l2.mdelete(keys)
+        self._invalidation_seq += 1
+        for key in keys:
+            self.l1.delete_sync(key)
+        await self._publish_invalidation(list(keys))
+        return deleted
+    
+    async def exists(self, key: str) -> bool:
+        """检查缓存项是否存在"""
+        if await self.l1.exists(key):
+            return True
+        return await self.l2.exists(key)
+    
+    async def clear(self, namespace: Optional[str] = None) -> None:
+        """清空两级缓存（或指定命名空间）并广播失效"""
+        if namespace is None:
+            await self.l1.clear()
+            await self.l2.clear()
+            self._invalidation_seq += 1
+            await self.l1.clear()
+            await self._publish_invalidation(["*"])
+            return
+        
+        prefix = f"{namespace}{self.namespace_separator}"
+        self.l1.delete_prefix(prefix)
+        await self.l2.clear(namespace)
+        self._invalidation_seq += 1
+        self.l1.delete_prefix(prefix)
+        await self._publish_invalidation([f"{prefix}*"])
+    
+    async def keys(self, pattern: str = "*") -> List[str]:
+        """获取所有匹配的缓存键（以Redis为准）"""
+        return await self.l2.keys(pattern)
+    
+    async def size(self) -> int:
+        """获取缓存大小（以Redis为准）"""
+        return await self.l2.size()
+    
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[int]]:
+        """获取缓存项及其剩余生存时间（以Redis为准）"""
+        return await self.l2.get_with_ttl(key)
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取分层命中统计"""
+        total = self._l1_hits + self._l2_hits + self._misses
+        return {
+            'l1_hits': self._l1_hits,
+            'l2_hits': self._l2_hits,
+            'misses': self._misses,
+            'l1_hit_rate': self._l1_hits / total if total else 0.0,
+            'hit_rate': (self._l1_hits + self._l2_hits) / total if total else 0.0,
+            'invalidations_received': self._invalidations_received,
+            'l1': self.l1.stats()
+        }
 
 class CacheManager:
     """缓存管理器，支持多级缓存"""
     
     def __init__(self):
-        self._caches: Dict[str, Union[InMemoryCache, RedisCache]] = {}
+        self._caches: Dict[str, Union[InMemoryCache, RedisCache, TieredCache]] = {}
         self._default_cache = None
     
     def register_cache(
         self,
         name: str,
-        cache: Union[InMemoryCache, RedisCache],
+        cache: Union[InMemoryCache, RedisCache, TieredCache],
         is_default: bool = False
     ) -> None:
         """注册缓存实例"""
@@ -404,7 +1314,7 @@ class CacheManager:
         if is_default:
             self._default_cache = name
     
-    def get_cache(self, name: Optional[str] = None) -> Union[InMemoryCache, RedisCache]:
+    def get_cache(self, name: Optional[str] = None) -> Union[InMemoryCache, RedisCache, TieredCache]:
         """获取缓存实例"""
         if name is None:
             if self._default_cache is None:
@@ -429,94 +1339,520 @@ class CacheManager:
 
 # 缓存装饰器
 
+# 后端不带编解码器时，cache_result使用带类型标签的JSON文本保存结果，
+# 通过负载头区分，不再根据首字符猜测是否需要json.loads
+_RESULT_CODEC = JSONCodec()
+
+def _stores_objects(cache: Any) -> bool:
+    """后端是否能直接保存Python对象（内存缓存或配置了编解码器的Redis）"""
+    if isinstance(cache, TieredCache):
+        cache = cache.l2
+    return isinstance(cache, InMemoryCache) or getattr(cache, "codec", None) is not None
+
+def _pack_result(cache: Any, result: Any) -> Any:
+    """将函数结果转换为后端可保存的形式，无法编码的结果抛出CodecError"""
+    if _stores_objects(cache):
+        return result
+    return _RESULT_CODEC.dumps(result).decode("utf-8")
+
+def _unpack_result(cache: Any, cached: Any) -> Any:
+    """还原 _pack_result 保存的结果"""
+    if _stores_objects(cache):
+        return cached
+    return _RESULT_CODEC.loads(cached)
+
+# 缓存结果信封：记录逻辑过期时间和计算耗时，用于提前过期与stale-while-revalidate
+_ENTRY_MARKER = "$cr"
+
+def _wrap_entry(result: Any, ttl: int, delta: float) -> Dict[str, Any]:
+    """包装函数结果"""
+    return {_ENTRY_MARKER: 1, "v": result, "exp": time.time() + ttl, "delta": delta}
+
+def _unwrap_entry(cached: Any) -> Tuple[Any, float, float]:
+    """解包缓存结果，返回 (值, 逻辑过期时间, 计算耗时)；旧格式数据视为始终新鲜"""
+    if isinstance(cached, dict) and _ENTRY_MARKER in cached:
+        return cached["v"], cached["exp"], cached["delta"]
+    return cached, float("inf"), 0.0
+
+def _needs_refresh(expires_at: float, delta: float, beta: float, now: float) -> bool:
+    """
+    概率性提前过期（XFetch）：越接近过期、计算越慢，越可能提前刷新，
+    从而把同一时刻的集中失效打散到单个调用上
+    """
+    if beta <= 0 or delta <= 0:
+        return now >= expires_at
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+class _LeaderCancelled(Exception):
+    """单飞调用的执行者被取消，等待者需要重新发起调用"""
+
+class _AsyncSingleFlight:
+    """按键合并并发的异步调用，同一时刻同一个键只执行一次（每个事件循环独立）"""
+    
+    def __init__(self):
+        self._calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._background: set = set()
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或等待正在进行的同键调用"""
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        future = self._calls.get(call_key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # 执行者被取消不影响等待者，由第一个醒来的等待者重新执行
+                future = self._calls.get(call_key)
+        
+        future = loop.create_future()
+        # 没有等待者时避免"exception was never retrieved"警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[call_key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._calls.pop(call_key, None)
+    
+    def spawn(self, key: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        """在后台刷新；同键已有调用在进行时直接跳过"""
+        loop = asyncio.get_running_loop()
+        if (id(loop), key) in self._calls:
+            return
+        
+        async def runner():
+            try:
+                await self.do(key, fn)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for key {key}: {str(e)}")
+        
+        task = loop.create_task(runner())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+class _SyncCall:
+    """同步单飞调用的共享状态"""
+    
+    __slots__ = ('event', 'result', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class _SyncSingleFlight:
+    """按键合并并发的同步调用（跨线程）"""
+    
+    def __init__(self, max_background_workers: int = 4):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _SyncCall] = {}
+        self._max_background_workers = max_background_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """执行或等待正在进行的同键调用"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _SyncCall()
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+    
+    def spawn(self, key: str, fn: Callable[[], Any]) -> None:
+        """在后台线程中刷新；同键已有调用在进行时直接跳过"""
+        with self._lock:
+            if key in self._calls:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_background_workers,
+                    thread_name_prefix="cache-refresh"
+                )
+        
+        def runner():
+            try:
+                self.do(key, fn)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for key {key}: {str(e)}")
+        
+        self._executor.submit(runner)
+
+_async_flight = _AsyncSingleFlight()
+_sync_flight = _SyncSingleFlight()
+
+def _canonicalize(value: Any) -> Any:
+    """将参数转换为稳定的可JSON序列化结构（不包含内存地址等易变信息）"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _canonicalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonicalize(v) for v in value), key=repr)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    if isinstance(value, Enum):
+        return _canonicalize(value.value)
+    if hasattr(value, "__cache_key__"):
+        # 自定义对象可实现 __cache_key__ 返回稳定标识
+        return _canonicalize(value.__cache_key__())
+    if isinstance(value, BaseModel):
+        return _canonicalize(value.model_dump() if hasattr(value, "model_dump") else value.dict())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonicalize(dataclasses.asdict(value))
+    return repr(value)
+
+class _VersionRegistry:
+    """
+    命名空间/标签版本号
+    
+    版本号保存在缓存后端中并参与缓存键计算，更新版本号即可让该命名空间或标签下的
+    所有键整体失效，无需逐个删除。进程内短暂缓存版本号以避免每次调用都访问后端，
+    其他副本最多在 local_ttl 秒后看到新版本。
+    """
+    
+    KEY_PREFIX = "cr:ver:"
+    
+    def __init__(self, local_ttl: float = 5.0):
+        self.local_ttl = local_ttl
+        self._local: Dict[Tuple[int, str], Tuple[str, float]] = {}
+    
+    def _cached(self, cache: Any, name: str) -> Optional[str]:
+        entry = self._local.get((id(cache), name))
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        return None
+    
+    def _remember(self, cache: Any, name: str, version: str) -> str:
+        self._local[(id(cache), name)] = (version, time.time() + self.local_ttl)
+        return version
+    
+    @staticmethod
+    def _new_version() -> str:
+        # 使用时间戳作为版本号，无需原子自增；版本号丢失（如被淘汰）时生成新版本，只会导致多一次未命中
+        return str(time.time_ns())
+    
+    async def get(self, cache: Any, name: str) -> str:
+        """获取版本号，不存在时创建"""
+        version = self._cached(cache, name)
+        if version is not None:
+            return version
+        version = await cache.get(self.KEY_PREFIX + name)
+        if version is None:
+            version = self._new_version()
+            await cache.set(self.KEY_PREFIX + name, version)
+        return self._remember(cache, name, str(version))
+    
+    def get_sync(self, cache: Any, name: str) -> str:
+        """同步获取版本号，不存在时创建"""
+        version = self._cached(cache, name)
+        if version is not None:
+            return version
+        version = cache.get_sync(self.KEY_PREFIX + name)
+        if version is None:
+            version = self._new_version()
+            cache.set_sync(self.KEY_PREFIX + name, version, None)
+        return self._remember(cache, name, str(version))
+    
+    async def bump(self, cache: Any, name: str) -> str:
+        """更新版本号"""
+        version = self._new_version()
+        await cache.set(self.KEY_PREFIX + name, version)
+        return self._remember(cache, name, version)
+    
+    def bump_sync(self, cache: Any, name: str) -> str:
+        """同步更新版本号"""
+        version = self._new_version()
+        cache.set_sync(self.KEY_PREFIX + name, version, None)
+        return self._remember(cache, name, version)
+
+_versions = _VersionRegistry()
+
+class CacheKeyBuilder:
+    """
+    cache_result的缓存键生成器
+    
+    参数先按函数签名绑定（关键字参数顺序和位置/关键字传参方式不影响结果），
+    再规范化为JSON并取SHA-256摘要，生成固定长度的键：
+    cr:<命名空间>:v<版本>:<摘要>
+    """
+    
+    def __init__(
+        self,
+        func: Callable,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        skip_self: bool = True,
+        namespace: Optional[str] = None,
+        version: int = 1,
+        tags: Optional[Union[List[str], Callable[..., List[str]]]] = None
+    ):
+        """
+        初始化缓存键生成器
+        
+        Args:
+            func: 被缓存的函数
+            include: 只使用这些参数生成键
+            exclude: 生成键时忽略这些参数
+            skip_self: 忽略方法的self/cls参数，使不同实例共享缓存
+            namespace: 命名空间，默认为函数的模块和限定名
+            version: 代码层面的键版本，结果结构变化时递增
+            tags: 标签列表，或根据调用参数返回标签列表的函数
+        """
+        self.func = func
+        self.include = set(include) if include else None
+        self.exclude = set(exclude or ())
+        self.namespace = namespace or f"{func.__module__}.{func.__qualname__}"
+        self.version = version
+        self.tags = tags
+        
+        try:
+            self._signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            self._signature = None
+        
+        params = list(self._signature.parameters) if self._signature else []
+        if skip_self and params and params[0] in ("self", "cls"):
+            self.exclude.add(params[0])
+    
+    def accepts(self, args: tuple, kwargs: Dict[str, Any]) -> bool:
+        """检查调用参数是否与函数签名匹配"""
+        if self._signature is None:
+            return True
+        try:
+            self._signature.bind(*args, **kwargs)
+        except TypeError:
+            return False
+        return True
+    
+    def _bound_arguments(self, args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """按签名绑定参数并应用选择器"""
+        if self._signature is None:
+            bound = {f"_{i}": arg for i, arg in enumerate(args)}
+            bound.update(kwargs)
+        else:
+            binding = self._signature.bind(*args, **kwargs)
+            binding.apply_defaults()
+            bound = dict(binding.arguments)
+        
+        return {
+            name: value for name, value in bound.items()
+            if name not in self.exclude and (self.include is None or name in self.include)
+        }
+    
+    def tag_names(self, args: tuple, kwargs: Dict[str, Any]) -> List[str]:
+        """获取本次调用关联的标签"""
+        if self.tags is None:
+            return []
+        if callable(self.tags):
+            return list(self.tags(*args, **kwargs))
+        return list(self.tags)
+    
+    def digest(self, args: tuple, kwargs: Dict[str, Any], generations: List[str]) -> str:
+        """计算参数和版本号的摘要"""
+        payload = json.dumps(
+            [_canonicalize(self._bound_arguments(args, kwargs)), generations],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    
+    def _format(self, digest: str) -> str:
+        return f"cr:{self.namespace}:v{self.version}:{digest}"
+    
+    async def build(self, cache: Any, args: tuple, kwargs: Dict[str, Any]) -> str:
+        """生成缓存键"""
+        names = ["ns:" + self.namespace] + ["tag:" + tag for tag in self.tag_names(args, kwargs)]
+        generations = [await _versions.get(cache, name) for name in names]
+        return self._format(self.digest(args, kwargs, generations))
+    
+    def build_sync(self, cache: Any, args: tuple, kwargs: Dict[str, Any]) -> str:
+        """同步生成缓存键"""
+        names = ["ns:" + self.namespace] + ["tag:" + tag for tag in self.tag_names(args, kwargs)]
+        generations = [_versions.get_sync(cache, name) for name in names]
+        return self._format(self.digest(args, kwargs, generations))
+
+async def invalidate_namespace(namespace: str, cache_name: Optional[str] = None) -> None:
+    """使命名空间下的所有cache_result缓存失效"""
+    await _versions.bump(cache_manager.get_cache(cache_name), "ns:" + namespace)
+
+async def invalidate_tags(*tags: str, cache_name: Optional[str] = None) -> None:
+    """使带有指定标签的所有cache_result缓存失效"""
+    cache = cache_manager.get_cache(cache_name)
+    for tag in tags:
+        await _versions.bump(cache, "tag:" + tag)
+
+def invalidate_namespace_sync(namespace: str, cache_name: Optional[str] = None) -> None:
+    """同步使命名空间下的所有cache_result缓存失效"""
+    _versions.bump_sync(cache_manager.get_cache(cache_name), "ns:" + namespace)
+
+def invalidate_tags_sync(*tags: str, cache_name: Optional[str] = None) -> None:
+    """同步使带有指定标签的所有cache_result缓存失效"""
+    cache = cache_manager.get_cache(cache_name)
+    for tag in tags:
+        _versions.bump_sync(cache, "tag:" + tag)
+
 def cache_result(
     ttl: int = 3600,
     key: Optional[str] = None,
-    cache_name: Optional[str] = None
+    cache_name: Optional[str] = None,
+    single_flight: bool = True,
+    early_expiration_beta: float = 1.0,
+    stale_while_revalidate: Optional[int] = None,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    skip_self: bool = True,
+    namespace: Optional[str] = None,
+    version: int = 1,
+    tags: Optional[Union[List[str], Callable[..., List[str]]]] = None
 ):
-    """缓存函数结果的装饰器"""
+    """
+    缓存函数结果的装饰器
+    
+    Args:
+        ttl: 结果的逻辑有效期（秒）
+        key: 固定缓存键，None时根据函数名和参数生成
+        cache_name: 使用的缓存名称，None时使用默认缓存
+        single_flight: 未命中时同一个键只允许一个调用执行函数，其余调用等待其结果
+        early_expiration_beta: 概率性提前过期系数，0表示关闭；越大越早刷新
+        stale_while_revalidate: 逻辑过期后仍可返回旧值的秒数，期间由一个后台任务刷新
+        include: 只使用这些参数生成缓存键
+        exclude: 生成缓存键时忽略这些参数
+        skip_self: 忽略方法的self/cls参数，使不同实例共享缓存
+        namespace: 命名空间，可通过 invalidate_namespace 整体失效
+        version: 缓存键版本，结果结构变化时递增
+        tags: 标签列表或根据参数返回标签的函数，可通过 invalidate_tags 失效
+    """
+    stale_window = stale_while_revalidate or 0
+    
     def decorator(func: Callable) -> Callable:
+        key_builder = CacheKeyBuilder(
+            func,
+            include=include,
+            exclude=exclude,
+            skip_self=skip_self,
+            namespace=namespace,
+            version=version,
+            tags=tags
+        )
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
+            # 获取缓存实例
+            cache = cache_manager.get_cache(cache_name)
+            
             # 获取缓存键
             cache_key = key
             if cache_key is None:
-                # 生成基于函数名和参数的缓存键
-                args_repr = [repr(arg) for arg in args]
-                kwargs_repr = [f"{k}={repr(v)}" for k, v in kwargs.items()]
-                cache_key = f"{func.__module__}.{func.__name__}({', '.join(args_repr + kwargs_repr)})"
+                if not key_builder.accepts(args, kwargs):
+                    # 参数与签名不匹配，直接调用以抛出原始错误
+                    return await func(*args, **kwargs)
+                cache_key = await key_builder.build(cache, args, kwargs)
             
-            # 获取缓存实例
-            cache = cache_manager.get_cache(cache_name)
+            async def load():
+                start = time.time()
+                result = await func(*args, **kwargs)
+                # 将结果存入缓存，物理TTL包含stale窗口
+                if result is not None:
+                    entry = _wrap_entry(result, ttl, time.time() - start)
+                    await cache.set(cache_key, _pack_result(cache, entry), ttl + stale_window)
+                return result
             
             # 尝试从缓存获取结果
-            result = await cache.get(cache_key)
-            if result is not None:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                # 如果结果是JSON字符串，尝试解析
-                if isinstance(result, str) and (result.startswith('{') or result.startswith('[')):
-                    try:
-                        return json.loads(result)
-                    except json.JSONDecodeError:
-                        pass
-                return result
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                value, expires_at, delta = _unwrap_entry(_unpack_result(cache, cached))
+                now = time.time()
+                if not _needs_refresh(expires_at, delta, early_expiration_beta, now):
+                    logger.debug(f"Cache hit for key: {cache_key}")
+                    return value
+                if now < expires_at + stale_window:
+                    # 提前过期或处于stale窗口：返回当前值，由一个后台任务刷新
+                    logger.debug(f"Cache refresh ahead for key: {cache_key}")
+                    _async_flight.spawn(cache_key, load)
+                    return value
             
             # 缓存未命中，执行函数
             logger.debug(f"Cache miss for key: {cache_key}")
-            result = await func(*args, **kwargs)
-            
-            # 将结果存入缓存
-            if isinstance(result, (dict, list)):
-                await cache.set(cache_key, json.dumps(result), ttl)
-            else:
-                await cache.set(cache_key, result, ttl)
-            
-            return result
+            if single_flight:
+                return await _async_flight.do(cache_key, load)
+            return await load()
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
             # 同步版本的包装器
+            cache = cache_manager.get_cache(cache_name)
+            
             cache_key = key
             if cache_key is None:
-                # 生成基于函数名和参数的缓存键
-                args_repr = [repr(arg) for arg in args]
-                kwargs_repr = [f"{k}={repr(v)}" for k, v in kwargs.items()]
-                cache_key = f"{func.__module__}.{func.__name__}({', '.join(args_repr + kwargs_repr)})"
+                if not key_builder.accepts(args, kwargs):
+                    return func(*args, **kwargs)
+                cache_key = key_builder.build_sync(cache, args, kwargs)
             
-            # 获取缓存实例
-            cache = cache_manager.get_cache(cache_name)
+            def load():
+                start = time.time()
+                result = func(*args, **kwargs)
+                if result is not None:
+                    entry = _wrap_entry(result, ttl, time.time() - start)
+                    cache.set_sync(cache_key, _pack_result(cache, entry), ttl + stale_window)
+                return result
             
             # 尝试从缓存获取结果
-            if isinstance(cache, RedisCache):
-                result = cache.get_sync(cache_key)
-                if result is not None:
+            cached = cache.get_sync(cache_key)
+            if cached is not None:
+                value, expires_at, delta = _unwrap_entry(_unpack_result(cache, cached))
+                now = time.time()
+                if not _needs_refresh(expires_at, delta, early_expiration_beta, now):
                     logger.debug(f"Cache hit for key: {cache_key}")
-                    # 如果结果是JSON字符串，尝试解析
-                    if isinstance(result, str) and (result.startswith('{') or result.startswith('[')):
-                        try:
-                            return json.loads(result)
-                        except json.JSONDecodeError:
-                            pass
-                    return result
+                    return value
+                if now < expires_at + stale_window:
+                    logger.debug(f"Cache refresh ahead for key: {cache_key}")
+                    _sync_flight.spawn(cache_key, load)
+                    return value
             
             # 缓存未命中，执行函数
             logger.debug(f"Cache miss for key: {cache_key}")
-            result = func(*args, **kwargs)
-            
-            # 将结果存入缓存
-            if isinstance(cache, RedisCache):
-                if isinstance(result, (dict, list)):
-                    cache.set_sync(cache_key, json.dumps(result), ttl)
-                else:
-                    cache.set_sync(cache_key, result, ttl)
-            
-            return result
+            if single_flight:
+                return _sync_flight.do(cache_key, load)
+            return load()
         
         # 根据函数是同步还是异步选择合适的包装器
         if asyncio.iscoroutinefunction(func):
-            return async_wrapper
+            wrapper = async_wrapper
         else:
-            return sync_wrapper
+            wrapper = sync_wrapper
+        wrapper.key_builder = key_builder
+        return wrapper
     
     return decorator
 
@@ -526,8 +1862,15 @@ cache_manager = CacheManager()
 # 创建默认缓存实例
 async def init_default_caches():
     """初始化默认缓存实例"""
-    # 创建内存缓存
-    memory_cache = InMemoryCache()
+    # 创建内存缓存（有界，避免唯一键持续写入导致内存无限增长）
+    memory_config = get_config("memory_cache", {})
+    memory_cache = InMemoryCache(
+        max_entries=memory_config.get("max_entries", 10000),
+        max_bytes=memory_config.get("max_bytes", 64 * 1024 * 1024),
+        eviction_policy=memory_config.get("eviction_policy", EvictionPolicy.LRU),
+        sweep_interval=memory_config.get("sweep_interval", 1.0)
+    )
+    memory_cache.start_sweeper()
     cache_manager.register_cache("memory", memory_cache)
     
     # 从配置中获取Redis配置
@@ -544,7 +1887,11 @@ async def init_default_caches():
             retry_attempts=redis_config.get("retry_attempts", 3),
             retry_delay=redis_config.get("retry_delay", 0.5),
             pool_size=redis_config.get("pool_size", 10),
-            decode_responses=True
+            decode_responses=True,
+            batch_size=redis_config.get("batch_size", 500),
+            scan_count=redis_config.get("scan_count", 1000),
+            codec=redis_config.get("codec"),
+            compress_threshold=redis_config.get("compress_threshold")
         )
         
         redis_cache = RedisCache(config)
@@ -552,6 +1899,27 @@ async def init_default_caches():
         await redis_cache._get_async_client()
         cache_manager.register_cache("redis", redis_cache, is_default=True)
         logger.info("Default Redis cache initialized")
+        
+        # 创建两级近端缓存
+        near_cache_config = redis_config.get("near_cache", {})
+        if near_cache_config.get("enabled", True):
+            # 近端缓存要求L2使用编解码器，未配置时为其单独创建JSON编解码的客户端
+            tiered_l2 = redis_cache
+            if redis_cache.codec is None:
+                tiered_l2 = RedisCache(config, codec=get_codec("json", compress_threshold=config.compress_threshold))
+            tiered_cache = TieredCache(
+                l2=tiered_l2,
+                l1=InMemoryCache(
+                    max_entries=near_cache_config.get("max_entries", 10000),
+                    max_bytes=near_cache_config.get("max_bytes", 32 * 1024 * 1024)
+                ),
+                namespace_ttls=near_cache_config.get("namespace_ttls"),
+                default_l1_ttl=near_cache_config.get("default_ttl", 30),
+                channel=near_cache_config.get("channel", "leverageguard:cache:invalidate")
+            )
+            await tiered_cache.start()
+            cache_manager.register_cache("tiered", tiered_cache, is_default=near_cache_config.get("is_default", False))
+            logger.info("Tiered near cache initialized")
     except Exception as e:
         logger.warning(f"Failed to initialize Redis cache, using memory cache as fallback: {str(e)}")
         cache_manager.register_cache("redis", memory_cache)
@@ -563,11 +1931,19 @@ __all__ = [
     'CacheConnectionError',
     'CacheOperationError',
     'CacheConfig',
+    'EvictionPolicy',
     'CacheItem',
+    'CacheStats',
     'InMemoryCache',
     'RedisCache',
+    'TieredCache',
     'CacheManager',
+    'CacheKeyBuilder',
     'cache_result',
+    'invalidate_namespace',
+    'invalidate_tags',
+    'invalidate_namespace_sync',
+    'invalidate_tags_sync',
     'cache_manager',
     'init_default_caches'
 ]
\ No newline at end of file
@@ -0,0 +1,324 @@
+import base64
+import json
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Type, Union
+from pydantic import BaseModel
+from .errors import BaseError
+
+# 可选依赖：未安装时对应编解码器不可用
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# 负载头：魔数 + 编解码器ID(1字节) + 压缩标志(1字节)
+# 头部全部为ASCII字符，未压缩的JSON负载仍是合法的UTF-8文本
+MAGIC = b"\x1fLG"
+HEADER_SIZE = len(MAGIC) + 2
+FLAG_NONE = b"0"
+FLAG_ZSTD = b"z"
+
+# 类型标签键
+TAG_KEY = "$lg"
+
+class CodecError(BaseError):
+    """编解码异常"""
+    
+    def __init__(self,
+                 message: str = "Codec error",
+                 error_code: str = "CODEC_ERROR",
+                 **kwargs):
+        super().__init__(message, error_code, **kwargs)
+
+# 可被解码的Pydantic模型类；解码只在此查找，不会根据负载内容导入模块
+_MODEL_REGISTRY: Dict[str, Type[BaseModel]] = {}
+
+def _model_path(model_cls: Type[BaseModel]) -> str:
+    return f"{model_cls.__module__}:{model_cls.__qualname__}"
+
+def register_model(model_cls: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    注册可被解码的Pydantic模型（也可作为类装饰器使用）
+    
+    本进程编码过的模型会自动注册；其他进程写入的模型需要在解码前显式注册。
+    """
+    _MODEL_REGISTRY[_model_path(model_cls)] = model_cls
+    return model_cls
+
+def _resolve_model(path: str) -> Type[BaseModel]:
+    """根据 'module:qualname' 查找已注册的模型类"""
+    model_cls = _MODEL_REGISTRY.get(path)
+    if model_cls is None:
+        raise CodecError(message=f"Unknown model type: {path}; register it with register_model")
+    return model_cls
+
+def _model_dump(model: BaseModel) -> Dict[str, Any]:
+    """兼容Pydantic v1/v2的模型导出"""
+    if hasattr(model, "model_dump"):
+        return model.model_dump()
+    return model.dict()
+
+def _model_load(model_cls: Type[BaseModel], data: Dict[str, Any]) -> BaseModel:
+    """兼容Pydantic v1/v2的模型构造"""
+    if hasattr(model_cls, "model_validate"):
+        return model_cls.model_validate(data)
+    return model_cls.parse_obj(data)
+
+def to_tagged(value: Any, native_bytes: bool = False) -> Any:
+    """将值转换为仅包含基础类型的结构，非JSON类型使用类型标签保留"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        for key in value:
+            if not isinstance(key, str):
+                raise CodecError(message=f"Unsupported dict key type for cache codec: {type(key).__name__}")
+        tagged = {k: to_tagged(v, native_bytes) for k, v in value.items()}
+        if TAG_KEY in value:
+            # 用户数据中的键与类型标签冲突时整体转义
+            return {TAG_KEY: "dict", "v": tagged}
+        return tagged
+    if isinstance(value, list):
+        return [to_tagged(v, native_bytes) for v in value]
+    if isinstance(value, datetime):
+        return {TAG_KEY: "dt", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {TAG_KEY: "d", "v": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {TAG_KEY: "dec", "v": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        if native_bytes:
+            return bytes(value)
+        return {TAG_KEY: "b", "v": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {TAG_KEY: "tup", "v": [to_tagged(v, native_bytes) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        return {TAG_KEY: "set", "v": [to_tagged(v, native_bytes) for v in value]}
+    if isinstance(value, uuid.UUID):
+        return {TAG_KEY: "uuid", "v": str(value)}
+    if isinstance(value, BaseModel):
+        model_cls = type(value)
+        path = _model_path(model_cls)
+        _MODEL_REGISTRY.setdefault(path, model_cls)
+        return {TAG_KEY: "model", "cls": path, "v": to_tagged(_model_dump(value), native_bytes)}
+    raise CodecError(message=f"Unsupported type for cache codec: {type(value).__name__}")
+
+def from_tagged(value: Any) -> Any:
+    """还原 to_tagged 生成的结构"""
+    if isinstance(value, list):
+        return [from_tagged(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    
+    tag = value.get(TAG_KEY)
+    if tag is None:
+        return {k: from_tagged(v) for k, v in value.items()}
+    
+    raw = value.get("v")
+    if tag == "dict":
+        return {k: from_tagged(v) for k, v in raw.items()}
+    if tag == "dt":
+        return datetime.fromisoformat(raw)
+    if tag == "d":
+        return date.fromisoformat(raw)
+    if tag == "dec":
+        return Decimal(raw)
+    if tag == "b":
+        return base64.b64decode(raw)
+    if tag == "tup":
+        return tuple(from_tagged(v) for v in raw)
+    if tag == "set":
+        return set(from_tagged(v) for v in raw)
+    if tag == "uuid":
+        return uuid.UUID(raw)
+    if tag == "model":
+        return _model_load(_resolve_model(value["cls"]), from_tagged(raw))
+    raise CodecError(message=f"Unknown type tag: {tag}")
+
+class Codec:
+    """编解码器基类，负责类型标签、可选zstd压缩和负载头"""
+    
+    name = ""
+    codec_id = b""
+    native_bytes = False
+    
+    def __init__(self, compress_threshold: Optional[int] = None, compression_level: int = 3):
+        """
+        初始化编解码器
+        
+        Args:
+            compress_threshold: 负载超过该字节数时使用zstd压缩，None表示不压缩
+            compression_level: zstd压缩级别
+        """
+        if compress_threshold is not None and zstandard is None:
+            raise CodecError(message="zstandard is required for compression")
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self._local = threading.local()
+    
+    def _encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+    
+    def _decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+    
+    def _compressor(self):
+        """获取线程本地的zstd压缩器（压缩器对象不能跨线程共享）"""
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            self._local.compressor = compressor
+        return compressor
+    
+    def dumps(self, value: Any) -> bytes:
+        """序列化为带头部的字节串"""
+        body = self._encode(to_tagged(value, self.native_bytes))
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            return MAGIC + self.codec_id + FLAG_ZSTD + self._compressor().compress(body)
+        return MAGIC + self.codec_id + FLAG_NONE + body
+    
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """反序列化；头部决定实际使用的编解码器，无头部的旧数据原样返回"""
+        return decode(data)
+
+class JSONCodec(Codec):
+    """标准库json编解码器"""
+    
+    name = "json"
+    codec_id = b"j"
+    
+    def _encode(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def _decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+class OrjsonCodec(Codec):
+    """orjson编解码器"""
+    
+    name = "orjson"
+    codec_id = b"o"
+    
+    def __init__(self, *args, **kwargs):
+        if orjson is None:
+            raise CodecError(message="orjson is not installed")
+        super().__init__(*args, **kwargs)
+    
+    def _encode(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+    
+    def _decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+class MsgpackCodec(Codec):
+    """msgpack编解码器，bytes原生编码"""
+    
+    name = "msgpack"
+    codec_id = b"m"
+    native_bytes = True
+    
+    def __init__(self, *args, **kwargs):
+        if msgpack is None:
+            raise CodecError(message="msgpack is not installed")
+        super().__init__(*args, **kwargs)
+    
+    def _encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def _decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+_CODEC_CLASSES: Dict[str, Type[Codec]] = {
+    JSONCodec.name: JSONCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+_CODECS_BY_ID: Dict[bytes, Codec] = {}
+_decompressor_local = threading.local()
+
+def _decoder_for(codec_id: bytes) -> Codec:
+    """根据负载头中的ID获取解码器"""
+    codec = _CODECS_BY_ID.get(codec_id)
+    if codec is None:
+        for codec_cls in _CODEC_CLASSES.values():
+            if codec_cls.codec_id == codec_id:
+                codec = _CODECS_BY_ID[codec_id] = codec_cls()
+                break
+        else:
+            raise CodecError(message=f"Unknown codec id: {codec_id!r}")
+    return codec
+
+def decode(data: Union[bytes, str]) -> Any:
+    """解码任意编解码器生成的负载；无头部的旧数据原样返回（bytes尽量解码为str）"""
+    if isinstance(data, str):
+        if not data.startswith(MAGIC.decode("ascii")):
+            return data
+        data = data.encode("utf-8")
+    
+    if not data.startswith(MAGIC) or len(data) < HEADER_SIZE:
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data
+    
+    codec_id = data[len(MAGIC):len(MAGIC) + 1]
+    flag = data[len(MAGIC) + 1:HEADER_SIZE]
+    body = data[HEADER_SIZE:]
+    
+    if flag == FLAG_ZSTD:
+        if zstandard is None:
+            raise CodecError(message="zstandard is required to decode compressed payload")
+        decompressor = getattr(_decompressor_local, "decompressor", None)
+        if decompressor is None:
+            decompressor = _decompressor_local.decompressor = zstandard.ZstdDecompressor()
+        body = decompressor.decompress(body)
+    elif flag != FLAG_NONE:
+        raise CodecError(message=f"Unknown payload flag: {flag!r}")
+    
+    try:
+        return from_tagged(_decoder_for(codec_id)._decode(body))
+    except CodecError:
+        raise
+    except Exception as e:
+        raise CodecError(message="Failed to decode payload", details={"error": str(e)})
+
+def get_codec(name: str = "json", **kwargs) -> Codec:
+    """
+    按名称创建编解码器
+    
+    Args:
+        name: json / orjson / msgpack / auto（优先orjson，未安装时回退json）
+        **kwargs: 传递给编解码器的参数（compress_threshold、compression_level）
+    """
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    codec_cls = _CODEC_CLASSES.get(name)
+    if codec_cls is None:
+        raise CodecError(message=f"Unknown codec: {name}")
+    return codec_cls(**kwargs)
+
+# 导出所有类和函数
+__all__ = [
+    'CodecError',
+    'Codec',
+    'JSONCodec',
+    'OrjsonCodec',
+    'MsgpackCodec',
+    'register_model',
+    'to_tagged',
+    'from_tagged',
+    'decode',
+    'get_codec'
+]
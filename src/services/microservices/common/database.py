@@ -3,7 +3,7 @@ import json
 import time
 from typing import Any, Dict, Optional, Callable, Union, List, Tuple, TypeVar, Generic
 from functools import wraps
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session, relationship, backref
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DatabaseError
@@ -268,6 +268,32 @@ class DatabaseManager:
         
         logger.info("Async database connection closed")
 
+def create_sqlite_engine(url: str, wal: bool = True, synchronous: str = "NORMAL", echo: bool = False):
+    """
+    创建SQLite引擎（用于本地持久化，如任务调度器的任务存储）
+    
+    Args:
+        url: SQLite连接URL，例如 sqlite:///data/tasks.db
+        wal: 是否启用WAL日志模式，允许读写并发并减少fsync次数
+        synchronous: PRAGMA synchronous 级别，WAL模式下NORMAL可保证崩溃一致性
+        echo: 是否打印SQL
+    """
+    engine = create_engine(
+        url,
+        echo=echo,
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.close()
+    
+    return engine
+
 # 声明式基类
 Base = declarative_base()
 
@@ -567,6 +593,7 @@ __all__ = [
     'DatabaseOperationError',
     'DatabaseConfig',
     'DatabaseManager',
+    'create_sqlite_engine',
     'Base',
     'BaseModel',
     'db_manager',
@@ -0,0 +1,196 @@
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Type, Union
+from pydantic import BaseModel
+from .codec import MAGIC, CodecError, decode, get_codec, _model_dump, _model_load
+
+# 信封结构：[标记, 模式ID, 模式版本, 跟踪ID, 发布时间, 负载]
+# 使用列表而不是字典，省去每条消息重复编码的字段名；负载头（编解码器、压缩标志）由codec负责
+ENVELOPE_MARK = "$env1"
+ENVELOPE_FIELDS = 6
+
+# 当前处理上下文的跟踪ID，消费回调中发布的消息自动沿用
+_current_trace_id: ContextVar[Optional[str]] = ContextVar("mq_trace_id", default=None)
+
+# 模式注册表：模型类 <-> (模式ID, 版本)
+_SCHEMA_BY_MODEL: Dict[Type[BaseModel], Tuple[str, int]] = {}
+# (模式ID, 源版本) -> 把负载从源版本升级到下一版本的函数
+_MIGRATIONS: Dict[Tuple[str, int], Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+def register_schema(schema_id: str, version: int = 1) -> Callable[[Type[BaseModel]], Type[BaseModel]]:
+    """
+    为Pydantic模型注册消息模式（类装饰器）
+    
+    模式ID在服务之间共享，生产者和消费者可以使用各自定义的模型类；
+    发布模型实例时自动写入模式ID和版本，消费时按版本执行升级函数后构造目标模型。
+    """
+    def decorator(model_cls: Type[BaseModel]) -> Type[BaseModel]:
+        _SCHEMA_BY_MODEL[model_cls] = (schema_id, version)
+        return model_cls
+    return decorator
+
+def register_migration(schema_id: str, from_version: int) -> Callable:
+    """注册负载升级函数（装饰器）：把 from_version 版本的负载字典升级到 from_version + 1"""
+    def decorator(func: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable:
+        _MIGRATIONS[(schema_id, from_version)] = func
+        return func
+    return decorator
+
+def schema_of(model_cls: Type[BaseModel]) -> Optional[Tuple[str, int]]:
+    """获取模型注册的 (模式ID, 版本)，未注册返回None"""
+    return _SCHEMA_BY_MODEL.get(model_cls)
+
+def new_trace_id() -> str:
+    """生成新的跟踪ID"""
+    return uuid.uuid4().hex
+
+def get_trace_id() -> Optional[str]:
+    """获取当前上下文的跟踪ID"""
+    return _current_trace_id.get()
+
+@contextmanager
+def trace_context(trace_id: Optional[str]) -> Iterator[Optional[str]]:
+    """在上下文中设置跟踪ID，期间发布的消息沿用该ID"""
+    token = _current_trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _current_trace_id.reset(token)
+
+class Envelope:
+    """解码后的消息信封"""
+    
+    __slots__ = ("schema", "version", "trace_id", "timestamp", "payload")
+    
+    def __init__(self, payload: Any, schema: Optional[str] = None, version: int = 0,
+                 trace_id: Optional[str] = None, timestamp: Optional[float] = None):
+        self.payload = payload
+        self.schema = schema
+        self.version = version
+        self.trace_id = trace_id
+        self.timestamp = timestamp
+
+def _upgrade(schema: str, version: int, target_version: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """依次执行升级函数，把负载从 version 升级到 target_version"""
+    while version < target_version:
+        migration = _MIGRATIONS.get((schema, version))
+        if migration is not None:
+            payload = migration(payload)
+        version += 1
+    return payload
+
+def decode_envelope(body: Union[bytes, str], model: Optional[Type[BaseModel]] = None) -> Envelope:
+    """
+    解码消息体
+    
+    Args:
+        body: 消息体；兼容旧格式（无负载头的JSON，非JSON消息原样作为负载）
+        model: 目标模型类，指定时负载直接构造为该模型（只解码一次）
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    
+    if not body.startswith(MAGIC):
+        try:
+            envelope = Envelope(json.loads(body.decode("utf-8")))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            envelope = Envelope(body)
+    else:
+        value = decode(body)
+        if isinstance(value, list) and len(value) == ENVELOPE_FIELDS and value[0] == ENVELOPE_MARK:
+            _, schema, version, trace_id, timestamp, payload = value
+            envelope = Envelope(payload, schema, version, trace_id, timestamp)
+        else:
+            envelope = Envelope(value)
+    
+    if model is not None and not isinstance(envelope.payload, model):
+        payload = envelope.payload
+        registered = _SCHEMA_BY_MODEL.get(model)
+        if registered is not None and envelope.schema is not None:
+            schema_id, target_version = registered
+            if envelope.schema != schema_id:
+                raise CodecError(message=f"Schema mismatch: expected {schema_id}, got {envelope.schema}")
+            payload = _upgrade(schema_id, envelope.version, target_version, payload)
+        if not isinstance(payload, dict):
+            raise CodecError(message=f"Cannot decode {type(payload).__name__} payload into {model.__name__}")
+        envelope.payload = _model_load(model, payload)
+    return envelope
+
+class EnvelopeCodec:
+    """
+    消息信封编解码器
+    
+    负载头沿用codec模块的格式（魔数、编解码器ID、压缩标志），信封中携带模式ID/版本、
+    跟踪ID和发布时间。默认使用msgpack，未安装时退回orjson/json，信封格式不变；
+    消费端根据负载头选择解码器，因此不同配置的生产者可以混用。
+    """
+    
+    def __init__(self, codec: str = "msgpack", compress_threshold: Optional[int] = None,
+                 compression_level: int = 3):
+        """
+        初始化信封编解码器
+        
+        Args:
+            codec: 负载编解码器名称（json / orjson / msgpack / auto）
+            compress_threshold: 负载超过该字节数时使用zstd压缩，None表示不压缩
+            compression_level: zstd压缩级别
+        """
+        kwargs = {"compress_threshold": compress_threshold, "compression_level": compression_level}
+        try:
+            self._codec = get_codec(codec, **kwargs)
+        except CodecError:
+            if codec != "msgpack":
+                raise
+            self._codec = get_codec("auto", **kwargs)
+        self.content_type = f"application/vnd.lg.envelope+{self._codec.name}"
+    
+    @property
+    def codec_name(self) -> str:
+        """实际使用的负载编解码器"""
+        return self._codec.name
+    
+    def encode(self, message: Any, schema: Optional[str] = None, version: Optional[int] = None,
+               trace_id: Optional[str] = None) -> bytes:
+        """
+        编码消息
+        
+        Args:
+            message: 消息内容；注册过模式的模型实例自动写入模式ID和版本
+            schema: 模式ID（覆盖注册信息）
+            version: 模式版本
+            trace_id: 跟踪ID，默认沿用当前上下文，没有时生成新ID
+        """
+        if isinstance(message, BaseModel):
+            registered = _SCHEMA_BY_MODEL.get(type(message))
+            if registered is not None and schema is None:
+                schema, version = registered
+            message = _model_dump(message)
+        return self._codec.dumps([
+            ENVELOPE_MARK,
+            schema,
+            version or (1 if schema else 0),
+            trace_id or _current_trace_id.get() or new_trace_id(),
+            time.time(),
+            message
+        ])
+    
+    @staticmethod
+    def decode(body: Union[bytes, str], model: Optional[Type[BaseModel]] = None) -> Envelope:
+        """解码消息体（参数同 decode_envelope）"""
+        return decode_envelope(body, model)
+
+# 导出所有类和函数
+__all__ = [
+    'Envelope',
+    'EnvelopeCodec',
+    'register_schema',
+    'register_migration',
+    'schema_of',
+    'new_trace_id',
+    'get_trace_id',
+    'trace_context',
+    'decode_envelope'
+]
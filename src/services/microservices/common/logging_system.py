@@ -213,6 +213,9 @@ def get_logger(name: str = None) -> logging.Logger:
     """获取日志记录器"""
     return logger_manager.get_logger(name)
 
+# common模块共用的日志记录器
+logger = get_logger("services.microservices.common")
+
 def log_debug(message: str, *args, **kwargs):
     """记录DEBUG级别日志"""
     logger = get_logger()
@@ -290,6 +293,7 @@ __all__ = [
     'LoggerManager',
     'logger_manager',
     'get_logger',
+    'logger',
     'log_debug',
     'log_info',
     'log_warning',
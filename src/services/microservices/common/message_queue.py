@@ -5,12 +5,18 @@ import json
 import pika
 import threading
 import uuid
-from typing import Any, Dict, Optional, Callable, List, Union
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Dict, Optional, Callable, List, Union, Tuple, Type
 from functools import wraps
+from pydantic import BaseModel
 
 # 导入配置管理器和日志系统
 from .config_manager import get_config
-from .logging import get_logger
+from .logging_system import get_logger
+from .codec import _model_dump
+from .envelope import EnvelopeCodec, decode_envelope, trace_context
 
 # 默认消息队列配置
 DEFAULT_MQ_CONFIG = {
@@ -29,9 +35,53 @@ DEFAULT_MQ_CONFIG = {
     'prefetch_count': 1,
     'dead_letter_enabled': True,
     'dead_letter_exchange': 'dlx_exchange',
-    'dead_letter_queue': 'dlx_queue'
+    'dead_letter_queue': 'dlx_queue',
+    # 批量发布器配置
+    'publisher_enabled': True,  # publish_message 是否通过批量发布器发送
+    'publisher_batch_size': 100,  # 每批最多发布的消息数
+    'publisher_linger_ms': 5,  # 未凑满一批时最多等待的毫秒数
+    'publisher_outbox_size': 10000,  # 待发送消息缓冲区上限
+    'publisher_max_unconfirmed': 1000,  # 已发送未确认消息的上限
+    'publisher_block_timeout': 1.0,  # 缓冲区满时发布调用最多阻塞的秒数
+    # asyncio客户端配置
+    'connection_pool_size': 2,  # 连接池大小
+    'channel_pool_size': 10,  # 发布通道池大小
+    'publisher_confirms': True,  # 发布通道是否启用发布确认
+    # 消费者工作线程池配置
+    'consumer_workers': 4,  # 每个队列的工作线程数
+    'adaptive_prefetch': True,  # 是否根据处理速度自动调整预取数量
+    'max_prefetch_count': 256,  # 自动调整的预取上限
+    'prefetch_adjust_interval': 5.0,  # 预取调整周期（秒）
+    # 批量消费配置
+    'batch_size': 100,  # 每批最多消息数
+    'batch_timeout_ms': 50,  # 未凑满一批时最多等待的毫秒数
+    # 消息信封配置
+    'message_envelope': True,  # 是否使用二进制信封发送消息（关闭时发送旧的JSON格式，消费端两种格式都能解码）
+    'message_codec': 'msgpack',  # 信封负载编解码器（msgpack未安装时退回orjson/json）
+    'message_compress_threshold': None,  # 负载超过该字节数时使用zstd压缩，None表示不压缩
+    # asyncio客户端传输层配置
+    'transport': 'amqp',  # amqp（RabbitMQ）/ memory（进程内broker）/ socket（本地broker服务）
+    'local_broker_host': '127.0.0.1',  # 本地broker服务地址
+    'local_broker_port': 5680,  # 本地broker服务端口
+    'local_broker_path': None,  # 本地broker的Unix socket路径（优先于地址和端口）
+    # 优先级通道与延迟重试配置
+    'queues': {},  # 队列级配置：队列名称 -> 配置项（见 DEFAULT_QUEUE_SETTINGS），覆盖内置的常用队列配置
+    'urgent_priority': 5,  # 优先级不低于该值的消息走紧急通道：发布缓冲区中先于其他消息发送，不受其他消息积压的背压影响
+    'urgent_reserved_channels': 2  # asyncio客户端为紧急消息预留的发布通道数（其他消息最多占用 channel_pool_size 减去该值）
 }
 
+# 队列级配置项及默认值
+DEFAULT_QUEUE_SETTINGS = {
+    'max_priority': None,  # 队列支持的最大优先级（x-max-priority），None为普通FIFO队列
+    'priority': None,  # 发布到该队列的消息的默认优先级
+    'retry_delays': [],  # 延迟重试的等待秒数（逐次递增），为空时处理失败的消息直接进入死信队列
+    'max_retries': None,  # 最大重试次数，默认为 retry_delays 的长度；超出部分沿用最后一个延迟
+    'prefetch_count': None  # 消费者预取数量，None表示使用全局配置
+}
+
+# 消息头：已经进行的延迟重试次数
+RETRY_COUNT_HEADER = 'x-retry-count'
+
 class MessageQueueError(Exception):
     """消息队列异常基类"""
     pass
@@ -48,6 +98,837 @@ class ConsumeError(MessageQueueError):
     """消费消息异常"""
     pass
 
+def _create_envelope(config: Dict[str, Any]) -> Optional[EnvelopeCodec]:
+    """根据配置创建消息信封编解码器，未启用信封时返回None"""
+    if not config['message_envelope']:
+        return None
+    return EnvelopeCodec(config['message_codec'], compress_threshold=config['message_compress_threshold'])
+
+def _serialize_message(message: Any, envelope: Optional[EnvelopeCodec] = None,
+                       trace_id: Optional[str] = None) -> bytes:
+    """序列化消息体：bytes原样发送，指定信封编解码器时编码为信封（trace_id默认沿用当前上下文），否则为JSON"""
+    if isinstance(message, bytes):
+        return message
+    if envelope is not None:
+        return envelope.encode(message, trace_id=trace_id)
+    if isinstance(message, BaseModel):
+        message = _model_dump(message)
+    return json.dumps(message, ensure_ascii=False, default=str).encode('utf-8')
+
+def _deserialize_message(body: bytes, model: Optional[Type[BaseModel]] = None) -> Any:
+    """反序列化消息体（信封或旧JSON格式），指定模型时直接构造模型；非JSON消息原样返回"""
+    return decode_envelope(body, model).payload
+
+def _queue_arguments(config: Dict[str, Any], dead_letter_enabled: Optional[bool] = None,
+                     max_priority: Optional[int] = None) -> Dict[str, Any]:
+    """队列声明参数（发布与消费两端必须一致，否则声明会失败）"""
+    if dead_letter_enabled is None:
+        dead_letter_enabled = config['dead_letter_enabled']
+    arguments = {}
+    if dead_letter_enabled:
+        arguments['x-dead-letter-exchange'] = config['dead_letter_exchange']
+    if max_priority:
+        arguments['x-max-priority'] = int(max_priority)
+    return arguments
+
+def _retry_queue_name(queue_name: str, delay: float) -> str:
+    """延迟重试队列名称（每个队列的每个延迟一个队列）"""
+    return f"{queue_name}.retry.{int(delay * 1000)}ms"
+
+def _retry_queue_arguments(queue_name: str, delay: float) -> Dict[str, Any]:
+    """延迟重试队列参数：消息TTL到期后经默认交换机回到原队列"""
+    return {
+        'x-message-ttl': int(delay * 1000),
+        'x-dead-letter-exchange': '',
+        'x-dead-letter-routing-key': queue_name
+    }
+
+def _retry_count(headers: Optional[Dict[str, Any]]) -> int:
+    """消息已经进行的延迟重试次数"""
+    try:
+        return int((headers or {}).get(RETRY_COUNT_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+class QueueSettings:
+    """
+    队列级配置
+    
+    合并顺序为 DEFAULT_QUEUE_SETTINGS < 内置的常用队列配置（DEFAULT_QUEUE_OVERRIDES）< 配置中的 queues 节，
+    结果按队列缓存。同时负责生成队列声明参数（x-max-priority）、消息默认优先级和延迟重试队列。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        self._config = config
+        self._cache: Dict[str, Dict[str, Any]] = {}
+    
+    def get(self, queue_name: str) -> Dict[str, Any]:
+        """获取队列的合并配置"""
+        settings = self._cache.get(queue_name)
+        if settings is None:
+            settings = dict(DEFAULT_QUEUE_SETTINGS)
+            settings.update(DEFAULT_QUEUE_OVERRIDES.get(queue_name, {}))
+            settings.update((self._config.get('queues') or {}).get(queue_name, {}))
+            self._cache[queue_name] = settings
+        return settings
+    
+    def arguments(self, queue_name: str, dead_letter_enabled: Optional[bool] = None) -> Dict[str, Any]:
+        """队列声明参数"""
+        return _queue_arguments(self._config, dead_letter_enabled, self.get(queue_name)['max_priority'])
+    
+    def priority(self, queue_name: str, priority: Optional[int] = None) -> Optional[int]:
+        """消息优先级：未显式指定时使用队列的默认优先级"""
+        return self.get(queue_name)['priority'] if priority is None else priority
+    
+    def is_urgent(self, priority: Optional[int]) -> bool:
+        """该优先级的消息是否走紧急通道"""
+        return priority is not None and priority >= self._config['urgent_priority']
+    
+    def retries_enabled(self, queue_name: str) -> bool:
+        """队列是否启用延迟重试"""
+        return bool(self.get(queue_name)['retry_delays'])
+    
+    def retry_delay(self, queue_name: str, attempt: int) -> Optional[float]:
+        """第 attempt 次重试（从1开始）的等待秒数，未启用重试或重试次数用尽时返回None"""
+        settings = self.get(queue_name)
+        delays = settings['retry_delays']
+        max_retries = len(delays) if settings['max_retries'] is None else settings['max_retries']
+        if not delays or attempt > max_retries:
+            return None
+        return delays[min(attempt, len(delays)) - 1]
+    
+    def retry_queues(self, queue_name: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """队列的延迟重试队列列表 [(名称, 声明参数)]"""
+        return [(_retry_queue_name(queue_name, delay), _retry_queue_arguments(queue_name, delay))
+                for delay in sorted(set(self.get(queue_name)['retry_delays']))]
+    
+    def retry_target(self, queue_name: str,
+                     headers: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """消息下一次重试的 (延迟队列名称, 消息头)，未启用重试或重试次数用尽时返回None"""
+        attempt = _retry_count(headers) + 1
+        delay = self.retry_delay(queue_name, attempt)
+        if delay is None:
+            return None
+        headers = dict(headers or {})
+        headers[RETRY_COUNT_HEADER] = attempt
+        return _retry_queue_name(queue_name, delay), headers
+
+class _MessageProperties(dict):
+    """按 (持久化, 优先级) 缓存消息属性，避免每条消息重复构造"""
+    
+    def __init__(self, content_type: str):
+        super().__init__()
+        self.content_type = content_type
+    
+    def __missing__(self, key: Tuple[bool, Optional[int]]) -> pika.BasicProperties:
+        durable, priority = key
+        properties = self[key] = pika.BasicProperties(
+            delivery_mode=2 if durable else 1,
+            content_type=self.content_type,
+            priority=priority
+        )
+        return properties
+
+def _message_properties(envelope: Optional[EnvelopeCodec]) -> _MessageProperties:
+    """创建消息属性缓存"""
+    return _MessageProperties(envelope.content_type if envelope is not None else 'application/json')
+
+class _PriorityDeque:
+    """
+    按优先级分通道的队列：popleft 先取最高优先级通道，同一通道内先进先出
+    
+    只实现发布缓冲区和本地broker用到的 deque 接口；元素优先级由 key 给出，限制在 [0, levels] 范围内
+    （与RabbitMQ一致：没有优先级的消息视为0，超过上限的视为上限）。
+    """
+    
+    __slots__ = ('_lanes', '_key', '_size')
+    
+    def __init__(self, levels: int = 0, key: Callable[[Any], Optional[int]] = lambda item: item.priority):
+        self._lanes = [deque() for _ in range(max(0, int(levels or 0)) + 1)]
+        self._key = key
+        self._size = 0
+    
+    def _level(self, item: Any) -> int:
+        if len(self._lanes) == 1:
+            return 0
+        return min(max(int(self._key(item) or 0), 0), len(self._lanes) - 1)
+    
+    def append(self, item: Any) -> None:
+        self._lanes[self._level(item)].append(item)
+        self._size += 1
+    
+    def appendleft(self, item: Any) -> None:
+        self._lanes[self._level(item)].appendleft(item)
+        self._size += 1
+    
+    def extendleft(self, items) -> None:
+        for item in items:
+            self.appendleft(item)
+    
+    def popleft(self) -> Any:
+        for lane in reversed(self._lanes):
+            if lane:
+                self._size -= 1
+                return lane.popleft()
+        raise IndexError("pop from an empty queue")
+    
+    def peek(self) -> Any:
+        """下一个 popleft 返回的元素"""
+        for lane in reversed(self._lanes):
+            if lane:
+                return lane[0]
+        raise IndexError("peek from an empty queue")
+    
+    def ahead_of(self, item: Any) -> int:
+        """新加入的 item 之前（同优先级及更高优先级）的元素数"""
+        level = self._level(item)
+        return sum(len(lane) for lane in self._lanes[level:])
+    
+    def clear(self) -> None:
+        for lane in self._lanes:
+            lane.clear()
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self):
+        for lane in reversed(self._lanes):
+            yield from lane
+
+class _OutboxEntry:
+    """待发布消息"""
+    
+    __slots__ = ('queue_name', 'exchange', 'routing_key', 'durable', 'body', 'priority', 'urgent',
+                 'future', 'attempts')
+    
+    def __init__(self, queue_name: str, exchange: str, routing_key: str, durable: bool, body: bytes,
+                 priority: Optional[int] = None, urgent: bool = False):
+        self.queue_name = queue_name
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.durable = durable
+        self.body = body
+        self.priority = priority
+        self.urgent = urgent
+        self.future: Future = Future()
+        self.attempts = 0
+
+class BatchPublisher:
+    """
+    异步批量消息发布器
+    
+    独占一个连接和通道，在后台I/O线程中运行pika SelectConnection。发布调用只把消息放入
+    有界缓冲区并返回Future；I/O线程按批发送，启用发布确认（publisher confirms），
+    收到broker的Basic.Ack后才完成Future。队列、交换机和绑定在每个通道上只声明一次
+    （nowait方式，不额外等待往返）。缓冲区满时发布调用阻塞至多 publisher_block_timeout 秒，
+    之后抛出PublishError（背压）。连接或通道断开时未确认的消息重新入队发送（至少一次语义）。
+    紧急通道的消息（优先级不低于 urgent_priority）在缓冲区中排在其他消息之前，背压只按紧急消息计算。
+    """
+    
+    def __init__(self, config: Dict[str, Any], name: str = 'publisher'):
+        """
+        初始化批量发布器
+        
+        Args:
+            config: 消息队列配置（DEFAULT_MQ_CONFIG 格式）
+            name: 发布器名称（用于日志和线程名）
+        """
+        self._config = config
+        self._name = name
+        self._batch_size = max(1, int(config['publisher_batch_size']))
+        self._linger = max(0.0, config['publisher_linger_ms'] / 1000.0)
+        self._outbox_size = max(1, int(config['publisher_outbox_size']))
+        self._max_unconfirmed = max(1, int(config['publisher_max_unconfirmed']))
+        self._block_timeout = config['publisher_block_timeout']
+        self._envelope = _create_envelope(config)
+        self._properties = _message_properties(self._envelope)
+        self._queues = QueueSettings(config)
+        self._logger = get_logger('message_queue')
+        
+        self._cond = threading.Condition()
+        # 两个通道：紧急消息先发送
+        self._outbox = _PriorityDeque(1, key=lambda entry: entry.urgent)
+        self._unconfirmed: "OrderedDict[int, _OutboxEntry]" = OrderedDict()
+        self._drain_pending = False
+        self._closed = False
+        self._stopping = False
+        
+        # 以下状态只在I/O线程中访问
+        self._connection = None
+        self._channel = None
+        self._ready = False
+        self._delivery_tag = 0
+        self._declared = set()
+        
+        self._stats = {
+            'published': 0,
+            'confirmed': 0,
+            'nacked': 0,
+            'retried': 0,
+            'rejected': 0,
+            'failed': 0
+        }
+        self._thread = threading.Thread(target=self._run, name=f"mq-{name}", daemon=True)
+        self._thread.start()
+    
+    def publish(self, queue_name: str, message: Any, exchange: str = '',
+                routing_key: Optional[str] = None, durable: bool = True,
+                timeout: Optional[float] = None, priority: Optional[int] = None) -> Future:
+        """
+        将消息放入发布缓冲区
+        
+        Args:
+            queue_name: 队列名称（首次使用时声明）
+            message: 消息内容（bytes原样发送，其他类型按配置编码为信封或JSON）
+            exchange: 交换机名称，为空时直接发送到队列
+            routing_key: 路由键，默认与队列名称相同
+            durable: 队列与消息是否持久化
+            timeout: 缓冲区满时的最长等待秒数，默认 publisher_block_timeout
+            priority: 消息优先级，默认使用队列配置的 priority
+            
+        Returns:
+            broker确认后完成的Future（结果为True），最终失败时设置PublishError
+        """
+        # 在调用线程中编码，I/O线程只负责发送
+        priority = self._queues.priority(queue_name, priority)
+        entry = _OutboxEntry(queue_name, exchange, routing_key or queue_name, durable,
+                             _serialize_message(message, self._envelope), priority, self._queues.is_urgent(priority))
+        if timeout is None:
+            timeout = self._block_timeout
+        
+        with self._cond:
+            if self._closed:
+                raise PublishError("Publisher is closed")
+            if self._outbox.ahead_of(entry) >= self._outbox_size:
+                deadline = time.monotonic() + timeout
+                while self._outbox.ahead_of(entry) >= self._outbox_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        self._stats['rejected'] += 1
+                        raise PublishError(f"Publisher outbox is full ({self._outbox_size} messages)")
+                    self._cond.wait(remaining)
+            self._outbox.append(entry)
+            wake = not self._drain_pending
+            self._drain_pending = True
+        
+        if wake:
+            self._wake()
+        return entry.future
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待缓冲区中的消息全部得到确认，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._outbox or self._unconfirmed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """等待已缓冲消息确认后关闭连接，仍未完成的消息以PublishError结束"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self.flush(timeout)
+        
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._shutdown)
+            except Exception:
+                pass
+        self._thread.join(timeout)
+        
+        with self._cond:
+            pending = list(self._unconfirmed.values()) + list(self._outbox)
+            self._unconfirmed.clear()
+            self._outbox.clear()
+        for entry in pending:
+            self._fail(entry, PublishError("Publisher closed before the message was confirmed"))
+    
+    def stats(self) -> Dict[str, int]:
+        """获取发布统计"""
+        with self._cond:
+            return dict(self._stats, outbox=len(self._outbox), unconfirmed=len(self._unconfirmed))
+    
+    def _fail(self, entry: _OutboxEntry, error: Exception) -> None:
+        self._stats['failed'] += 1
+        if not entry.future.done():
+            entry.future.set_exception(error)
+    
+    # ---- I/O线程 ----
+    
+    def _run(self) -> None:
+        """I/O线程主循环：连接断开后按 retry_delay 重连"""
+        credentials = pika.PlainCredentials(self._config['username'], self._config['password'])
+        parameters = pika.ConnectionParameters(
+            host=self._config['host'],
+            port=self._config['port'],
+            virtual_host=self._config['virtual_host'],
+            credentials=credentials,
+            heartbeat=self._config['heartbeat'],
+            blocked_connection_timeout=self._config['connection_timeout']
+        )
+        while not self._stopping:
+            try:
+                self._connection = pika.SelectConnection(
+                    parameters,
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_error,
+                    on_close_callback=self._on_connection_closed
+                )
+                self._connection.ioloop.start()
+            except Exception as e:
+                self._logger.error(f"Publisher {self._name} I/O loop failed: {str(e)}")
+            self._connection = None
+            if not self._stopping:
+                time.sleep(self._config['retry_delay'])
+    
+    def _wake(self) -> None:
+        """通知I/O线程有新消息（未连接时等待通道打开后统一发送）"""
+        connection = self._connection
+        if connection is not None and self._ready:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._schedule_drain)
+            except Exception:
+                pass
+    
+    def _shutdown(self) -> None:
+        if self._connection is not None and not (self._connection.is_closing or self._connection.is_closed):
+            self._connection.close()
+    
+    def _on_connection_open(self, connection) -> None:
+        self._logger.info(f"Publisher {self._name} connected to message queue")
+        connection.channel(on_open_callback=self._on_channel_open)
+    
+    def _on_connection_error(self, connection, error) -> None:
+        self._logger.error(f"Publisher {self._name} failed to connect: {str(error)}")
+        connection.ioloop.stop()
+    
+    def _on_connection_closed(self, connection, reason) -> None:
+        self._ready = False
+        self._channel = None
+        self._requeue_unconfirmed()
+        if not self._stopping:
+            self._logger.warning(f"Publisher {self._name} connection closed: {reason}")
+        connection.ioloop.stop()
+    
+    def _on_channel_open(self, channel) -> None:
+        self._channel = channel
+        self._delivery_tag = 0
+        self._declared.clear()
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=self._on_confirm_select)
+    
+    def _on_confirm_select(self, frame) -> None:
+        # 死信交换机和队列随通道声明一次
+        if self._config['dead_letter_enabled']:
+            self._declare_dead_letter()
+        self._ready = True
+        self._schedule_drain()
+    
+    def _on_channel_closed(self, channel, reason) -> None:
+        self._ready = False
+        self._channel = None
+        self._requeue_unconfirmed()
+        connection = self._connection
+        if self._stopping or connection is None or not connection.is_open:
+            return
+        # 声明失败（如参数冲突）会关闭通道：未确认消息已计入重试次数，重开通道继续发送
+        self._logger.warning(f"Publisher {self._name} channel closed: {reason}")
+        connection.channel(on_open_callback=self._on_channel_open)
+    
+    def _requeue_unconfirmed(self) -> None:
+        """将未确认的消息按原顺序放回缓冲区头部，超过重试次数的消息失败"""
+        failed = []
+        with self._cond:
+            entries = list(self._unconfirmed.values())
+            self._unconfirmed.clear()
+            for entry in reversed(entries):
+                entry.attempts += 1
+                if entry.attempts > self._config['retry_attempts']:
+                    failed.append(entry)
+                else:
+                    self._stats['retried'] += 1
+                    self._outbox.appendleft(entry)
+            self._drain_pending = bool(self._outbox)
+            self._cond.notify_all()
+        for entry in failed:
+            self._fail(entry, PublishError(f"Message to '{entry.routing_key}' was not confirmed after {entry.attempts} attempts"))
+    
+    def _declare_dead_letter(self) -> None:
+        channel = self._channel
+        exchange = self._config['dead_letter_exchange']
+        queue = self._config['dead_letter_queue']
+        channel.exchange_declare(
+            exchange=exchange,
+            exchange_type=self._config['exchange_type'],
+            durable=self._config['durable'],
+            auto_delete=self._config['auto_delete']
+        )
+        channel.queue_declare(
+            queue=queue,
+            durable=self._config['durable'],
+            auto_delete=self._config['auto_delete'],
+            arguments={}
+        )
+        channel.queue_bind(queue=queue, exchange=exchange, routing_key='#')
+        self._declared.update({('exchange', exchange), ('queue', queue, self._config['durable'])})
+    
+    def _ensure_topology(self, entry: _OutboxEntry) -> None:
+        """每个通道上只声明一次队列、交换机和绑定（不等待声明确认，通道内帧按顺序处理）"""
+        channel = self._channel
+        queue_key = ('queue', entry.queue_name, entry.durable)
+        if queue_key not in self._declared:
+            channel.queue_declare(
+                queue=entry.queue_name,
+                durable=entry.durable,
+                auto_delete=self._config['auto_delete'],
+                arguments=self._queues.arguments(entry.queue_name)
+            )
+            self._declared.add(queue_key)
+        if entry.exchange:
+            exchange_key = ('exchange', entry.exchange)
+            if exchange_key not in self._declared:
+                channel.exchange_declare(
+                    exchange=entry.exchange,
+                    exchange_type=self._config['exchange_type'],
+                    durable=self._config['durable'],
+                    auto_delete=self._config['auto_delete']
+                )
+                self._declared.add(exchange_key)
+            bind_key = ('bind', entry.queue_name, entry.exchange, entry.routing_key)
+            if bind_key not in self._declared:
+                channel.queue_bind(queue=entry.queue_name, exchange=entry.exchange, routing_key=entry.routing_key)
+                self._declared.add(bind_key)
+    
+    def _schedule_drain(self) -> None:
+        """凑满一批时立即发送，否则最多等待 linger 时间"""
+        with self._cond:
+            backlog = len(self._outbox)
+        if backlog >= self._batch_size or self._linger <= 0:
+            self._drain()
+        elif self._connection is not None:
+            self._connection.ioloop.call_later(self._linger, self._drain)
+    
+    def _drain(self) -> None:
+        """发送一批消息；未确认窗口已满时等待确认后继续"""
+        if not self._ready or self._channel is None:
+            return
+        with self._cond:
+            count = min(self._batch_size, len(self._outbox), self._max_unconfirmed - len(self._unconfirmed))
+            batch = [self._outbox.popleft() for _ in range(max(0, count))]
+            if batch:
+                self._cond.notify_all()
+        
+        channel = self._channel
+        try:
+            for entry in batch:
+                self._ensure_topology(entry)
+                channel.basic_publish(
+                    exchange=entry.exchange,
+                    routing_key=entry.routing_key,
+                    body=entry.body,
+                    properties=self._properties[entry.durable, entry.priority]
+                )
+                self._delivery_tag += 1
+                with self._cond:
+                    self._unconfirmed[self._delivery_tag] = entry
+                    self._stats['published'] += 1
+        except Exception as e:
+            # 通道不可用：尚未发送的消息放回缓冲区，已发送的由通道关闭回调处理
+            self._logger.error(f"Publisher {self._name} failed to publish batch: {str(e)}")
+            sent = set(map(id, self._unconfirmed.values()))
+            with self._cond:
+                self._outbox.extendleft(reversed([entry for entry in batch if id(entry) not in sent]))
+        
+        with self._cond:
+            more = bool(self._outbox) and len(self._unconfirmed) < self._max_unconfirmed
+            self._drain_pending = more
+        if more:
+            # 让出I/O循环处理确认帧后继续发送下一批
+            self._connection.ioloop.call_later(0, self._drain)
+    
+    def _on_confirm(self, frame) -> None:
+        """处理broker的Basic.Ack/Basic.Nack（multiple=True时确认该标签及之前的所有消息）"""
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        tag = method.delivery_tag
+        with self._cond:
+            if method.multiple:
+                entries = []
+                while self._unconfirmed:
+                    first = next(iter(self._unconfirmed))
+                    if first > tag:
+                        break
+                    entries.append(self._unconfirmed.popitem(last=False)[1])
+            else:
+                entry = self._unconfirmed.pop(tag, None)
+                entries = [entry] if entry is not None else []
+            
+            retry = []
+            if acked:
+                self._stats['confirmed'] += len(entries)
+            else:
+                self._stats['nacked'] += len(entries)
+                for entry in entries:
+                    entry.attempts += 1
+                    if entry.attempts <= self._config['retry_attempts']:
+                        retry.append(entry)
+                        self._stats['retried'] += 1
+                self._outbox.extendleft(reversed(retry))
+            resume = bool(self._outbox) and not self._drain_pending
+            if resume:
+                self._drain_pending = True
+            self._cond.notify_all()
+        
+        for entry in entries:
+            if acked:
+                if not entry.future.done():
+                    entry.future.set_result(True)
+            elif entry not in retry:
+                self._fail(entry, PublishError(f"Message to '{entry.routing_key}' was rejected by the broker"))
+        if resume:
+            self._drain()
+
+class ConsumeResult(str, Enum):
+    """消费回调的处理结果"""
+    ACK = "ack"  # 确认消息
+    REJECT = "reject"  # 拒绝消息（启用死信队列时进入死信队列）
+    REQUEUE = "requeue"  # 拒绝并重新入队
+    RETRY = "retry"  # 延迟重试（按队列的 retry_delays 进入延迟队列，未启用或次数用尽时进入死信队列）
+
+def _normalize_result(result: Any) -> ConsumeResult:
+    """将回调返回值转换为处理结果：None/True确认，False或异常对象拒绝"""
+    if result is None or result is True:
+        return ConsumeResult.ACK
+    if result is False or isinstance(result, BaseException):
+        return ConsumeResult.REJECT
+    return ConsumeResult(result)
+
+class QueueConsumer:
+    """
+    队列消费者：I/O线程持有独立的pika连接，消息交给有界工作线程池处理
+    
+    回调签名为 callback(message) -> ConsumeResult | bool | None：返回None/True/ACK确认，
+    False/REJECT拒绝（进入死信队列），REQUEUE重新入队，RETRY延迟重试；
+    抛出异常时，队列启用了延迟重试则视为RETRY，否则视为REJECT。
+    工作线程通过 connection.add_callback_threadsafe 把确认交回I/O线程执行（pika连接不是线程安全的）。
+    同时处理的消息数受预取数量限制；启用自适应预取时，若工作线程因预取上限而空闲则加倍预取，
+    若本地等待处理的消息持续多于工作线程数则减少预取。
+    """
+    
+    def __init__(self, client: 'MessageQueueClient', queue_name: str, callback: Callable,
+                 auto_ack: bool = False, exchange_name: Optional[str] = None,
+                 routing_key: Optional[str] = None, workers: Optional[int] = None,
+                 prefetch_count: Optional[int] = None, adaptive_prefetch: Optional[bool] = None,
+                 model: Optional[Type[BaseModel]] = None):
+        config = client._config
+        self._client = client
+        self._logger = client._logger
+        self.queue_name = queue_name
+        self._callback = callback
+        self._model = model
+        self._auto_ack = auto_ack
+        self._exchange_name = exchange_name
+        self._routing_key = routing_key
+        self._settings = client._queues.get(queue_name)
+        self.workers = max(1, int(workers or config['consumer_workers']))
+        self.prefetch_count = max(1, int(prefetch_count or self._settings['prefetch_count']
+                                         or max(config['prefetch_count'], self.workers * 2)))
+        self._min_prefetch = self.workers
+        self._max_prefetch = max(self.prefetch_count, int(config['max_prefetch_count']))
+        self._adaptive = config['adaptive_prefetch'] if adaptive_prefetch is None else adaptive_prefetch
+        self._adjust_interval = config['prefetch_adjust_interval']
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._connection = None
+        self._channel = None
+        self._stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        
+        # 统计（_lock保护）
+        self._lock = threading.Lock()
+        self._in_flight = 0  # 已投递未结算
+        self._waiting = 0  # 已投递未开始处理
+        self._starved = 0  # 本周期内工作线程因预取上限而空闲的次数
+        self._min_waiting: Optional[int] = None  # 本周期内等待处理消息数的最小值
+        self._stats = {'delivered': 0, 'acked': 0, 'rejected': 0, 'requeued': 0, 'retried': 0, 'errors': 0}
+    
+    def start(self) -> threading.Thread:
+        """在后台线程中开始消费"""
+        self.thread = threading.Thread(target=self.run, name=f"mq-consumer-{self.queue_name}", daemon=True)
+        self.thread.start()
+        return self.thread
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止接收新消息，等待已投递的消息处理完成后关闭连接"""
+        self._stopping.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取消费统计"""
+        with self._lock:
+            return dict(self._stats, queue=self.queue_name, workers=self.workers,
+                        prefetch_count=self.prefetch_count, in_flight=self._in_flight, waiting=self._waiting)
+    
+    def run(self) -> None:
+        """消费主循环（阻塞），连接断开后按 retry_delay 重连"""
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"mq-worker-{self.queue_name}")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    self._consume()
+                except Exception as e:
+                    self._logger.error(f"Error in consumer for queue {self.queue_name}: {str(e)}")
+                    if not self._stopping.wait(self._client._config['retry_delay']):
+                        continue
+        finally:
+            self._executor.shutdown(wait=True)
+    
+    def _consume(self) -> None:
+        connection = pika.BlockingConnection(self._client._get_connection_parameters())
+        channel = connection.channel()
+        self._connection, self._channel = connection, channel
+        with self._lock:
+            # 旧连接上未确认的消息会被broker重新投递
+            self._in_flight = self._waiting = 0
+        try:
+            self._client._declare_queue(channel, self.queue_name)
+            self._client._declare_retry_queues(channel, self.queue_name)
+            if self._exchange_name and self._routing_key:
+                self._client._declare_exchange(channel, self._exchange_name)
+                channel.queue_bind(queue=self.queue_name, exchange=self._exchange_name, routing_key=self._routing_key)
+            channel.basic_qos(prefetch_count=self.prefetch_count)
+            consumer_tag = channel.basic_consume(
+                queue=self.queue_name,
+                on_message_callback=self._on_message,
+                auto_ack=self._auto_ack
+            )
+            self._logger.info(f"Started consuming messages from queue: {self.queue_name} "
+                              f"(workers={self.workers}, prefetch={self.prefetch_count})")
+            
+            next_adjust = time.monotonic() + self._adjust_interval
+            while not self._stopping.is_set():
+                connection.process_data_events(time_limit=0.5)
+                if self._adaptive and time.monotonic() >= next_adjust:
+                    self._adjust_prefetch()
+                    next_adjust = time.monotonic() + self._adjust_interval
+            
+            # 停止投递新消息，等待已投递的消息处理并确认
+            channel.basic_cancel(consumer_tag)
+            deadline = time.monotonic() + self._client._config['connection_timeout']
+            while self._in_flight and time.monotonic() < deadline:
+                connection.process_data_events(time_limit=0.1)
+        finally:
+            self._connection = self._channel = None
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
+    
+    def _on_message(self, channel, method, properties, body) -> None:
+        """I/O线程：把消息交给工作线程池"""
+        with self._lock:
+            self._in_flight += 1
+            self._waiting += 1
+            self._stats['delivered'] += 1
+        self._executor.submit(self._process, self._connection, channel, method.delivery_tag, body, properties)
+    
+    def _process(self, connection, channel, delivery_tag: int, body: bytes, properties) -> None:
+        """工作线程：执行回调并把确认交回I/O线程"""
+        with self._lock:
+            self._waiting -= 1
+        try:
+            envelope = decode_envelope(body, self._model)
+            # 回调中发布的消息沿用当前消息的跟踪ID
+            with trace_context(envelope.trace_id):
+                result = self._callback(envelope.payload)
+            # 无法识别的返回值与回调异常同样处理，保证消息总会被结算
+            result = _normalize_result(result)
+        except Exception as e:
+            self._logger.error(f"Error processing message from queue {self.queue_name}: {str(e)}")
+            with self._lock:
+                self._stats['errors'] += 1
+            result = ConsumeResult.RETRY if self._settings['retry_delays'] else ConsumeResult.REJECT
+        
+        with self._lock:
+            # 工作线程空闲且没有待处理消息，而未结算消息已达到预取上限：预取限制了并发
+            if self._waiting == 0 and self._in_flight >= self.prefetch_count:
+                self._starved += 1
+            self._min_waiting = self._waiting if self._min_waiting is None else min(self._min_waiting, self._waiting)
+        
+        try:
+            connection.add_callback_threadsafe(lambda: self._settle(channel, delivery_tag, result, body, properties))
+        except Exception as e:
+            # 连接已关闭：broker会重新投递未确认的消息
+            self._logger.warning(f"Could not settle message from queue {self.queue_name}: {str(e)}")
+    
+    def _settle(self, channel, delivery_tag: int, result: ConsumeResult, body: bytes, properties) -> None:
+        """I/O线程：确认或拒绝消息（延迟重试的消息转入重试队列后确认）"""
+        if result == ConsumeResult.RETRY and not self._auto_ack and channel.is_open \
+                and not self._retry(channel, body, properties):
+            result = ConsumeResult.REJECT
+        with self._lock:
+            self._in_flight -= 1
+            self._stats[{'ack': 'acked', 'reject': 'rejected', 'requeue': 'requeued',
+                         'retry': 'retried'}[result.value]] += 1
+        if self._auto_ack or not channel.is_open:
+            return
+        if result == ConsumeResult.ACK or result == ConsumeResult.RETRY:
+            channel.basic_ack(delivery_tag=delivery_tag)
+        else:
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=result == ConsumeResult.REQUEUE)
+    
+    def _retry(self, channel, body: bytes, properties) -> bool:
+        """I/O线程：把消息转入延迟重试队列（确认原消息前发送），未启用重试或次数用尽时返回False"""
+        target = self._client._queues.retry_target(self.queue_name, properties.headers)
+        if target is None:
+            return False
+        retry_queue, headers = target
+        try:
+            channel.basic_publish(
+                exchange='',
+                routing_key=retry_queue,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=properties.delivery_mode,
+                    content_type=properties.content_type,
+                    priority=properties.priority,
+                    headers=headers
+                )
+            )
+        except Exception as e:
+            self._logger.error(f"Failed to schedule retry for message from queue {self.queue_name}: {str(e)}")
+            return False
+        return True
+    
+    def _adjust_prefetch(self) -> None:
+        """I/O线程：根据上一周期的处理情况调整预取数量"""
+        with self._lock:
+            starved, min_waiting = self._starved, self._min_waiting or 0
+            self._starved, self._min_waiting = 0, None
+        
+        prefetch = self.prefetch_count
+        if starved:
+            prefetch = min(self._max_prefetch, prefetch * 2)
+        elif min_waiting > self.workers:
+            # 本地积压的消息始终多于工作线程数，多余的预取只会让其他消费者拿不到消息
+            prefetch = max(self._min_prefetch, prefetch - min_waiting // 2)
+        
+        if prefetch != self.prefetch_count:
+            self._logger.info(f"Adjusting prefetch for queue {self.queue_name}: {self.prefetch_count} -> {prefetch}")
+            self.prefetch_count = prefetch
+            self._channel.basic_qos(prefetch_count=prefetch)
+
 class MessageQueueClient:
     """消息队列客户端类，提供与消息队列服务交互的功能"""
     _instance = None
@@ -66,21 +947,32 @@ class MessageQueueClient:
         """初始化消息队列客户端"""
         with self._lock:
             if not MessageQueueClient._initialized:
+                # 获取日志记录器
+                self._logger = get_logger('message_queue')
                 # 加载消息队列配置
                 self._config = self._load_config()
                 # 初始化连接池
                 self._connection_pool = {}
-                # 初始化消费者线程池
+                # 初始化消费者及其线程
+                self._consumers: Dict[str, QueueConsumer] = {}
                 self._consumer_threads = {}
                 # 初始化回调函数映射
                 self._callbacks = {}
                 # 初始化RPC相关组件
                 self._rpc_responses = {}
                 self._rpc_locks = {}
+                # 同步发布路径复用的通道和已声明的拓扑
+                self._publish_channel = None
+                self._declared_topology = set()
+                # 批量发布器（首次发布时创建）
+                self._publisher: Optional[BatchPublisher] = None
+                # 同步发布路径的消息编码
+                self._envelope = _create_envelope(self._config)
+                self._properties = _message_properties(self._envelope)
+                # 队列级配置（优先级、延迟重试、预取）
+                self._queues = QueueSettings(self._config)
                 # 设置标志
                 MessageQueueClient._initialized = True
-                # 获取日志记录器
-                self._logger = get_logger('message_queue')
     
     def _load_config(self) -> Dict[str, Any]:
         """加载消息队列配置"""
@@ -167,18 +1059,23 @@ class MessageQueueClient:
         if dead_letter_enabled is None:
             dead_letter_enabled = self._config['dead_letter_enabled']
         
-        arguments = {}
-        # 如果启用了死信队列，添加死信交换机参数
-        if dead_letter_enabled:
-            arguments['x-dead-letter-exchange'] = self._config['dead_letter_exchange']
-        
         channel.queue_declare(
             queue=queue_name,
             durable=durable,
             auto_delete=self._config['auto_delete'],
-            arguments=arguments
+            arguments=self._queues.arguments(queue_name, dead_letter_enabled)
         )
     
+    def _declare_retry_queues(self, channel: pika.channel.Channel, queue_name: str) -> None:
+        """声明队列的延迟重试队列（未启用重试时不声明）"""
+        for retry_queue, arguments in self._queues.retry_queues(queue_name):
+            channel.queue_declare(
+                queue=retry_queue,
+                durable=self._config['durable'],
+                auto_delete=self._config['auto_delete'],
+                arguments=arguments
+            )
+    
     def _declare_dead_letter_exchange_and_queue(self, channel: pika.channel.Channel) -> None:
         """声明死信交换机和队列"""
         # 声明死信交换机
@@ -206,55 +1103,87 @@ class MessageQueueClient:
         except Exception:
             return False
     
-    def publish_message(self, queue_name, message, exchange='', routing_key=None, durable=True):
-        """发布消息到指定队列（保持向后兼容性）"""
+    @property
+    def publisher(self) -> BatchPublisher:
+        """批量发布器（首次访问时创建并启动后台I/O线程）"""
+        if self._publisher is None:
+            with self._lock:
+                if self._publisher is None:
+                    self._publisher = BatchPublisher(self._config)
+        return self._publisher
+    
+    def publish_message(self, queue_name, message, exchange='', routing_key=None, durable=True, confirm=True,
+                        priority=None):
+        """
+        发布消息到指定队列（保持向后兼容性）
+        
+        启用批量发布器时默认等待broker确认，返回值反映消息是否真正发布成功；
+        不需要等待确认的调用方使用 publish_message_nowait。priority 默认使用队列配置的优先级。
+        """
         try:
             # 如果未指定路由键，使用队列名称
             if routing_key is None:
                 routing_key = queue_name
             
+            if self._config['publisher_enabled']:
+                future = self.publisher.publish(queue_name, message, exchange, routing_key, durable, priority=priority)
+                if confirm:
+                    future.result(timeout=self._config['connection_timeout'])
+                return True
+            
             # 调用新的发布方法
-            self._publish_to_queue(queue_name, message, exchange, routing_key, durable)
+            self._publish_to_queue(queue_name, message, exchange, routing_key, durable, priority)
             return True
         except Exception as e:
             self._logger.error(f"Failed to publish message to queue '{queue_name}': {str(e)}")
             return False
     
-    def _publish_to_queue(self, queue_name: str, message: Any, exchange_name: str = '', 
-                         routing_key: str = None, durable: bool = True) -> None:
-        """发布消息到队列的内部方法"""
-        # 创建连接和通道
-        connection = self._get_connection()
-        channel = connection.channel()
+    def publish_message_nowait(self, queue_name, message, exchange='', routing_key=None, durable=True,
+                               priority=None):
+        """
+        发布消息但不等待broker确认
         
-        # 声明队列
-        self._declare_queue(channel, queue_name, durable=durable)
-        
-        # 如果指定了交换机，声明并绑定
-        if exchange_name:
-            self._declare_exchange(channel, exchange_name)
-            channel.queue_bind(
-                queue=queue_name,
+        启用批量发布器时消息进入发布缓冲区后即返回True，缓冲区已满时返回False；
+        之后的发布失败只记录日志，调用方无法感知。
+        """
+        return self.publish_message(queue_name, message, exchange, routing_key, durable, confirm=False,
+                                    priority=priority)
+    
+    def _publish_to_queue(self, queue_name: str, message: Any, exchange_name: str = '', 
+                         routing_key: str = None, durable: bool = True, priority: Optional[int] = None) -> None:
+        """同步发布消息到队列的内部方法（复用通道，拓扑只声明一次）"""
+        with self._lock:
+            connection = self._get_connection()
+            channel = self._publish_channel
+            if channel is None or not channel.is_open:
+                channel = self._publish_channel = connection.channel()
+                self._declared_topology.clear()
+            
+            # 声明队列
+            queue_key = ('queue', queue_name, durable)
+            if queue_key not in self._declared_topology:
+                self._declare_queue(channel, queue_name, durable=durable)
+                self._declared_topology.add(queue_key)
+            
+            # 如果指定了交换机，声明并绑定
+            if exchange_name:
+                bind_key = ('bind', queue_name, exchange_name, routing_key or queue_name)
+                if bind_key not in self._declared_topology:
+                    self._declare_exchange(channel, exchange_name)
+                    channel.queue_bind(
+                        queue=queue_name,
+                        exchange=exchange_name,
+                        routing_key=routing_key or queue_name
+                    )
+                    self._declared_topology.add(bind_key)
+            
+            # 发布消息
+            channel.basic_publish(
                 exchange=exchange_name,
-                routing_key=routing_key or queue_name
+                routing_key=routing_key or queue_name,
+                body=_serialize_message(message, self._envelope),
+                properties=self._properties[durable, self._queues.priority(queue_name, priority)]
             )
-        
-        # 序列化消息
-        if not isinstance(message, bytes):
-            message_body = json.dumps(message, ensure_ascii=False).encode('utf-8')
-        else:
-            message_body = message
-        
-        # 发布消息
-        channel.basic_publish(
-            exchange=exchange_name,
-            routing_key=routing_key or queue_name,
-            body=message_body,
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # 持久化消息
-                content_type='application/json'
-            )
-        )
     
     def consume_message(self, queue_name, callback, auto_ack=False, durable=True):
         """消费指定队列的消息（保持向后兼容性）"""
@@ -269,86 +1198,56 @@ class MessageQueueClient:
                         auto_ack: bool = False, 
                         exchange_name: Optional[str] = None, 
                         routing_key: Optional[str] = None, 
-                        start_thread: bool = True) -> Union[threading.Thread, None]:
-        """消费队列中的消息"""
-        # 创建连接和通道
-        connection = self._get_connection()
-        channel = connection.channel()
-        
-        # 声明队列
-        self._declare_queue(channel, queue_name)
-        
-        # 如果指定了交换机，绑定队列到交换机
-        if exchange_name and routing_key:
-            self._declare_exchange(channel, exchange_name)
-            channel.queue_bind(
-                queue=queue_name,
-                exchange=exchange_name,
-                routing_key=routing_key
-            )
+                        start_thread: bool = True,
+                        workers: Optional[int] = None,
+                        prefetch_count: Optional[int] = None,
+                        adaptive_prefetch: Optional[bool] = None,
+                        model: Optional[Type[BaseModel]] = None) -> Union[threading.Thread, None]:
+        """
+        消费队列中的消息
         
-        # 设置预取计数
-        channel.basic_qos(prefetch_count=self._config['prefetch_count'])
-        
-        # 定义消息处理函数包装器
-        def message_handler(ch, method, properties, body):
-            try:
-                # 尝试解析消息体
-                try:
-                    message = json.loads(body.decode('utf-8'))
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    message = body
-                
-                # 调用回调函数处理消息
-                callback(ch, method, properties, message)
-                
-                # 如果不是自动确认，手动确认消息
-                if not auto_ack:
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-                    
-            except Exception as e:
-                self._logger.error(f"Error processing message from queue {queue_name}: {str(e)}")
-                
-                # 如果不是自动确认，根据异常情况决定是否重新入队
-                if not auto_ack:
-                    # 拒绝消息并设置是否重新入队
-                    # 注意：如果启用了死信队列，拒绝消息会将消息发送到死信队列
-                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        Args:
+            queue_name: 队列名称
+            callback: 回调函数 callback(message)，message为解码后的消息体；
+                返回None/True/ConsumeResult.ACK确认，False/ConsumeResult.REJECT拒绝（进入死信队列），
+                ConsumeResult.REQUEUE重新入队；回调不应自行确认消息
+            auto_ack: 是否自动确认
+            exchange_name: 绑定的交换机名称（可选）
+            routing_key: 绑定的路由键（可选）
+            start_thread: 是否在后台线程中消费，否则阻塞当前线程
+            workers: 工作线程数，默认 consumer_workers
+            prefetch_count: 初始预取数量，默认为工作线程数的2倍
+            adaptive_prefetch: 是否自动调整预取数量，默认 adaptive_prefetch
+            model: 消息模型类，指定时回调直接收到模型实例（解码失败的消息被拒绝）
+        """
+        consumer = QueueConsumer(
+            self, queue_name, callback, auto_ack, exchange_name, routing_key,
+            workers=workers, prefetch_count=prefetch_count, adaptive_prefetch=adaptive_prefetch,
+            model=model
+        )
+        with self._lock:
+            previous = self._consumers.get(queue_name)
+        if previous is not None:
+            previous.stop()
+        with self._lock:
+            self._consumers[queue_name] = consumer
         
         # 如果需要在新线程中运行消费者
         if start_thread:
-            # 定义消费者线程函数
-            def consumer_thread_func():
-                try:
-                    self._logger.info(f"Started consuming messages from queue: {queue_name}")
-                    channel.basic_consume(
-                        queue=queue_name,
-                        on_message_callback=message_handler,
-                        auto_ack=auto_ack
-                    )
-                    channel.start_consuming()
-                except Exception as e:
-                    self._logger.error(f"Error in consumer thread for queue {queue_name}: {str(e)}")
-                    
-            # 创建并启动线程
-            thread = threading.Thread(target=consumer_thread_func, daemon=True)
-            thread.start()
-            
-            # 保存线程引用
-            self._consumer_threads[queue_name] = thread
-            
+            thread = consumer.start()
+            with self._lock:
+                self._consumer_threads[queue_name] = thread
             return thread
-        else:
-            # 在当前线程中运行消费者（会阻塞当前线程）
-            self._logger.info(f"Started consuming messages from queue: {queue_name}")
-            channel.basic_consume(
-                queue=queue_name,
-                on_message_callback=message_handler,
-                auto_ack=auto_ack
-            )
-            channel.start_consuming()
-            
-            return None
+        
+        # 在当前线程中运行消费者（会阻塞当前线程）
+        consumer.run()
+        return None
+    
+    def get_consumer_stats(self) -> List[Dict[str, Any]]:
+        """获取各队列消费者的统计"""
+        with self._lock:
+            consumers = list(self._consumers.values())
+        return [consumer.stats() for consumer in consumers]
     
     def start_consuming(self):
         """开始消费消息（阻塞调用，保持向后兼容性）"""
@@ -366,15 +1265,13 @@ class MessageQueueClient:
         """停止消费消息（保持向后兼容性）"""
         if queue_name:
             with self._lock:
-                # 检查是否有对应的消费者线程
-                if queue_name in self._consumer_threads:
-                    # 获取线程并停止它
-                    thread = self._consumer_threads[queue_name]
-                    # 注意：这里需要一种方式来优雅地停止消费者线程
-                    # 实际实现中，可能需要维护通道引用并调用channel.stop_consuming()
-                    self._logger.info(f"Stopped consuming messages from queue: {queue_name}")
-                    del self._consumer_threads[queue_name]
-                    return True
+                consumer = self._consumers.pop(queue_name, None)
+                self._consumer_threads.pop(queue_name, None)
+            if consumer is not None:
+                # 等待已投递的消息处理完成并确认
+                consumer.stop()
+                self._logger.info(f"Stopped consuming messages from queue: {queue_name}")
+                return True
         return False
     
     def close(self):
@@ -406,8 +1303,16 @@ class MessageQueueClient:
             return False
     
     def queue_declare(self, queue_name: str, durable: Optional[bool] = None, 
-                     exclusive: bool = False, auto_delete: Optional[bool] = None) -> Dict[str, Any]:
-        """声明队列"""
+                     exclusive: bool = False, auto_delete: Optional[bool] = None,
+                     max_priority: Optional[int] = None,
+                     arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        声明队列
+        
+        Args:
+            max_priority: 队列支持的最大优先级（x-max-priority），默认使用队列配置的 max_priority
+            arguments: 其他队列参数
+        """
         # 创建连接和通道
         connection = self._get_connection()
         channel = connection.channel()
@@ -417,13 +1322,19 @@ class MessageQueueClient:
             durable = self._config['durable']
         if auto_delete is None:
             auto_delete = self._config['auto_delete']
+        if max_priority is None:
+            max_priority = self._queues.get(queue_name)['max_priority']
+        arguments = dict(arguments or {})
+        if max_priority:
+            arguments['x-max-priority'] = int(max_priority)
         
         # 声明队列
         result = channel.queue_declare(
             queue=queue_name,
             durable=durable,
             exclusive=exclusive,
-            auto_delete=auto_delete
+            auto_delete=auto_delete,
+            arguments=arguments or None
         )
         
         return result.method.__dict__
@@ -480,8 +1391,15 @@ class MessageQueueClient:
     def close_all_connections(self) -> None:
         """关闭所有连接"""
         with self._lock:
+            # 发送缓冲区中剩余的消息后关闭批量发布器
+            if self._publisher is not None:
+                self._publisher.close()
+                self._publisher = None
+            self._publish_channel = None
+            self._declared_topology.clear()
+            
             # 停止所有消费者线程
-            for queue_name in list(self._consumer_threads.keys()):
+            for queue_name in list(self._consumers.keys()):
                 self.stop_consuming(queue_name)
             
             # 关闭所有连接
@@ -494,7 +1412,28 @@ QUEUE_VERIFICATION_RESULTS = 'verification_results'
 QUEUE_PAYOUT_REQUESTS = 'payout_requests'
 QUEUE_PAYOUT_RESULTS = 'payout_results'
 QUEUE_REPORT_REQUESTS = 'report_requests'
+QUEUE_REPORT_NOTIFICATIONS = 'report_notifications'
 QUEUE_FUND_EVENTS = 'fund_events'
+QUEUE_USER_EVENTS = 'user_events'
+QUEUE_RISK_ASSESSMENT = 'risk_assessment'
+QUEUE_RISK_ALERTS = 'risk_alerts'
+QUEUE_ORDER_VERIFICATION = 'order_verification'
+QUEUE_SMART_CONTRACT_EVENTS = 'smart_contract_events'
+QUEUE_PAYOUT_PROCESSING = 'payout_processing'
+
+# 常用队列的内置队列级配置（可被 queues 配置覆盖）：只设置消息的默认优先级，用于发布端选择紧急通道，
+# 不改变队列声明参数。x-max-priority 和延迟重试需要在 queues 配置中按队列显式开启：已存在的队列修改
+# max_priority 前需要先删除或迁移（RabbitMQ 拒绝参数不同的重复声明）；赔付等非幂等队列处理失败时
+# 默认直接进入死信队列，开启重试前需确认消费端幂等。
+DEFAULT_QUEUE_OVERRIDES = {
+    QUEUE_PAYOUT_REQUESTS: {'priority': 8},
+    QUEUE_PAYOUT_PROCESSING: {'priority': 8},
+    QUEUE_VERIFICATION_REQUESTS: {'priority': 8},
+    QUEUE_ORDER_VERIFICATION: {'priority': 5},
+    QUEUE_REPORT_REQUESTS: {'priority': 1},
+    QUEUE_REPORT_NOTIFICATIONS: {'priority': 1},
+    QUEUE_USER_EVENTS: {'priority': 1}
+}
 
 # 全局消息队列客户端实例
 mq_client = MessageQueueClient()
@@ -516,18 +1455,16 @@ if __name__ == '__main__':
         if success:
             print(f"Message published: {message}")
     
-    # 消费消息示例
-    def on_message_received(ch, method, properties, body):
+    # 消费消息示例：返回处理结果，由消费者负责确认
+    def on_message_received(message):
         try:
-            print(f"Received message: {body}")
+            print(f"Received message: {message}")
             # 处理消息...
-            
-            # 手动确认消息
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return ConsumeResult.ACK
         except Exception as e:
             print(f"Error processing message: {str(e)}")
             # 拒绝消息并重新入队
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return ConsumeResult.REQUEUE
     
     # 发布消息
     publish_example()
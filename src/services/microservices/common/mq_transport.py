@@ -0,0 +1,890 @@
+import asyncio
+import itertools
+import json
+import struct
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+# 可选依赖：未安装时AMQP传输不可用，内存和本地socket传输仍可使用
+try:
+    import aio_pika
+    from aio_pika.pool import Pool
+except ImportError:  # pragma: no cover
+    aio_pika = None
+    Pool = None
+
+from .logging_system import get_logger
+from .message_queue import MessageQueueError, ConnectionError, PublishError, ConsumeError, _PriorityDeque
+
+# 消费回调：接收投递对象（body/headers/priority/redelivered属性，ack()/nack(requeue)协程方法）
+DeliveryCallback = Callable[[Any], Awaitable[None]]
+
+class Transport:
+    """
+    消息传输层接口
+    
+    AsyncMessageQueueClient 只通过该接口访问broker：声明拓扑、批量发布（等待确认）、
+    按预取数量消费。投递对象需提供 body、content_type、headers、priority、redelivered 属性
+    和 ack()/nack(requeue) 协程方法。
+    """
+    
+    name = ""
+    
+    async def connect(self) -> None:
+        """建立连接，失败时抛出ConnectionError"""
+        raise NotImplementedError
+    
+    async def close(self) -> None:
+        """关闭连接"""
+    
+    async def declare_exchange(self, name: str, exchange_type: str, durable: bool = True,
+                               auto_delete: bool = False) -> None:
+        raise NotImplementedError
+    
+    async def declare_queue(self, name: str, durable: bool = True, auto_delete: bool = False,
+                            arguments: Optional[Dict[str, Any]] = None) -> None:
+        raise NotImplementedError
+    
+    async def bind_queue(self, queue_name: str, exchange_name: str, routing_key: str) -> None:
+        raise NotImplementedError
+    
+    async def publish(self, exchange: str, routing_key: str, bodies: List[bytes], content_type: str,
+                      persistent: bool = True, headers: Optional[Dict[str, Any]] = None,
+                      priority: Optional[int] = None) -> None:
+        """发布一批消息，全部被broker接收后返回"""
+        raise NotImplementedError
+    
+    async def consume(self, queue_name: str, callback: DeliveryCallback, prefetch_count: int) -> str:
+        """开始消费队列，返回消费者标签"""
+        raise NotImplementedError
+    
+    async def cancel(self, consumer_tag: str) -> None:
+        """停止消费者，未确认的消息重新入队"""
+        raise NotImplementedError
+    
+    async def stats(self) -> Dict[str, Any]:
+        """队列统计（仅本地broker支持）"""
+        return {}
+
+class AmqpTransport(Transport):
+    """基于aio-pika的AMQP传输：连接池 + 发布通道池，每个消费者独立通道"""
+    
+    name = "amqp"
+    
+    def __init__(self, config: Dict[str, Any]):
+        self._config = config
+        self._connection_pool = None
+        self._channel_pool = None
+        # consumer_tag -> (通道, 队列)
+        self._consumers: Dict[str, Tuple[Any, Any]] = {}
+    
+    def _url(self) -> str:
+        """根据配置生成AMQP连接URL"""
+        return "amqp://{}:{}@{}:{}/{}".format(
+            quote(self._config['username'], safe=''),
+            quote(self._config['password'], safe=''),
+            self._config['host'],
+            self._config['port'],
+            quote(self._config['virtual_host'], safe='')
+        )
+    
+    async def _create_connection(self):
+        return await aio_pika.connect_robust(
+            self._url(),
+            heartbeat=self._config['heartbeat'],
+            timeout=self._config['connection_timeout']
+        )
+    
+    async def _create_channel(self):
+        async with self._connection_pool.acquire() as connection:
+            return await connection.channel(publisher_confirms=self._config['publisher_confirms'])
+    
+    async def connect(self) -> None:
+        if aio_pika is None:
+            raise ConnectionError("aio-pika is not installed")
+        if self._connection_pool is None:
+            self._connection_pool = Pool(self._create_connection, max_size=self._config['connection_pool_size'])
+            self._channel_pool = Pool(self._create_channel, max_size=self._config['channel_pool_size'])
+        async with self._channel_pool.acquire():
+            pass
+    
+    async def close(self) -> None:
+        if self._channel_pool is not None:
+            await self._channel_pool.close()
+            await self._connection_pool.close()
+        self._channel_pool = None
+        self._connection_pool = None
+    
+    async def declare_exchange(self, name: str, exchange_type: str, durable: bool = True,
+                               auto_delete: bool = False) -> None:
+        async with self._channel_pool.acquire() as channel:
+            await channel.declare_exchange(name, exchange_type, durable=durable, auto_delete=auto_delete)
+    
+    async def declare_queue(self, name: str, durable: bool = True, auto_delete: bool = False,
+                            arguments: Optional[Dict[str, Any]] = None) -> None:
+        async with self._channel_pool.acquire() as channel:
+            await channel.declare_queue(name, durable=durable, auto_delete=auto_delete, arguments=arguments)
+    
+    async def bind_queue(self, queue_name: str, exchange_name: str, routing_key: str) -> None:
+        async with self._channel_pool.acquire() as channel:
+            queue = await channel.get_queue(queue_name, ensure=False)
+            exchange = await channel.get_exchange(exchange_name, ensure=False)
+            await queue.bind(exchange, routing_key)
+    
+    async def publish(self, exchange: str, routing_key: str, bodies: List[bytes], content_type: str,
+                      persistent: bool = True, headers: Optional[Dict[str, Any]] = None,
+                      priority: Optional[int] = None) -> None:
+        delivery_mode = aio_pika.DeliveryMode.PERSISTENT if persistent else aio_pika.DeliveryMode.NOT_PERSISTENT
+        async with self._channel_pool.acquire() as channel:
+            if exchange:
+                target = await channel.get_exchange(exchange, ensure=False)
+            else:
+                target = channel.default_exchange
+            await asyncio.gather(*(
+                target.publish(
+                    aio_pika.Message(body, content_type=content_type, delivery_mode=delivery_mode, headers=headers,
+                                     priority=priority),
+                    routing_key=routing_key
+                )
+                for body in bodies
+            ))
+    
+    async def consume(self, queue_name: str, callback: DeliveryCallback, prefetch_count: int) -> str:
+        async with self._connection_pool.acquire() as connection:
+            channel = await connection.channel()
+        await channel.set_qos(prefetch_count=prefetch_count)
+        queue = await channel.get_queue(queue_name, ensure=False)
+        consumer_tag = await queue.consume(callback)
+        self._consumers[consumer_tag] = (channel, queue)
+        return consumer_tag
+    
+    async def cancel(self, consumer_tag: str) -> None:
+        consumer = self._consumers.pop(consumer_tag, None)
+        if consumer is not None:
+            channel, queue = consumer
+            await queue.cancel(consumer_tag)
+            await channel.close()
+
+class _BrokerMessage:
+    """本地broker中的消息"""
+    
+    __slots__ = ('body', 'content_type', 'headers', 'exchange', 'routing_key', 'persistent', 'priority',
+                 'redelivered', 'enqueued_at')
+    
+    def __init__(self, body: bytes, content_type: Optional[str], headers: Optional[Dict[str, Any]],
+                 exchange: str, routing_key: str, persistent: bool, priority: Optional[int] = None):
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.persistent = persistent
+        self.priority = priority
+        self.redelivered = False
+        self.enqueued_at = 0.0
+
+class _BrokerQueue:
+    """本地broker中的队列"""
+    
+    def __init__(self, name: str, arguments: Optional[Dict[str, Any]]):
+        self.name = name
+        self.arguments = dict(arguments or {})
+        # x-max-priority：按优先级分通道，高优先级消息先投递
+        self.messages = _PriorityDeque(self.arguments.get('x-max-priority') or 0)
+        # x-message-ttl（毫秒）：消息在队列中超时后进入死信交换机
+        ttl = self.arguments.get('x-message-ttl')
+        self.ttl: Optional[float] = ttl / 1000.0 if ttl is not None else None
+        self.expiry_timer: Optional[asyncio.TimerHandle] = None
+        self.consumers: List['_BrokerConsumer'] = []
+        self.next_consumer = 0
+        self.stats = {
+            'published': 0,
+            'delivered': 0,
+            'acked': 0,
+            'rejected': 0,
+            'requeued': 0,
+            'dead_lettered': 0,
+            'expired': 0,
+            'max_depth': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0
+        }
+
+class _BrokerConsumer:
+    """本地broker中的消费者"""
+    
+    __slots__ = ('tag', 'queue', 'callback', 'prefetch_count', 'unacked')
+    
+    def __init__(self, tag: str, queue: _BrokerQueue, callback: DeliveryCallback, prefetch_count: int):
+        self.tag = tag
+        self.queue = queue
+        self.callback = callback
+        self.prefetch_count = prefetch_count
+        self.unacked: Set[int] = set()
+    
+    def has_capacity(self) -> bool:
+        return self.prefetch_count <= 0 or len(self.unacked) < self.prefetch_count
+
+class MemoryDelivery:
+    """本地broker的投递对象"""
+    
+    __slots__ = ('_broker', 'delivery_tag', 'body', 'content_type', 'headers', 'priority', 'redelivered',
+                 'routing_key')
+    
+    def __init__(self, broker: 'MemoryBroker', delivery_tag: int, message: _BrokerMessage):
+        self._broker = broker
+        self.delivery_tag = delivery_tag
+        self.body = message.body
+        self.content_type = message.content_type
+        self.headers = message.headers
+        self.priority = message.priority
+        self.redelivered = message.redelivered
+        self.routing_key = message.routing_key
+    
+    async def ack(self) -> None:
+        self._broker.ack(self.delivery_tag)
+    
+    async def nack(self, requeue: bool = True) -> None:
+        self._broker.nack(self.delivery_tag, requeue)
+    
+    async def reject(self, requeue: bool = False) -> None:
+        self._broker.nack(self.delivery_tag, requeue)
+
+def _match_words(pattern: Tuple[str, ...], words: Tuple[str, ...]) -> bool:
+    if not pattern:
+        return not words
+    if pattern[0] == '#':
+        return any(_match_words(pattern[1:], words[i:]) for i in range(len(words) + 1))
+    if not words:
+        return False
+    return (pattern[0] == '*' or pattern[0] == words[0]) and _match_words(pattern[1:], words[1:])
+
+@lru_cache(maxsize=4096)
+def _topic_matches(pattern: str, routing_key: str) -> bool:
+    """AMQP topic匹配：* 匹配一个单词，# 匹配零个或多个单词"""
+    return _match_words(tuple(pattern.split('.')), tuple(routing_key.split('.')))
+
+class MemoryBroker:
+    """
+    进程内broker，语义与RabbitMQ一致的子集
+    
+    支持direct/topic/fanout交换机和默认交换机、按消费者预取数量限流并轮询投递、
+    ack/nack（requeue=False时按 x-dead-letter-exchange 进入死信交换机并记录x-death头）、
+    消费者取消时未确认消息重新入队、优先级队列（x-max-priority）和队列消息TTL（x-message-ttl，
+    与RabbitMQ一样只在队首检查超时，到期后按死信参数转发，用于延迟重试队列）。所有操作必须在同一个事件循环中调用；
+    回调以任务方式运行，与aio-pika一致。
+    """
+    
+    def __init__(self):
+        self._logger = get_logger('message_queue')
+        self._exchanges: Dict[str, str] = {}
+        # exchange -> [(队列名, 路由键)]
+        self._bindings: Dict[str, List[Tuple[str, str]]] = {}
+        self._queues: Dict[str, _BrokerQueue] = {}
+        self._consumers: Dict[str, _BrokerConsumer] = {}
+        # delivery_tag -> (消费者, 消息)
+        self._unacked: Dict[int, Tuple[_BrokerConsumer, _BrokerMessage]] = {}
+        self._delivery_tags = itertools.count(1)
+        self._consumer_tags = itertools.count(1)
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def declare_exchange(self, name: str, exchange_type: str = 'direct') -> None:
+        existing = self._exchanges.get(name)
+        if existing is not None and existing != exchange_type:
+            raise MessageQueueError(f"Exchange '{name}' already declared with type '{existing}'")
+        self._exchanges[name] = exchange_type
+        self._bindings.setdefault(name, [])
+    
+    def declare_queue(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> None:
+        queue = self._queues.get(name)
+        if queue is None:
+            self._queues[name] = _BrokerQueue(name, arguments)
+        elif arguments and queue.arguments != arguments:
+            # 与RabbitMQ一致：参数不同的重复声明失败（PRECONDITION_FAILED）
+            raise MessageQueueError(f"Queue '{name}' already declared with different arguments")
+    
+    def bind_queue(self, queue_name: str, exchange_name: str, routing_key: str) -> None:
+        if queue_name not in self._queues:
+            raise MessageQueueError(f"Queue '{queue_name}' not found")
+        if exchange_name not in self._exchanges:
+            raise MessageQueueError(f"Exchange '{exchange_name}' not found")
+        binding = (queue_name, routing_key)
+        if binding not in self._bindings[exchange_name]:
+            self._bindings[exchange_name].append(binding)
+    
+    def _route(self, exchange: str, routing_key: str) -> List[_BrokerQueue]:
+        """根据交换机类型计算目标队列，不可路由的消息被丢弃"""
+        if not exchange:
+            queue = self._queues.get(routing_key)
+            return [queue] if queue is not None else []
+        exchange_type = self._exchanges.get(exchange)
+        if exchange_type is None:
+            raise PublishError(f"Exchange '{exchange}' not found")
+        targets = []
+        for queue_name, key in self._bindings[exchange]:
+            if exchange_type == 'fanout' or (exchange_type == 'topic' and _topic_matches(key, routing_key)) \
+                    or key == routing_key:
+                queue = self._queues.get(queue_name)
+                if queue is not None and queue not in targets:
+                    targets.append(queue)
+        return targets
+    
+    def publish(self, exchange: str, routing_key: str, body: bytes, content_type: Optional[str] = None,
+                persistent: bool = True, headers: Optional[Dict[str, Any]] = None,
+                priority: Optional[int] = None) -> int:
+        """发布消息，返回进入的队列数"""
+        targets = self._route(exchange, routing_key)
+        for queue in targets:
+            self._enqueue(queue, _BrokerMessage(body, content_type, headers, exchange, routing_key, persistent,
+                                                priority))
+        return len(targets)
+    
+    def _enqueue(self, queue: _BrokerQueue, message: _BrokerMessage, front: bool = False) -> None:
+        message.enqueued_at = time.monotonic()
+        if front:
+            queue.messages.appendleft(message)
+        else:
+            queue.messages.append(message)
+            queue.stats['published'] += 1
+        if len(queue.messages) > queue.stats['max_depth']:
+            queue.stats['max_depth'] = len(queue.messages)
+        self._dispatch(queue)
+        if queue.ttl is not None:
+            self._schedule_expiry(queue)
+    
+    def _schedule_expiry(self, queue: _BrokerQueue) -> None:
+        """在队首消息到期时检查超时"""
+        if queue.expiry_timer is not None or not queue.messages:
+            return
+        delay = queue.messages.peek().enqueued_at + queue.ttl - time.monotonic()
+        queue.expiry_timer = asyncio.get_running_loop().call_later(max(0.0, delay), self._expire, queue)
+    
+    def _expire(self, queue: _BrokerQueue) -> None:
+        """队首的超时消息进入死信交换机"""
+        queue.expiry_timer = None
+        now = time.monotonic()
+        while queue.messages and queue.messages.peek().enqueued_at + queue.ttl <= now:
+            message = queue.messages.popleft()
+            queue.stats['expired'] += 1
+            self._dead_letter(queue, message, 'expired')
+        self._schedule_expiry(queue)
+    
+    def _next_consumer(self, queue: _BrokerQueue) -> Optional[_BrokerConsumer]:
+        """轮询选择仍有预取余量的消费者"""
+        consumers = queue.consumers
+        for _ in range(len(consumers)):
+            consumer = consumers[queue.next_consumer % len(consumers)]
+            queue.next_consumer += 1
+            if consumer.has_capacity():
+                return consumer
+        return None
+    
+    def _dispatch(self, queue: _BrokerQueue) -> None:
+        """把就绪消息投递给有余量的消费者"""
+        loop = None
+        while queue.messages and queue.consumers:
+            consumer = self._next_consumer(queue)
+            if consumer is None:
+                return
+            message = queue.messages.popleft()
+            now = time.monotonic()
+            wait = now - message.enqueued_at
+            queue.stats['delivered'] += 1
+            queue.stats['wait_total'] += wait
+            if wait > queue.stats['wait_max']:
+                queue.stats['wait_max'] = wait
+            
+            delivery_tag = next(self._delivery_tags)
+            consumer.unacked.add(delivery_tag)
+            self._unacked[delivery_tag] = (consumer, message)
+            if loop is None:
+                loop = asyncio.get_running_loop()
+            task = loop.create_task(self._deliver(consumer, MemoryDelivery(self, delivery_tag, message)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _deliver(self, consumer: _BrokerConsumer, delivery: MemoryDelivery) -> None:
+        try:
+            await consumer.callback(delivery)
+        except Exception as e:
+            # 回调异常不影响broker，消息保持未确认直到消费者取消
+            self._logger.error(f"Consumer {consumer.tag} callback failed: {str(e)}")
+    
+    def consume(self, queue_name: str, callback: DeliveryCallback, prefetch_count: int = 0) -> str:
+        queue = self._queues.get(queue_name)
+        if queue is None:
+            raise ConsumeError(f"Queue '{queue_name}' not found")
+        tag = f"ctag-{next(self._consumer_tags)}"
+        consumer = _BrokerConsumer(tag, queue, callback, prefetch_count)
+        self._consumers[tag] = consumer
+        queue.consumers.append(consumer)
+        self._dispatch(queue)
+        return tag
+    
+    def cancel(self, consumer_tag: str) -> None:
+        """取消消费者，未确认消息按原顺序放回队首"""
+        consumer = self._consumers.pop(consumer_tag, None)
+        if consumer is None:
+            return
+        consumer.queue.consumers.remove(consumer)
+        for delivery_tag in sorted(consumer.unacked, reverse=True):
+            _, message = self._unacked.pop(delivery_tag)
+            message.redelivered = True
+            consumer.queue.stats['requeued'] += 1
+            self._enqueue(consumer.queue, message, front=True)
+        consumer.unacked.clear()
+    
+    def _settle(self, delivery_tag: int) -> Optional[Tuple[_BrokerConsumer, _BrokerMessage]]:
+        entry = self._unacked.pop(delivery_tag, None)
+        if entry is not None:
+            entry[0].unacked.discard(delivery_tag)
+        return entry
+    
+    def ack(self, delivery_tag: int) -> None:
+        entry = self._settle(delivery_tag)
+        if entry is None:
+            return
+        consumer, _ = entry
+        consumer.queue.stats['acked'] += 1
+        self._dispatch(consumer.queue)
+    
+    def nack(self, delivery_tag: int, requeue: bool = True) -> None:
+        entry = self._settle(delivery_tag)
+        if entry is None:
+            return
+        consumer, message = entry
+        queue = consumer.queue
+        if requeue:
+            message.redelivered = True
+            queue.stats['requeued'] += 1
+            self._enqueue(queue, message, front=True)
+        else:
+            queue.stats['rejected'] += 1
+            self._dead_letter(queue, message, 'rejected')
+        self._dispatch(queue)
+    
+    def _dead_letter(self, queue: _BrokerQueue, message: _BrokerMessage, reason: str) -> None:
+        """按队列的 x-dead-letter-exchange 参数转发消息，未配置时丢弃"""
+        exchange = queue.arguments.get('x-dead-letter-exchange')
+        if exchange is None:
+            return
+        routing_key = queue.arguments.get('x-dead-letter-routing-key', message.routing_key)
+        headers = dict(message.headers or {})
+        deaths = [dict(death) for death in headers.get('x-death', [])]
+        for death in deaths:
+            if death.get('queue') == queue.name and death.get('reason') == reason:
+                death['count'] = death.get('count', 1) + 1
+                deaths.remove(death)
+                deaths.insert(0, death)
+                break
+        else:
+            deaths.insert(0, {'queue': queue.name, 'reason': reason, 'count': 1,
+                              'exchange': message.exchange, 'routing-keys': [message.routing_key]})
+        headers['x-death'] = deaths
+        queue.stats['dead_lettered'] += 1
+        if exchange not in self._exchanges and exchange:
+            self._logger.warning(f"Dead letter exchange '{exchange}' not found, dropping message")
+            return
+        self.publish(exchange, routing_key, message.body, message.content_type, message.persistent, headers,
+                     message.priority)
+    
+    def stats(self) -> Dict[str, Any]:
+        """每个队列的统计：就绪/未确认消息数、消费者数、累计计数和排队等待时间"""
+        result = {}
+        for name, queue in self._queues.items():
+            stats = dict(queue.stats)
+            delivered = stats['delivered']
+            stats['wait_avg'] = stats.pop('wait_total') / delivered if delivered else 0.0
+            stats['ready'] = len(queue.messages)
+            stats['unacked'] = sum(len(consumer.unacked) for consumer in queue.consumers)
+            stats['consumers'] = len(queue.consumers)
+            result[name] = stats
+        return result
+
+# 进程内共享的broker（transport=memory 时所有客户端共用）
+_default_broker: Optional[MemoryBroker] = None
+
+def get_memory_broker() -> MemoryBroker:
+    """获取进程内共享的broker"""
+    global _default_broker
+    if _default_broker is None:
+        _default_broker = MemoryBroker()
+    return _default_broker
+
+class MemoryTransport(Transport):
+    """进程内传输，直接调用 MemoryBroker"""
+    
+    name = "memory"
+    
+    def __init__(self, broker: Optional[MemoryBroker] = None):
+        self.broker = broker or get_memory_broker()
+    
+    async def connect(self) -> None:
+        pass
+    
+    async def close(self) -> None:
+        pass
+    
+    async def declare_exchange(self, name: str, exchange_type: str, durable: bool = True,
+                               auto_delete: bool = False) -> None:
+        self.broker.declare_exchange(name, exchange_type)
+    
+    async def declare_queue(self, name: str, durable: bool = True, auto_delete: bool = False,
+                            arguments: Optional[Dict[str, Any]] = None) -> None:
+        self.broker.declare_queue(name, arguments)
+    
+    async def bind_queue(self, queue_name: str, exchange_name: str, routing_key: str) -> None:
+        self.broker.bind_queue(queue_name, exchange_name, routing_key)
+    
+    async def publish(self, exchange: str, routing_key: str, bodies: List[bytes], content_type: str,
+                      persistent: bool = True, headers: Optional[Dict[str, Any]] = None,
+                      priority: Optional[int] = None) -> None:
+        for body in bodies:
+            self.broker.publish(exchange, routing_key, body, content_type, persistent, headers, priority)
+    
+    async def consume(self, queue_name: str, callback: DeliveryCallback, prefetch_count: int) -> str:
+        return self.broker.consume(queue_name, callback, prefetch_count)
+    
+    async def cancel(self, consumer_tag: str) -> None:
+        self.broker.cancel(consumer_tag)
+    
+    async def stats(self) -> Dict[str, Any]:
+        return self.broker.stats()
+
+# 本地socket协议帧：头部长度(4字节) + 消息体长度(4字节) + JSON头部 + 消息体
+_FRAME_HEADER = struct.Struct("!II")
+
+def _encode_frame(header: Dict[str, Any], body: bytes = b"") -> bytes:
+    data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return _FRAME_HEADER.pack(len(data), len(body)) + data + body
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    header_size, body_size = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    data = await reader.readexactly(header_size + body_size)
+    return json.loads(data[:header_size]), data[header_size:]
+
+class LocalBrokerServer:
+    """
+    本地broker服务：通过TCP或Unix socket对外提供 MemoryBroker
+    
+    多个服务进程连接同一个本地broker即可在没有RabbitMQ的环境中跑通队列流程。
+    客户端断开时其消费者被取消，未确认的消息重新入队。
+    """
+    
+    def __init__(self, broker: Optional[MemoryBroker] = None, host: str = '127.0.0.1', port: int = 5680,
+                 path: Optional[str] = None):
+        """
+        初始化本地broker服务
+        
+        Args:
+            broker: 提供服务的broker，默认新建
+            host: 监听地址
+            port: 监听端口（0表示随机端口，启动后见 port 属性）
+            path: Unix socket路径（指定时忽略host/port）
+        """
+        self.broker = broker or MemoryBroker()
+        self.host = host
+        self.port = port
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+        self._logger = get_logger('message_queue')
+    
+    async def start(self) -> None:
+        if self.path:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        self._logger.info(f"Local message broker listening on {self.path or f'{self.host}:{self.port}'}")
+    
+    async def stop(self) -> None:
+        """停止监听并断开所有客户端连接"""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+    
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个客户端连接"""
+        broker = self.broker
+        task = asyncio.current_task()
+        self._connections.add(task)
+        consumer_tags: Set[str] = set()
+        # 投递给该连接、尚未确认的delivery_tag
+        owned: Set[int] = set()
+        
+        def make_callback(consumer_tag: str) -> DeliveryCallback:
+            async def deliver(delivery: MemoryDelivery) -> None:
+                owned.add(delivery.delivery_tag)
+                writer.write(_encode_frame({
+                    "op": "deliver",
+                    "ctag": consumer_tag,
+                    "dtag": delivery.delivery_tag,
+                    "content_type": delivery.content_type,
+                    "headers": delivery.headers,
+                    "priority": delivery.priority,
+                    "redelivered": delivery.redelivered,
+                    "routing_key": delivery.routing_key
+                }, delivery.body))
+                await writer.drain()
+            return deliver
+        
+        try:
+            while True:
+                header, body = await _read_frame(reader)
+                op = header.get("op")
+                request_id = header.get("id")
+                try:
+                    if op == "ack":
+                        if header["dtag"] in owned:
+                            owned.discard(header["dtag"])
+                            broker.ack(header["dtag"])
+                        continue
+                    if op == "nack":
+                        if header["dtag"] in owned:
+                            owned.discard(header["dtag"])
+                            broker.nack(header["dtag"], header.get("requeue", True))
+                        continue
+                    
+                    result = None
+                    if op == "publish":
+                        broker.publish(header["exchange"], header["routing_key"], body, header.get("content_type"),
+                                       header.get("persistent", True), header.get("headers"), header.get("priority"))
+                    elif op == "declare_exchange":
+                        broker.declare_exchange(header["name"], header["type"])
+                    elif op == "declare_queue":
+                        broker.declare_queue(header["name"], header.get("arguments"))
+                    elif op == "bind_queue":
+                        broker.bind_queue(header["queue"], header["exchange"], header["routing_key"])
+                    elif op == "consume":
+                        # 客户端消费者标签由请求ID确定，客户端在发送请求前已登记回调
+                        broker_tag = broker.consume(header["queue"], make_callback(f"c{request_id}"),
+                                                    header.get("prefetch", 0))
+                        consumer_tags.add(broker_tag)
+                        result = broker_tag
+                    elif op == "cancel":
+                        consumer_tags.discard(header["broker_tag"])
+                        broker.cancel(header["broker_tag"])
+                    elif op == "stats":
+                        result = broker.stats()
+                    else:
+                        raise MessageQueueError(f"Unknown operation: {op}")
+                    writer.write(_encode_frame({"op": "ok", "id": request_id, "result": result}))
+                except Exception as e:
+                    writer.write(_encode_frame({"op": "error", "id": request_id, "message": str(e)}))
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            # 客户端断开或服务停止
+            pass
+        finally:
+            self._connections.discard(task)
+            for consumer_tag in consumer_tags:
+                broker.cancel(consumer_tag)
+            writer.close()
+
+class SocketDelivery:
+    """本地socket传输的投递对象"""
+    
+    __slots__ = ('_transport', 'delivery_tag', 'body', 'content_type', 'headers', 'priority', 'redelivered',
+                 'routing_key')
+    
+    def __init__(self, transport: 'SocketTransport', header: Dict[str, Any], body: bytes):
+        self._transport = transport
+        self.delivery_tag = header["dtag"]
+        self.body = body
+        self.content_type = header.get("content_type")
+        self.headers = header.get("headers")
+        self.priority = header.get("priority")
+        self.redelivered = header.get("redelivered", False)
+        self.routing_key = header.get("routing_key")
+    
+    async def ack(self) -> None:
+        self._transport._send({"op": "ack", "dtag": self.delivery_tag})
+    
+    async def nack(self, requeue: bool = True) -> None:
+        self._transport._send({"op": "nack", "dtag": self.delivery_tag, "requeue": requeue})
+    
+    async def reject(self, requeue: bool = False) -> None:
+        await self.nack(requeue)
+
+class SocketTransport(Transport):
+    """连接 LocalBrokerServer 的本地socket传输（不自动重连）"""
+    
+    name = "socket"
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 5680, path: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        # 客户端消费者标签 -> (broker消费者标签, 回调)
+        self._consumers: Dict[str, Tuple[str, DeliveryCallback]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._logger = get_logger('message_queue')
+    
+    async def connect(self) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        try:
+            if self.path:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            else:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            raise ConnectionError(f"Failed to connect to local broker: {str(e)}")
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+    
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+    
+    def _send(self, header: Dict[str, Any], body: bytes = b"") -> None:
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError("Local broker connection is closed")
+        self._writer.write(_encode_frame(header, body))
+    
+    async def _request(self, header: Dict[str, Any], body: bytes = b"") -> Any:
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        header["id"] = request_id
+        try:
+            self._send(header, body)
+        except Exception:
+            self._pending.pop(request_id, None)
+            raise
+        return await future
+    
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                header, body = await _read_frame(self._reader)
+                op = header["op"]
+                if op == "deliver":
+                    consumer = self._consumers.get(header["ctag"])
+                    if consumer is None:
+                        continue
+                    task = asyncio.get_running_loop().create_task(consumer[1](SocketDelivery(self, header, body)))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                    continue
+                future = self._pending.pop(header.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if op == "ok":
+                    future.set_result(header.get("result"))
+                else:
+                    future.set_exception(MessageQueueError(header.get("message", "Local broker error")))
+        except (asyncio.IncompleteReadError, ConnectionResetError) as e:
+            self._logger.error(f"Local broker connection lost: {str(e)}")
+        finally:
+            error = ConnectionError("Local broker connection lost")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+    
+    async def declare_exchange(self, name: str, exchange_type: str, durable: bool = True,
+                               auto_delete: bool = False) -> None:
+        await self._request({"op": "declare_exchange", "name": name, "type": exchange_type})
+    
+    async def declare_queue(self, name: str, durable: bool = True, auto_delete: bool = False,
+                            arguments: Optional[Dict[str, Any]] = None) -> None:
+        await self._request({"op": "declare_queue", "name": name, "arguments": arguments})
+    
+    async def bind_queue(self, queue_name: str, exchange_name: str, routing_key: str) -> None:
+        await self._request({"op": "bind_queue", "queue": queue_name, "exchange": exchange_name,
+                             "routing_key": routing_key})
+    
+    async def publish(self, exchange: str, routing_key: str, bodies: List[bytes], content_type: str,
+                      persistent: bool = True, headers: Optional[Dict[str, Any]] = None,
+                      priority: Optional[int] = None) -> None:
+        await asyncio.gather(*(
+            self._request({"op": "publish", "exchange": exchange, "routing_key": routing_key,
+                           "content_type": content_type, "persistent": persistent, "headers": headers,
+                           "priority": priority}, body)
+            for body in bodies
+        ))
+    
+    async def consume(self, queue_name: str, callback: DeliveryCallback, prefetch_count: int) -> str:
+        # 投递可能先于响应到达：消费者标签由请求ID确定，发送请求前先登记回调
+        request_id = next(self._request_ids)
+        consumer_tag = f"c{request_id}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._consumers[consumer_tag] = ("", callback)
+        try:
+            self._send({"op": "consume", "id": request_id, "queue": queue_name, "prefetch": prefetch_count})
+            broker_tag = await future
+        except Exception:
+            self._pending.pop(request_id, None)
+            self._consumers.pop(consumer_tag, None)
+            raise
+        self._consumers[consumer_tag] = (broker_tag, callback)
+        return consumer_tag
+    
+    async def cancel(self, consumer_tag: str) -> None:
+        consumer = self._consumers.pop(consumer_tag, None)
+        if consumer is not None:
+            await self._request({"op": "cancel", "broker_tag": consumer[0]})
+    
+    async def stats(self) -> Dict[str, Any]:
+        return await self._request({"op": "stats"})
+
+def create_transport(config: Dict[str, Any]) -> Transport:
+    """
+    根据配置创建传输层
+    
+    Args:
+        config: 消息队列配置，transport 为 amqp（默认）、memory 或 socket
+    """
+    kind = config.get('transport', 'amqp')
+    if kind == 'amqp':
+        return AmqpTransport(config)
+    if kind == 'memory':
+        return MemoryTransport()
+    if kind == 'socket':
+        return SocketTransport(config['local_broker_host'], config['local_broker_port'],
+                               config.get('local_broker_path'))
+    raise MessageQueueError(f"Unknown message queue transport: {kind}")
+
+# 导出所有类和函数
+__all__ = [
+    'Transport',
+    'AmqpTransport',
+    'MemoryBroker',
+    'MemoryTransport',
+    'LocalBrokerServer',
+    'SocketTransport',
+    'get_memory_broker',
+    'create_transport'
+]
+
+if __name__ == "__main__":
+    # 独立运行本地broker：python -m services.microservices.common.mq_transport --port 5680
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Local message broker")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=5680, help="监听端口")
+    parser.add_argument("--path", default=None, help="Unix socket路径")
+    args = parser.parse_args()
+    asyncio.run(LocalBrokerServer(host=args.host, port=args.port, path=args.path).serve_forever())
@@ -1,12 +1,23 @@
 import asyncio
+import heapq
+import importlib
+import itertools
+import multiprocessing
+import os
+import random
+import re
+import socket
 import time
 import uuid
 import threading
-from typing import Any, Dict, Optional, Callable, List, Tuple, Union
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Callable, List, Set, Tuple, Union
 from enum import Enum
 from datetime import datetime, timedelta
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from functools import wraps
 from .errors import BaseError
+from .codec import JSONCodec
 from .logging_system import logger
 from .config_manager import get_config
 
@@ -57,6 +68,314 @@ class TaskPriority(int, Enum):
     MEDIUM = 5
     HIGH = 10
 
+class ExecutorBackend(str, Enum):
+    """任务执行后端枚举"""
+    THREAD = "thread"      # 固定大小线程池（默认，适合I/O型同步任务）
+    PROCESS = "process"    # 进程池（CPU密集型任务，函数和参数必须可pickle）
+    ASYNC = "async"        # 调度器的异步事件循环
+
+# 持久化任务参数使用带类型标签的JSON编码，保留tuple、datetime、Decimal等类型
+_TASK_CODEC = JSONCodec()
+
+def _import_path(module_name: str, qualname: str) -> Any:
+    """按模块名和限定名导入对象"""
+    obj: Any = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+def _func_path(func: Callable) -> str:
+    """获取任务函数的可导入路径 module:qualname；被装饰器包装的函数追加 #wrapped"""
+    module_name = getattr(func, "__module__", None)
+    qualname = getattr(func, "__qualname__", None)
+    if not module_name or not qualname or "<" in qualname:
+        raise TaskSchedulerError(f"Task function is not importable: {func!r}")
+    
+    try:
+        obj = _import_path(module_name, qualname)
+    except (ImportError, AttributeError):
+        raise TaskSchedulerError(f"Task function is not importable: {module_name}.{qualname}")
+    
+    if obj is func:
+        return f"{module_name}:{qualname}"
+    if getattr(obj, "__wrapped__", None) is func:
+        return f"{module_name}:{qualname}#wrapped"
+    raise TaskSchedulerError(f"Task function is not importable: {module_name}.{qualname}")
+
+def _resolve_func(path: str) -> Callable:
+    """根据 _func_path 生成的路径导入任务函数"""
+    path, _, marker = path.partition("#")
+    module_name, _, qualname = path.partition(":")
+    func = _import_path(module_name, qualname)
+    if marker == "wrapped":
+        func = func.__wrapped__
+    return func
+
+class CronSpec:
+    """
+    五段式cron表达式：分 时 日 月 周
+    
+    每段支持 *、数字、范围 a-b、步长 */n 或 a-b/n 以及逗号分隔的列表；周取值0-6（0为周日，7同0）。
+    日和周同时被限定时满足任意一个即可（与标准cron一致）。
+    """
+    
+    _FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+    
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise TaskSchedulerError(f"Invalid cron expression: {expression}")
+        self.expression = expression
+        values = [self._parse_field(part, low, high) for part, (_, low, high) in zip(parts, self._FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {0 if d == 7 else d for d in weekdays}
+        self._day_restricted = parts[2] != "*"
+        self._weekday_restricted = parts[4] != "*"
+    
+    def _parse_field(self, field: str, low: int, high: int) -> set:
+        values = set()
+        for item in field.split(","):
+            range_part, _, step_part = item.partition("/")
+            try:
+                step = int(step_part) if step_part else 1
+                if range_part == "*":
+                    start, end = low, high
+                elif "-" in range_part:
+                    start, end = (int(v) for v in range_part.split("-", 1))
+                else:
+                    start = int(range_part)
+                    end = high if step_part else start
+            except ValueError:
+                raise TaskSchedulerError(f"Invalid cron field: {field}")
+            if start < low or end > high or start > end or step < 1:
+                raise TaskSchedulerError(f"Invalid cron field: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+    
+    def next_after(self, dt: datetime) -> datetime:
+        """返回严格晚于dt的下一个触发时间"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                # 跳到下个月1日0点
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise TaskSchedulerError(f"Cron expression never fires: {self.expression}")
+
+_RATE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d*(?:\.\d+)?)\s*([smh])\s*$")
+_RATE_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _parse_rate(rate_limit: Union[str, Tuple[float, float]]) -> Tuple[float, float]:
+    """解析速率上限，如 "10/s"、"100/m"、"5/30s" 或 (次数, 秒数)"""
+    if isinstance(rate_limit, tuple):
+        return float(rate_limit[0]), float(rate_limit[1])
+    match = _RATE_PATTERN.match(rate_limit)
+    if not match:
+        raise TaskSchedulerError(f"Invalid rate limit: {rate_limit}")
+    count, multiplier, unit = match.groups()
+    return float(count), float(multiplier or 1) * _RATE_UNITS[unit]
+
+class TaskClass:
+    """命名任务类：同类任务共享并发上限和速率上限（令牌桶）"""
+    
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[Union[str, Tuple[float, float]]] = None
+    ):
+        """
+        初始化任务类
+        
+        Args:
+            name: 任务类名称，如 "okx-api"
+            max_concurrency: 同时运行的最大任务数，None表示不限制
+            rate_limit: 启动速率上限，如 "10/s"，None表示不限制
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        if rate_limit is not None:
+            count, per_seconds = _parse_rate(rate_limit)
+            self._capacity = count
+            self._refill_rate = count / per_seconds
+        else:
+            self._capacity = None
+            self._refill_rate = None
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self.running = 0
+        self.started = 0
+        # 因上限受阻的就绪任务，按 (优先级, 调度时间) 排序
+        self.waiting: List[Tuple[int, float, int, Task]] = []
+    
+    def _refill(self, now: float) -> None:
+        if self._capacity is not None:
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._refill_rate)
+        self._updated = now
+    
+    def capacity(self, now: float) -> int:
+        """当前还能启动的任务数"""
+        self._refill(now)
+        slots = float("inf")
+        if self.max_concurrency is not None:
+            slots = self.max_concurrency - self.running
+        if self._capacity is not None:
+            slots = min(slots, int(self._tokens))
+        return max(0, int(min(slots, 1 << 30)))
+    
+    def acquire(self) -> None:
+        self.running += 1
+        self.started += 1
+        if self._capacity is not None:
+            self._tokens -= 1
+    
+    def release(self) -> None:
+        self.running -= 1
+    
+    def seconds_until_token(self, now: float) -> Optional[float]:
+        """速率受限时距下一个令牌的秒数；不受速率限制时返回None"""
+        if self._capacity is None:
+            return None
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._refill_rate
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'max_concurrency': self.max_concurrency,
+            'rate_limit': self.rate_limit,
+            'running': self.running,
+            'waiting': sum(1 for e in self.waiting if e[3].status == TaskStatus.PENDING),
+            'started': self.started
+        }
+
+class RecurringSchedule:
+    """周期任务定义：按固定间隔或cron表达式生成任务实例"""
+    
+    def __init__(
+        self,
+        schedule_id: str,
+        func: Callable,
+        args: tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        interval: Optional[float] = None,
+        cron: Optional[str] = None,
+        jitter: float = 0.0,
+        skip_if_running: bool = True,
+        priority: int = TaskPriority.MEDIUM,
+        is_async: bool = False,
+        backend: Optional[Union[ExecutorBackend, str]] = None,
+        task_class: Optional[str] = None,
+        max_retries: int = 0,
+        retry_delay: int = 5,
+        description: Optional[str] = None
+    ):
+        if (interval is None) == (cron is None):
+            raise TaskSchedulerError("Exactly one of interval or cron must be given")
+        if interval is not None and interval <= 0:
+            raise TaskSchedulerError("Interval must be positive")
+        self.schedule_id = schedule_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.interval = interval
+        self.cron = CronSpec(cron) if cron else None
+        self.jitter = jitter
+        self.skip_if_running = skip_if_running
+        self.priority = priority
+        self.is_async = is_async
+        self.backend = backend
+        self.task_class = task_class
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.description = description or f"Recurring task {schedule_id}"
+        
+        self.next_base: Optional[datetime] = None  # 下一次触发时间（不含抖动）
+        self.running_task_id: Optional[str] = None
+        self.pending_task_id: Optional[str] = None
+        self.retry_task_ids: Set[str] = set()  # 等待重试的实例
+        self.runs = 0
+        self.skipped = 0
+        self.last_run: Optional[datetime] = None
+    
+    def next_after(self, dt: datetime) -> datetime:
+        """计算dt之后的下一次触发时间"""
+        if self.cron is not None:
+            return self.cron.next_after(dt)
+        return dt + timedelta(seconds=self.interval)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'schedule_id': self.schedule_id,
+            'description': self.description,
+            'interval': self.interval,
+            'cron': self.cron.expression if self.cron else None,
+            'jitter': self.jitter,
+            'skip_if_running': self.skip_if_running,
+            'task_class': self.task_class,
+            'next_run': self.next_base.isoformat() if self.next_base else None,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'running': self.running_task_id is not None,
+            'runs': self.runs,
+            'skipped': self.skipped
+        }
+
+class _TaskStats:
+    """按任务名聚合的执行统计，耗时样本保存在固定长度的环形缓冲区中"""
+    
+    __slots__ = ('completed', 'failed', 'cancelled', 'retried', 'durations', 'last_end')
+    
+    def __init__(self, window: int):
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.retried = 0
+        self.durations = deque(maxlen=window)
+        self.last_end: Optional[datetime] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        samples = sorted(self.durations)
+        
+        def percentile(q: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))], 6)
+        
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'retried': self.retried,
+            'latency_p50': percentile(0.50),
+            'latency_p95': percentile(0.95),
+            'latency_p99': percentile(0.99),
+            'latency_max': round(samples[-1], 6) if samples else None,
+            'samples': len(samples),
+            'last_end': self.last_end.isoformat() if self.last_end else None
+        }
+
 class Task:
     """任务类"""
     
@@ -71,7 +390,11 @@ class Task:
         max_retries: int = 3,
         retry_delay: int = 5,
         is_async: bool = False,
-        description: Optional[str] = None
+        description: Optional[str] = None,
+        backend: Optional[Union[ExecutorBackend, str]] = None,
+        durable: bool = False,
+        task_class: Optional[str] = None,
+        schedule_id: Optional[str] = None
     ):
         """初始化任务"""
         self.task_id = task_id or str(uuid.uuid4())
@@ -84,6 +407,13 @@ class Task:
         self.retry_delay = retry_delay
         self.is_async = is_async
         self.description = description
+        self.name = f"{getattr(func, '__module__', None) or ''}.{getattr(func, '__qualname__', None) or repr(func)}"
+        if backend is None:
+            backend = ExecutorBackend.ASYNC if is_async else ExecutorBackend.THREAD
+        self.backend = ExecutorBackend(backend)
+        self.durable = durable  # 是否已写入持久化存储
+        self.task_class = task_class  # 所属任务类（并发/速率上限）
+        self.schedule_id = schedule_id  # 所属周期任务
         
         # 任务状态
         self.status = TaskStatus.PENDING
@@ -102,6 +432,7 @@ class Task:
                 'task_id': self.task_id,
                 'status': self.status,
                 'description': self.description,
+                'name': self.name,
                 'priority': self.priority,
                 'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
                 'created_at': self.created_at.isoformat(),
@@ -109,8 +440,87 @@ class Task:
                 'end_time': self.end_time.isoformat() if self.end_time else None,
                 'retries': self.retries,
                 'max_retries': self.max_retries,
-                'is_async': self.is_async
+                'is_async': self.is_async,
+                'backend': self.backend,
+                'durable': self.durable,
+                'task_class': self.task_class,
+                'schedule_id': self.schedule_id
             }
+    
+    def to_record(self) -> Dict[str, Any]:
+        """转换为持久化记录；函数必须可按模块路径导入，参数必须可编码"""
+        return {
+            'task_id': self.task_id,
+            'func_path': _func_path(self.func),
+            'payload': _TASK_CODEC.dumps({
+                'args': tuple(self.args),
+                'kwargs': self.kwargs,
+                'task_class': self.task_class
+            }),
+            'priority': int(self.priority),
+            'scheduled_ts': self.scheduled_time.timestamp(),
+            'max_retries': self.max_retries,
+            'retry_delay': self.retry_delay,
+            'is_async': self.is_async,
+            'backend': self.backend.value,
+            'description': self.description,
+            'status': self.status.value,
+            'retries': self.retries,
+            'error': str(self.error) if self.error is not None else None,
+            'owner': None,
+            'lease_expires': None,
+            'created_ts': self.created_at.timestamp(),
+            'start_ts': None,
+            'end_ts': None
+        }
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'Task':
+        """从持久化记录还原任务"""
+        payload = _TASK_CODEC.loads(record['payload'])
+        task = cls(
+            task_id=record['task_id'],
+            func=_resolve_func(record['func_path']),
+            args=tuple(payload['args']),
+            kwargs=payload['kwargs'],
+            priority=record['priority'],
+            scheduled_time=datetime.fromtimestamp(record['scheduled_ts']),
+            max_retries=record['max_retries'],
+            retry_delay=record['retry_delay'],
+            is_async=bool(record['is_async']),
+            description=record['description'],
+            backend=record['backend'],
+            durable=True,
+            task_class=payload.get('task_class')
+        )
+        task.retries = record['retries']
+        task.created_at = datetime.fromtimestamp(record['created_ts'])
+        if record['error']:
+            task.error = TaskExecutionError(record['error'])
+        return task
+    
+    def to_history_record(self) -> Dict[str, Any]:
+        """转换为历史记录（不要求函数可导入，不保存参数）"""
+        return {
+            'task_id': self.task_id,
+            'func_path': self.name,
+            'payload': b"",
+            'priority': int(self.priority),
+            'scheduled_ts': self.scheduled_time.timestamp(),
+            'max_retries': self.max_retries,
+            'retry_delay': self.retry_delay,
+            'is_async': self.is_async,
+            'backend': self.backend.value,
+            'description': self.description,
+            'status': self.status.value,
+            'retries': self.retries,
+            'error': str(self.error) if self.error is not None else None,
+            'owner': None,
+            'lease_expires': None,
+            'created_ts': self.created_at.timestamp(),
+            'start_ts': self.start_time.timestamp() if self.start_time else None,
+            'end_ts': self.end_time.timestamp() if self.end_time else None
+        }
 
 class TaskScheduler:
     """任务调度器"""
@@ -129,13 +539,25 @@ class TaskScheduler:
     def _initialize(self):
         """初始化任务调度器"""
         # 任务存储
-        self._pending_tasks = []  # 待执行任务
+        # 待执行任务使用两类堆：定时堆按 (调度时间, 优先级) 排序，到期后移入对应执行后端
+        # 按 (优先级, 调度时间) 排序的就绪堆；取消采用惰性删除，出堆时跳过非PENDING任务
+        self._pending_heap: List[Tuple[float, int, int, Task]] = []  # 未到期任务
+        self._ready_heaps: Dict[ExecutorBackend, List[Tuple[int, float, int, Task]]] = {
+            backend: [] for backend in ExecutorBackend
+        }  # 已到期等待执行的任务
+        self._pending_index: Dict[str, Task] = {}  # 待执行任务索引
+        self._sequence = itertools.count()  # 同一时间和优先级下保持提交顺序
         self._running_tasks = {}  # 正在执行的任务
-        self._completed_tasks = {}  # 已完成的任务
-        self._failed_tasks = {}  # 失败的任务
+        # 历史任务按结束顺序保存，超过上限时O(1)淘汰最早的记录
+        self._completed_tasks: "OrderedDict[str, Task]" = OrderedDict()  # 已完成的任务
+        self._failed_tasks: "OrderedDict[str, Task]" = OrderedDict()  # 失败的任务
+        self._task_stats: Dict[str, _TaskStats] = {}  # 按任务名聚合的统计
+        self._spill_buffer: List[Dict[str, Any]] = []  # 待写入存储的淘汰记录
+        self._claim_queue: List[Task] = []  # 已预留执行槽位、等待在存储中认领的持久化任务
         
         # 锁和控制变量
         self._task_lock = threading.RLock()
+        self._task_cond = threading.Condition(self._task_lock)  # 新任务提交或任务结束时唤醒调度线程
         self._stop_event = threading.Event()
         self._scheduler_thread = None
         self._async_loop = None
@@ -144,20 +566,87 @@ class TaskScheduler:
         # 加载配置
         self._config = self._load_config()
         
+        # 执行后端及其指标
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._backend_limits = {
+            ExecutorBackend.THREAD: self._config["thread_pool_size"],
+            ExecutorBackend.PROCESS: self._config["process_pool_size"],
+            ExecutorBackend.ASYNC: self._config["async_concurrency"]
+        }
+        self._backend_busy = {backend: 0 for backend in ExecutorBackend}
+        self._backend_busy_seconds = {backend: 0.0 for backend in ExecutorBackend}
+        
+        # 任务类和周期任务
+        self._task_classes: Dict[str, TaskClass] = {}
+        for name, class_config in self._config["task_classes"].items():
+            self._task_classes[name] = TaskClass(
+                name,
+                max_concurrency=class_config.get("max_concurrency"),
+                rate_limit=class_config.get("rate_limit")
+            )
+        self._recurring: Dict[str, RecurringSchedule] = {}
+        
+        # 持久化任务存储，多个实例通过 owner 标识区分租约
+        self._owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._next_store_sync = 0.0
+        self._next_store_purge = 0.0
+        self._store = self._create_store()
+        
         # 启动调度器
         self.start()
     
     def _load_config(self) -> Dict[str, Any]:
         """加载任务调度器配置"""
         config = get_config("task_scheduler", {})
+        store_config = config.get("store", {})
         
         return {
-            "check_interval": config.get("check_interval", 1),  # 任务检查间隔（秒）
+            "check_interval": config.get("check_interval", 1),  # 调度循环出错后的等待间隔（秒）
             "max_pending_tasks": config.get("max_pending_tasks", 1000),  # 最大待执行任务数
             "max_running_tasks": config.get("max_running_tasks", 10),  # 最大并发执行任务数
-            "task_history_size": config.get("task_history_size", 1000)  # 历史任务记录数
+            "task_history_size": config.get("task_history_size", 1000),  # 历史任务记录数
+            "history_spill": config.get("history_spill", False),  # 淘汰的历史记录是否写入持久化存储
+            "latency_window": config.get("latency_window", 1024),  # 每个任务名保留的耗时样本数
+            "thread_pool_size": config.get("thread_pool_size", config.get("max_running_tasks", 10)),  # 线程池大小
+            "process_pool_size": config.get("process_pool_size", os.cpu_count() or 1),  # 进程池大小
+            "process_start_method": config.get("process_start_method", "spawn"),  # 进程启动方式
+            "async_concurrency": config.get("async_concurrency", config.get("max_running_tasks", 10)),  # 异步任务并发数
+            "task_classes": config.get("task_classes", {}),  # 任务类：{名称: {max_concurrency, rate_limit}}
+            "store": {
+                "enabled": store_config.get("enabled", False),  # 是否持久化任务（需显式开启）
+                "backend": store_config.get("backend", "sqlite"),  # 存储后端
+                "url": store_config.get("url", "sqlite:///task_scheduler.db"),  # 存储地址，每个服务需使用独立的绝对路径
+                "lease_seconds": store_config.get("lease_seconds", 60),  # 运行中任务的租约时长
+                "poll_interval": store_config.get("poll_interval", 1.0),  # 同步存储的间隔（秒）
+                "batch_size": store_config.get("batch_size", 500),  # 每次从存储加载的最大任务数
+                "retention_seconds": store_config.get("retention_seconds", 7 * 24 * 3600),  # 已结束任务的保留时长
+                "purge_interval": store_config.get("purge_interval", 3600)  # 清理已结束任务的间隔（秒）
+            }
         }
     
+    def _create_store(self):
+        """根据配置创建持久化任务存储，失败时退化为仅内存调度"""
+        store_config = self._config["store"]
+        if not store_config["enabled"]:
+            return None
+        
+        try:
+            # 存储依赖SQLAlchemy，延迟导入
+            from .task_store import create_task_store
+            return create_task_store(store_config)
+        except Exception as e:
+            logger.error(f"Failed to initialize task store, tasks will not be persisted: {str(e)}")
+            return None
+    
+    def set_store(self, store) -> None:
+        """替换持久化任务存储（实现 task_store.TaskStore 接口），None表示仅内存调度"""
+        with self._task_lock:
+            self._store = store
+            self._next_store_sync = 0.0
+            self._next_store_purge = 0.0
+            self._task_cond.notify()
+    
     def start(self) -> None:
         """启动任务调度器"""
         with self._lock:
@@ -168,6 +657,13 @@ class TaskScheduler:
             # 清除停止标志
             self._stop_event.clear()
             
+            # 创建线程池（进程池在首次使用时创建）
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self._config["thread_pool_size"],
+                    thread_name_prefix="task-worker"
+                )
+            
             # 启动调度线程
             self._scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
             self._scheduler_thread.start()
@@ -187,8 +683,10 @@ class TaskScheduler:
                 logger.warning("Task scheduler is not running")
                 return
             
-            # 设置停止标志
+            # 设置停止标志并唤醒调度线程
             self._stop_event.set()
+            with self._task_cond:
+                self._task_cond.notify_all()
             
             # 等待调度线程结束
             if self._scheduler_thread and self._scheduler_thread.is_alive():
@@ -200,22 +698,44 @@ class TaskScheduler:
                 if self._async_thread and self._async_thread.is_alive():
                     self._async_thread.join(timeout=5)
             
+            # 关闭执行池，不等待正在执行的任务
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False)
+                self._thread_pool = None
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+            
             logger.info("Task scheduler stopped")
     
     def _scheduler_loop(self) -> None:
         """调度器主循环"""
         while not self._stop_event.is_set():
             try:
-                # 检查并执行到期任务
-                self._process_pending_tasks()
+                # 与持久化存储同步（不持有任务锁）
+                if self._store is not None and time.time() >= self._next_store_sync:
+                    self._sync_store()
+                if self._spill_buffer:
+                    self._flush_spill_buffer()
                 
-                # 清理历史任务
-                self._cleanup_history_tasks()
+                with self._task_cond:
+                    # 检查并执行到期任务
+                    timeout = self._process_pending_tasks()
+                    
+                    if self._store is not None:
+                        until_sync = max(0.0, self._next_store_sync - time.time())
+                        timeout = until_sync if timeout is None else min(timeout, until_sync)
+                    
+                    # 休眠到下一个任务到期，期间有新任务提交或任务结束时提前唤醒
+                    if not self._stop_event.is_set() and not self._claim_queue:
+                        self._task_cond.wait(timeout)
                 
-                # 休眠一段时间
-                time.sleep(self._config["check_interval"])
+                # 持久化任务在任务锁外认领
+                if self._claim_queue:
+                    self._claim_tasks()
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {str(e)}")
+                time.sleep(self._config["check_interval"])
     
     def _async_loop_runner(self) -> None:
         """异步事件循环运行器"""
@@ -227,169 +747,436 @@ class TaskScheduler:
         finally:
             self._async_loop.close()
     
-    def _process_pending_tasks(self) -> None:
-        """处理待执行任务"""
+    def _sync_store(self) -> None:
+        """与持久化存储同步：续租运行中任务、恢复租约过期任务并加载即将到期的任务"""
+        store = self._store
+        store_config = self._config["store"]
+        self._next_store_sync = time.time() + store_config["poll_interval"]
+        
+        try:
+            with self._task_lock:
+                owns_running = any(task.durable for task in self._running_tasks.values())
+            if owns_running:
+                store.renew(self._owner_id, store_config["lease_seconds"])
+            store.recover_expired()
+            records = store.fetch_due(self._next_store_sync, store_config["batch_size"])
+        except Exception as e:
+            logger.error(f"Failed to sync task store: {str(e)}")
+            return
+        
+        # 定期清理超过保留时长的已结束任务
+        now = time.time()
+        if now >= self._next_store_purge:
+            self._next_store_purge = now + store_config["purge_interval"]
+            purged = self._store_call("purge", now - store_config["retention_seconds"])
+            if purged:
+                logger.info(f"Purged {purged} finished task(s) from task store")
+        
+        broken = []
+        with self._task_cond:
+            for record in records:
+                task_id = record["task_id"]
+                if task_id in self._pending_index or task_id in self._running_tasks:
+                    continue
+                if len(self._pending_index) >= self._config["max_pending_tasks"]:
+                    break
+                
+                try:
+                    task = Task.from_record(record)
+                except Exception as e:
+                    logger.error(f"Failed to restore task {task_id}: {str(e)}")
+                    broken.append((task_id, str(e)))
+                    continue
+                self._push_pending(task)
+        
+        # 无法还原的任务（如函数已删除）标记为失败，避免每次同步重复加载
+        for task_id, error in broken:
+            self._store_call("finish_pending", task_id, TaskStatus.FAILED.value, error)
+    
+    def _store_call(self, method: str, *args) -> Any:
+        """调用持久化存储，失败时记录日志而不中断调度"""
+        try:
+            return getattr(self._store, method)(*args)
+        except Exception as e:
+            logger.error(f"Task store {method} failed: {str(e)}")
+            return None
+    
+    def _push_pending(self, task: Task) -> None:
+        """将任务加入定时堆（调用方需持有_task_lock）"""
+        task.status = TaskStatus.PENDING
+        self._pending_index[task.task_id] = task
+        heapq.heappush(
+            self._pending_heap,
+            (task.scheduled_time.timestamp(), -task.priority, next(self._sequence), task)
+        )
+        self._task_cond.notify()
+    
+    def _compact_pending(self) -> None:
+        """已取消的堆条目过多时重建堆"""
+        live = len(self._pending_index)
+        queued = sum(len(heap) for heap in self._ready_heaps.values())
+        if len(self._pending_heap) + queued > 2 * live + 64:
+            self._pending_heap = [e for e in self._pending_heap if e[3].status == TaskStatus.PENDING]
+            heapq.heapify(self._pending_heap)
+            for backend, heap in self._ready_heaps.items():
+                heap = [e for e in heap if e[3].status == TaskStatus.PENDING]
+                heapq.heapify(heap)
+                self._ready_heaps[backend] = heap
+    
+    def _process_pending_tasks(self) -> Optional[float]:
+        """
+        处理待执行任务（调用方需持有_task_lock）
+        
+        Returns:
+            距下一个任务到期的秒数；None表示无需定时唤醒
+        """
+        now_ts = time.time()
+        
+        # 将到期任务移入就绪堆
+        pending_heap = self._pending_heap
+        while pending_heap and pending_heap[0][0] <= now_ts:
+            scheduled_ts, neg_priority, seq, task = heapq.heappop(pending_heap)
+            if task.status == TaskStatus.PENDING:
+                heapq.heappush(self._ready_heaps[task.backend], (neg_priority, scheduled_ts, seq, task))
+        
+        # 任务类有余量时，将受阻任务移回就绪堆
+        monotonic_now = time.monotonic()
+        for task_class in self._task_classes.values():
+            if task_class.waiting:
+                self._release_waiting(task_class, monotonic_now)
+        
+        # 在有空闲工作者的后端中按优先级执行就绪任务，已满的后端不阻塞其他后端；
+        # 任务类达到并发或速率上限的任务暂存到该任务类的等待堆
+        available_slots = self._config["max_running_tasks"] - len(self._running_tasks)
+        while available_slots > 0:
+            best = None
+            for backend, heap in self._ready_heaps.items():
+                while heap:
+                    head = heap[0][3]
+                    if head.status != TaskStatus.PENDING:
+                        heapq.heappop(heap)
+                        continue
+                    task_class = self._task_classes.get(head.task_class) if head.task_class else None
+                    if task_class is not None and task_class.capacity(monotonic_now) <= 0:
+                        heapq.heappush(task_class.waiting, heapq.heappop(heap))
+                        continue
+                    break
+                if not heap or self._backend_busy[backend] >= self._backend_limits[backend]:
+                    continue
+                if best is None or heap[0] < self._ready_heaps[best][0]:
+                    best = backend
+            if best is None:
+                break
+            if self._start_task(heapq.heappop(self._ready_heaps[best])[3]):
+                available_slots -= 1
+        
+        # 受速率限制的任务类在下一个令牌可用时唤醒
+        timeout = None
+        for task_class in self._task_classes.values():
+            if task_class.waiting:
+                wait = task_class.seconds_until_token(time.monotonic())
+                if wait is not None and (timeout is None or wait < timeout):
+                    timeout = wait
+        
+        # 就绪堆中可能有等待已满后端的任务，但其他后端的任务仍需按时唤醒
+        if pending_heap:
+            until_due = max(0.0, pending_heap[0][0] - time.time())
+            timeout = until_due if timeout is None else min(timeout, until_due)
+        # timeout为None时等待新任务提交或任务结束的通知
+        return timeout
+    
+    def _release_waiting(self, task_class: TaskClass, now: float) -> None:
+        """按任务类当前余量将等待任务移回就绪堆"""
+        slots = task_class.capacity(now)
+        while slots > 0 and task_class.waiting:
+            entry = heapq.heappop(task_class.waiting)
+            task = entry[3]
+            if task.status == TaskStatus.PENDING:
+                heapq.heappush(self._ready_heaps[task.backend], entry)
+                slots -= 1
+    
+    def _start_task(self, task: Task) -> bool:
+        """
+        标记任务为运行中并提交执行（调用方需持有_task_lock），任务未启动时返回False
+        
+        持久化任务先预留执行槽位并加入认领队列，由调度线程在任务锁外认领成功后再提交执行。
+        """
+        if task.schedule_id is not None and not self._start_occurrence(task):
+            return False
+        
+        task.status = TaskStatus.RUNNING
+        task.start_time = datetime.now()
+        self._pending_index.pop(task.task_id, None)
+        self._running_tasks[task.task_id] = task
+        self._backend_busy[task.backend] += 1
+        if task.task_class in self._task_classes:
+            self._task_classes[task.task_class].acquire()
+        if task.durable and self._store is not None:
+            self._claim_queue.append(task)
+        else:
+            self._run_task(task)
+        return True
+    
+    def _claim_tasks(self) -> None:
+        """在存储中认领预留了执行槽位的持久化任务，认领成功后提交执行"""
         with self._task_lock:
-            # 获取当前时间
-            now = datetime.now()
-            
-            # 筛选出已到执行时间且可以运行的任务
-            available_slots = self._config["max_running_tasks"] - len(self._running_tasks)
-            
-            if available_slots <= 0:
-                return
-            
-            # 按优先级和调度时间排序任务
-            eligible_tasks = [
-                task for task in self._pending_tasks 
-                if task.scheduled_time <= now and task.status == TaskStatus.PENDING
-            ]
-            
-            eligible_tasks.sort(key=lambda t: (t.priority, t.scheduled_time), reverse=True)
-            
-            # 执行符合条件的任务
-            for task in eligible_tasks[:available_slots]:
-                self._run_task(task)
+            tasks, self._claim_queue = self._claim_queue, []
+        lease_seconds = self._config["store"]["lease_seconds"]
+        # 存储不可用（返回None）时仍按内存调度执行
+        claimed = [self._store_call("claim", task.task_id, self._owner_id, lease_seconds) is not False for task in tasks]
+        
+        with self._task_cond:
+            for task, ok in zip(tasks, claimed):
+                if ok:
+                    self._run_task(task)
+                    continue
+                # 已被共享同一存储的其他调度器实例认领
+                self._release_slot(task)
+                task.status = TaskStatus.CANCELLED
+                logger.debug(f"Task {task.task_id} was claimed by another scheduler")
+    
+    def _release_slot(self, task: Task) -> None:
+        """释放任务占用的执行槽位（调用方需持有_task_lock）"""
+        self._backend_busy[task.backend] -= 1
+        self._running_tasks.pop(task.task_id, None)
+        if task.task_class in self._task_classes:
+            self._task_classes[task.task_class].release()
+        if task.schedule_id is not None:
+            schedule = self._recurring.get(task.schedule_id)
+            if schedule is not None and schedule.running_task_id == task.task_id:
+                schedule.running_task_id = None
+        self._task_cond.notify()
+    
+    def _start_occurrence(self, task: Task) -> bool:
+        """周期任务实例启动前：安排下一次实例，并在上一次仍在运行时跳过本次"""
+        schedule = self._recurring.get(task.schedule_id)
+        is_retry = schedule is not None and task.task_id in schedule.retry_task_ids
+        if schedule is None or (schedule.pending_task_id != task.task_id and not is_retry):
+            # 周期任务已取消或被替换
+            self._pending_index.pop(task.task_id, None)
+            task.status = TaskStatus.CANCELLED
+            return False
+        
+        now = datetime.now()
+        if is_retry:
+            # 重试实例：下一次实例在首次执行时已安排
+            schedule.retry_task_ids.discard(task.task_id)
+        else:
+            # 固定频率：基于上一次计划时间推进，落后时直接跳到当前时间之后
+            next_base = schedule.next_after(schedule.next_base)
+            if next_base <= now:
+                next_base = schedule.next_after(now)
+            schedule.next_base = next_base
+            self._enqueue_occurrence(schedule)
+        
+        if schedule.skip_if_running and schedule.running_task_id is not None:
+            self._pending_index.pop(task.task_id, None)
+            task.status = TaskStatus.CANCELLED
+            schedule.skipped += 1
+            logger.debug(f"Skipping recurring task {schedule.schedule_id}: previous run still in progress")
+            return False
+        
+        schedule.running_task_id = task.task_id
+        schedule.runs += 1
+        schedule.last_run = now
+        return True
+    
+    def _enqueue_occurrence(self, schedule: RecurringSchedule) -> None:
+        """按下一次触发时间（加随机抖动）创建周期任务实例（调用方需持有_task_lock）"""
+        scheduled_time = schedule.next_base
+        if schedule.jitter:
+            scheduled_time += timedelta(seconds=random.uniform(0, schedule.jitter))
+        task = Task(
+            func=schedule.func,
+            args=schedule.args,
+            kwargs=schedule.kwargs,
+            priority=schedule.priority,
+            scheduled_time=scheduled_time,
+            max_retries=schedule.max_retries,
+            retry_delay=schedule.retry_delay,
+            is_async=schedule.is_async,
+            description=schedule.description,
+            backend=schedule.backend,
+            task_class=schedule.task_class,
+            schedule_id=schedule.schedule_id
+        )
+        schedule.pending_task_id = task.task_id
+        self._push_pending(task)
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """获取进程池，首次使用时创建"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self._config["process_pool_size"],
+                mp_context=multiprocessing.get_context(self._config["process_start_method"])
+            )
+        return self._process_pool
     
     def _run_task(self, task: Task) -> None:
-        """执行任务"""
-        if task.is_async:
-            # 异步任务提交到异步事件循环
-            if self._async_loop and not self._async_loop.is_closed():
+        """将任务提交到其执行后端（调用方需持有_task_lock）"""
+        try:
+            if task.backend == ExecutorBackend.ASYNC:
+                # 异步任务提交到异步事件循环
+                if not self._async_loop or self._async_loop.is_closed():
+                    raise TaskSchedulerError("Async event loop is not running")
                 asyncio.run_coroutine_threadsafe(self._run_async_task(task), self._async_loop)
-        else:
-            # 同步任务在单独的线程中执行
-            thread = threading.Thread(target=self._run_sync_task, args=(task,), daemon=True)
-            thread.start()
+            elif task.backend == ExecutorBackend.PROCESS:
+                # CPU密集型任务提交到进程池，结果通过回调处理
+                future = self._get_process_pool().submit(task.func, *task.args, **task.kwargs)
+                future.add_done_callback(lambda f: self._on_process_task_done(task, f))
+            else:
+                # 同步任务提交到固定大小的线程池
+                if self._thread_pool is None:
+                    raise TaskSchedulerError("Thread pool is not running")
+                self._thread_pool.submit(self._run_sync_task, task)
+        except Exception as e:
+            self._finish_task(task, error=e)
     
     def _run_sync_task(self, task: Task) -> None:
         """执行同步任务"""
-        with self._task_lock:
-            # 更新任务状态
-            task.status = TaskStatus.RUNNING
-            task.start_time = datetime.now()
-            self._pending_tasks.remove(task)
-            self._running_tasks[task.task_id] = task
-        
         try:
             # 执行任务函数
             result = task.func(*task.args, **task.kwargs)
-            
-            with self._task_lock:
-                # 更新任务状态为完成
-                task.status = TaskStatus.COMPLETED
-                task.result = result
-                task.end_time = datetime.now()
-                self._running_tasks.pop(task.task_id, None)
-                self._completed_tasks[task.task_id] = task
-                
-            logger.debug(f"Task {task.task_id} completed successfully")
         except Exception as e:
-            with self._task_lock:
-                task.retries += 1
-                
-                # 判断是否需要重试
-                if task.retries <= task.max_retries:
-                    # 计算下次重试时间
-                    retry_time = datetime.now() + timedelta(seconds=task.retry_delay * (2 ** (task.retries - 1)))
-                    task.scheduled_time = retry_time
-                    task.status = TaskStatus.PENDING
-                    task.error = e
-                    
-                    # 重新加入待执行任务列表
-                    self._running_tasks.pop(task.task_id, None)
-                    self._pending_tasks.append(task)
-                    
-                    logger.warning(f"Task {task.task_id} failed, will retry ({task.retries}/{task.max_retries}) at {retry_time}")
-                else:
-                    # 任务失败，不再重试
-                    task.status = TaskStatus.FAILED
-                    task.error = e
-                    task.end_time = datetime.now()
-                    self._running_tasks.pop(task.task_id, None)
-                    self._failed_tasks[task.task_id] = task
-                    
-                    logger.error(f"Task {task.task_id} failed after {task.max_retries} retries: {str(e)}")
+            self._finish_task(task, error=e)
+        else:
+            self._finish_task(task, result=result)
+    
+    def _on_process_task_done(self, task: Task, future: Future) -> None:
+        """进程池任务完成回调"""
+        if future.cancelled():
+            self._finish_task(task, error=TaskExecutionError("Process task was cancelled"))
+        elif future.exception() is not None:
+            self._finish_task(task, error=future.exception())
+        else:
+            self._finish_task(task, result=future.result())
     
     async def _run_async_task(self, task: Task) -> None:
         """执行异步任务"""
-        with self._task_lock:
-            # 更新任务状态
-            task.status = TaskStatus.RUNNING
-            task.start_time = datetime.now()
-            self._pending_tasks.remove(task)
-            self._running_tasks[task.task_id] = task
-        
+        result, error = None, None
         try:
             # 执行异步任务函数
             result = await task.func(*task.args, **task.kwargs)
+        except Exception as e:
+            error = e
+        
+        if task.durable and self._store is not None:
+            # 存储写入是阻塞调用，不在事件循环线程中执行
+            await asyncio.get_running_loop().run_in_executor(None, self._finish_task, task, result, error)
+        else:
+            self._finish_task(task, result, error)
+    
+    def _finish_task(self, task: Task, result: Any = None, error: Optional[Exception] = None) -> None:
+        """记录任务结束状态，失败时按指数退避重新调度"""
+        # 计算下次重试时间，None表示不再重试
+        retry_time = None
+        if error is not None and task.retries < task.max_retries:
+            retry_time = datetime.now() + timedelta(seconds=task.retry_delay * (2 ** task.retries))
+        
+        # 在任务锁外写入存储；先持久化重试计划，再重新加入待执行任务堆
+        lease_lost = False
+        if task.durable and self._store is not None:
+            if retry_time is not None:
+                written = self._store_call(
+                    "reschedule", task.task_id, self._owner_id, retry_time.timestamp(), task.retries + 1, str(error)
+                )
+            else:
+                status = TaskStatus.COMPLETED if error is None else TaskStatus.FAILED
+                written = self._store_call(
+                    "finish", task.task_id, self._owner_id, status.value, None if error is None else str(error)
+                )
+            lease_lost = written is False
+            if lease_lost:
+                logger.warning(f"Task {task.task_id} lease was lost before it finished; the store keeps the current owner's state")
+        
+        with self._task_cond:
+            # 释放执行后端的工作者
+            if task.start_time:
+                self._backend_busy_seconds[task.backend] += (datetime.now() - task.start_time).total_seconds()
+            self._release_slot(task)
             
-            with self._task_lock:
+            if error is None:
                 # 更新任务状态为完成
                 task.status = TaskStatus.COMPLETED
                 task.result = result
                 task.end_time = datetime.now()
-                self._running_tasks.pop(task.task_id, None)
-                self._completed_tasks[task.task_id] = task
+                self._record_history(self._completed_tasks, task)
+                logger.debug(f"Task {task.task_id} completed successfully")
+                return
+            
+            task.retries += 1
+            task.error = error
+            
+            # 判断是否需要重试
+            if retry_time is not None:
+                task.scheduled_time = retry_time
+                self._stats_for(task).retried += 1
+                if lease_lost:
+                    # 租约已被其他实例接管，由接管的实例负责重试
+                    task.status = TaskStatus.CANCELLED
+                    return
+                if task.schedule_id is not None:
+                    schedule = self._recurring.get(task.schedule_id)
+                    if schedule is not None:
+                        schedule.retry_task_ids.add(task.task_id)
+                self._push_pending(task)
                 
-            logger.debug(f"Async task {task.task_id} completed successfully")
-        except Exception as e:
-            with self._task_lock:
-                task.retries += 1
+                logger.warning(f"Task {task.task_id} failed, will retry ({task.retries}/{task.max_retries}) at {retry_time}")
+            else:
+                # 任务失败，不再重试
+                task.status = TaskStatus.FAILED
+                task.end_time = datetime.now()
+                self._record_history(self._failed_tasks, task)
                 
-                # 判断是否需要重试
-                if task.retries <= task.max_retries:
-                    # 计算下次重试时间
-                    retry_time = datetime.now() + timedelta(seconds=task.retry_delay * (2 ** (task.retries - 1)))
-                    task.scheduled_time = retry_time
-                    task.status = TaskStatus.PENDING
-                    task.error = e
-                    
-                    # 重新加入待执行任务列表
-                    self._running_tasks.pop(task.task_id, None)
-                    self._pending_tasks.append(task)
-                    
-                    logger.warning(f"Async task {task.task_id} failed, will retry ({task.retries}/{task.max_retries}) at {retry_time}")
-                else:
-                    # 任务失败，不再重试
-                    task.status = TaskStatus.FAILED
-                    task.error = e
-                    task.end_time = datetime.now()
-                    self._running_tasks.pop(task.task_id, None)
-                    self._failed_tasks[task.task_id] = task
-                    
-                    logger.error(f"Async task {task.task_id} failed after {task.max_retries} retries: {str(e)}")
+                logger.error(f"Task {task.task_id} failed after {task.max_retries} retries: {str(error)}")
+    
+    def _stats_for(self, task: Task) -> _TaskStats:
+        stats = self._task_stats.get(task.name)
+        if stats is None:
+            stats = self._task_stats[task.name] = _TaskStats(self._config["latency_window"])
+        return stats
     
-    def _cleanup_history_tasks(self) -> None:
-        """清理历史任务"""
+    def _record_history(self, history: "OrderedDict[str, Task]", task: Task) -> None:
+        """记录结束的任务并更新统计（调用方需持有_task_lock），超出上限时淘汰最早的记录"""
+        stats = self._stats_for(task)
+        if task.status == TaskStatus.COMPLETED:
+            stats.completed += 1
+        elif task.status == TaskStatus.FAILED:
+            stats.failed += 1
+        elif task.status == TaskStatus.CANCELLED:
+            stats.cancelled += 1
+        if task.start_time and task.end_time:
+            stats.durations.append((task.end_time - task.start_time).total_seconds())
+        stats.last_end = task.end_time
+        
+        history[task.task_id] = task
+        history.move_to_end(task.task_id)
+        while len(history) > self._config["task_history_size"]:
+            _, evicted = history.popitem(last=False)
+            # 持久化任务已在存储中保存了最终状态，只需写入内存任务
+            if self._config["history_spill"] and self._store is not None and not evicted.durable:
+                self._spill_buffer.append(evicted.to_history_record())
+        if len(self._spill_buffer) >= self._config["store"]["batch_size"]:
+            self._task_cond.notify()
+    
+    def _flush_spill_buffer(self) -> None:
+        """批量写入淘汰的历史记录（不持有任务锁执行写入）"""
         with self._task_lock:
-            # 清理已完成任务
-            if len(self._completed_tasks) > self._config["task_history_size"]:
-                # 按完成时间排序，保留最近的任务
-                sorted_tasks = sorted(
-                    self._completed_tasks.items(), 
-                    key=lambda x: x[1].end_time or datetime.min, 
-                    reverse=True
-                )
-                
-                # 删除超出限制的任务
-                to_remove = sorted_tasks[self._config["task_history_size"]:]
-                for task_id, _ in to_remove:
-                    self._completed_tasks.pop(task_id, None)
-            
-            # 清理失败任务
-            if len(self._failed_tasks) > self._config["task_history_size"]:
-                # 按完成时间排序，保留最近的任务
-                sorted_tasks = sorted(
-                    self._failed_tasks.items(), 
-                    key=lambda x: x[1].end_time or datetime.min, 
-                    reverse=True
-                )
-                
-                # 删除超出限制的任务
-                to_remove = sorted_tasks[self._config["task_history_size"]:]
-                for task_id, _ in to_remove:
-                    self._failed_tasks.pop(task_id, None)
+            records, self._spill_buffer = self._spill_buffer, []
+        if records and self._store is not None:
+            self._store_call("save_many", records)
+    
+    def get_task_summary(self, name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        获取按任务名聚合的统计：完成/失败/取消/重试次数和执行耗时分位数（秒）
+        
+        统计独立于历史记录保留上限，淘汰历史记录不会丢失计数。
+        """
+        with self._task_lock:
+            if name is not None:
+                stats = self._task_stats.get(name)
+                return {name: stats.to_dict()} if stats else {}
+            return {task_name: stats.to_dict() for task_name, stats in self._task_stats.items()}
     
     def schedule_task(
         self,
@@ -401,45 +1188,209 @@ class TaskScheduler:
         max_retries: int = 3,
         retry_delay: int = 5,
         is_async: bool = False,
-        description: Optional[str] = None
+        description: Optional[str] = None,
+        backend: Optional[Union[ExecutorBackend, str]] = None,
+        durable: Optional[bool] = None,
+        task_class: Optional[str] = None
     ) -> str:
-        """调度任务"""
+        """
+        调度任务
+        
+        backend 指定执行后端：thread（默认）、process（CPU密集型任务）或 async（异步函数）。
+        durable 控制是否先写入持久化存储再入队：None表示函数可导入且参数可编码时持久化，
+        True表示必须持久化（否则抛出异常），False表示仅保存在内存中。
+        task_class 指定已注册的任务类，受其并发和速率上限约束。
+        """
+        if task_class is not None and task_class not in self._task_classes:
+            raise TaskSchedulerError(f"Unknown task class: {task_class}")
+        if backend is not None and (ExecutorBackend(backend) == ExecutorBackend.ASYNC) != is_async:
+            raise TaskSchedulerError("Async tasks must use the async backend and sync tasks must not")
+        
         # 检查待执行任务数量
         with self._task_lock:
-            if len(self._pending_tasks) >= self._config["max_pending_tasks"]:
+            if len(self._pending_index) >= self._config["max_pending_tasks"]:
                 raise TaskSchedulerError("Maximum number of pending tasks reached")
+        
+        # 处理调度时间
+        if scheduled_time is None:
+            task_scheduled_time = datetime.now()
+        elif isinstance(scheduled_time, (int, float)):
+            # 秒数或时间戳
+            if scheduled_time < 365 * 24 * 3600:  # 小于一年的秒数，视为延迟执行
+                task_scheduled_time = datetime.now() + timedelta(seconds=scheduled_time)
+            else:  # 否则视为时间戳
+                task_scheduled_time = datetime.fromtimestamp(scheduled_time)
+        else:
+            task_scheduled_time = scheduled_time
+        
+        # 创建任务
+        task = Task(
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            priority=priority,
+            scheduled_time=task_scheduled_time,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            is_async=is_async,
+            description=description,
+            backend=backend,
+            task_class=task_class
+        )
+        
+        # 预写：先写入持久化存储，再加入内存队列
+        if durable is not False:
+            self._persist_task(task, required=bool(durable))
+        
+        with self._task_cond:
+            # 添加到待执行任务堆并唤醒调度线程
+            self._push_pending(task)
+        
+        logger.debug(f"Task {task.task_id} scheduled for {task_scheduled_time}")
+        
+        return task.task_id
+    
+    def _persist_task(self, task: Task, required: bool) -> None:
+        """将新任务写入持久化存储"""
+        if self._store is None:
+            if required:
+                raise TaskSchedulerError("Task store is not configured")
+            return
+        
+        try:
+            record = task.to_record()
+        except Exception as e:
+            if required:
+                raise TaskSchedulerError(f"Task {task.task_id} cannot be persisted: {str(e)}")
+            logger.debug(f"Task {task.task_id} is not persistable, keeping it in memory: {str(e)}")
+            return
+        
+        try:
+            self._store.save(record)
+        except Exception as e:
+            if required:
+                raise TaskSchedulerError(f"Failed to persist task {task.task_id}: {str(e)}")
+            logger.error(f"Failed to persist task {task.task_id}, keeping it in memory: {str(e)}")
+            return
+        task.durable = True
+    
+    def register_task_class(
+        self,
+        name: str,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[Union[str, Tuple[float, float]]] = None
+    ) -> TaskClass:
+        """
+        注册（或更新）命名任务类
+        
+        Args:
+            name: 任务类名称，如 "okx-api"
+            max_concurrency: 同时运行的最大任务数
+            rate_limit: 启动速率上限，如 "10/s"、"600/m"
+        """
+        with self._task_cond:
+            task_class = TaskClass(name, max_concurrency=max_concurrency, rate_limit=rate_limit)
+            existing = self._task_classes.get(name)
+            if existing is not None:
+                task_class.running = existing.running
+                task_class.started = existing.started
+                task_class.waiting = existing.waiting
+            self._task_classes[name] = task_class
+            self._task_cond.notify()
+            return task_class
+    
+    def schedule_recurring(
+        self,
+        func: Callable,
+        interval: Optional[float] = None,
+        cron: Optional[str] = None,
+        name: Optional[str] = None,
+        args: tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        jitter: float = 0.0,
+        skip_if_running: bool = True,
+        run_immediately: bool = False,
+        priority: int = TaskPriority.MEDIUM,
+        backend: Optional[Union[ExecutorBackend, str]] = None,
+        task_class: Optional[str] = None,
+        max_retries: int = 0,
+        retry_delay: int = 5,
+        description: Optional[str] = None
+    ) -> str:
+        """
+        调度周期任务
+        
+        Args:
+            func: 任务函数（同步或异步）
+            interval: 固定间隔（秒），与cron二选一
+            cron: 五段式cron表达式，与interval二选一
+            name: 周期任务ID，已存在时替换原定义
+            jitter: 每次触发随机延后 0~jitter 秒，避免多实例同时触发
+            skip_if_running: 上一次仍在运行时跳过本次
+            run_immediately: 是否立即执行第一次
+            task_class: 已注册的任务类
+            max_retries: 单次执行失败的重试次数（默认不重试，等待下一次触发）
+        
+        Returns:
+            周期任务ID
+        """
+        if task_class is not None and task_class not in self._task_classes:
+            raise TaskSchedulerError(f"Unknown task class: {task_class}")
+        
+        schedule = RecurringSchedule(
+            schedule_id=name or str(uuid.uuid4()),
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            interval=interval,
+            cron=cron,
+            jitter=jitter,
+            skip_if_running=skip_if_running,
+            priority=priority,
+            is_async=asyncio.iscoroutinefunction(func),
+            backend=backend,
+            task_class=task_class,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            description=description
+        )
+        
+        with self._task_cond:
+            previous = self._recurring.get(schedule.schedule_id)
+            if previous is not None:
+                self._cancel_occurrence(previous)
             
-            # 处理调度时间
-            if scheduled_time is None:
-                task_scheduled_time = datetime.now()
-            elif isinstance(scheduled_time, (int, float)):
-                # 秒数或时间戳
-                if scheduled_time < 365 * 24 * 3600:  # 小于一年的秒数，视为延迟执行
-                    task_scheduled_time = datetime.now() + timedelta(seconds=scheduled_time)
-                else:  # 否则视为时间戳
-                    task_scheduled_time = datetime.fromtimestamp(scheduled_time)
-            else:
-                task_scheduled_time = scheduled_time
-            
-            # 创建任务
-            task = Task(
-                func=func,
-                args=args,
-                kwargs=kwargs,
-                priority=priority,
-                scheduled_time=task_scheduled_time,
-                max_retries=max_retries,
-                retry_delay=retry_delay,
-                is_async=is_async,
-                description=description
-            )
-            
-            # 添加到待执行任务列表
-            self._pending_tasks.append(task)
-            
-            logger.debug(f"Task {task.task_id} scheduled for {task_scheduled_time}")
-            
-            return task.task_id
+            now = datetime.now()
+            schedule.next_base = now if run_immediately else schedule.next_after(now)
+            self._recurring[schedule.schedule_id] = schedule
+            self._enqueue_occurrence(schedule)
+        
+        logger.info(f"Recurring task {schedule.schedule_id} scheduled, next run at {schedule.next_base}")
+        return schedule.schedule_id
+    
+    def _cancel_occurrence(self, schedule: RecurringSchedule) -> None:
+        """取消周期任务尚未执行的实例（调用方需持有_task_lock）"""
+        task = self._pending_index.pop(schedule.pending_task_id, None) if schedule.pending_task_id else None
+        if task is not None:
+            task.status = TaskStatus.CANCELLED
+        schedule.pending_task_id = None
+    
+    def cancel_recurring(self, schedule_id: str) -> bool:
+        """取消周期任务（正在运行的实例会执行完毕）"""
+        with self._task_cond:
+            schedule = self._recurring.pop(schedule_id, None)
+            if schedule is None:
+                return False
+            self._cancel_occurrence(schedule)
+            self._compact_pending()
+        
+        logger.info(f"Recurring task {schedule_id} cancelled")
+        return True
+    
+    def get_recurring_tasks(self) -> List[Dict[str, Any]]:
+        """获取周期任务列表"""
+        with self._task_lock:
+            return [schedule.to_dict() for schedule in self._recurring.values()]
     
     def schedule_async_task(
         self,
@@ -477,7 +1428,7 @@ class TaskScheduler:
                 task = self._failed_tasks[task_id]
             else:
                 # 在待执行任务中查找
-                task = next((t for t in self._pending_tasks if t.task_id == task_id), None)
+                task = self._pending_index.get(task_id)
             
             if not task:
                 raise TaskNotFoundError(f"Task with ID {task_id} not found")
@@ -496,33 +1447,38 @@ class TaskScheduler:
     def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
         with self._task_lock:
-            # 查找待执行任务
-            task_index = next((i for i, t in enumerate(self._pending_tasks) if t.task_id == task_id), None)
+            # 查找待执行任务，堆中的条目在出堆时跳过
+            task = self._pending_index.pop(task_id, None)
             
-            if task_index is not None:
-                task = self._pending_tasks.pop(task_index)
+            if task is not None:
                 task.status = TaskStatus.CANCELLED
                 task.end_time = datetime.now()
                 
                 # 添加到已取消任务记录
-                self._completed_tasks[task_id] = task
-                
+                self._record_history(self._completed_tasks, task)
+                self._compact_pending()
                 logger.debug(f"Task {task_id} cancelled")
-                return True
             
-            # 检查运行中任务（无法直接取消）
-            if task_id in self._running_tasks:
+            elif task_id in self._running_tasks:
+                # 检查运行中任务（无法直接取消）
                 logger.warning(f"Cannot cancel running task {task_id}")
                 return False
             
-            # 任务不存在或已完成/失败
-            logger.warning(f"Task {task_id} not found or already completed/failed")
-            return False
+            else:
+                # 任务不存在或已完成/失败
+                logger.warning(f"Task {task_id} not found or already completed/failed")
+                return False
+        
+        # 在任务锁外写入存储，任务已被其他实例认领时不覆盖其状态
+        if task.durable and self._store is not None:
+            if self._store_call("finish_pending", task_id, TaskStatus.CANCELLED.value, None) is False:
+                logger.warning(f"Task {task_id} was already claimed in the task store; only the local copy was cancelled")
+        return True
     
     def get_pending_tasks(self) -> List[Dict[str, Any]]:
         """获取待执行任务列表"""
         with self._task_lock:
-            return [task.to_dict() for task in self._pending_tasks]
+            return [task.to_dict() for task in self._pending_index.values()]
     
     def get_running_tasks(self) -> List[Dict[str, Any]]:
         """获取运行中任务列表"""
@@ -539,18 +1495,59 @@ class TaskScheduler:
         with self._task_lock:
             return [task.to_dict() for task in self._failed_tasks.values()]
     
+    def _clear_pending(self) -> None:
+        """清空待执行任务（调用方需持有_task_lock），同时取消存储中的待执行任务"""
+        if self._store is not None:
+            self._store_call("cancel_pending")
+        for task in self._pending_index.values():
+            task.status = TaskStatus.CANCELLED
+        self._pending_index.clear()
+        self._pending_heap.clear()
+        for heap in self._ready_heaps.values():
+            heap.clear()
+        for task_class in self._task_classes.values():
+            task_class.waiting.clear()
+        # 周期任务的下一次实例需要重新入队
+        for schedule in self._recurring.values():
+            self._enqueue_occurrence(schedule)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取各执行后端的队列深度和工作者利用率"""
+        with self._task_lock:
+            backends = {}
+            for backend in ExecutorBackend:
+                workers = self._backend_limits[backend]
+                busy = self._backend_busy[backend]
+                backends[backend.value] = {
+                    'workers': workers,
+                    'busy': busy,
+                    'utilization': busy / workers if workers else 0.0,
+                    'queue_depth': sum(
+                        1 for e in self._ready_heaps[backend] if e[3].status == TaskStatus.PENDING
+                    ),
+                    'busy_seconds': round(self._backend_busy_seconds[backend], 3)
+                }
+            
+            return {
+                'pending': len(self._pending_index),
+                'running': len(self._running_tasks),
+                'backends': backends,
+                'task_classes': {name: tc.to_dict() for name, tc in self._task_classes.items()},
+                'recurring': len(self._recurring)
+            }
+    
     def clear_tasks(self, status: Optional[TaskStatus] = None) -> None:
         """清理任务"""
         with self._task_lock:
             if status is None:
                 # 清理所有任务
-                self._pending_tasks.clear()
+                self._clear_pending()
                 self._completed_tasks.clear()
                 self._failed_tasks.clear()
                 # 不清理运行中的任务
             elif status == TaskStatus.PENDING:
                 # 清理待执行任务
-                self._pending_tasks.clear()
+                self._clear_pending()
             elif status == TaskStatus.COMPLETED:
                 # 清理已完成任务
                 self._completed_tasks.clear()
@@ -564,7 +1561,8 @@ class TaskScheduler:
 def task(
     priority: int = TaskPriority.MEDIUM,
     max_retries: int = 3,
-    retry_delay: int = 5
+    retry_delay: int = 5,
+    backend: Optional[Union[ExecutorBackend, str]] = None
 ):
     """将函数转换为可调度任务的装饰器"""
     def decorator(func: Callable) -> Callable:
@@ -585,7 +1583,8 @@ def task(
                 max_retries=max_retries,
                 retry_delay=retry_delay,
                 is_async=is_async,
-                description=f"Task for {func.__name__}"
+                description=f"Task for {func.__name__}",
+                backend=backend
             )
             
             return task_id
@@ -634,6 +1633,10 @@ __all__ = [
     'TaskNotFoundError',
     'TaskStatus',
     'TaskPriority',
+    'ExecutorBackend',
+    'CronSpec',
+    'TaskClass',
+    'RecurringSchedule',
     'Task',
     'TaskScheduler',
     'task_scheduler',
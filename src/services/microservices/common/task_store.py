@@ -0,0 +1,308 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Table, Column, MetaData, String, Integer, Float, Boolean, LargeBinary, Text, Index, and_, or_, bindparam
+from .database import DatabaseOperationError, create_sqlite_engine
+from .logging_system import logger
+
+class TaskStoreError(DatabaseOperationError):
+    """任务存储异常"""
+    
+    def __init__(
+        self,
+        message: str = "Task store operation failed",
+        error_code: str = "TASK_STORE_ERROR",
+        **kwargs
+    ):
+        super().__init__(message, error_code, **kwargs)
+
+# 任务存储中的状态值与 TaskStatus 保持一致
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+# 任务表使用独立的元数据，避免随业务库的 Base.metadata.create_all 一起建表
+_metadata = MetaData()
+
+scheduled_tasks = Table(
+    "scheduled_tasks",
+    _metadata,
+    Column("task_id", String(64), primary_key=True),
+    Column("func_path", String(255), nullable=False),
+    Column("payload", LargeBinary, nullable=False),
+    Column("priority", Integer, nullable=False),
+    Column("scheduled_ts", Float, nullable=False),
+    Column("max_retries", Integer, nullable=False),
+    Column("retry_delay", Float, nullable=False),
+    Column("is_async", Boolean, nullable=False),
+    Column("backend", String(16), nullable=False),
+    Column("description", Text),
+    Column("status", String(16), nullable=False),
+    Column("retries", Integer, nullable=False, default=0),
+    Column("error", Text),
+    Column("owner", String(128)),
+    Column("lease_expires", Float),
+    Column("created_ts", Float, nullable=False),
+    Column("start_ts", Float),
+    Column("end_ts", Float),
+    Index("ix_scheduled_tasks_due", "status", "scheduled_ts"),
+    Index("ix_scheduled_tasks_lease", "status", "lease_expires"),
+)
+
+class TaskStore:
+    """
+    持久化任务存储接口
+    
+    记录为字典，字段与 scheduled_tasks 表一致。调度器在任务进入内存队列之前写入存储
+    （预写），执行前通过租约认领任务，因此多个调度器实例可以共享同一个存储；
+    租约过期仍处于RUNNING的任务会被恢复为PENDING重新执行（至少一次语义）。
+    """
+    
+    def save(self, record: Dict[str, Any]) -> None:
+        """保存（插入或覆盖）任务记录"""
+        raise NotImplementedError
+    
+    def save_many(self, records: List[Dict[str, Any]]) -> None:
+        """批量保存任务记录"""
+        for record in records:
+            self.save(record)
+    
+    def claim(self, task_id: str, owner: str, lease_seconds: float) -> bool:
+        """认领待执行任务，成功返回True；任务已被其他实例认领时返回False"""
+        raise NotImplementedError
+    
+    def renew(self, owner: str, lease_seconds: float) -> int:
+        """延长该实例所有运行中任务的租约"""
+        raise NotImplementedError
+    
+    def reschedule(self, task_id: str, owner: str, scheduled_ts: float, retries: int, error: Optional[str]) -> bool:
+        """重新调度失败的任务，仅当任务仍由 owner 运行时生效，租约已丢失时返回False"""
+        raise NotImplementedError
+    
+    def finish(self, task_id: str, owner: str, status: str, error: Optional[str] = None) -> bool:
+        """记录运行中任务的最终状态（completed/failed），仅当任务仍由 owner 运行时生效，租约已丢失时返回False"""
+        raise NotImplementedError
+    
+    def finish_pending(self, task_id: str, status: str, error: Optional[str] = None) -> bool:
+        """结束尚未被认领的待执行任务（取消或无法还原），任务已被认领或已结束时返回False"""
+        raise NotImplementedError
+    
+    def fetch_due(self, until_ts: float, limit: int) -> List[Dict[str, Any]]:
+        """获取调度时间早于 until_ts 的待执行任务"""
+        raise NotImplementedError
+    
+    def recover_expired(self) -> int:
+        """将租约过期的运行中任务恢复为待执行，返回恢复数量"""
+        raise NotImplementedError
+    
+    def cancel_pending(self) -> int:
+        """取消所有待执行任务"""
+        raise NotImplementedError
+    
+    def purge(self, before_ts: float) -> int:
+        """删除结束时间早于 before_ts 的历史任务"""
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        """释放资源"""
+
+class SQLiteTaskStore(TaskStore):
+    """基于SQLite（WAL模式）的任务存储"""
+    
+    def __init__(self, url: str = "sqlite:///task_scheduler.db", engine=None):
+        """
+        初始化SQLite任务存储
+        
+        Args:
+            url: SQLite连接URL
+            engine: 已创建的引擎（可选，优先于url）
+        """
+        try:
+            self._engine = engine or create_sqlite_engine(url)
+            _metadata.create_all(self._engine, tables=[scheduled_tasks])
+        except Exception as e:
+            raise TaskStoreError(message="Failed to open task store", details={"url": url, "error": str(e)})
+        # SQLite只允许一个写者，串行化写操作避免忙等
+        self._write_lock = threading.Lock()
+        self._prepare_statements()
+    
+    def _prepare_statements(self) -> None:
+        """预先构造热路径语句，避免每次状态变更重复构造和编译SQL"""
+        t = scheduled_tasks.c
+        self._stmt_save = scheduled_tasks.insert().prefix_with("OR REPLACE")
+        self._stmt_claim = (
+            scheduled_tasks.update()
+            .where(and_(
+                t.task_id == bindparam("b_task_id"),
+                or_(
+                    t.status == STATUS_PENDING,
+                    and_(t.status == STATUS_RUNNING, t.lease_expires < bindparam("b_now"))
+                )
+            ))
+            .values(
+                status=STATUS_RUNNING,
+                owner=bindparam("b_owner"),
+                lease_expires=bindparam("b_lease"),
+                start_ts=bindparam("b_now")
+            )
+        )
+        self._stmt_renew = (
+            scheduled_tasks.update()
+            .where(and_(t.owner == bindparam("b_owner"), t.status == STATUS_RUNNING))
+            .values(lease_expires=bindparam("b_lease"))
+        )
+        # 状态变更只作用于仍由本实例持有租约的任务，租约过期后被其他实例恢复的任务不会被覆盖
+        owned = and_(
+            t.task_id == bindparam("b_task_id"),
+            t.owner == bindparam("b_owner"),
+            t.status == STATUS_RUNNING
+        )
+        self._stmt_reschedule = (
+            scheduled_tasks.update()
+            .where(owned)
+            .values(
+                status=STATUS_PENDING,
+                scheduled_ts=bindparam("b_scheduled_ts"),
+                retries=bindparam("b_retries"),
+                error=bindparam("b_error"),
+                owner=None,
+                lease_expires=None
+            )
+        )
+        self._stmt_finish = (
+            scheduled_tasks.update()
+            .where(owned)
+            .values(
+                status=bindparam("b_status"),
+                error=bindparam("b_error"),
+                end_ts=bindparam("b_now"),
+                lease_expires=None
+            )
+        )
+        self._stmt_finish_pending = (
+            scheduled_tasks.update()
+            .where(and_(t.task_id == bindparam("b_task_id"), t.status == STATUS_PENDING))
+            .values(
+                status=bindparam("b_status"),
+                error=bindparam("b_error"),
+                end_ts=bindparam("b_now")
+            )
+        )
+    
+    def _execute(self, statement, params: Optional[Any] = None):
+        """在事务中执行语句"""
+        try:
+            with self._write_lock, self._engine.begin() as conn:
+                if params is None:
+                    return conn.execute(statement)
+                return conn.execute(statement, params)
+        except Exception as e:
+            raise TaskStoreError(details={"error": str(e)})
+    
+    def save(self, record: Dict[str, Any]) -> None:
+        self._execute(self._stmt_save, record)
+    
+    def save_many(self, records: List[Dict[str, Any]]) -> None:
+        if records:
+            self._execute(self._stmt_save, records)
+    
+    def claim(self, task_id: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        result = self._execute(self._stmt_claim, {
+            "b_task_id": task_id, "b_now": now, "b_owner": owner, "b_lease": now + lease_seconds
+        })
+        return result.rowcount == 1
+    
+    def renew(self, owner: str, lease_seconds: float) -> int:
+        result = self._execute(self._stmt_renew, {"b_owner": owner, "b_lease": time.time() + lease_seconds})
+        return result.rowcount
+    
+    def reschedule(self, task_id: str, owner: str, scheduled_ts: float, retries: int, error: Optional[str]) -> bool:
+        result = self._execute(self._stmt_reschedule, {
+            "b_task_id": task_id, "b_owner": owner, "b_scheduled_ts": scheduled_ts,
+            "b_retries": retries, "b_error": error
+        })
+        return result.rowcount == 1
+    
+    def finish(self, task_id: str, owner: str, status: str, error: Optional[str] = None) -> bool:
+        result = self._execute(self._stmt_finish, {
+            "b_task_id": task_id, "b_owner": owner, "b_status": status, "b_error": error, "b_now": time.time()
+        })
+        return result.rowcount == 1
+    
+    def finish_pending(self, task_id: str, status: str, error: Optional[str] = None) -> bool:
+        result = self._execute(self._stmt_finish_pending, {
+            "b_task_id": task_id, "b_status": status, "b_error": error, "b_now": time.time()
+        })
+        return result.rowcount == 1
+    
+    def fetch_due(self, until_ts: float, limit: int) -> List[Dict[str, Any]]:
+        t = scheduled_tasks.c
+        try:
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    scheduled_tasks.select()
+                    .where(and_(t.status == STATUS_PENDING, t.scheduled_ts <= until_ts))
+                    .order_by(t.scheduled_ts)
+                    .limit(limit)
+                ).mappings().all()
+        except Exception as e:
+            raise TaskStoreError(details={"error": str(e)})
+        return [dict(row) for row in rows]
+    
+    def recover_expired(self) -> int:
+        t = scheduled_tasks.c
+        result = self._execute(
+            scheduled_tasks.update()
+            .where(and_(t.status == STATUS_RUNNING, t.lease_expires < time.time()))
+            .values(status=STATUS_PENDING, owner=None, lease_expires=None)
+        )
+        if result.rowcount:
+            logger.warning(f"Recovered {result.rowcount} tasks with expired leases")
+        return result.rowcount
+    
+    def cancel_pending(self) -> int:
+        result = self._execute(
+            scheduled_tasks.update()
+            .where(scheduled_tasks.c.status == STATUS_PENDING)
+            .values(status=STATUS_CANCELLED, end_ts=time.time())
+        )
+        return result.rowcount
+    
+    def purge(self, before_ts: float) -> int:
+        t = scheduled_tasks.c
+        result = self._execute(
+            scheduled_tasks.delete().where(and_(
+                t.status.in_([STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED]),
+                t.end_ts < before_ts
+            ))
+        )
+        return result.rowcount
+    
+    def close(self) -> None:
+        self._engine.dispose()
+
+def create_task_store(config: Dict[str, Any]) -> Optional[TaskStore]:
+    """
+    根据配置创建任务存储
+    
+    Args:
+        config: task_scheduler.store 配置，backend 为 sqlite（默认）或 none
+    """
+    backend = config.get("backend", "sqlite")
+    if backend in (None, "none", "memory"):
+        return None
+    if backend == "sqlite":
+        return SQLiteTaskStore(url=config.get("url", "sqlite:///task_scheduler.db"))
+    raise TaskStoreError(message=f"Unknown task store backend: {backend}")
+
+# 导出所有类和函数
+__all__ = [
+    'TaskStoreError',
+    'TaskStore',
+    'SQLiteTaskStore',
+    'scheduled_tasks',
+    'create_task_store'
+]
@@ -5,14 +5,16 @@ import uvicorn
 import time
 import web3
 from web3 import Web3
-import asyncio
 from datetime import datetime, timedelta
 import math
 
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_FUND_EVENTS, QUEUE_RISK_ALERTS
+from ..common.message_queue import QUEUE_FUND_EVENTS, QUEUE_RISK_ALERTS
+from ..common.async_message_queue import async_mq_client
+from ..common.envelope import register_schema
+from ..common.task_scheduler import task_scheduler
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -76,6 +78,7 @@ class FundTransfer(BaseModel):
         return v
 
 # 资金事件模型
+@register_schema("fund_management.fund_event")
 class FundEvent(BaseModel):
     event_id: str = Field(..., description="Unique event identifier")
     event_type: str = Field(..., description="Event type (deposit, withdrawal, transfer, payout)")
@@ -183,7 +186,7 @@ def execute_fund_transfer(transfer: FundTransfer) -> bool:
         )
         
         # 发布资金事件到消息队列
-        mq_client.publish_message(QUEUE_FUND_EVENTS, fund_event.dict())
+        async_mq_client.publish_nowait(QUEUE_FUND_EVENTS, fund_event)
         
         # 记录审计日志
         audit_logger.log_fund_transfer(
@@ -268,7 +271,7 @@ def assess_system_risk() -> RiskAssessment:
                 "timestamp": int(time.time()),
                 "assessment_id": assessment.assessment_id
             }
-            mq_client.publish_message(QUEUE_RISK_ALERTS, alert_message)
+            async_mq_client.publish_nowait(QUEUE_RISK_ALERTS, alert_message)
             
         logger.info(f"Risk assessment completed: {assessment.assessment_id}, Risk level: {risk_level}")
         return assessment
@@ -285,20 +288,19 @@ def assess_system_risk() -> RiskAssessment:
             fund_status={}
         )
 
-# 异步函数：定期执行风险评估
-async def periodic_risk_assessment():
-    """定期执行系统风险评估"""
-    assessment_interval = config_manager.get('risk.assessment_interval', 3600)  # 默认1小时
-    
-    while True:
-        try:
-            # 执行风险评估
-            assess_system_risk()
-        except Exception as e:
-            logger.error(f"Periodic risk assessment failed: {str(e)}")
-        
-        # 等待下一次评估
-        await asyncio.sleep(assessment_interval)
+# 定期风险评估的周期任务ID
+RISK_ASSESSMENT_SCHEDULE = "fund_management.periodic_risk_assessment"
+
+def schedule_periodic_risk_assessment() -> str:
+    """在任务调度器中注册定期系统风险评估"""
+    return task_scheduler.schedule_recurring(
+        assess_system_risk,
+        interval=config_manager.get('risk.assessment_interval', 3600),  # 默认1小时
+        name=RISK_ASSESSMENT_SCHEDULE,
+        jitter=config_manager.get('risk.assessment_jitter', 30),
+        run_immediately=True,
+        description="Periodic system risk assessment"
+    )
 
 # API端点：健康检查
 @app.get("/health", tags=["Health"])
@@ -311,7 +313,7 @@ async def health_check():
     contract_connected = web3_connected and contract is not None
     
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 总体健康状态
     overall_status = "up" if web3_connected and mq_connected else "down"
@@ -489,13 +491,12 @@ async def startup_event():
     logger.info("Fund Management Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
-    # 启动定期风险评估任务
-    loop = asyncio.get_event_loop()
-    loop.create_task(periodic_risk_assessment())
+    # 启动定期风险评估任务（上一次未完成时跳过本次）
+    schedule_periodic_risk_assessment()
     
     logger.info("Fund Management Service started successfully")
 
@@ -505,8 +506,11 @@ async def shutdown_event():
     """应用关闭时执行"""
     logger.info("Fund Management Service shutting down...")
     
+    # 停止定期风险评估
+    task_scheduler.cancel_recurring(RISK_ASSESSMENT_SCHEDULE)
+    
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("Fund Management Service shut down successfully")
 
@@ -13,7 +13,9 @@ from eth_account import Account
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_VERIFICATION_REQUESTS, QUEUE_VERIFICATION_RESULTS
+from ..common.message_queue import ConsumeResult, QUEUE_VERIFICATION_REQUESTS, QUEUE_VERIFICATION_RESULTS
+from ..common.async_message_queue import async_mq_client
+from ..common.envelope import register_schema, trace_context
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -48,6 +50,7 @@ if CONTRACT_ADDRESS and CONTRACT_ABI:
         logger.error(f"Failed to initialize smart contract: {str(e)}")
 
 # 订单验证模型
+@register_schema("order_verification.order")
 class Order(BaseModel):
     order_id: str = Field(..., description="Unique order identifier")
     user_address: str = Field(..., description="User wallet address")
@@ -89,6 +92,7 @@ class Order(BaseModel):
         return v
 
 # 验证结果模型
+@register_schema("order_verification.result")
 class VerificationResult(BaseModel):
     order_id: str
     is_valid: bool
@@ -229,44 +233,55 @@ def verify_order(order: Order) -> VerificationResult:
 
 # 异步函数：处理队列中的验证请求
 async def process_verification_queue():
-    """从队列中获取验证请求并处理"""
-    def callback(ch, method, properties, body):
-        """队列消息处理回调函数"""
+    """从队列中批量获取验证请求并处理"""
+    def verify_batch(orders, trace_ids):
+        """批量验证订单（在线程池中执行），返回每条消息的处理结果、验证结果及其跟踪ID"""
+        outcomes = []
+        verification_results = []
+        result_trace_ids = []
+        for order, trace_id in zip(orders, trace_ids):
+            try:
+                # 验证订单（验证结果沿用请求的跟踪ID）
+                with trace_context(trace_id):
+                    result = verify_order(order)
+                verification_results.append(result)
+                result_trace_ids.append(trace_id)
+                
+                # 记录审计日志
+                audit_logger.log_order_verification(
+                    order_id=order.order_id,
+                    user_address=order.user_address,
+                    is_valid=result.is_valid,
+                    risk_score=result.risk_score,
+                    reason=result.reason
+                )
+                outcomes.append(ConsumeResult.ACK)
+            except Exception as e:
+                logger.error(f"Error processing verification request: {str(e)}")
+                outcomes.append(ConsumeResult.REJECT)
+        return outcomes, verification_results, result_trace_ids
+    
+    async def handle_batch(orders, trace_ids):
+        """批量处理回调函数，返回每条消息的处理结果；无法处理的消息进入死信队列"""
+        outcomes, verification_results, result_trace_ids = await asyncio.to_thread(verify_batch, orders, trace_ids)
+        
+        # 整批发布验证结果到结果队列，发布确认后才确认请求；发布失败时请求重新入队
         try:
-            # 解析订单数据
-            import json
-            order_data = json.loads(body)
-            order = Order(**order_data)
-            
-            # 验证订单
-            result = verify_order(order)
-            
-            # 发布验证结果到结果队列
-            mq_client.publish_message(QUEUE_VERIFICATION_RESULTS, result.dict())
-            
-            # 记录审计日志
-            audit_logger.log_order_verification(
-                order_id=order.order_id,
-                user_address=order.user_address,
-                is_valid=result.is_valid,
-                risk_score=result.risk_score,
-                reason=result.reason
-            )
-            
-            # 确认消息已处理
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
+            await async_mq_client.publish_batch(QUEUE_VERIFICATION_RESULTS, verification_results, trace_ids=result_trace_ids)
         except Exception as e:
-            logger.error(f"Error processing verification request: {str(e)}")
-            # 处理失败，将消息重新入队或死信队列
-            try:
-                # 可以设置重新入队的逻辑或死信队列处理
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            except:
-                pass
+            logger.error(f"Failed to publish {len(verification_results)} verification results: {str(e)}")
+            outcomes = [ConsumeResult.REQUEUE if outcome == ConsumeResult.ACK else outcome for outcome in outcomes]
+        return outcomes
     
-    # 消费队列消息
-    mq_client.consume_messages(QUEUE_VERIFICATION_REQUESTS, callback)
+    # 批量消费队列消息
+    await async_mq_client.consume_batch(
+        QUEUE_VERIFICATION_REQUESTS,
+        handle_batch,
+        batch_size=config_manager.get('order_verification.batch_size', 100),
+        batch_timeout_ms=config_manager.get('order_verification.batch_timeout_ms', 50),
+        model=Order,
+        with_trace_ids=True
+    )
 
 # API端点：健康检查
 @app.get("/health", tags=["Health"])
@@ -279,7 +294,7 @@ async def health_check():
     contract_connected = web3_connected and contract is not None
     
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 总体健康状态
     overall_status = "up" if web3_connected and mq_connected else "down"
@@ -320,8 +335,7 @@ async def submit_verification_request(order: Order, background_tasks: Background
     """异步提交订单验证请求"""
     try:
         # 将订单发布到消息队列
-        order_dict = order.dict()
-        success = mq_client.publish_message(QUEUE_VERIFICATION_REQUESTS, order_dict)
+        success = await async_mq_client.publish_message(QUEUE_VERIFICATION_REQUESTS, order)
         
         if success:
             logger.info(f"Order verification request submitted: {order.order_id}")
@@ -390,7 +404,7 @@ async def startup_event():
     logger.info("Order Verification Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -407,7 +421,7 @@ async def shutdown_event():
     logger.info("Order Verification Service shutting down...")
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("Order Verification Service shut down successfully")
 
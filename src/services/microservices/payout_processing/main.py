@@ -13,7 +13,9 @@ import string
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_PAYOUT_REQUESTS, QUEUE_PAYOUT_RESULTS
+from ..common.message_queue import QUEUE_PAYOUT_REQUESTS, QUEUE_PAYOUT_RESULTS
+from ..common.async_message_queue import async_mq_client
+from ..common.envelope import register_schema
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -50,6 +52,7 @@ if CONTRACT_ADDRESS and CONTRACT_ABI:
         logger.error(f"Failed to initialize smart contract: {str(e)}")
 
 # 赔付请求模型
+@register_schema("payout.request")
 class PayoutRequest(BaseModel):
     claim_id: str = Field(..., description="Unique claim identifier")
     user_address: str = Field(..., description="User wallet address")
@@ -77,6 +80,7 @@ class PayoutRequest(BaseModel):
         return v
 
 # 赔付结果模型
+@register_schema("payout.result")
 class PayoutResult(BaseModel):
     claim_id: str
     status: str  # pending, processing, completed, failed
@@ -201,14 +205,9 @@ def execute_payout(request: PayoutRequest) -> Dict[str, Any]:
 # 异步函数：处理队列中的赔付请求
 async def process_payout_queue():
     """从队列中获取赔付请求并处理"""
-    def callback(ch, method, properties, body):
-        """队列消息处理回调函数"""
+    def callback(request):
+        """队列消息处理回调函数（在线程池中执行；返回即确认，抛出异常时消息进入死信队列）"""
         try:
-            # 解析赔付请求数据
-            import json
-            request_data = json.loads(body)
-            request = PayoutRequest(**request_data)
-            
             # 创建赔付结果对象
             fee = calculate_payout_fee(request.amount)
             result = PayoutResult(
@@ -242,7 +241,7 @@ async def process_payout_queue():
                 logger.error(f"Payout processing failed: {request.claim_id}, Error: {str(e)}")
             
             # 发布赔付结果到结果队列
-            mq_client.publish_message(QUEUE_PAYOUT_RESULTS, result.dict())
+            async_mq_client.publish_nowait(QUEUE_PAYOUT_RESULTS, result)
             
             # 记录审计日志
             audit_logger.log_payout_processing(
@@ -254,19 +253,12 @@ async def process_payout_queue():
                 error_message=result.error_message
             )
             
-            # 确认消息已处理
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
         except Exception as e:
             logger.error(f"Error processing payout request: {str(e)}")
-            # 处理失败，将消息重新入队或死信队列
-            try:
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            except:
-                pass
+            raise
     
     # 消费队列消息
-    mq_client.consume_messages(QUEUE_PAYOUT_REQUESTS, callback)
+    await async_mq_client.consume(QUEUE_PAYOUT_REQUESTS, callback, model=PayoutRequest)
 
 # API端点：健康检查
 @app.get("/health", tags=["Health"])
@@ -279,7 +271,7 @@ async def health_check():
     contract_connected = web3_connected and contract is not None
     
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 总体健康状态
     overall_status = "up" if web3_connected and mq_connected else "down"
@@ -344,8 +336,7 @@ async def submit_payout_async(request: PayoutRequest, background_tasks: Backgrou
     """异步提交赔付请求"""
     try:
         # 将请求发布到消息队列
-        request_dict = request.dict()
-        success = mq_client.publish_message(QUEUE_PAYOUT_REQUESTS, request_dict)
+        success = await async_mq_client.publish_message(QUEUE_PAYOUT_REQUESTS, request)
         
         if success:
             logger.info(f"Payout request submitted to queue: {request.claim_id}")
@@ -422,7 +413,7 @@ async def startup_event():
     logger.info("Payout Processing Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -439,7 +430,7 @@ async def shutdown_event():
     logger.info("Payout Processing Service shutting down...")
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("Payout Processing Service shut down successfully")
 
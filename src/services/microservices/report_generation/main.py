@@ -19,7 +19,9 @@ import uuid
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_REPORT_REQUESTS, QUEUE_REPORT_NOTIFICATIONS
+from ..common.message_queue import QUEUE_REPORT_REQUESTS, QUEUE_REPORT_NOTIFICATIONS
+from ..common.async_message_queue import async_mq_client
+from ..common.envelope import register_schema
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -45,6 +47,7 @@ if not os.path.exists(REPORT_STORAGE_PATH):
         logger.error(f"Failed to create report storage directory: {str(e)}")
 
 # 报告请求模型
+@register_schema("report.request")
 class ReportRequest(BaseModel):
     report_id: str = Field(default_factory=lambda: f"report-{uuid.uuid4()}", description="Unique report identifier")
     report_type: str = Field(..., description="Type of report to generate")
@@ -539,14 +542,9 @@ def generate_report(request: ReportRequest, temp_dir: str) -> Tuple[bool, str, D
 # 异步函数：处理队列中的报告请求
 async def process_report_queue():
     """从队列中获取报告请求并处理"""
-    def callback(ch, method, properties, body):
-        """队列消息处理回调函数"""
+    def callback(request):
+        """队列消息处理回调函数（在线程池中执行；返回即确认，抛出异常时消息进入死信队列）"""
         try:
-            # 解析报告请求数据
-            import json
-            request_data = json.loads(body)
-            request = ReportRequest(**request_data)
-            
             # 创建临时目录
             temp_dir = tempfile.mkdtemp()
             
@@ -584,10 +582,10 @@ async def process_report_queue():
                             "report_id": request.report_id,
                             "status": "completed",
                             "download_url": f"/api/report/download/{request.report_id}",
-                            "notify_email": request_data.get("notify_email", None),
+                            "notify_email": getattr(request, "notify_email", None),
                             "timestamp": int(time.time())
                         }
-                        mq_client.publish_message(QUEUE_REPORT_NOTIFICATIONS, notification)
+                        async_mq_client.publish_nowait(QUEUE_REPORT_NOTIFICATIONS, notification)
                     
                 else:
                     # 更新报告状态为失败
@@ -611,19 +609,12 @@ async def process_report_queue():
                 # 清理临时目录
                 shutil.rmtree(temp_dir, ignore_errors=True)
             
-            # 确认消息已处理
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
         except Exception as e:
             logger.error(f"Error processing report request: {str(e)}")
-            # 处理失败，将消息重新入队或死信队列
-            try:
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            except:
-                pass
+            raise
     
     # 消费队列消息
-    mq_client.consume_messages(QUEUE_REPORT_REQUESTS, callback)
+    await async_mq_client.consume(QUEUE_REPORT_REQUESTS, callback, model=ReportRequest)
 
 # 内部函数：保存报告文件
 def save_report_file(temp_path: str, report_id: str, format: str) -> str:
@@ -665,7 +656,7 @@ def update_report_status(report_id: str, status: str, progress: int, download_ur
 async def health_check():
     """检查报告生成服务健康状态"""
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 检查报告存储目录
     storage_accessible = os.path.exists(REPORT_STORAGE_PATH) and os.access(REPORT_STORAGE_PATH, os.W_OK)
@@ -743,8 +734,7 @@ async def generate_report_async(request: ReportRequest, background_tasks: Backgr
         logger.info(f"Received asynchronous report request: {request.report_id}")
         
         # 将请求发布到消息队列
-        request_dict = request.dict()
-        success = mq_client.publish_message(QUEUE_REPORT_REQUESTS, request_dict)
+        success = await async_mq_client.publish_message(QUEUE_REPORT_REQUESTS, request)
         
         if success:
             # 初始化报告状态
@@ -952,7 +942,7 @@ async def startup_event():
     logger.info("Report Generation Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -969,7 +959,7 @@ async def shutdown_event():
     logger.info("Report Generation Service shutting down...")
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("Report Generation Service shut down successfully")
 
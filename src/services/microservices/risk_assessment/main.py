@@ -20,7 +20,9 @@ from enum import Enum
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_RISK_ASSESSMENT, QUEUE_RISK_ALERTS, QUEUE_ORDER_VERIFICATION
+from ..common.message_queue import ConsumeResult, QUEUE_RISK_ASSESSMENT, QUEUE_RISK_ALERTS, QUEUE_ORDER_VERIFICATION
+from ..common.async_message_queue import async_mq_client
+from ..common.envelope import register_schema, trace_context
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -134,6 +136,7 @@ class RiskAssessmentResult(BaseModel):
     timestamp: int = Field(default_factory=lambda: int(time.time()), description="Assessment timestamp")
 
 # 风险预警模型
+@register_schema("risk_assessment.alert")
 class RiskAlert(BaseModel):
     alert_id: str = Field(default_factory=lambda: f"alert-{uuid.uuid4()}", description="Unique alert identifier")
     user_id: Optional[str] = Field(None, description="User ID associated with the alert")
@@ -475,8 +478,20 @@ def determine_approval(risk_level: RiskLevel, risk_score: float) -> Tuple[bool,
     else:
         return True, "Order approved with low risk level."
 
+# 内部函数：获取风险得分（批量评估时同一交易对/用户只计算一次）
+def _cached_risk_score(score_cache: Optional[Dict[Tuple[str, str], float]], kind: str, key: str, assess) -> float:
+    """从批内缓存获取风险得分"""
+    if score_cache is None:
+        return assess(key)[0]
+    cache_key = (kind, key)
+    if cache_key not in score_cache:
+        score_cache[cache_key] = assess(key)[0]
+    return score_cache[cache_key]
+
 # 内部函数：执行风险评估
-def perform_risk_assessment(request: RiskAssessmentRequest) -> RiskAssessmentResult:
+def perform_risk_assessment(request: RiskAssessmentRequest,
+                            score_cache: Optional[Dict[Tuple[str, str], float]] = None,
+                            publish_result: bool = True) -> RiskAssessmentResult:
     """执行完整的风险评估"""
     try:
         logger.info(f"Performing risk assessment for order: {request.order_id}")
@@ -485,11 +500,13 @@ def perform_risk_assessment(request: RiskAssessmentRequest) -> RiskAssessmentRes
         collateral_ratio = request.collateral_amount / (request.order_amount * request.leverage)
         
         # 评估各项风险因素
-        market_risk_score, _ = assess_market_risk(request.trading_pair)
+        market_risk_score = _cached_risk_score(score_cache, "market", request.trading_pair, assess_market_risk)
         leverage_risk_score, _ = assess_leverage_risk(request.leverage)
         collateral_risk_score, _ = assess_collateral_risk(collateral_ratio)
         position_risk_score, _ = assess_position_size_risk(request.position_size_percentage)
-        trading_history_risk_score, _ = assess_user_trading_history_risk(request.user_id)
+        trading_history_risk_score = _cached_risk_score(
+            score_cache, "user", request.user_id, assess_user_trading_history_risk
+        )
         
         # 汇总风险因素得分
         risk_factors = {
@@ -541,11 +558,8 @@ def perform_risk_assessment(request: RiskAssessmentRequest) -> RiskAssessmentRes
         logger.info(f"Risk assessment completed for order: {request.order_id}, Risk Level: {risk_level}")
         
         # 发布风险评估结果到消息队列，用于其他服务处理
-        mq_client.publish_message(QUEUE_ORDER_VERIFICATION, {
-            "event_type": "RISK_ASSESSMENT_COMPLETED",
-            "order_id": request.order_id,
-            "assessment_result": result.dict()
-        })
+        if publish_result:
+            async_mq_client.publish_nowait(QUEUE_ORDER_VERIFICATION, _assessment_event(result))
         
         return result
     except Exception as e:
@@ -563,6 +577,29 @@ def perform_risk_assessment(request: RiskAssessmentRequest) -> RiskAssessmentRes
             approval_reason="Risk assessment failed."
         )
 
+# 内部函数：风险评估完成事件
+def _assessment_event(result: RiskAssessmentResult) -> Dict[str, Any]:
+    """生成风险评估完成事件"""
+    return {
+        "event_type": "RISK_ASSESSMENT_COMPLETED",
+        "order_id": result.order_id,
+        "assessment_result": result.dict()
+    }
+
+# 内部函数：批量执行风险评估
+def perform_risk_assessments(
+    requests: List[RiskAssessmentRequest],
+    trace_ids: Optional[List[Optional[str]]] = None
+) -> List[RiskAssessmentResult]:
+    """批量执行风险评估：市场风险和用户历史风险在批内共享，评估结果由调用方整批发布"""
+    score_cache: Dict[Tuple[str, str], float] = {}
+    trace_ids = trace_ids or [None] * len(requests)
+    results = []
+    for request, trace_id in zip(requests, trace_ids):
+        with trace_context(trace_id):
+            results.append(perform_risk_assessment(request, score_cache, publish_result=False))
+    return results
+
 # 内部函数：发送风险预警
 def send_risk_alert(request: RiskAssessmentRequest, assessment: RiskAssessmentResult) -> None:
     """发送风险预警"""
@@ -584,7 +621,7 @@ def send_risk_alert(request: RiskAssessmentRequest, assessment: RiskAssessmentRe
         )
         
         # 发布风险预警到消息队列
-        mq_client.publish_message(QUEUE_RISK_ALERTS, alert.dict())
+        async_mq_client.publish_nowait(QUEUE_RISK_ALERTS, alert)
         
         logger.info(f"Risk alert sent for order: {request.order_id}, User: {request.user_id}")
         
@@ -632,55 +669,70 @@ def update_market_data(trading_pair: str, market_data: Dict[str, Any]) -> None:
 
 # 异步函数：处理队列中的风险评估请求
 async def process_risk_assessment_queue():
-    """从队列中获取风险评估请求并处理"""
-    def callback(ch, method, properties, body):
-        """队列消息处理回调函数"""
-        try:
-            # 解析风险评估请求数据
-            import json
-            request_data = json.loads(body)
-            
-            # 检查是否包含order_data
-            if "order_data" in request_data:
-                # 这是从订单验证服务转发的订单数据
-                order_data = request_data["order_data"]
-                
-                # 创建风险评估请求
-                request = RiskAssessmentRequest(
-                    order_id=order_data["order_id"],
-                    user_id=order_data["user_id"],
-                    user_address=order_data["user_address"],
-                    trading_pair=order_data["trading_pair"],
-                    order_type=order_data["order_type"],
-                    leverage=order_data["leverage"],
-                    collateral_amount=order_data["collateral_amount"],
-                    order_amount=order_data["order_amount"],
-                    entry_price=order_data["entry_price"],
-                    liquidation_price=order_data["liquidation_price"],
-                    stop_loss_price=order_data.get("stop_loss_price"),
-                    take_profit_price=order_data.get("take_profit_price"),
-                    position_size_percentage=order_data.get("position_size_percentage")
-                )
-            else:
-                # 这是直接的风险评估请求
-                request = RiskAssessmentRequest(**request_data)
+    """从队列中批量获取风险评估请求并处理"""
+    def parse_request(request_data) -> RiskAssessmentRequest:
+        """解析队列消息中的风险评估请求"""
+        # 检查是否包含order_data
+        if "order_data" in request_data:
+            # 这是从订单验证服务转发的订单数据
+            order_data = request_data["order_data"]
             
-            # 执行风险评估
-            result = perform_risk_assessment(request)
-            
-            # 确认消息已处理
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            
-        except Exception as e:
-            logger.error(f"Error processing risk assessment request: {str(e)}")
-            # 处理失败，将消息重新入队或死信队列
+            # 创建风险评估请求
+            request = RiskAssessmentRequest(
+                order_id=order_data["order_id"],
+                user_id=order_data["user_id"],
+                user_address=order_data["user_address"],
+                trading_pair=order_data["trading_pair"],
+                order_type=order_data["order_type"],
+                leverage=order_data["leverage"],
+                collateral_amount=order_data["collateral_amount"],
+                order_amount=order_data["order_amount"],
+                entry_price=order_data["entry_price"],
+                liquidation_price=order_data["liquidation_price"],
+                stop_loss_price=order_data.get("stop_loss_price"),
+                take_profit_price=order_data.get("take_profit_price"),
+                position_size_percentage=order_data.get("position_size_percentage")
+            )
+        else:
+            # 这是直接的风险评估请求
+            request = RiskAssessmentRequest(**request_data)
+        return request
+    
+    async def handle_batch(requests_data, trace_ids):
+        """批量处理回调函数，返回每条消息的处理结果；无法解析的消息进入死信队列"""
+        outcomes = []
+        requests = []
+        request_trace_ids = []
+        for request_data, trace_id in zip(requests_data, trace_ids):
             try:
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            except:
-                pass
+                requests.append(parse_request(request_data))
+                request_trace_ids.append(trace_id)
+                outcomes.append(ConsumeResult.ACK)
+            except Exception as e:
+                logger.error(f"Error processing risk assessment request: {str(e)}")
+                outcomes.append(ConsumeResult.REJECT)
+        
+        # 在线程池中执行风险评估
+        results = await asyncio.to_thread(perform_risk_assessments, requests, request_trace_ids)
+        
+        # 整批发布评估结果（沿用各请求的跟踪ID），发布确认后才确认请求；发布失败时请求重新入队
+        try:
+            await async_mq_client.publish_batch(
+                QUEUE_ORDER_VERIFICATION, [_assessment_event(result) for result in results], trace_ids=request_trace_ids
+            )
+        except Exception as e:
+            logger.error(f"Failed to publish {len(results)} risk assessment results: {str(e)}")
+            outcomes = [ConsumeResult.REQUEUE if outcome == ConsumeResult.ACK else outcome for outcome in outcomes]
+        return outcomes
     
-    # 消费队列消息
-    mq_client.consume_messages(QUEUE_RISK_ASSESSMENT, callback)
+    # 批量消费队列消息
+    await async_mq_client.consume_batch(
+        QUEUE_RISK_ASSESSMENT,
+        handle_batch,
+        batch_size=config_manager.get('risk.batch_size', 100),
+        batch_timeout_ms=config_manager.get('risk.batch_timeout_ms', 50),
+        with_trace_ids=True
+    )
 
 # 依赖项：获取当前用户
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> Dict[str, Any]:
@@ -703,7 +755,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_
 async def health_check():
     """检查风险评估服务健康状态"""
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 检查缓存状态
     cache_status = "up" if len(user_risk_cache._cache) >= 0 and len(market_data_cache._cache) >= 0 else "down"
@@ -970,7 +1022,7 @@ async def startup_event():
     logger.info("Risk Assessment Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -1029,7 +1081,7 @@ async def shutdown_event():
     logger.info("Risk Assessment Service shutting down...")
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("Risk Assessment Service shut down successfully")
 
@@ -23,7 +23,9 @@ import base64
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_SMART_CONTRACT_EVENTS, QUEUE_PAYOUT_PROCESSING, QUEUE_ORDER_VERIFICATION
+from ..common.message_queue import QUEUE_SMART_CONTRACT_EVENTS, QUEUE_PAYOUT_PROCESSING, QUEUE_ORDER_VERIFICATION
+from ..common.async_message_queue import async_mq_client
+from ..common.task_scheduler import task_scheduler
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -530,7 +532,7 @@ async def wait_for_transaction_confirmation(network_name: str, tx_hash: str, res
                     )
                     
                     # 发布交易确认事件到消息队列
-                    mq_client.publish_message(QUEUE_SMART_CONTRACT_EVENTS, {
+                    async_mq_client.publish_nowait(QUEUE_SMART_CONTRACT_EVENTS, {
                         "event_type": "TRANSACTION_CONFIRMED",
                         "tx_hash": tx_hash,
                         "network_name": network_name,
@@ -780,7 +782,7 @@ async def wait_for_deployment_confirmation(network_name: str, tx_hash: str, resu
                         web3_manager.add_contract(result.contract_name, network_name, contract_address, abi)
                         
                         # 发布合约部署事件到消息队列
-                        mq_client.publish_message(QUEUE_SMART_CONTRACT_EVENTS, {
+                        async_mq_client.publish_nowait(QUEUE_SMART_CONTRACT_EVENTS, {
                             "event_type": "CONTRACT_DEPLOYED",
                             "tx_hash": tx_hash,
                             "contract_address": contract_address,
@@ -1038,23 +1040,18 @@ def get_contract_events(network_name: str, contract_name: str, event_name: str,
         logger.error(f"Error in get_contract_events: {str(e)}")
         raise
 
-# 异步函数：监听合约事件
+# 合约事件监听的周期任务ID
+CONTRACT_EVENTS_SCHEDULE = "smart_contract_service.monitor_contract_events"
+
+# 异步函数：检查合约事件
 async def monitor_contract_events():
-    """持续监听合约事件并发布到消息队列"""
+    """检查合约事件并发布到消息队列（由任务调度器周期触发）"""
     # 注意：这是一个简化的实现。在实际应用中，应该为每个合约和事件设置专门的监听器
     # 这里仅作为示例
     
-    # 模拟监听逻辑
-    while True:
-        try:
-            # 检查是否有新的连接和合约
-            # 如果有，设置事件监听器
-            
-            # 每30秒检查一次
-            await asyncio.sleep(30)
-        except Exception as e:
-            logger.error(f"Error in monitor_contract_events: {str(e)}")
-            await asyncio.sleep(5)
+    # 检查是否有新的连接和合约
+    # 如果有，设置事件监听器
+    pass
 
 # 依赖项：获取当前用户
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> Dict[str, Any]:
@@ -1077,7 +1074,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_
 async def health_check():
     """检查智能合约服务健康状态"""
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 检查Web3连接状态
     networks_status = {}
@@ -1425,7 +1422,7 @@ async def startup_event():
     logger.info("Smart Contract Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -1448,9 +1445,16 @@ async def startup_event():
                 logger.info(f"Loading contract: {contract_name} on network: {network_name}")
                 web3_manager.add_contract(contract_name, network_name, address, abi)
     
-    # 启动事件监听任务
-    loop = asyncio.get_event_loop()
-    loop.create_task(monitor_contract_events())
+    # 启动事件监听任务：每30秒检查一次，失败后5秒重试一次
+    task_scheduler.schedule_recurring(
+        monitor_contract_events,
+        interval=config_manager.get('blockchain.event_poll_interval', 30),
+        name=CONTRACT_EVENTS_SCHEDULE,
+        jitter=config_manager.get('blockchain.event_poll_jitter', 1),
+        max_retries=1,
+        retry_delay=5,
+        description="Monitor smart contract events"
+    )
     
     logger.info("Smart Contract Service started successfully")
 
@@ -1460,8 +1464,11 @@ async def shutdown_event():
     """应用关闭时执行"""
     logger.info("Smart Contract Service shutting down...")
     
+    # 停止事件监听任务
+    task_scheduler.cancel_recurring(CONTRACT_EVENTS_SCHEDULE)
+    
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     # 关闭区块链连接
     web3_manager.close()
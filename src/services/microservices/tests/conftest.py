@@ -0,0 +1,7 @@
+"""测试配置：把 src 目录加入模块搜索路径，测试以 services.microservices 的绝对路径导入共享组件"""
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[3]
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
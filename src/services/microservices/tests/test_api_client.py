@@ -0,0 +1,59 @@
+"""API客户端测试：熔断器状态转换"""
+import time
+
+from services.microservices.common.api_client import CircuitBreaker, CircuitState
+from services.microservices.common.test_utils import TestBase
+
+
+class TestCircuitBreaker(TestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05, half_open_max_calls=1)
+
+    def open_breaker(self) -> None:
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+
+        # 成功后失败计数清零，需要重新连续失败 failure_threshold 次
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertGreater(self.breaker.retry_after, 0)
+
+    def test_half_open_allows_limited_trials(self):
+        self.open_breaker()
+        time.sleep(0.06)
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+        self.assertEqual(self.breaker.retry_after, 0.0)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_release_returns_trial_slot(self):
+        self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(self.breaker.allow_request())
+        # 试探请求被取消，没有结果：名额归还，状态仍为半开
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, CircuitState.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
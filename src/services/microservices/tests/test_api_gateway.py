@@ -0,0 +1,99 @@
+"""API网关测试：副本选择策略和被动异常剔除"""
+import time
+
+from services.microservices.api_gateway.main import LoadBalancingPolicy, UpstreamPool
+from services.microservices.common.test_utils import TestBase
+
+URLS = ["http://a:8000", "http://b:8000", "http://c:8000", "http://d:8000"]
+
+
+class TestReplicaSelection(TestBase):
+
+    def test_round_robin_rotates_over_replicas(self):
+        pool = UpstreamPool("svc", URLS[:3], policy=LoadBalancingPolicy.ROUND_ROBIN)
+        picks = [pool.select().url for _ in range(6)]
+        self.assertEqual(sorted(picks[:3]), URLS[:3])
+        self.assertEqual(picks[:3], picks[3:])
+
+    def test_least_outstanding_prefers_idle_replica(self):
+        pool = UpstreamPool("svc", URLS[:2], policy=LoadBalancingPolicy.LEAST_OUTSTANDING)
+        busy, idle = pool.upstreams
+        for _ in range(3):
+            pool.acquire(busy)
+        self.assertTrue(all(pool.select() is idle for _ in range(10)))
+
+        for _ in range(3):
+            pool.release(busy)
+        pool.acquire(idle)
+        self.assertIs(pool.select(), busy)
+
+    def test_ewma_prefers_faster_replica(self):
+        pool = UpstreamPool("svc", URLS[:2], policy=LoadBalancingPolicy.EWMA)
+        slow, fast = pool.upstreams
+        pool.record_success(slow, 0.5)
+        pool.record_success(fast, 0.01)
+        self.assertTrue(all(pool.select() is fast for _ in range(10)))
+
+    def test_exclude_skips_previous_attempt(self):
+        pool = UpstreamPool("svc", URLS[:2])
+        first = pool.select()
+        self.assertIsNot(pool.select(exclude=first), first)
+
+    def test_update_keeps_existing_replica_state(self):
+        pool = UpstreamPool("svc", URLS[:2])
+        kept = pool.upstreams[0]
+        pool.acquire(kept)
+        pool.update([URLS[0] + "/", URLS[2]])
+        self.assertEqual([u.url for u in pool.upstreams], [URLS[0], URLS[2]])
+        self.assertIs(pool.upstreams[0], kept)
+        self.assertEqual(kept.outstanding, 1)
+
+        pool.update([])
+        self.assertEqual(len(pool.upstreams), 2)
+
+
+class TestOutlierEjection(TestBase):
+
+    def fail(self, pool: UpstreamPool, upstream, times: int) -> None:
+        for _ in range(times):
+            pool.record_failure(upstream)
+
+    def test_consecutive_failures_eject_replica(self):
+        pool = UpstreamPool("svc", URLS[:2], policy=LoadBalancingPolicy.ROUND_ROBIN, failure_threshold=3)
+        bad, good = pool.upstreams
+        self.fail(pool, bad, 2)
+        pool.record_success(bad, 0.01)
+        self.fail(pool, bad, 2)
+        self.assertFalse(bad.ejected(time.monotonic()))
+
+        self.fail(pool, bad, 1)
+        self.assertTrue(bad.ejected(time.monotonic()))
+        self.assertTrue(all(pool.select() is good for _ in range(6)))
+
+    def test_ejection_time_grows_with_repeat_ejections(self):
+        pool = UpstreamPool("svc", URLS[:2], failure_threshold=1, ejection_time=10, max_ejection_time=25)
+        upstream = pool.upstreams[0]
+        durations = []
+        for _ in range(3):
+            self.fail(pool, upstream, 1)
+            durations.append(upstream.ejected_until - time.monotonic())
+            upstream.ejected_until = 0.0
+        self.assertEqual([round(d) for d in durations], [10, 20, 25])
+        self.assertEqual(upstream.ejections, 3)
+
+    def test_max_ejection_percent_caps_ejections(self):
+        pool = UpstreamPool("svc", URLS, failure_threshold=1, max_ejection_percent=50)
+        for upstream in pool.upstreams:
+            self.fail(pool, upstream, 1)
+        now = time.monotonic()
+        self.assertEqual(sum(1 for u in pool.upstreams if u.ejected(now)), 2)
+
+    def test_falls_back_to_healthy_replicas_when_all_ejected(self):
+        pool = UpstreamPool("svc", URLS[:2], failure_threshold=1, max_ejection_percent=100)
+        for upstream in pool.upstreams:
+            self.fail(pool, upstream, 1)
+        self.assertIn(pool.select(), pool.upstreams)
+
+        for upstream in pool.upstreams:
+            upstream.healthy = False
+        self.assertIsNone(pool.select())
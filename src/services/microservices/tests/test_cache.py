@@ -0,0 +1,333 @@
+"""缓存测试：TinyLFU准入、过期堆、两级缓存失效和异步单飞"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.microservices.common.cache import (
+    EvictionPolicy,
+    InMemoryCache,
+    TieredCache,
+    _AsyncSingleFlight,
+)
+from services.microservices.common.codec import get_codec
+from services.microservices.common.test_utils import AsyncTestBase
+
+
+class FakeRedisServer:
+    """模拟Redis的键空间和发布/订阅，供多个 FakeL2 共享"""
+
+    def __init__(self):
+        self.data: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self.subscribers: List[asyncio.Queue] = []
+        # 设置后 get_with_ttl 在返回前等待该事件，用于构造读写交错
+        self.read_gate: Optional[asyncio.Event] = None
+
+
+class FakePubSub:
+
+    def __init__(self, server: FakeRedisServer):
+        self._server = server
+        self._queue: asyncio.Queue = asyncio.Queue()
+        server.subscribers.append(self._queue)
+
+    async def listen(self):
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        self._server.subscribers.remove(self._queue)
+
+
+class FakeL2:
+    """TieredCache 用到的 RedisCache 接口子集"""
+
+    codec = get_codec("json")
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+
+    async def get_with_ttl(self, key: str):
+        value, ttl = self.server.data.get(key, (None, None))
+        if self.server.read_gate is not None:
+            await self.server.read_gate.wait()
+        return value, ttl
+
+    async def mget_with_ttl(self, keys: List[str]):
+        return {key: self.server.data[key] for key in keys if key in self.server.data}
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.server.data[key] = (value, ttl)
+
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        for key, value in mapping.items():
+            self.server.data[key] = (value, ttl)
+
+    async def delete(self, key: str) -> bool:
+        return self.server.data.pop(key, None) is not None
+
+    async def mdelete(self, keys: List[str]) -> int:
+        return sum(1 for key in keys if self.server.data.pop(key, None) is not None)
+
+    async def clear(self, namespace: Optional[str] = None) -> None:
+        for key in list(self.server.data):
+            if namespace is None or key.startswith(f"{namespace}:"):
+                del self.server.data[key]
+
+    async def publish(self, channel: str, message: str) -> int:
+        for queue in self.server.subscribers:
+            queue.put_nowait({"type": "message", "channel": channel, "data": message.encode("utf-8")})
+        return len(self.server.subscribers)
+
+    async def subscribe(self, channel: str) -> FakePubSub:
+        return FakePubSub(self.server)
+
+
+class TestInMemoryCache(AsyncTestBase):
+
+    def test_tinylfu_rejects_cold_keys_and_admits_hot_ones(self):
+        async def scenario():
+            cache = InMemoryCache(max_entries=2, eviction_policy=EvictionPolicy.TINY_LFU)
+            await cache.set("a", 1)
+            await cache.set("b", 2)
+            for _ in range(5):
+                await cache.get("a")
+                await cache.get("b")
+
+            # 一次性访问的新键不会挤掉热点键
+            await cache.set("cold", 3)
+            after_cold = sorted(await cache.keys())
+
+            # 访问频率超过淘汰候选的新键被接纳，淘汰最近最少使用的键
+            for _ in range(10):
+                await cache.get("hot")
+            await cache.get("b")
+            await cache.set("hot", 4)
+            return after_cold, sorted(await cache.keys()), cache.stats()
+
+        after_cold, after_hot, stats = self.loop.run_until_complete(scenario())
+        self.assertEqual(after_cold, ["a", "b"])
+        self.assertEqual(after_hot, ["b", "hot"])
+        self.assertEqual((stats["rejections"], stats["evictions"]), (1, 1))
+
+    def test_lfu_evicts_least_frequently_used(self):
+        async def scenario():
+            cache = InMemoryCache(max_entries=3, eviction_policy=EvictionPolicy.LFU)
+            for i in range(3):
+                await cache.set(f"k{i}", i)
+            await cache.get("k0")
+            await cache.get("k0")
+            await cache.get("k1")
+            await cache.set("k3", 3)
+            return sorted(await cache.keys())
+
+        self.assertEqual(self.loop.run_until_complete(scenario()), ["k0", "k1", "k3"])
+
+    def test_sweeper_purges_expired_items_without_reads(self):
+        async def scenario():
+            cache = InMemoryCache(sweep_interval=0.05)
+            cache.start_sweeper()
+            try:
+                await cache.set("short", 1, ttl=0.1)
+                await cache.set("forever", 2)
+                value, ttl = await cache.get_with_ttl("short")
+                await asyncio.sleep(0.3)
+                return value, ttl, cache.stats()
+            finally:
+                await cache.stop_sweeper()
+
+        value, ttl, stats = self.loop.run_until_complete(scenario())
+        self.assertEqual(value, 1)
+        self.assertIsNotNone(ttl)
+        self.assertEqual((stats["entries"], stats["expirations"], stats["hits"]), (1, 1, 1))
+
+    def test_stale_heap_entries_do_not_expire_overwritten_keys(self):
+        async def scenario():
+            cache = InMemoryCache(sweep_interval=0.05)
+            cache.start_sweeper()
+            try:
+                await cache.set("k", "old", ttl=0.1)
+                await cache.set("k", "new", ttl=60)
+                await asyncio.sleep(0.3)
+                return await cache.get("k"), cache.stats()["expirations"]
+            finally:
+                await cache.stop_sweeper()
+
+        self.assertEqual(self.loop.run_until_complete(scenario()), ("new", 0))
+
+    def test_max_bytes_bounds_memory(self):
+        async def scenario():
+            cache = InMemoryCache(max_bytes=1000)
+            for i in range(50):
+                await cache.set(f"k{i}", "x" * 100)
+            return cache.stats()
+
+        stats = self.loop.run_until_complete(scenario())
+        self.assertLessEqual(stats["bytes"], 1000)
+        self.assertGreater(stats["evictions"], 0)
+
+
+class TestTieredCache(AsyncTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeRedisServer()
+
+    def make_cache(self) -> TieredCache:
+        return TieredCache(FakeL2(self.server), namespace_ttls={"user": 60})
+
+    async def subscribed(self) -> None:
+        """等待监听任务完成订阅（订阅前发布的失效消息会丢失）"""
+        await asyncio.sleep(0.01)
+
+    def test_requires_l2_codec(self):
+        class NoCodec(FakeL2):
+            codec = None
+
+        with self.assertRaises(Exception):
+            TieredCache(NoCodec(self.server))
+
+    def test_write_on_one_replica_invalidates_other_l1(self):
+        async def scenario():
+            a, b = self.make_cache(), self.make_cache()
+            await a.start()
+            await b.start()
+            await self.subscribed()
+            try:
+                await a.set("user:1", {"name": "old"})
+                await asyncio.sleep(0.05)
+                first = await b.get("user:1")
+                in_l1 = b.l1.get_sync("user:1")
+
+                await a.set("user:1", {"name": "new"})
+                await asyncio.sleep(0.05)
+                dropped = b.l1.get_sync("user:1")
+                second = await b.get("user:1")
+                return first, in_l1, dropped, second, b.stats()
+            finally:
+                await a.stop()
+                await b.stop()
+
+        first, in_l1, dropped, second, stats = self.loop.run_until_complete(scenario())
+        self.assertEqual(first, {"name": "old"})
+        self.assertEqual(in_l1, {"name": "old"})
+        self.assertIsNone(dropped)
+        self.assertEqual(second, {"name": "new"})
+        self.assertEqual(stats["invalidations_received"], 2)
+
+    def test_namespace_clear_invalidates_remote_prefix(self):
+        async def scenario():
+            a, b = self.make_cache(), self.make_cache()
+            await a.start()
+            await b.start()
+            await self.subscribed()
+            try:
+                await a.mset({"user:1": 1, "user:2": 2, "order:1": 3})
+                await asyncio.sleep(0.05)
+                await b.mget(["user:1", "user:2", "order:1"])
+                await a.clear("user")
+                await asyncio.sleep(0.05)
+                return sorted(await b.l1.keys()), await b.get("user:1")
+            finally:
+                await a.stop()
+                await b.stop()
+
+        self.assertEqual(self.loop.run_until_complete(scenario()), (["order:1"], None))
+
+    def test_concurrent_write_prevents_stale_l1_refill(self):
+        async def scenario():
+            cache = self.make_cache()
+            await cache.l2.set("user:1", "old")
+            self.server.read_gate = asyncio.Event()
+            reader = asyncio.ensure_future(cache.get("user:1"))
+            await asyncio.sleep(0.01)
+            # 读取已拿到旧值但尚未回填时发生写入
+            self.server.read_gate.set()
+            self.server.read_gate = None
+            await cache.set("user:1", "new")
+            return await reader, cache.l1.get_sync("user:1")
+
+        stale_read, l1_value = self.loop.run_until_complete(scenario())
+        self.assertEqual(stale_read, "old")
+        self.assertEqual(l1_value, "new")
+
+    def test_mget_fills_l1_with_l2_ttl(self):
+        async def scenario():
+            cache = self.make_cache()
+            await cache.l2.set("user:1", "v", ttl=1)
+            await cache.mget(["user:1"])
+            _, ttl = await cache.l1.get_with_ttl("user:1")
+            return ttl
+
+        ttl = self.loop.run_until_complete(scenario())
+        self.assertIsNotNone(ttl)
+        self.assertLessEqual(ttl, 1)
+
+    def test_foreign_invalidation_message_is_applied(self):
+        async def scenario():
+            cache = self.make_cache()
+            await cache.start()
+            await self.subscribed()
+            try:
+                await cache.set("user:1", 1)
+                await cache.l2.publish(cache.channel, json.dumps({"origin": "other", "keys": ["user:*"]}))
+                await asyncio.sleep(0.05)
+                return cache.l1.get_sync("user:1")
+            finally:
+                await cache.stop()
+
+        self.assertIsNone(self.loop.run_until_complete(scenario()))
+
+
+class TestAsyncSingleFlight(AsyncTestBase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        async def scenario():
+            flight = _AsyncSingleFlight()
+            calls = []
+
+            async def load():
+                calls.append(1)
+                await asyncio.sleep(0.05)
+                return "value"
+
+            results = await asyncio.gather(*(flight.do("k", load) for _ in range(5)))
+            return results, len(calls)
+
+        self.assertEqual(self.loop.run_until_complete(scenario()), (["value"] * 5, 1))
+
+    def test_leader_cancellation_does_not_cancel_waiters(self):
+        async def scenario():
+            flight = _AsyncSingleFlight()
+            calls = []
+
+            async def load():
+                calls.append(1)
+                await asyncio.sleep(0.05)
+                return len(calls)
+
+            leader = asyncio.ensure_future(flight.do("k", load))
+            await asyncio.sleep(0.01)
+            waiters = [asyncio.ensure_future(flight.do("k", load)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*waiters)
+            return results, len(calls), leader.cancelled()
+
+        results, calls, cancelled = self.loop.run_until_complete(scenario())
+        # 第一个醒来的等待者重新执行，其余等待者共享其结果
+        self.assertEqual(results, [2, 2, 2])
+        self.assertEqual(calls, 2)
+        self.assertTrue(cancelled)
+
+    def test_errors_propagate_to_all_waiters(self):
+        async def scenario():
+            flight = _AsyncSingleFlight()
+
+            async def load():
+                await asyncio.sleep(0.01)
+                raise ValueError("boom")
+
+            return await asyncio.gather(*(flight.do("k", load) for _ in range(3)), return_exceptions=True)
+
+        results = self.loop.run_until_complete(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
@@ -0,0 +1,113 @@
+"""消息队列测试：回调结果归一化和延迟重试路由"""
+import asyncio
+import time
+
+from services.microservices.common.async_message_queue import AsyncMessageQueueClient
+from services.microservices.common.message_queue import (
+    ConsumeResult,
+    DEFAULT_MQ_CONFIG,
+    QueueSettings,
+    RETRY_COUNT_HEADER,
+    _normalize_result,
+)
+from services.microservices.common.mq_transport import MemoryBroker, MemoryTransport
+from services.microservices.common.test_utils import AsyncTestBase, TestBase
+
+
+class TestNormalizeResult(TestBase):
+
+    def test_none_and_true_ack(self):
+        self.assertEqual(_normalize_result(None), ConsumeResult.ACK)
+        self.assertEqual(_normalize_result(True), ConsumeResult.ACK)
+
+    def test_false_and_exceptions_reject(self):
+        self.assertEqual(_normalize_result(False), ConsumeResult.REJECT)
+        self.assertEqual(_normalize_result(ValueError("bad")), ConsumeResult.REJECT)
+
+    def test_consume_results_and_values_pass_through(self):
+        for result in ConsumeResult:
+            self.assertEqual(_normalize_result(result), result)
+            self.assertEqual(_normalize_result(result.value), result)
+
+    def test_unknown_results_raise(self):
+        self.assertRaises(ValueError, _normalize_result, "bogus")
+        self.assertRaises(ValueError, _normalize_result, 1)
+
+
+class TestRetryRouting(TestBase):
+
+    def settings(self, **queue_settings) -> QueueSettings:
+        return QueueSettings(dict(DEFAULT_MQ_CONFIG, queues={"work": queue_settings}))
+
+    def test_retries_disabled_by_default(self):
+        settings = self.settings()
+        self.assertFalse(settings.retries_enabled("work"))
+        self.assertEqual(settings.retry_queues("work"), [])
+        self.assertIsNone(settings.retry_target("work", None))
+
+    def test_delays_follow_attempts_and_reuse_last_delay(self):
+        settings = self.settings(retry_delays=[1, 5], max_retries=4)
+        self.assertEqual([settings.retry_delay("work", attempt) for attempt in range(1, 6)], [1, 5, 5, 5, None])
+
+    def test_retry_queues_dead_letter_back_to_source(self):
+        settings = self.settings(retry_delays=[0.5, 2, 0.5])
+        self.assertEqual(settings.retry_queues("work"), [
+            ("work.retry.500ms", {"x-message-ttl": 500, "x-dead-letter-exchange": "",
+                                  "x-dead-letter-routing-key": "work"}),
+            ("work.retry.2000ms", {"x-message-ttl": 2000, "x-dead-letter-exchange": "",
+                                   "x-dead-letter-routing-key": "work"}),
+        ])
+
+    def test_retry_target_counts_attempts_in_headers(self):
+        settings = self.settings(retry_delays=[1, 5])
+        first = settings.retry_target("work", {"trace": "t"})
+        self.assertEqual(first, ("work.retry.1000ms", {"trace": "t", RETRY_COUNT_HEADER: 1}))
+        second = settings.retry_target("work", first[1])
+        self.assertEqual(second, ("work.retry.5000ms", {"trace": "t", RETRY_COUNT_HEADER: 2}))
+        self.assertIsNone(settings.retry_target("work", second[1]))
+
+
+class TestRetryDelivery(AsyncTestBase):
+    """在进程内broker上验证失败消息经延迟队列回到原队列，重试用尽后进入死信队列"""
+
+    def test_failed_messages_are_retried_then_dead_lettered(self):
+        async def scenario():
+            broker = MemoryBroker()
+            config = {"transport": "memory", "queues": {"work": {"retry_delays": [0.05, 0.1]}}}
+            client = AsyncMessageQueueClient(config, transport=MemoryTransport(broker))
+            await client.connect()
+            dead = []
+
+            async def on_dead(delivery):
+                dead.append(delivery.headers)
+                await delivery.ack()
+
+            broker.consume("dlx_queue", on_dead)
+            attempts = {}
+
+            async def work(body):
+                attempts[body["id"]] = attempts.get(body["id"], 0) + 1
+                if body["id"] == "always":
+                    raise ValueError("boom")
+                if body["id"] == "once" and attempts["once"] == 1:
+                    return ConsumeResult.RETRY
+                return None
+
+            try:
+                await client.consume("work", work)
+                start = time.monotonic()
+                await client.publish_batch("work", [{"id": "always"}, {"id": "once"}, {"id": "ok"}])
+                while (not dead or broker.stats()["work"]["unacked"]) and time.monotonic() - start < 5:
+                    await asyncio.sleep(0.01)
+                return attempts, dead, broker.stats()
+            finally:
+                await client.close()
+
+        attempts, dead, stats = self.loop.run_until_complete(scenario())
+        self.assertEqual(attempts, {"always": 3, "once": 2, "ok": 1})
+        self.assertEqual(len(dead), 1)
+        self.assertEqual(dead[0][RETRY_COUNT_HEADER], 2)
+        self.assertEqual(stats["work.retry.50ms"]["expired"], 2)
+        self.assertEqual(stats["work.retry.100ms"]["expired"], 1)
+        # 转入延迟队列的投递在原队列上确认，重试用尽的投递被拒绝进入死信
+        self.assertEqual((stats["work"]["acked"], stats["work"]["rejected"]), (5, 1))
@@ -0,0 +1,224 @@
+"""
+进程内传输（transport=memory）上的消息队列测试
+
+覆盖确认、拒绝进入死信交换机、预取限流，以及 验证 -> 风险评估 -> 赔付 流水线（与
+benchmarks/pipeline_benchmark.py 的接线方式一致），不需要RabbitMQ。
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable
+
+from services.microservices.benchmarks import pipeline_benchmark
+from services.microservices.common import mq_transport
+from services.microservices.common.async_message_queue import AsyncMessageQueueClient
+from services.microservices.common.message_queue import ConsumeResult
+from services.microservices.common.mq_transport import MemoryBroker, MemoryTransport
+from services.microservices.common.test_utils import AsyncTestBase
+
+DEAD_LETTER_QUEUE = "dlx_queue"
+
+
+async def wait_until(predicate: Callable[[], bool], timeout: float = 5.0) -> None:
+    """轮询等待条件成立，超时抛出AssertionError"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met before timeout")
+        await asyncio.sleep(0.01)
+
+
+class MemoryTransportTestCase(AsyncTestBase):
+    """每个测试使用独立的进程内broker"""
+
+    def setUp(self):
+        super().setUp()
+        self.broker = MemoryBroker()
+        self.client = AsyncMessageQueueClient({"transport": "memory"}, transport=MemoryTransport(self.broker))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.client.close())
+        super().tearDown()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(asyncio.wait_for(coro, timeout=10))
+
+    def queue_stats(self, queue_name: str):
+        return self.broker.stats()[queue_name]
+
+
+class TestAckAndDeadLetter(MemoryTransportTestCase):
+
+    def test_ack_removes_messages(self):
+        async def scenario():
+            await self.client.connect()
+            received = []
+
+            async def on_message(body):
+                received.append(body["n"])
+
+            await self.client.consume("test.ack", on_message, prefetch_count=4)
+            await self.client.publish_batch("test.ack", [{"n": i} for i in range(20)])
+            await wait_until(lambda: self.queue_stats("test.ack")["acked"] == 20)
+            return received
+
+        received = self.run_async(scenario())
+        self.assertEqual(sorted(received), list(range(20)))
+        stats = self.queue_stats("test.ack")
+        self.assertEqual((stats["ready"], stats["unacked"], stats["dead_lettered"]), (0, 0, 0))
+
+    def test_reject_and_errors_go_to_dead_letter_exchange(self):
+        async def scenario():
+            await self.client.connect()
+            dead = []
+
+            async def on_dead(delivery):
+                dead.append(delivery.headers["x-death"][0])
+                await delivery.ack()
+
+            self.broker.consume(DEAD_LETTER_QUEUE, on_dead)
+
+            async def on_message(body):
+                if body["n"] == 1:
+                    return ConsumeResult.REJECT
+                if body["n"] == 2:
+                    raise ValueError("bad message")
+                return None
+
+            await self.client.consume("test.dlx", on_message)
+            await self.client.publish_batch("test.dlx", [{"n": i} for i in range(4)])
+            await wait_until(lambda: len(dead) == 2 and self.queue_stats("test.dlx")["acked"] == 2)
+            return dead
+
+        dead = self.run_async(scenario())
+        self.assertEqual([(d["queue"], d["reason"]) for d in dead], [("test.dlx", "rejected")] * 2)
+        stats = self.queue_stats("test.dlx")
+        self.assertEqual((stats["rejected"], stats["dead_lettered"], stats["ready"]), (2, 2, 0))
+
+    def test_requeue_redelivers_message(self):
+        async def scenario():
+            await self.client.connect()
+            attempts = []
+
+            async def on_message(body):
+                attempts.append(body["n"])
+                return ConsumeResult.REQUEUE if len(attempts) == 1 else ConsumeResult.ACK
+
+            await self.client.consume("test.requeue", on_message)
+            await self.client.publish("test.requeue", {"n": 7})
+            await wait_until(lambda: self.queue_stats("test.requeue")["acked"] == 1)
+            return attempts
+
+        self.assertEqual(self.run_async(scenario()), [7, 7])
+        self.assertEqual(self.queue_stats("test.requeue")["requeued"], 1)
+
+
+class TestPrefetch(MemoryTransportTestCase):
+
+    def test_prefetch_limits_unacked_deliveries(self):
+        async def scenario():
+            await self.client.connect()
+            gate = asyncio.Event()
+            in_flight = [0]
+            peak = [0]
+
+            async def on_message(body):
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+                await gate.wait()
+                in_flight[0] -= 1
+
+            await self.client.consume("test.prefetch", on_message, prefetch_count=3)
+            await self.client.publish_batch("test.prefetch", [{"n": i} for i in range(10)])
+            await wait_until(lambda: in_flight[0] == 3)
+            # 给broker机会投递超出预取数量的消息（不应发生）
+            await asyncio.sleep(0.05)
+            blocked = self.queue_stats("test.prefetch")
+            gate.set()
+            await wait_until(lambda: self.queue_stats("test.prefetch")["acked"] == 10)
+            return blocked, peak[0]
+
+        blocked, peak = self.run_async(scenario())
+        self.assertEqual((blocked["unacked"], blocked["ready"]), (3, 7))
+        self.assertEqual(peak, 3)
+
+    def test_batch_consumer_prefetches_one_batch(self):
+        async def scenario():
+            await self.client.connect()
+            gate = asyncio.Event()
+            batches = []
+
+            async def handle_batch(messages):
+                batches.append(len(messages))
+                await gate.wait()
+
+            await self.client.consume_batch("test.batch", handle_batch, batch_size=4, batch_timeout_ms=5)
+            await self.client.publish_batch("test.batch", [{"n": i} for i in range(10)])
+            await wait_until(lambda: batches == [4])
+            await asyncio.sleep(0.05)
+            blocked = self.queue_stats("test.batch")
+            gate.set()
+            await wait_until(lambda: self.queue_stats("test.batch")["acked"] == 10)
+            return blocked, batches
+
+        blocked, batches = self.run_async(scenario())
+        self.assertLessEqual(blocked["unacked"], 2 * 4)
+        self.assertEqual(sum(batches), 10)
+
+
+class TestPipeline(AsyncTestBase):
+    """验证 -> 风险评估 -> 赔付 流水线，每个阶段使用独立客户端，与服务部署方式一致"""
+
+    ORDERS = 500
+
+    def setUp(self):
+        super().setUp()
+        # transport=memory 的客户端共用进程内broker，每个测试重新创建
+        mq_transport._default_broker = None
+
+    def tearDown(self):
+        mq_transport._default_broker = None
+        super().tearDown()
+
+    def run_pipeline(self, batch: bool):
+        args = argparse.Namespace(
+            orders=self.ORDERS, batch=batch, batch_size=50, batch_timeout_ms=5, prefetch=16,
+            publish_batch=100, reject_score=0.6
+        )
+
+        async def scenario():
+            pipeline = pipeline_benchmark.Pipeline(args, {"transport": "memory"})
+            await pipeline.start()
+            try:
+                await pipeline.produce()
+                await asyncio.wait_for(pipeline.done.wait(), timeout=10)
+                # 最后一批消息在处理完成后才确认
+                broker = mq_transport.get_memory_broker()
+                await wait_until(lambda: all(broker.stats()[name]["unacked"] == 0 for name in (
+                    pipeline_benchmark.QUEUE_ORDERS, pipeline_benchmark.QUEUE_RISK, pipeline_benchmark.QUEUE_PAYOUT
+                )))
+                return pipeline, await pipeline.producer.queue_stats()
+            finally:
+                await pipeline.close()
+
+        return self.loop.run_until_complete(scenario())
+
+    def assert_pipeline_drained(self, pipeline, stats):
+        self.assertGreater(pipeline.rejected, 0)
+        self.assertEqual(len(pipeline.latencies) + pipeline.rejected, self.ORDERS)
+        orders = stats[pipeline_benchmark.QUEUE_ORDERS]
+        risk = stats[pipeline_benchmark.QUEUE_RISK]
+        payout = stats[pipeline_benchmark.QUEUE_PAYOUT]
+        self.assertEqual((orders["published"], orders["acked"]), (self.ORDERS, self.ORDERS))
+        self.assertEqual(risk["published"], self.ORDERS)
+        self.assertEqual((risk["acked"], risk["dead_lettered"]), (len(pipeline.latencies), pipeline.rejected))
+        self.assertEqual((payout["published"], payout["acked"]), (len(pipeline.latencies), len(pipeline.latencies)))
+        self.assertEqual(stats[DEAD_LETTER_QUEUE]["published"], pipeline.rejected)
+        for queue in (orders, risk, payout):
+            self.assertEqual((queue["ready"], queue["unacked"]), (0, 0))
+
+    def test_per_message_pipeline(self):
+        self.assert_pipeline_drained(*self.run_pipeline(batch=False))
+
+    def test_batch_pipeline(self):
+        self.assert_pipeline_drained(*self.run_pipeline(batch=True))
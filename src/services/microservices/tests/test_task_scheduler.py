@@ -0,0 +1,73 @@
+"""任务调度器测试：周期任务的失败重试和取消"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.microservices.common.task_scheduler import TaskScheduler
+from services.microservices.common.test_utils import TestBase
+
+
+class TestRecurringRetries(TestBase):
+
+    def setUp(self):
+        super().setUp()
+        # 绕过单例，每个测试使用独立的调度器实例
+        self.scheduler = object.__new__(TaskScheduler)
+        self.scheduler._initialize()
+
+    def tearDown(self):
+        self.scheduler.stop()
+        super().tearDown()
+
+    def wait_for(self, predicate, timeout: float = 3.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def test_failed_run_is_retried_before_next_interval(self):
+        calls = []
+        done = threading.Event()
+
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise ValueError("transient")
+            done.set()
+
+        schedule_id = self.scheduler.schedule_recurring(
+            flaky, interval=60, max_retries=1, retry_delay=0.2, run_immediately=True
+        )
+        self.assertTrue(done.wait(3))
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.2)
+
+        self.assertTrue(self.wait_for(lambda: not self.scheduler.get_recurring_tasks()[0]["running"]))
+        schedule = self.scheduler.get_recurring_tasks()[0]
+        self.assertEqual(schedule["schedule_id"], schedule_id)
+        self.assertEqual(schedule["runs"], 2)
+        # 重试不推进周期：下一次触发仍在首次执行的一个间隔之后
+        self.assertLess(datetime.fromisoformat(schedule["next_run"]), datetime.now() + timedelta(seconds=60))
+
+    def test_without_retries_failure_waits_for_next_interval(self):
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise ValueError("always")
+
+        self.scheduler.schedule_recurring(failing, interval=60, run_immediately=True)
+        self.assertTrue(self.wait_for(lambda: calls))
+        time.sleep(0.3)
+        self.assertEqual(len(calls), 1)
+
+    def test_cancel_recurring_drops_pending_occurrence(self):
+        calls = []
+        schedule_id = self.scheduler.schedule_recurring(lambda: calls.append(1), interval=0.2)
+        self.assertTrue(self.scheduler.cancel_recurring(schedule_id))
+        self.assertFalse(self.scheduler.cancel_recurring(schedule_id))
+        time.sleep(0.4)
+        self.assertEqual(calls, [])
+        self.assertEqual(self.scheduler.get_recurring_tasks(), [])
@@ -18,7 +18,8 @@ import uuid
 # 导入共享组件
 from ..common.logger import logger, audit_logger
 from ..common.config_manager import config_manager
-from ..common.message_queue import mq_client, QUEUE_USER_EVENTS
+from ..common.message_queue import QUEUE_USER_EVENTS
+from ..common.async_message_queue import async_mq_client
 
 # 初始化FastAPI应用
 app = FastAPI(
@@ -263,7 +264,7 @@ def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
         "user_address": user["user_address"],
         "timestamp": now
     }
-    mq_client.publish_message(QUEUE_USER_EVENTS, user_event)
+    async_mq_client.publish_nowait(QUEUE_USER_EVENTS, user_event)
     
     # 记录审计日志
     audit_logger.log_user_creation(
@@ -304,7 +305,7 @@ def update_user(user_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str,
             "updated_fields": list(update_data.keys()),
             "timestamp": int(time.time())
         }
-        mq_client.publish_message(QUEUE_USER_EVENTS, user_event)
+        async_mq_client.publish_nowait(QUEUE_USER_EVENTS, user_event)
         
         # 记录审计日志
         audit_logger.log_user_update(
@@ -373,7 +374,7 @@ def check_user_permission(permission: str):
 async def health_check():
     """检查用户管理服务健康状态"""
     # 检查消息队列连接
-    mq_connected = mq_client.connected or mq_client.connect()
+    mq_connected = async_mq_client.connected or await async_mq_client.connect()
     
     # 总体健康状态
     overall_status = "up" if mq_connected else "down"
@@ -485,7 +486,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             "ip_address": "127.0.0.1",  # 在实际应用中应该获取真实IP
             "timestamp": now
         }
-        mq_client.publish_message(QUEUE_USER_EVENTS, login_event)
+        async_mq_client.publish_nowait(QUEUE_USER_EVENTS, login_event)
         
         # 记录审计日志
         audit_logger.log_user_login(
@@ -585,7 +586,7 @@ async def logout(user: Dict[str, Any] = Depends(get_current_user)):
             "email": user["email"],
             "timestamp": int(time.time())
         }
-        mq_client.publish_message(QUEUE_USER_EVENTS, logout_event)
+        async_mq_client.publish_nowait(QUEUE_USER_EVENTS, logout_event)
         
         # 记录审计日志
         audit_logger.log_user_logout(
@@ -706,7 +707,7 @@ async def update_password(password_data: PasswordUpdate, user: Dict[str, Any] =
             "email": user["email"],
             "timestamp": int(time.time())
         }
-        mq_client.publish_message(QUEUE_USER_EVENTS, password_event)
+        async_mq_client.publish_nowait(QUEUE_USER_EVENTS, password_event)
         
         # 记录审计日志
         audit_logger.log_password_change(
@@ -755,7 +756,7 @@ async def send_verification_email(user: Dict[str, Any] = Depends(get_current_use
             "email": user["email"],
             "timestamp": int(time.time())
         }
-        mq_client.publish_message(QUEUE_USER_EVENTS, verify_event)
+        async_mq_client.publish_nowait(QUEUE_USER_EVENTS, verify_event)
         
         # 记录审计日志
         audit_logger.log_email_verification(
@@ -800,7 +801,7 @@ async def verify_email(code: str, user: Dict[str, Any] = Depends(get_current_use
                 "email": user["email"],
                 "timestamp": int(time.time())
             }
-            mq_client.publish_message(QUEUE_USER_EVENTS, verify_event)
+            async_mq_client.publish_nowait(QUEUE_USER_EVENTS, verify_event)
             
             # 记录审计日志
             audit_logger.log_email_verification_success(
@@ -866,7 +867,7 @@ async def startup_event():
     logger.info("User Management Service starting up...")
     
     # 连接到消息队列
-    if not mq_client.connect():
+    if not await async_mq_client.connect():
         logger.error("Failed to connect to message queue")
         # 在实际应用中，可能需要根据配置决定是否继续启动服务
     
@@ -879,7 +880,7 @@ async def shutdown_event():
     logger.info("User Management Service shutting down...")
     
     # 关闭消息队列连接
-    mq_client.close()
+    await async_mq_client.close()
     
     logger.info("User Management Service shut down successfully")
 